@@ -0,0 +1,78 @@
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, NamedTuple, Callable
+from metriche import DURATA_FASE
+
+
+class _Voce(NamedTuple):
+    testo: str
+    audio: bytes
+    mp3_path: Path
+    txt_path: Path
+
+
+class ArchivioAudio:
+    """
+    Salvataggio asincrono di testo e audio sintetizzati (modalità in memoria di VoiceAI).
+
+    salva() ritorna subito: i file vengono scritti da un thread dedicato, fuori dal
+    percorso della richiesta. Su schede SD le piccole scritture sono la latenza dominante
+    di una sintesi già in cache, quindi qui non vengono mai fatte in linea.
+    La coda è limitata: se il disco non tiene il passo le voci in eccesso vengono scartate
+    (e conteggiate) invece di far crescere la memoria.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        scartate (int): Voci non salvate perché la coda era piena.
+        dopo_scrittura (Optional[Callable[[Path, Path], None]]): Chiamata con (mp3, txt) dopo ogni salvataggio.
+    """
+
+    def __init__(self, max_in_coda: int = 256, dopo_scrittura: Optional[Callable[[Path, Path], None]] = None):
+        self.logger = logging.getLogger("ArchivioAudio")
+        self.scartate = 0
+        self.dopo_scrittura = dopo_scrittura
+        self._coda: "queue.Queue[Optional[_Voce]]" = queue.Queue(maxsize=max_in_coda)
+        self._worker = threading.Thread(target=self._ciclo, name="ArchivioAudio", daemon=True)
+        self._worker.start()
+
+    def salva(self, testo: str, audio: bytes, mp3_path: Path, txt_path: Path) -> bool:
+        """
+        Accoda il salvataggio di testo e audio.
+
+        Returns:
+            bool: False se la coda era piena e la voce è stata scartata.
+        """
+        try:
+            self._coda.put_nowait(_Voce(testo, audio, Path(mp3_path), Path(txt_path)))
+            return True
+        except queue.Full:
+            self.scartate += 1
+            self.logger.warning(f"Coda di archiviazione piena: '{mp3_path}' non verrà salvato.")
+            return False
+
+    def attendi(self) -> None:
+        """Attende che tutte le voci accodate siano state scritte."""
+        self._coda.join()
+
+    def chiudi(self) -> None:
+        """Scrive le voci ancora in coda e termina il thread."""
+        self._coda.put(None)
+        self._worker.join()
+
+    def _ciclo(self) -> None:
+        while True:
+            voce = self._coda.get()
+            try:
+                if voce is None:
+                    return
+                with DURATA_FASE.labels(fase="archiviazione").cronometra():
+                    voce.txt_path.write_text(voce.testo, encoding="utf-8")
+                    voce.mp3_path.write_bytes(voce.audio)
+                if self.dopo_scrittura is not None:
+                    self.dopo_scrittura(voce.mp3_path, voce.txt_path)
+            except Exception as e:
+                self.logger.error(f"❌ Errore salvando '{voce.mp3_path}': {e}")
+            finally:
+                self._coda.task_done()
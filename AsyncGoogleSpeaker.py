@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, List, Optional, Union
+from google.cloud import texttospeech
+from GoogleSpeaker import GoogleSpeaker, SynthesisSpec
+from AudioPlayer import AudioPlayer
+from SynthesisCache import SynthesisCache
+from VoiceRegistry import VoiceRegistry
+from PianificatoreSintesi import PianificatoreSintesi, SintesiRifiutata
+from PoliticaChiamate import PoliticaChiamate, ScadenzaSuperata
+from metriche import DURATA_FASE, AUDIO_BYTES, CARATTERI_GOOGLE
+from text_chunker import MAX_BYTES_API, dividi_testo
+from formati_audio import AdattatoreStream, unisci_audio
+
+
+class AsyncGoogleSpeaker(GoogleSpeaker):
+    """
+    Variante asincrona di GoogleSpeaker basata su TextToSpeechAsyncClient.
+
+    La selezione della voce, la cache e la suddivisione dei testi lunghi sono
+    quelle di GoogleSpeaker; cambia solo il trasporto: l'attesa della risposta
+    di Google e quella della quota (PianificatoreSintesi.acquisisci_async) non
+    occupano un thread, mentre scrittura su file, accesso alla cache
+    su disco vengono eseguiti fuori dall'event loop (asyncio.to_thread) e la riproduzione
+    viene accodata all'AudioPlayer, che ha un proprio thread.
+
+    Il client gRPC asincrono viene creato alla prima sintesi, all'interno
+    dell'event loop che lo userà. Tutti i metodi di sintesi (parla, parla_lungo,
+    sintetizza, sintetizza_stream) vanno usati con await / async for.
+    """
+
+    def __init__(self, voce: str = 'femminile', lingua: str = 'it',
+                 cache: Optional[SynthesisCache] = None, player: Optional[AudioPlayer] = None,
+                 registro: Optional[VoiceRegistry] = None, pianificatore: Optional[PianificatoreSintesi] = None,
+                 politica: Optional[PoliticaChiamate] = None):
+        self._client_async: Optional[texttospeech.TextToSpeechAsyncClient] = None
+        super().__init__(voce=voce, lingua=lingua, cache=cache, player=player, registro=registro,
+                         pianificatore=pianificatore, politica=politica)
+        self.logger = logging.getLogger(__name__)
+
+    def _crea_client(self):
+        # Il canale gRPC asincrono è legato all'event loop: viene creato in _client()
+        return None
+
+    def _client(self) -> texttospeech.TextToSpeechAsyncClient:
+        if self._client_async is None:
+            self._client_async = texttospeech.TextToSpeechAsyncClient()
+            self.logger.info("Client asincrono Google Cloud Text-to-Speech inizializzato.")
+        return self._client_async
+
+    def parla(self, testo: str, output_file: Optional[str] = "output_google.mp3", play_audio: bool = True,
+              spec: Optional[SynthesisSpec] = None) -> Awaitable[Union[bool, Optional[bytes]]]:
+        """
+        Sintetizza il testo in voce e salva l'audio; da usare con await.
+
+        Se spec è None, i default dell'istanza vengono fissati al momento della chiamata
+        (non dell'await): modifiche successive con set_voce/set_velocita non influenzano questa sintesi.
+        I testi più lunghi di _SOGLIA_TESTO_LUNGO vengono divisi in blocchi
+        sintetizzati in parallelo. Con output_file=None l'audio resta in memoria, come in GoogleSpeaker.parla.
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            output_file (Optional[str]): Il percorso del file dove salvare l'audio (None = solo in memoria).
+            play_audio (bool): Se True, accoda l'audio al riproduttore dopo la sintesi.
+            spec (Optional[SynthesisSpec]): Parametri voce per questa sintesi (da crea_spec()).
+
+        Returns:
+            Awaitable[Union[bool, Optional[bytes]]]: True se la sintesi e il salvataggio sono riusciti,
+            False altrimenti; con output_file=None i byte audio, oppure None.
+        """
+        if spec is None:
+            try:
+                spec = self.crea_spec()
+            except Exception as e:
+                self.logger.error(f"❌ Configurazione voce non valida: {e}")
+        return self._parla(testo, output_file, play_audio, spec)
+
+    async def _parla(self, testo: str, output_file: Optional[str], play_audio: bool,
+                     spec: Optional[SynthesisSpec]) -> Union[bool, Optional[bytes]]:
+        esito_fallito = None if output_file is None else False
+        if not testo or not testo.strip():
+            self.logger.warning("Tentativo di sintetizzare un testo vuoto. Nessuna operazione.")
+            return esito_fallito
+        if spec is None:
+            return esito_fallito
+
+        try:
+            if len(testo.encode("utf-8")) > self._SOGLIA_TESTO_LUNGO:
+                blocchi = dividi_testo(testo)
+                self.logger.info(f"Sintesi asincrona testo lungo: {len(blocchi)} blocchi.")
+                audio_content = unisci_audio(await self._sintetizza_blocchi_async(blocchi, spec), spec.formato_audio)
+            else:
+                audio_content = await self._sintetizza_audio_async(testo, spec)
+
+            if output_file is None:
+                if play_audio:
+                    await asyncio.to_thread(self.player.accoda_audio, audio_content, spec.formato_audio.estensione)
+                return audio_content
+
+            await asyncio.to_thread(self._scrivi_file, output_file, audio_content)
+            self.logger.info(f"✅ Audio salvato con successo in '{output_file}'")
+
+            if play_audio:
+                self._play_audio(output_file)
+            return True
+
+        except (SintesiRifiutata, ScadenzaSuperata):
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Errore critico durante la sintesi vocale asincrona con Google TTS: {e}", exc_info=True)
+            return esito_fallito
+
+    def parla_lungo(self, testo: str, output_file: Optional[str] = "output_google.mp3", play_audio: bool = True,
+                    max_paralleli: int = GoogleSpeaker._MAX_SINTESI_PARALLELE, max_bytes_blocco: int = MAX_BYTES_API,
+                    spec: Optional[SynthesisSpec] = None) -> Awaitable[Union[bool, Optional[bytes]]]:
+        """Come parla(), che divide già in blocchi i testi lunghi; da usare con await."""
+        return self.parla(testo, output_file=output_file, play_audio=play_audio, spec=spec)
+
+    async def sintetizza(self, testo: str, spec: Optional[SynthesisSpec] = None) -> bytes:
+        """Come GoogleSpeaker.sintetizza: restituisce l'audio e propaga gli errori al chiamante."""
+        spec = spec or self.crea_spec()
+        if len(testo.encode("utf-8")) > self._SOGLIA_TESTO_LUNGO:
+            return unisci_audio(await self._sintetizza_blocchi_async(dividi_testo(testo), spec), spec.formato_audio)
+        return await self._sintetizza_audio_async(testo, spec)
+
+    async def sintetizza_stream(self, testo: str, max_paralleli: int = GoogleSpeaker._MAX_SINTESI_PARALLELE,
+                                max_bytes_blocco: int = MAX_BYTES_API,
+                                spec: Optional[SynthesisSpec] = None) -> AsyncIterator[bytes]:
+        """
+        Come GoogleSpeaker.sintetizza_stream, con async for: i blocchi vengono sintetizzati
+        in parallelo (al massimo max_paralleli) e restituiti in ordine appena pronti.
+        """
+        spec = spec or self.crea_spec()
+        blocchi = dividi_testo(testo, max_bytes=max_bytes_blocco)
+        self.logger.info(f"Sintesi asincrona in streaming: {len(blocchi)} blocchi, parallelismo {max_paralleli}.")
+        semaforo = asyncio.Semaphore(max(1, max_paralleli))
+
+        async def sintetizza(blocco: str) -> bytes:
+            async with semaforo:
+                return await self._sintetizza_audio_async(blocco, spec)
+
+        tasks = [asyncio.ensure_future(sintetizza(b)) for b in blocchi]
+        adattatore = AdattatoreStream(spec.formato_audio)
+        try:
+            for task in tasks:
+                yield adattatore.adatta(await task)
+            coda = adattatore.fine()
+            if coda:
+                yield coda
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _sintetizza_blocchi_async(self, blocchi: List[str], spec: SynthesisSpec) -> List[bytes]:
+        """Sintetizza i blocchi con al massimo _MAX_SINTESI_PARALLELE richieste contemporanee, in ordine."""
+        semaforo = asyncio.Semaphore(self._MAX_SINTESI_PARALLELE)
+
+        async def sintetizza(blocco: str) -> bytes:
+            async with semaforo:
+                return await self._sintetizza_audio_async(blocco, spec)
+
+        return list(await asyncio.gather(*(sintetizza(b) for b in blocchi)))
+
+    async def _sintetizza_audio_async(self, testo: str, spec: SynthesisSpec) -> bytes:
+        """Come GoogleSpeaker._sintetizza_audio, ma attende Google TTS senza bloccare l'event loop."""
+        chiave, audio_content = await asyncio.to_thread(self._cerca_in_cache, testo, spec)
+        if audio_content is None:
+            audio_content = await self.coalescenza.esegui_async(
+                (chiave or self.chiave_sintesi(testo, spec), spec.priorita),
+                lambda: self._sintetizza_google_async(testo, spec, chiave), spec.scadenza)
+        AUDIO_BYTES.inc(len(audio_content))
+        return audio_content
+
+    async def _sintetizza_google_async(self, testo: str, spec: SynthesisSpec, chiave: Optional[str]) -> bytes:
+        if self.pianificatore is not None:
+            await self.pianificatore.acquisisci_async(len(testo), spec.priorita, spec.scadenza)
+        self.logger.info(f"Inizio sintesi vocale asincrona: Lingua='{spec.lingua}', Voce='{spec.voce}', Velocità='{spec.velocita:.2f}'")
+        richiesta = self._richiesta_sintesi(testo, spec)
+        CARATTERI_GOOGLE.inc(len(testo))
+        try:
+            with DURATA_FASE.labels(fase="sintesi_google").cronometra():
+                response = await self.politica.esegui_async(
+                    lambda timeout: self._client().synthesize_speech(**richiesta, timeout=timeout, retry=None),
+                    spec.scadenza, lambda: self._consenti_hedge(testo, spec))
+        except Exception as e:
+            self._rilancia_se_quota_esaurita(e, testo, spec)
+            raise
+        if chiave is not None:
+            await asyncio.to_thread(self._salva_in_cache, chiave, response.audio_content)
+        return response.audio_content
+
+    async def riscalda(self, testo: str = "Pronto.", timeout: float = 5.0) -> None:
+        """Come GoogleSpeaker.riscalda, ma crea il client asincrono nell'event loop corrente."""
+        richiesta = self._richiesta_sintesi(testo, self.crea_spec())
+        CARATTERI_GOOGLE.inc(len(testo))
+        with DURATA_FASE.labels(fase="riscaldamento").cronometra():
+            await self._client().synthesize_speech(**richiesta, timeout=timeout, retry=None)
+
+    @staticmethod
+    def _scrivi_file(output_file: str, audio_content: bytes) -> None:
+        with DURATA_FASE.labels(fase="scrittura_mp3").cronometra():
+            with open(output_file, "wb") as out:
+                out.write(audio_content)
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from typing import Optional, Dict, Any, AsyncIterator, List
+from VoiceAI import VoiceAI
+from AsyncGoogleSpeaker import AsyncGoogleSpeaker
+from PianificatoreSintesi import SintesiRifiutata
+from PoliticaChiamate import ScadenzaSuperata
+from formati_audio import unisci_audio
+from metriche import DURATA_FASE, RICHIESTE, IN_CORSO
+
+
+class AsyncVoiceAI(VoiceAI):
+    """
+    Variante di VoiceAI per server asincroni (ASGI): usa AsyncGoogleSpeaker e
+    espone sintetizza_voce, sintetizza_audio, sintetizza_batch e riscalda come coroutine
+    e sintetizza_voce_stream come generatore asincrono, con lo stesso formato di risposta.
+    Il file TXT viene scritto in un thread per non bloccare l'event loop
+    (in modalità in memoria i file sono scritti in background da ArchivioAudio).
+    """
+
+    def _crea_motore(self, voce: str, lingua: str) -> AsyncGoogleSpeaker:
+        return AsyncGoogleSpeaker(voce=voce, lingua=lingua, cache=self.cache, pianificatore=self.pianificatore,
+                                  politica=self.politica)
+
+    async def riscalda(self) -> None:
+        """Come VoiceAI.riscalda; va attesa nell'event loop che servirà le richieste."""
+        await self.vocal_engine.riscalda()
+
+    async def sintetizza_voce(self, testo: str, voce: Optional[str] = None,
+                              velocita: Optional[int] = None, play_audio: bool = True,
+                              lingua: Optional[str] = None, formato: Optional[str] = None, sample_rate: Optional[int] = None,
+                              effetti: Optional[List[str]] = None,
+                              priorita: Optional[str] = None, scadenza: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Sintetizza un dato testo in voce, salva l'audio e il testo, e opzionalmente riproduce l'audio.
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            voce (Optional[str]): Genere della voce da usare per questa sintesi. Se None, usa il default dell'istanza.
+            velocita (Optional[int]): Velocità di riproduzione in percentuale. Se None, usa il default dell'istanza.
+            play_audio (bool): Se True, riproduce l'audio dopo la sintesi.
+            lingua (Optional[str]): Codice della lingua per questa sintesi. Se None, usa il default dell'istanza.
+            formato, sample_rate, effetti: Opzioni audio, come in VoiceAI.sintetizza_voce.
+            priorita (Optional[str]): Classe di priorità verso la quota di Google, come in VoiceAI.sintetizza_voce.
+            scadenza (Optional[float]): Istante time.monotonic() entro cui serve l'audio, come in VoiceAI.sintetizza_voce.
+
+        Returns:
+            Dict[str, Any]: Lo stesso dizionario restituito da VoiceAI.sintetizza_voce.
+        """
+        with IN_CORSO.in_corso():
+            return await self._sintetizza_voce_async(testo, voce, velocita, play_audio and self.riproduzione_locale,
+                                                     {"lingua": lingua or None, "formato": formato, "sample_rate": sample_rate,
+                                                      "effetti": effetti, "priorita": priorita,
+                                                      "scadenza": scadenza})
+
+    async def sintetizza_audio(self, testo: str, voce: Optional[str] = None, velocita: Optional[int] = None,
+                               lingua: Optional[str] = None, formato: Optional[str] = None,
+                               sample_rate: Optional[int] = None, effetti: Optional[List[str]] = None,
+                               priorita: Optional[str] = None, scadenza: Optional[float] = None) -> Dict[str, Any]:
+        """Come VoiceAI.sintetizza_audio: nessuna riproduzione, l'audio è nella chiave 'audio'."""
+        with IN_CORSO.in_corso():
+            return await self._sintetizza_voce_async(testo, voce, velocita, False,
+                                                     {"lingua": lingua or None, "formato": formato,
+                                                      "sample_rate": sample_rate, "effetti": effetti,
+                                                      "priorita": priorita, "scadenza": scadenza},
+                                                     includi_audio=True)
+
+    async def sintetizza_batch(self, richieste: List[Dict[str, Any]], max_paralleli: int = 4,
+                               play_audio: bool = False) -> List[Dict[str, Any]]:
+        """
+        Come VoiceAI.sintetizza_batch: gli elementi equivalenti vengono sintetizzati una sola volta,
+        al massimo max_paralleli alla volta, e i risultati restano nell'ordine dell'input.
+        """
+        gruppi = self._gruppi_batch(richieste)
+        self.logger.info(f"Batch di {len(richieste)} elementi: {len(gruppi)} sintesi distinte, parallelismo {max_paralleli}.")
+        semaforo = asyncio.Semaphore(max(1, max_paralleli))
+
+        async def esegui(indice: int) -> Dict[str, Any]:
+            async with semaforo:
+                try:
+                    return await self.sintetizza_voce(**self._argomenti_batch(richieste[indice], play_audio))
+                except Exception as e:
+                    self.logger.error(f"❌ Batch item {indice} failed: {e}", exc_info=True)
+                    return {"success": False, "message": f"Unexpected error: {e}"}
+
+        risultati: List[Optional[Dict[str, Any]]] = [None] * len(richieste)
+        for indici, risultato in zip(gruppi, await asyncio.gather(*(esegui(indici[0]) for indici in gruppi))):
+            for indice in indici:
+                risultati[indice] = dict(risultato)
+        return risultati
+
+    async def sintetizza_voce_stream(self, testo: str, voce: Optional[str] = None,
+                                     velocita: Optional[int] = None, lingua: Optional[str] = None,
+                                     formato: Optional[str] = None, sample_rate: Optional[int] = None,
+                                     effetti: Optional[List[str]] = None, priorita: Optional[str] = None,
+                                     scadenza: Optional[float] = None) -> AsyncIterator[bytes]:
+        """
+        Come VoiceAI.sintetizza_voce_stream, con async for. L'audio completo e il testo vengono
+        salvati a stream concluso (in background in modalità in memoria, altrimenti in un thread).
+
+        Raises:
+            ValueError: Se il testo è vuoto o le opzioni audio non sono valide.
+            SintesiRifiutata, ScadenzaSuperata: Come in VoiceAI.sintetizza_voce_stream.
+        """
+        if not testo or not testo.strip():
+            self.logger.warning("⚠️ Attempted to synthesize an empty or whitespace-only text.")
+            raise ValueError("Empty or invalid text provided.")
+
+        spec = self.vocal_engine.crea_spec(voce=voce or None, lingua=lingua or None, velocita=velocita or None,
+                                           formato=formato, sample_rate=sample_rate, effetti=effetti,
+                                           priorita=priorita, scadenza=scadenza)
+        parti = []
+        async for audio in self.vocal_engine.sintetizza_stream(testo, spec=spec):
+            parti.append(audio)
+            yield audio
+
+        formato_audio = spec.formato_audio
+        audio_path, txt_path = self._nuovi_percorsi(formato_audio.estensione)
+        if self.in_memoria:
+            if self.archivio is not None:
+                self.archivio.salva(testo, unisci_audio(parti, formato_audio), audio_path, txt_path)
+            return
+        await asyncio.to_thread(self._salva_stream, testo, unisci_audio(parti, formato_audio), audio_path, txt_path)
+        self.logger.info(f"✅ Streaming synthesis completed. Audio: {audio_path}, Text: {txt_path}")
+
+    async def _sintetizza_voce_async(self, testo: str, voce: Optional[str], velocita: Optional[int],
+                                     play_audio: bool, opzioni_spec: Dict[str, Any],
+                                     includi_audio: bool = False) -> Dict[str, Any]:
+        inizio = time.perf_counter()
+        if not testo or not testo.strip():
+            self.logger.warning("⚠️ Attempted to synthesize an empty or whitespace-only text.")
+            RICHIESTE.labels(esito="testo_non_valido").inc()
+            return {"success": False, "message": "Empty or invalid text provided."}
+
+        try:
+            spec = self.vocal_engine.crea_spec(voce=voce or None, velocita=velocita or None, **opzioni_spec)
+        except ValueError as e:
+            self.logger.warning(f"⚠️ Invalid audio options: {e}")
+            RICHIESTE.labels(esito="parametri_non_validi").inc()
+            return {"success": False, "message": str(e)}
+        DURATA_FASE.labels(fase="validazione").observe(time.perf_counter() - inizio)
+        estensione = spec.formato_audio.estensione
+
+        if self.in_memoria or includi_audio:
+            try:
+                audio = await self.vocal_engine.parla(testo, output_file=None, play_audio=play_audio, spec=spec)
+            except SintesiRifiutata as e:
+                return self._sintesi_rifiutata(e)
+            except ScadenzaSuperata as e:
+                return self._scadenza_superata(e)
+            return self._risultato_in_memoria(testo, audio, includi_audio, estensione=estensione)
+
+        mp3_path, txt_path = self._nuovi_percorsi(estensione)
+        sintesi = self.vocal_engine.parla(testo, output_file=str(mp3_path), play_audio=play_audio, spec=spec)
+
+        try:
+            with DURATA_FASE.labels(fase="scrittura_txt").cronometra():
+                await asyncio.to_thread(txt_path.write_text, testo, encoding="utf-8")
+            self.logger.info(f"Testo originale salvato in: {txt_path}")
+        except Exception as e:
+            sintesi.close()
+            self.logger.error(f"❌ Error saving text file '{txt_path}': {e}", exc_info=True)
+            RICHIESTE.labels(esito="errore_txt").inc()
+            return {"success": False, "message": f"Error saving text file: {e}"}
+
+        try:
+            esito = await sintesi
+        except (SintesiRifiutata, ScadenzaSuperata) as e:
+            await asyncio.to_thread(txt_path.unlink, missing_ok=True)
+            if isinstance(e, ScadenzaSuperata):
+                return self._scadenza_superata(e)
+            return self._sintesi_rifiutata(e)
+        self.storage.registra(mp3_path, txt_path)
+        if esito:
+            self.logger.info(f"✅ Synthesis completed. Audio: {mp3_path}, Text: {txt_path}")
+            RICHIESTE.labels(esito="successo").inc()
+            return {"success": True, "message": "Speech synthesis completed.", "audio_file": str(mp3_path)}
+        self.logger.error(f"❌ Speech synthesis failed for text: '{testo[:50]}...'")
+        RICHIESTE.labels(esito="errore_sintesi").inc()
+        return {"success": False, "message": "Speech synthesis failed."}
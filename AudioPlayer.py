@@ -0,0 +1,570 @@
+import io
+import os
+import sys
+import wave
+import select
+import shutil
+import logging
+import time
+import queue
+import itertools
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from typing import Optional, List, Dict, Any, NamedTuple, Callable, Tuple
+from metriche import DURATA_FASE
+# Tenta di importare playsound per la riproduzione audio.
+# Se non disponibile, lo gestiamo graziosamente.
+try:
+    from playsound import playsound
+except ImportError:
+    playsound = None
+
+# (frequenza di campionamento, canali, byte per campione)
+FormatoPcm = Tuple[int, int, int]
+
+
+class _Elemento(NamedTuple):
+    id: int
+    file_path: str
+    elimina_dopo: bool
+    pcm: Optional[Tuple[FormatoPcm, bytes]] = None  # WAV già decodificato, in memoria
+
+
+def _leggi_pcm(audio: bytes) -> Optional[Tuple[FormatoPcm, bytes]]:
+    """Formato e campioni di un WAV PCM; None se non è un WAV PCM (es. µ-law)."""
+    try:
+        with wave.open(io.BytesIO(audio)) as wav:
+            formato = (wav.getframerate(), wav.getnchannels(), wav.getsampwidth())
+            return formato, wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+class _Mpg123Residente:
+    """
+    Processo mpg123 sempre attivo in modalità remote control ('mpg123 -R').
+
+    Ogni file viene caricato con il comando LOAD sullo stesso processo: niente avvio di
+    un processo, inizializzazione del decoder e apertura del dispositivo audio per ogni frase.
+    Il primo messaggio '@F' dopo LOAD indica che il primo frame è stato decodificato e
+    inviato all'uscita audio; '@P 0' che la riproduzione è terminata (o è stata fermata).
+    Durante la riproduzione mpg123 emette un '@F' per frame: se per timeout_eventi secondi
+    non arriva nulla il processo è considerato bloccato, viene terminato e riavviato al
+    file successivo.
+    """
+
+    def __init__(self, comando: List[str], timeout_eventi: float = 5.0):
+        self.logger = logging.getLogger("AudioPlayer")
+        self.comando = comando
+        self.timeout_eventi = timeout_eventi
+        self._processo: Optional[subprocess.Popen] = None
+        self._eventi: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _assicura_processo(self) -> subprocess.Popen:
+        with self._lock:
+            if self._processo is None or self._processo.poll() is not None:
+                self._eventi = queue.Queue()
+                self._processo = subprocess.Popen(
+                    self.comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, text=True, bufsize=1)
+                threading.Thread(target=self._leggi_eventi, args=(self._processo, self._eventi),
+                                 name="AudioPlayer-mpg123", daemon=True).start()
+                self.logger.info(f"Avviato riproduttore residente: {' '.join(self.comando)}")
+            return self._processo
+
+    @staticmethod
+    def _leggi_eventi(processo: subprocess.Popen, eventi: "queue.Queue[Optional[str]]") -> None:
+        for riga in processo.stdout:
+            eventi.put(riga.rstrip("\n"))
+        eventi.put(None)  # processo terminato
+
+    def _invia(self, comando: str) -> None:
+        processo = self._processo
+        if processo is None or processo.poll() is not None:
+            return
+        try:
+            processo.stdin.write(comando + "\n")
+            processo.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def riproduci(self, file_path: str, da_saltare: Callable[[], bool] = lambda: False) -> Optional[float]:
+        """
+        Riproduce il file e attende la fine (o STOP).
+
+        Uno STOP inviato prima che mpg123 abbia preso in carico il LOAD andrebbe perso: per
+        questo da_saltare() viene controllata prima del LOAD e di nuovo al primo segnale di
+        avvio, e in quel caso lo STOP viene (re)inviato da qui.
+
+        Args:
+            file_path (str): Il file da riprodurre.
+            da_saltare (Callable[[], bool]): True se l'elemento è stato saltato.
+
+        Returns:
+            Optional[float]: Secondi tra il LOAD e il primo frame in uscita, None se non rilevato.
+        """
+        if "\n" in file_path or "\r" in file_path:
+            raise ValueError("Percorso del file non valido per mpg123 -R.")
+        if da_saltare():
+            return None
+        processo = self._assicura_processo()
+        eventi = self._eventi
+        # Scarta messaggi residui (banner '@R', ultimi '@F' del file precedente)
+        while True:
+            try:
+                eventi.get_nowait()
+            except queue.Empty:
+                break
+
+        inizio = time.perf_counter()
+        self._invia(f"LOAD {file_path}")
+        primo_campione: Optional[float] = None
+        avviato = False
+        while True:
+            try:
+                evento = eventi.get(timeout=self.timeout_eventi)
+            except queue.Empty:
+                self._termina(processo)
+                raise RuntimeError(f"mpg123 non risponde da {self.timeout_eventi:g} s: processo terminato, "
+                                   f"verrà riavviato.")
+            if evento is None:
+                raise RuntimeError(f"mpg123 è terminato inaspettatamente (codice {processo.poll()}).")
+            if evento.startswith("@F") or evento == "@P 2":
+                if not avviato and da_saltare():
+                    self._invia("STOP")
+                avviato = True
+                if evento.startswith("@F") and primo_campione is None:
+                    primo_campione = time.perf_counter() - inizio
+            elif evento.startswith("@E"):
+                raise RuntimeError(f"mpg123: {evento[3:]}")
+            elif evento == "@P 0" and avviato:
+                # Un '@P 0' prima dell'avvio è la risposta a uno STOP precedente al LOAD
+                return primo_campione
+
+    def ferma(self) -> None:
+        self._invia("STOP")
+
+    def _termina(self, processo: subprocess.Popen) -> None:
+        with self._lock:
+            if self._processo is processo:
+                self._processo = None
+        processo.kill()
+
+    def chiudi(self) -> None:
+        with self._lock:
+            processo, self._processo = self._processo, None
+        if processo is None:
+            return
+        try:
+            processo.stdin.write("QUIT\n")
+            processo.stdin.flush()
+            processo.wait(timeout=1)
+        except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+            processo.kill()
+
+class _PcmResidente:
+    """
+    Processo 'aplay' sempre attivo che legge PCM grezzo da stdin.
+
+    Fa per il LINEAR16 quello che mpg123 -R fa per l'MP3: niente processo e apertura del
+    dispositivo audio per ogni frase. I campioni vengono scritti al ritmo della riproduzione,
+    con anticipo secondi di margine, così riproduci() ritorna quando l'audio è finito. Il
+    processo viene riavviato solo se cambia il formato, o dopo ferma(): terminarlo è l'unico
+    modo di scartare subito l'audio già nel buffer del dispositivo.
+    """
+
+    _FORMATI_ALSA = {1: "U8", 2: "S16_LE", 3: "S24_3LE", 4: "S32_LE"}
+    _MAX_SCRITTURA = 4096  # select() garantisce almeno questo spazio libero nella pipe
+
+    def __init__(self, comando: List[str], anticipo: float = 0.2, timeout_scrittura: float = 5.0):
+        self.logger = logging.getLogger("AudioPlayer")
+        self.comando = comando
+        self.anticipo = anticipo
+        self.timeout_scrittura = timeout_scrittura
+        self._processo: Optional[subprocess.Popen] = None
+        self._formato: Optional[FormatoPcm] = None
+        self._sveglia = threading.Event()
+        self._lock = threading.Lock()
+
+    def _assicura_processo(self, formato: FormatoPcm) -> subprocess.Popen:
+        with self._lock:
+            if self._processo is not None and self._processo.poll() is None and self._formato == formato:
+                return self._processo
+            precedente = self._processo
+            frequenza, canali, larghezza = formato
+            self._processo = subprocess.Popen(
+                self.comando + ["-t", "raw", "-f", self._FORMATI_ALSA[larghezza],
+                                "-r", str(frequenza), "-c", str(canali), "-"],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, bufsize=0)
+            self._formato = formato
+            self.logger.info(f"Avviato riproduttore PCM residente: {self.comando[0]} "
+                             f"({frequenza} Hz, {canali} canali, {larghezza * 8} bit)")
+            processo = self._processo
+        if precedente is not None:
+            self._chiudi_processo(precedente)
+        return processo
+
+    def riproduci(self, formato: FormatoPcm, campioni: bytes,
+                  da_saltare: Callable[[], bool] = lambda: False) -> Optional[float]:
+        """
+        Scrive i campioni sul processo residente e attende la fine della riproduzione (o ferma()).
+
+        Returns:
+            Optional[float]: Secondi tra la chiamata (avvio del processo compreso, se serve) e la
+            prima scrittura di campioni accettata da aplay, None se nulla è stato scritto.
+        """
+        if formato[2] not in self._FORMATI_ALSA:
+            raise ValueError(f"Campioni da {formato[2]} byte non supportati.")
+        self._sveglia.clear()
+        if da_saltare():
+            return None
+        chiamata = time.perf_counter()
+        primo_campione: Optional[float] = None
+        processo = self._assicura_processo(formato)
+        frequenza, canali, larghezza = formato
+        dimensione_frame = canali * larghezza
+        byte_al_secondo = frequenza * dimensione_frame
+        passo = max(dimensione_frame, self._MAX_SCRITTURA // dimensione_frame * dimensione_frame)
+        inizio = time.monotonic()
+        for posizione in range(0, len(campioni), passo):
+            attesa = inizio + posizione / byte_al_secondo - self.anticipo - time.monotonic()
+            if attesa > 0:
+                self._sveglia.wait(attesa)
+            if da_saltare():
+                self._termina(processo)
+                return primo_campione
+            self._scrivi(processo, campioni[posizione:posizione + passo])
+            if primo_campione is None:
+                primo_campione = time.perf_counter() - chiamata
+        fine = inizio + len(campioni) / byte_al_secondo
+        while not da_saltare():
+            resto = fine - time.monotonic()
+            if resto <= 0:
+                return primo_campione
+            self._sveglia.wait(resto)
+            self._sveglia.clear()
+        self._termina(processo)
+        return primo_campione
+
+    def _scrivi(self, processo: subprocess.Popen, dati: bytes) -> None:
+        descrittore = processo.stdin.fileno()
+        _, scrivibili, _ = select.select([], [descrittore], [], self.timeout_scrittura)
+        if not scrivibili:
+            self._termina(processo)
+            raise RuntimeError(f"{self.comando[0]} non legge l'audio da {self.timeout_scrittura:g} s: "
+                               f"processo terminato, verrà riavviato.")
+        try:
+            os.write(descrittore, dati)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"{self.comando[0]} è terminato inaspettatamente (codice {processo.poll()}).") from e
+
+    def ferma(self) -> None:
+        self._sveglia.set()
+
+    def _termina(self, processo: subprocess.Popen) -> None:
+        with self._lock:
+            if self._processo is processo:
+                self._processo = None
+        processo.kill()
+        processo.wait()
+
+    @staticmethod
+    def _chiudi_processo(processo: subprocess.Popen) -> None:
+        try:
+            processo.stdin.close()
+            processo.wait(timeout=1)
+        except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+            processo.kill()
+
+    def chiudi(self) -> None:
+        with self._lock:
+            processo, self._processo = self._processo, None
+        if processo is not None:
+            self._chiudi_processo(processo)
+
+class AudioPlayer:
+    """
+    Coda di riproduzione audio servita da un thread dedicato.
+
+    accoda() ritorna subito: chi sintetizza non resta bloccato per la durata dell'audio.
+    Per default la riproduzione usa un solo processo 'mpg123 -R' residente, a cui i file
+    vengono passati uno alla volta; in alternativa (comando) un processo per elemento.
+    I WAV PCM (LINEAR16) vanno invece a un processo 'aplay' residente che legge i campioni
+    da stdin: i buffer accodati con accoda_audio() non passano da un file temporaneo.
+    L'Ogg resta a un processo per elemento (ffplay). In tutti i casi l'elemento corrente può essere interrotto (salta/interrompi); se
+    mpg123 non è disponibile ricade su 'playsound', che però non può essere interrotto
+    a metà di un file.
+
+    Il tempo tra l'inizio della riproduzione di un elemento e il primo campione in uscita
+    (solo con i processi residenti, mpg123 e aplay) è registrato nella fase 'avvio_riproduzione'.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        comando (Optional[List[str]]): Comando di riproduzione per elemento; il percorso del file viene aggiunto in coda.
+        residente (Optional[List[str]]): Comando del riproduttore residente in modalità remote control.
+        pcm (Optional[List[str]]): Comando del riproduttore PCM residente; formato e '-' vengono aggiunti in coda.
+    """
+
+    # Riproduttori per i formati che mpg123 non gestisce, in ordine di preferenza
+    _RIPRODUTTORI_FORMATO = {
+        ".wav": (["aplay", "-q"], ["paplay"], ["afplay"]),
+        ".ogg": (["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"], ["paplay"]),
+    }
+
+    _predefinito: Optional["AudioPlayer"] = None
+    _lock_predefinito = threading.Lock()
+
+    def __init__(self, comando: Optional[List[str]] = None, residente: Optional[List[str]] = None,
+                 pcm: Optional[List[str]] = None):
+        self.logger = logging.getLogger("AudioPlayer")
+        if comando is None and residente is None and (sys.platform.startswith('linux') or sys.platform == 'darwin') \
+                and shutil.which("mpg123"):
+            residente = ["mpg123", "-R"]
+        if comando is None and pcm is None and sys.platform.startswith('linux') and shutil.which("aplay"):
+            pcm = ["aplay", "-q"]
+        self.comando = comando
+        self.residente = residente
+        self.pcm = None if comando else pcm
+        self._backend_residente = _Mpg123Residente(residente) if residente else None
+        self._backend_pcm = _PcmResidente(self.pcm) if self.pcm else None
+        self._comandi_formato: Dict[str, Optional[List[str]]] = {} if comando else {
+            estensione: next((c for c in candidati if shutil.which(c[0])), None)
+            for estensione, candidati in self._RIPRODUTTORI_FORMATO.items()
+        }
+
+        self._condizione = threading.Condition()
+        self._in_attesa: "deque[_Elemento]" = deque()
+        self._corrente: Optional[_Elemento] = None
+        self._processo: Optional[subprocess.Popen] = None
+        self._da_saltare: Optional[int] = None
+        self._con_playsound = False
+        self._ids = itertools.count(1)
+        self._chiuso = False
+
+        if self.comando is None and self.residente is None and playsound is None:
+            self.logger.warning("Né 'mpg123' né 'playsound' sono disponibili: l'audio verrà solo salvato, non riprodotto.")
+        elif self.comando is None and self.residente is None:
+            self.logger.warning("'mpg123' non trovato: uso 'playsound', la riproduzione in corso non potrà essere interrotta.")
+
+        self._worker = threading.Thread(target=self._ciclo, name="AudioPlayer", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def predefinito(cls) -> "AudioPlayer":
+        """Restituisce il riproduttore condiviso dal processo (c'è un solo dispositivo audio)."""
+        with cls._lock_predefinito:
+            if cls._predefinito is None or cls._predefinito._chiuso:
+                cls._predefinito = cls()
+            return cls._predefinito
+
+    def accoda(self, file_path: str, elimina_dopo: bool = False) -> int:
+        """
+        Aggiunge un file alla coda di riproduzione e ritorna subito.
+
+        Args:
+            file_path (str): Il file audio da riprodurre.
+            elimina_dopo (bool): Se True, il file viene eliminato dopo la riproduzione (o se scartato).
+
+        Returns:
+            int: Identificativo dell'elemento in coda.
+        """
+        return self._aggiungi(_Elemento(next(self._ids), file_path, elimina_dopo))
+
+    def _aggiungi(self, elemento: _Elemento) -> int:
+        with self._condizione:
+            if self._chiuso:
+                raise RuntimeError("AudioPlayer chiuso.")
+            self._in_attesa.append(elemento)
+            self._condizione.notify_all()
+        return elemento.id
+
+    def accoda_audio(self, audio: bytes, suffisso: str = ".mp3") -> int:
+        """
+        Accoda un buffer audio già in memoria (es. un blocco appena sintetizzato).
+        I WAV PCM restano in memoria se c'è il riproduttore PCM residente; gli altri formati
+        vengono scritti in un file temporaneo (in /dev/shm se disponibile), eliminato dopo
+        la riproduzione.
+
+        Returns:
+            int: Identificativo dell'elemento in coda.
+        """
+        if suffisso == ".wav" and self._backend_pcm is not None:
+            pcm = _leggi_pcm(audio)
+            if pcm is not None:
+                return self._aggiungi(_Elemento(next(self._ids), f"<wav in memoria, {len(audio)} byte>", False, pcm))
+        cartella = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, file_path = tempfile.mkstemp(prefix="voce_", suffix=suffisso, dir=cartella)
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        return self.accoda(file_path, elimina_dopo=True)
+
+    def salta(self) -> bool:
+        """
+        Interrompe l'elemento in riproduzione e passa al successivo.
+
+        L'elemento viene segnato come saltato prima di fermare il riproduttore: se la
+        riproduzione non è ancora partita (processo non avviato, LOAD non ancora preso
+        in carico) viene interrotta non appena parte, invece di suonare per intero.
+
+        Returns:
+            bool: True se un elemento in riproduzione è stato interrotto.
+        """
+        with self._condizione:
+            processo = self._processo
+            corrente = self._corrente
+            if corrente is None:
+                return False
+            if self._con_playsound:
+                self.logger.warning("L'elemento in riproduzione non può essere interrotto (playsound).")
+                return False
+            self._da_saltare = corrente.id
+        if processo is not None and processo.poll() is None:
+            processo.terminate()
+        else:
+            for backend in (self._backend_residente, self._backend_pcm):
+                if backend is not None:
+                    backend.ferma()
+        self.logger.info("⏭️ Riproduzione corrente interrotta.")
+        return True
+
+    def svuota(self) -> int:
+        """
+        Scarta tutti gli elementi in attesa (quello in riproduzione continua).
+
+        Returns:
+            int: Numero di elementi scartati.
+        """
+        with self._condizione:
+            scartati = list(self._in_attesa)
+            self._in_attesa.clear()
+            self._condizione.notify_all()
+        for elemento in scartati:
+            self._elimina_se_richiesto(elemento)
+        if scartati:
+            self.logger.info(f"🧹 {len(scartati)} elementi rimossi dalla coda di riproduzione.")
+        return len(scartati)
+
+    def interrompi(self) -> Dict[str, Any]:
+        """Svuota la coda e interrompe l'elemento in riproduzione."""
+        scartati = self.svuota()
+        interrotto = self.salta()
+        return {"scartati": scartati, "interrotto": interrotto}
+
+    def stato(self) -> Dict[str, Any]:
+        """Restituisce l'elemento in riproduzione, la lunghezza della coda e il backend in uso."""
+        with self._condizione:
+            corrente = self._corrente
+            return {
+                "in_riproduzione": corrente.file_path if corrente else None,
+                "in_coda": len(self._in_attesa),
+                "backend": self._nome_backend(),
+            }
+
+    def _nome_backend(self) -> Optional[str]:
+        if self.residente:
+            return f"{self.residente[0]} (residente)"
+        return self.comando[0] if self.comando else ("playsound" if playsound else None)
+
+    def attendi(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attende che la coda sia vuota e nessun elemento sia in riproduzione.
+
+        Returns:
+            bool: True se la riproduzione è terminata entro il timeout.
+        """
+        with self._condizione:
+            return self._condizione.wait_for(lambda: not self._in_attesa and self._corrente is None, timeout)
+
+    def chiudi(self) -> None:
+        """Interrompe la riproduzione e termina il thread del riproduttore."""
+        with self._condizione:
+            self._chiuso = True
+            self._condizione.notify_all()
+        self.interrompi()
+        self._worker.join(timeout=2)
+        for backend in (self._backend_residente, self._backend_pcm):
+            if backend is not None:
+                backend.chiudi()
+
+    def _ciclo(self) -> None:
+        while True:
+            with self._condizione:
+                self._condizione.wait_for(lambda: self._in_attesa or self._chiuso)
+                if self._chiuso:
+                    return
+                elemento = self._in_attesa.popleft()
+                self._corrente = elemento
+            try:
+                with DURATA_FASE.labels(fase="riproduzione").cronometra():
+                    self._riproduci(elemento)
+            except Exception as e:
+                self.logger.error(f"Errore durante la riproduzione di '{elemento.file_path}': {e}")
+            finally:
+                self._elimina_se_richiesto(elemento)
+                with self._condizione:
+                    self._corrente = None
+                    self._processo = None
+                    self._con_playsound = False
+                    self._condizione.notify_all()
+
+    def _riproduci(self, elemento: _Elemento) -> None:
+        file_path = elemento.file_path
+        da_saltare = lambda: self._da_saltare == elemento.id
+        if da_saltare():
+            return
+        if elemento.pcm is not None:
+            self._osserva_avvio(self._backend_pcm.riproduci(*elemento.pcm, da_saltare))
+            return
+        if not os.path.exists(file_path):
+            self.logger.error(f"File audio non trovato per la riproduzione: {file_path}")
+            return
+
+        estensione = os.path.splitext(file_path)[1].lower()
+        pcm = None
+        if estensione == ".wav" and self._backend_pcm is not None:
+            with open(file_path, "rb") as f:
+                pcm = _leggi_pcm(f.read())
+        if pcm is not None:
+            self.logger.info(f"Riproduzione audio (riproduttore PCM residente): {file_path}")
+            self._osserva_avvio(self._backend_pcm.riproduci(*pcm, da_saltare))
+        elif self.comando:
+            self._esegui(self.comando, file_path, da_saltare)
+        elif self._comandi_formato.get(estensione):
+            # WAV/Ogg: mpg123 decodifica solo MPEG audio
+            self._esegui(self._comandi_formato[estensione], file_path, da_saltare)
+        elif self._backend_residente is not None and estensione not in self._comandi_formato:
+            self.logger.info(f"Riproduzione audio (riproduttore residente): {file_path}")
+            self._osserva_avvio(self._backend_residente.riproduci(file_path, da_saltare))
+        elif playsound:
+            self.logger.info(f"Riproduzione audio con 'playsound': {file_path}")
+            with self._condizione:
+                self._con_playsound = True
+            playsound(file_path)
+        else:
+            self.logger.warning(f"Nessun riproduttore disponibile per '{estensione}': {file_path}")
+
+    @staticmethod
+    def _osserva_avvio(primo_campione: Optional[float]) -> None:
+        if primo_campione is not None:
+            DURATA_FASE.labels(fase="avvio_riproduzione").observe(primo_campione)
+
+    def _esegui(self, comando: List[str], file_path: str, da_saltare: Callable[[], bool]) -> None:
+        self.logger.info(f"Riproduzione audio con '{comando[0]}': {file_path}")
+        processo = subprocess.Popen(comando + [file_path],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with self._condizione:
+            self._processo = processo
+            if da_saltare():  # salta() arrivato mentre il processo partiva
+                processo.terminate()
+        codice = processo.wait()
+        if codice not in (0, -15):  # -15: interrotto da salta()
+            self.logger.warning(f"Il comando '{comando[0]}' è terminato con codice {codice}.")
+
+    def _elimina_se_richiesto(self, elemento: _Elemento) -> None:
+        if elemento.elimina_dopo:
+            try:
+                os.remove(elemento.file_path)
+            except OSError:
+                pass
@@ -0,0 +1,253 @@
+import os
+import uuid
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: nessun coordinamento tra processi
+    fcntl = None
+
+
+class AudioStorage:
+    """
+    Archivio dei file MP3/TXT prodotti da VoiceAI, suddiviso per giorno (AAAA/MM/GG).
+
+    Ogni cartella contiene solo i file di un giorno, così le operazioni sulle directory
+    restano veloci con qualunque volume e la ritenzione per età si riduce a eliminare
+    intere cartelle. Un thread in background applica periodicamente due limiti:
+    età massima dei file e dimensione totale (eliminando prima i giorni più vecchi).
+
+    L'occupazione è tenuta in memoria per giorno: viene calcolata una volta all'avvio
+    e aggiornata da registra() dopo ogni scrittura, senza rileggere il disco.
+    I file 'agape_*' nella radice (layout precedente, non suddiviso) vengono conteggiati
+    e rimossi con le stesse regole.
+
+    Con condiviso=True la directory è usata da più processi (server multi-worker): a ogni
+    passata la pulizia viene fatta da un solo processo alla volta (lock su file), che prima
+    riconta l'occupazione dal disco, dato che gli altri processi vi scrivono senza avvisarlo.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        base_dir (Path): Directory radice dell'archivio.
+        max_eta_giorni (Optional[float]): Età massima dei file (None = nessun limite).
+        max_bytes (Optional[int]): Dimensione totale massima (None = nessun limite).
+        condiviso (bool): True se altri processi scrivono nella stessa directory.
+    """
+
+    _RADICE = ""  # chiave dei file nella radice (layout precedente)
+
+    def __init__(self, base_dir: str = "storage/audio", max_eta_giorni: Optional[float] = 30,
+                 max_bytes: Optional[int] = 2 * 1024 * 1024 * 1024, intervallo_pulizia: float = 600,
+                 condiviso: bool = False):
+        self.logger = logging.getLogger("AudioStorage")
+        self.base_dir = Path(base_dir)
+        self.max_eta_giorni = max_eta_giorni
+        self.max_bytes = max_bytes
+        self.intervallo_pulizia = intervallo_pulizia
+        self.condiviso = condiviso
+
+        self._lock = threading.Lock()
+        # giorno ("AAAA/MM/GG" o _RADICE) -> [bytes, numero di file]
+        self._uso: Dict[str, List[int]] = {}
+        self._giorno_corrente: Optional[Tuple[str, Path]] = None
+        self._contatori = {"rimossi_eta": 0, "rimossi_spazio": 0}
+        self._stop = threading.Event()
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._scansiona()
+        self._worker = threading.Thread(target=self._ciclo, name="AudioStorage", daemon=True)
+        self._worker.start()
+
+    def nuovi_percorsi(self, estensione: str = ".mp3") -> Tuple[Path, Path]:
+        """Genera percorsi audio/TXT univoci nella cartella del giorno corrente (estensione del formato audio)."""
+        adesso = datetime.now()
+        giorno = adesso.strftime("%Y/%m/%d")
+        with self._lock:
+            if self._giorno_corrente is None or self._giorno_corrente[0] != giorno:
+                cartella = self.base_dir / giorno
+                cartella.mkdir(parents=True, exist_ok=True)
+                self._giorno_corrente = (giorno, cartella)
+            cartella = self._giorno_corrente[1]
+        filename_base = f"agape_{adesso.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        return cartella / f"{filename_base}{estensione}", cartella / f"{filename_base}.txt"
+
+    def registra(self, *percorsi: Path) -> None:
+        """Aggiunge all'occupazione i file appena scritti (quelli inesistenti vengono ignorati)."""
+        for percorso in percorsi:
+            try:
+                dimensione = os.stat(percorso).st_size
+            except OSError:
+                continue
+            try:
+                giorno = self._giorno_di(Path(percorso))
+            except ValueError:  # fuori dall'archivio
+                continue
+            with self._lock:
+                uso = self._uso.setdefault(giorno, [0, 0])
+                uso[0] += dimensione
+                uso[1] += 1
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce occupazione (byte, file, giorni), limiti e file rimossi."""
+        with self._lock:
+            return {
+                "bytes": sum(u[0] for u in self._uso.values()),
+                "file": sum(u[1] for u in self._uso.values()),
+                "giorni": sum(1 for g in self._uso if g != self._RADICE),
+                "max_bytes": self.max_bytes,
+                "max_eta_giorni": self.max_eta_giorni,
+                **self._contatori,
+            }
+
+    def pulisci(self) -> Dict[str, int]:
+        """
+        Applica subito i limiti di età e dimensione (normalmente lo fa il thread in background).
+
+        Returns:
+            Dict[str, int]: File rimossi per età e per spazio in questa passata.
+        """
+        rimossi_eta = self._applica_eta()
+        rimossi_spazio = self._applica_dimensione()
+        with self._lock:
+            self._contatori["rimossi_eta"] += rimossi_eta
+            self._contatori["rimossi_spazio"] += rimossi_spazio
+        if rimossi_eta or rimossi_spazio:
+            self.logger.info(f"🧹 Archivio audio: {rimossi_eta} file rimossi per età, {rimossi_spazio} per spazio.")
+        return {"rimossi_eta": rimossi_eta, "rimossi_spazio": rimossi_spazio}
+
+    def chiudi(self) -> None:
+        """Ferma il thread di pulizia."""
+        self._stop.set()
+        self._worker.join(timeout=2)
+
+    def _ciclo(self) -> None:
+        while not self._stop.wait(self.intervallo_pulizia):
+            try:
+                if self.condiviso:
+                    self._pulisci_condiviso()
+                else:
+                    self.pulisci()
+            except Exception as e:
+                self.logger.error(f"Errore durante la pulizia dell'archivio audio: {e}")
+
+    def _pulisci_condiviso(self) -> None:
+        if fcntl is None:
+            self._scansiona()
+            self.pulisci()
+            return
+        with open(self.base_dir / ".pulizia.lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # un altro processo sta già pulendo
+            try:
+                self._scansiona()
+                self.pulisci()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _giorno_di(self, percorso: Path) -> str:
+        relativo = percorso.parent.relative_to(self.base_dir)
+        return relativo.as_posix() if relativo.parts else self._RADICE
+
+    def _scansiona(self) -> None:
+        uso: Dict[str, List[int]] = {}
+        for voce in self.base_dir.glob("agape_*"):
+            if voce.is_file():
+                u = uso.setdefault(self._RADICE, [0, 0])
+                u[0] += voce.stat().st_size
+                u[1] += 1
+        for cartella in self.base_dir.glob("[0-9]*/[0-9]*/[0-9]*"):
+            if cartella.is_dir():
+                file = [f.stat().st_size for f in cartella.iterdir() if f.is_file()]
+                uso[cartella.relative_to(self.base_dir).as_posix()] = [sum(file), len(file)]
+        with self._lock:
+            self._uso = uso
+
+    def _giorni_in_ordine(self) -> List[str]:
+        # La radice (file del layout precedente) è considerata la più vecchia
+        with self._lock:
+            return sorted(self._uso)
+
+    def _rimuovi_giorno(self, giorno: str) -> int:
+        with self._lock:
+            _, numero = self._uso.pop(giorno, (0, 0))
+            if self._giorno_corrente and self._giorno_corrente[0] == giorno:
+                self._giorno_corrente = None
+        cartella = self.base_dir / giorno
+        shutil.rmtree(cartella, ignore_errors=True)
+        # Rimuove anche le cartelle di mese e anno rimaste vuote
+        for genitore in (cartella.parent, cartella.parent.parent):
+            try:
+                genitore.rmdir()
+            except OSError:
+                break
+        return numero
+
+    def _rimuovi_file(self, giorno: str, file: List[Path]) -> int:
+        rimossi = 0
+        for percorso in file:
+            try:
+                dimensione = percorso.stat().st_size
+                percorso.unlink()
+            except OSError:
+                continue
+            rimossi += 1
+            with self._lock:
+                uso = self._uso.get(giorno)
+                if uso is not None:
+                    uso[0] -= dimensione
+                    uso[1] -= 1
+        return rimossi
+
+    def _applica_eta(self) -> int:
+        if self.max_eta_giorni is None:
+            return 0
+        limite = datetime.now() - timedelta(days=self.max_eta_giorni)
+        rimossi = 0
+        for giorno in self._giorni_in_ordine():
+            if giorno == self._RADICE:
+                scaduti = [f for f in self.base_dir.glob("agape_*")
+                           if f.is_file() and f.stat().st_mtime < limite.timestamp()]
+                rimossi += self._rimuovi_file(giorno, scaduti)
+                continue
+            try:
+                data = datetime.strptime(giorno, "%Y/%m/%d")
+            except ValueError:
+                continue
+            # Un giorno scade quando anche il suo ultimo istante è oltre il limite
+            if data + timedelta(days=1) <= limite:
+                rimossi += self._rimuovi_giorno(giorno)
+        return rimossi
+
+    def _applica_dimensione(self) -> int:
+        if self.max_bytes is None:
+            return 0
+        rimossi = 0
+        oggi = datetime.now().strftime("%Y/%m/%d")
+        for giorno in self._giorni_in_ordine():
+            with self._lock:
+                totale = sum(u[0] for u in self._uso.values())
+                uso_giorno = self._uso.get(giorno, [0, 0])[0]
+            if totale <= self.max_bytes:
+                break
+            if giorno not in (self._RADICE, oggi) and totale - uso_giorno >= self.max_bytes:
+                rimossi += self._rimuovi_giorno(giorno)
+                continue
+            # Basta una parte del giorno: rimuovi i file più vecchi (il nome inizia con il timestamp)
+            cartella = self.base_dir / giorno if giorno else self.base_dir
+            file = sorted(f for f in cartella.glob("agape_*") if f.is_file())
+            eccesso = totale - self.max_bytes
+            da_rimuovere: List[Path] = []
+            for percorso in file:
+                if eccesso <= 0:
+                    break
+                da_rimuovere.append(percorso)
+                eccesso -= percorso.stat().st_size
+            rimossi += self._rimuovi_file(giorno, da_rimuovere)
+        return rimossi
@@ -0,0 +1,169 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from metriche import AVVIO
+
+
+class MotoreNonPronto(RuntimeError):
+    """Il motore vocale non è (ancora) disponibile: inizializzazione in corso o fallita."""
+
+
+class AvvioMotore:
+    """
+    Inizializzazione del motore vocale fuori dall'avvio del server.
+
+    Il server risponde subito (liveness), mentre in background vengono importate le
+    librerie di Google, creato il motore (client, credenziali, catalogo voci) ed eseguito
+    un riscaldamento: una sintesi minima che apre il canale gRPC e completa l'handshake
+    TLS, così la prima richiesta reale non ne paga il costo. 'pronto' diventa True solo
+    a riscaldamento concluso ed è ciò che l'endpoint di readiness deve riportare.
+
+    La durata di ogni fase è esposta nel gauge voce_ai_avvio_secondi e in stato().
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        inizio (float): Istante di riferimento (perf_counter) per la fase 'pronto'.
+    """
+
+    def __init__(self, crea: Callable[[], Any], inizio: Optional[float] = None):
+        """
+        Args:
+            crea (Callable[[], Any]): Crea il motore (es. VoiceAI); se il motore ha un metodo
+                riscalda() viene chiamato subito dopo (anche se restituisce una coroutine).
+            inizio (Optional[float]): perf_counter() dell'avvio del processo; None = adesso.
+        """
+        self.logger = logging.getLogger("AvvioMotore")
+        self.inizio = inizio if inizio is not None else time.perf_counter()
+        self._crea = crea
+        self._motore: Any = None
+        self._errore: Optional[str] = None
+        self._creato = threading.Event()
+        self._pronto = threading.Event()
+        self._tempi: Dict[str, float] = {}
+        self._prima_richiesta_registrata = False
+
+    @property
+    def pronto(self) -> bool:
+        return self._pronto.is_set()
+
+    @contextmanager
+    def fase(self, nome: str) -> Iterator[None]:
+        """Misura la durata del blocco come fase di avvio 'nome'."""
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registra(nome, time.perf_counter() - inizio)
+
+    def registra(self, nome: str, secondi: float) -> None:
+        """Registra la durata di una fase di avvio misurata altrove."""
+        self._tempi[nome] = secondi
+        AVVIO.labels(fase=nome).set(secondi)
+
+    def registra_prima_richiesta(self, secondi: float) -> None:
+        """Registra la latenza della prima richiesta servita (solo la prima volta)."""
+        if self._prima_richiesta_registrata:
+            return
+        self._prima_richiesta_registrata = True
+        self.registra("prima_richiesta", secondi)
+        self.logger.info(f"⏱️ Prima richiesta servita in {secondi * 1000:.0f} ms.")
+
+    def avvia(self) -> None:
+        """Avvia creazione e riscaldamento in un thread in background e ritorna subito."""
+        threading.Thread(target=self._esegui, name="AvvioMotore", daemon=True).start()
+
+    async def avvia_async(self) -> None:
+        """
+        Come avvia(), per server asincroni: la creazione avviene in un thread,
+        il riscaldamento nell'event loop corrente (dove vivono i client asincroni).
+        Da lanciare come task, per non ritardare l'avvio del server.
+        """
+        try:
+            motore = await asyncio.to_thread(self._crea_motore)
+            esito = self._riscalda(motore)
+            if inspect.isawaitable(esito):
+                await esito
+        except Exception as e:
+            self._fallito(e)
+            return
+        self._concludi()
+
+    def ottieni(self, timeout: Optional[float] = None) -> Any:
+        """
+        Restituisce il motore, attendendone la creazione al più 'timeout' secondi.
+        Non attende il riscaldamento: una richiesta arrivata prima paga solo la connessione.
+
+        Raises:
+            MotoreNonPronto: Se la creazione non è conclusa entro il timeout o è fallita.
+        """
+        if not self._creato.wait(timeout):
+            raise MotoreNonPronto("Motore vocale in avvio, riprovare tra poco.")
+        if self._motore is None:
+            raise MotoreNonPronto(f"Inizializzazione del motore vocale fallita: {self._errore}")
+        return self._motore
+
+    def stato(self) -> Dict[str, Any]:
+        """Restituisce lo stato di avvio e la durata (ms) di ciascuna fase."""
+        return {
+            "pronto": self.pronto,
+            "motore_creato": self._motore is not None,
+            "errore": self._errore,
+            "tempi_ms": {nome: round(secondi * 1000, 1) for nome, secondi in self._tempi.items()},
+        }
+
+    def _esegui(self) -> None:
+        try:
+            motore = self._crea_motore()
+            self._riscalda(motore)
+        except Exception as e:
+            self._fallito(e)
+            return
+        self._concludi()
+
+    def _crea_motore(self) -> Any:
+        with self.fase("motore"):
+            motore = self._crea()
+        self._motore = motore
+        self._creato.set()
+        return motore
+
+    def _riscalda(self, motore: Any) -> Any:
+        riscalda = getattr(motore, "riscalda", None)
+        if riscalda is None:
+            return None
+        inizio = time.perf_counter()
+        try:
+            esito = riscalda()
+        except Exception as e:
+            self._riscaldamento_fallito(e)
+            return None
+        if not inspect.isawaitable(esito):
+            self.registra("riscaldamento", time.perf_counter() - inizio)
+            return None
+
+        async def attendi():
+            try:
+                await esito
+            except Exception as e:
+                self._riscaldamento_fallito(e)
+                return
+            self.registra("riscaldamento", time.perf_counter() - inizio)
+        return attendi()
+
+    def _riscaldamento_fallito(self, errore: Exception) -> None:
+        # Il motore funziona comunque: la connessione verrà aperta dalla prima richiesta
+        self.logger.warning(f"⚠️ Riscaldamento del motore vocale fallito: {errore}")
+
+    def _fallito(self, errore: Exception) -> None:
+        self._errore = str(errore)
+        self._creato.set()
+        self.logger.critical(f"❌ Errore critico inizializzando il motore vocale: {errore}", exc_info=True)
+
+    def _concludi(self) -> None:
+        self.registra("pronto", time.perf_counter() - self.inizio)
+        self._pronto.set()
+        self.logger.info(f"✅ Motore vocale pronto ({self.stato()['tempi_ms']}).")
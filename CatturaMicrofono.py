@@ -0,0 +1,157 @@
+import logging
+import math
+import threading
+from collections import deque
+from typing import Optional, Tuple
+import speech_recognition as sr
+from RilevatoreVoce import StimaRumore, energia
+
+logger = logging.getLogger("CatturaMicrofono")
+
+class CatturaMicrofono:
+    """
+    Cattura continua dal microfono in un buffer circolare limitato.
+
+    Un solo thread tiene lo stream sempre aperto, scrive i blocchi PCM (16 bit) nel buffer
+    e aggiorna in modo incrementale la stima del rumore di fondo, senza le pause di
+    adjust_for_ambient_noise. I consumatori leggono dal buffer con un cursore
+    (SorgenteBuffer): l'audio arrivato mentre elaborano non va perso, purché non restino
+    indietro oltre la durata del buffer.
+
+    Attributes:
+        microfono (sr.AudioSource): La sorgente catturata (es. sr.Microphone).
+        stima (StimaRumore): Stima del rumore di fondo, da condividere con i RilevatoreVoce.
+    """
+
+    def __init__(self, microfono: sr.AudioSource, durata_buffer: float = 30.0):
+        self.microfono = microfono
+        self.durata_buffer = durata_buffer
+        self.stima = StimaRumore()
+        self._blocchi: deque = deque()
+        self._scritti = 0
+        self._terminata = False
+        self._condizione = threading.Condition()
+        self._fermo = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def avvia(self) -> None:
+        """Apre il microfono e avvia il thread di cattura (nessun effetto se già avviato)."""
+        if self._thread is not None:
+            return
+        self.microfono.__enter__()
+        self._blocchi = deque(maxlen=max(1, math.ceil(self.durata_buffer / self.secondi_per_blocco)))
+        self._thread = threading.Thread(target=self._cattura, name="CatturaMicrofono", daemon=True)
+        self._thread.start()
+        logger.info(f"🎙️ Cattura continua avviata (buffer di {self.durata_buffer:.0f}s).")
+
+    def ferma(self, timeout: float = 2.0) -> None:
+        """Ferma la cattura e chiude il microfono; l'audio già nel buffer resta leggibile."""
+        self._fermo.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def attiva(self) -> bool:
+        """True finché il thread di cattura è in esecuzione."""
+        return self._thread is not None and not self._terminata
+
+    @property
+    def secondi_per_blocco(self) -> float:
+        return self.microfono.CHUNK / self.microfono.SAMPLE_RATE
+
+    def blocchi(self, secondi: float) -> int:
+        """Numero di blocchi che coprono la durata indicata."""
+        return math.ceil(secondi / self.secondi_per_blocco)
+
+    def posizione(self) -> int:
+        """Indice del prossimo blocco che verrà catturato."""
+        with self._condizione:
+            return self._scritti
+
+    def estrai(self, da: int, a: int) -> bytes:
+        """PCM dei blocchi da 'da' (incluso) ad 'a' (escluso) ancora presenti nel buffer."""
+        with self._condizione:
+            primo = self._scritti - len(self._blocchi)
+            return b"".join(self._blocchi[i - primo] for i in range(max(da, primo), min(a, self._scritti)))
+
+    def sorgente(self, da: Optional[int] = None, pre_roll: float = 0.0) -> "SorgenteBuffer":
+        """
+        Sorgente per sr.Recognizer che legge dal buffer.
+
+        Args:
+            da (Optional[int]): Blocco da cui iniziare (default: la posizione attuale).
+            pre_roll (float): Secondi di audio precedenti da includere.
+        """
+        inizio = self.posizione() if da is None else da
+        return SorgenteBuffer(self, max(0, inizio - self.blocchi(pre_roll)))
+
+    def leggi(self, indice: int, timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """
+        Restituisce il blocco all'indice indicato, attendendolo se non è ancora stato catturato,
+        e l'indice del blocco successivo. Se il blocco è già uscito dal buffer si riparte dal più
+        vecchio disponibile. Restituisce b"" a cattura terminata o allo scadere del timeout.
+        """
+        with self._condizione:
+            self._condizione.wait_for(lambda: indice < self._scritti or self._terminata, timeout)
+            if indice >= self._scritti:
+                return indice, b""
+            primo = self._scritti - len(self._blocchi)
+            if indice < primo:
+                logger.warning(f"⚠️ Lettura in ritardo: persi {(primo - indice) * self.secondi_per_blocco:.1f}s di audio.")
+                indice = primo
+            return indice + 1, self._blocchi[indice - primo]
+
+    def _cattura(self) -> None:
+        try:
+            while not self._fermo.is_set():
+                blocco = self.microfono.stream.read(self.microfono.CHUNK)
+                if not blocco:
+                    break  # fine dello stream (sorgenti da file)
+                self.stima.aggiorna(energia(blocco), self.secondi_per_blocco)
+                with self._condizione:
+                    self._blocchi.append(blocco)
+                    self._scritti += 1
+                    self._condizione.notify_all()
+        except Exception as e:
+            logger.error(f"❌ Errore di cattura dal microfono: {e}")
+        finally:
+            with self._condizione:
+                self._terminata = True
+                self._condizione.notify_all()
+            try:
+                self.microfono.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"⚠️ Chiusura del microfono non riuscita: {e}")
+
+
+class SorgenteBuffer(sr.AudioSource):
+    """
+    Sorgente audio per sr.Recognizer (listen, record) che legge dal buffer di una
+    CatturaMicrofono a partire da un cursore, senza aprire il microfono.
+
+    Attributes:
+        cursore (int): Indice del prossimo blocco da leggere.
+    """
+
+    def __init__(self, cattura: CatturaMicrofono, cursore: int):
+        self.cattura = cattura
+        self.cursore = cursore
+        self.SAMPLE_RATE = cattura.microfono.SAMPLE_RATE
+        self.SAMPLE_WIDTH = cattura.microfono.SAMPLE_WIDTH
+        self.CHUNK = cattura.microfono.CHUNK
+        self.stream = self
+
+    def __enter__(self) -> "SorgenteBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    @property
+    def esaurita(self) -> bool:
+        """True se la cattura è terminata e tutto l'audio catturato è stato letto."""
+        return not self.cattura.attiva and self.cursore >= self.cattura.posizione()
+
+    def read(self, _dimensione: int) -> bytes:
+        self.cursore, blocco = self.cattura.leggi(self.cursore)
+        return blocco
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from metriche import COALESCENZA
+from PoliticaChiamate import ScadenzaSuperata
+
+
+class _InVolo:
+    __slots__ = ("fatto", "risultato", "errore")
+
+    def __init__(self):
+        self.fatto = threading.Event()
+        self.risultato: Any = None
+        self.errore: Optional[BaseException] = None
+
+
+class CoalescenzaRichieste:
+    """
+    Coalescenza ("single flight") di operazioni identiche contemporanee.
+
+    La prima chiamata con una certa chiave esegue l'operazione; quelle che arrivano
+    mentre è in corso la attendono e ne ricevono lo stesso risultato, o la stessa
+    eccezione. A operazione conclusa la chiave viene rilasciata: una chiamata
+    successiva (anche dopo un errore) esegue di nuovo l'operazione.
+
+    La scadenza non fa parte della chiave: ogni chiamante attende al più fino alla propria.
+    Se l'operazione in corso fallisce per la scadenza di chi l'ha avviata (ScadenzaSuperata),
+    chi la attendeva e ha ancora tempo esegue la propria operazione invece di ricevere l'errore.
+
+    Le chiamate risparmiate sono conteggiate nel contatore voce_ai_coalescenza_total
+    e in statistiche().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_volo: Dict[Hashable, _InVolo] = {}
+        self._in_volo_async: Dict[Hashable, "asyncio.Future"] = {}
+        self._contatori = {"chiamate": 0, "risparmiate": 0}
+
+    def esegui(self, chiave: Hashable, operazione: Callable[[], Any], scadenza: Optional[float] = None) -> Any:
+        """
+        Esegue operazione(), o attende quella già in corso con la stessa chiave.
+
+        Args:
+            chiave (Hashable): Identifica le operazioni equivalenti.
+            operazione (Callable[[], Any]): L'operazione del chiamante, con la sua scadenza.
+            scadenza (Optional[float]): Istante time.monotonic() oltre il quale il chiamante non attende più.
+
+        Raises:
+            ScadenzaSuperata: Se la scadenza trascorre mentre si attende l'operazione di un altro chiamante.
+            Exception: L'eccezione sollevata dall'operazione (a tutti i chiamanti in attesa).
+        """
+        with self._lock:
+            voce = self._in_volo.get(chiave)
+            capofila = voce is None
+            if capofila:
+                voce = self._in_volo[chiave] = _InVolo()
+        if not capofila:
+            self._conta("risparmiate")
+            if not voce.fatto.wait(self._attesa_massima(scadenza)):
+                raise ScadenzaSuperata("Scadenza trascorsa in attesa di una sintesi identica in corso.")
+            if voce.errore is not None:
+                if self._ha_ancora_tempo(voce.errore, scadenza):
+                    return self.esegui(chiave, operazione, scadenza)
+                raise voce.errore
+            return voce.risultato
+
+        self._conta("chiamate")
+        try:
+            voce.risultato = operazione()
+            return voce.risultato
+        except BaseException as e:
+            voce.errore = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_volo[chiave]
+            voce.fatto.set()
+
+    async def esegui_async(self, chiave: Hashable, operazione: Callable[[], Awaitable[Any]],
+                           scadenza: Optional[float] = None) -> Any:
+        """
+        Come esegui(), per coroutine. L'operazione gira in un task separato: se il chiamante
+        che l'ha avviata viene cancellato (es. client disconnesso) gli altri la ricevono comunque.
+        """
+        task = self._in_volo_async.get(chiave)
+        capofila = task is None
+        if not capofila:
+            self._conta("risparmiate")
+        else:
+            self._conta("chiamate")
+            task = asyncio.ensure_future(operazione())
+            self._in_volo_async[chiave] = task
+            task.add_done_callback(lambda t: self._rilascia_async(chiave, t))
+        attesa = self._attesa_massima(scadenza)
+        if attesa is not None:
+            # asyncio.wait non cancella il task allo scadere: gli altri chiamanti lo attendono ancora
+            await asyncio.wait({task}, timeout=attesa)
+            if not task.done():
+                raise ScadenzaSuperata("Scadenza trascorsa in attesa di una sintesi identica in corso.")
+        try:
+            return await asyncio.shield(task)
+        except ScadenzaSuperata as e:
+            if not capofila and self._ha_ancora_tempo(e, scadenza):
+                return await self.esegui_async(chiave, operazione, scadenza)
+            raise
+
+    def statistiche(self) -> Dict[str, int]:
+        """Restituisce le operazioni eseguite, quelle risparmiate e quelle in corso."""
+        with self._lock:
+            return {**self._contatori, "in_corso": len(self._in_volo) + len(self._in_volo_async)}
+
+    @staticmethod
+    def _attesa_massima(scadenza: Optional[float]) -> Optional[float]:
+        return None if scadenza is None else max(0.0, scadenza - time.monotonic())
+
+    @staticmethod
+    def _ha_ancora_tempo(errore: BaseException, scadenza: Optional[float]) -> bool:
+        """True se l'errore è la scadenza di chi ha avviato l'operazione e il chiamante può ancora attendere."""
+        return isinstance(errore, ScadenzaSuperata) and (scadenza is None or time.monotonic() < scadenza)
+
+    def _rilascia_async(self, chiave: Hashable, task: "asyncio.Future") -> None:
+        if self._in_volo_async.get(chiave) is task:
+            del self._in_volo_async[chiave]
+        if not task.cancelled():
+            task.exception()  # evita l'avviso 'exception was never retrieved' se nessuno attende più
+
+    def _conta(self, esito: str) -> None:
+        with self._lock:
+            self._contatori[esito] += 1
+        COALESCENZA.labels(esito=esito).inc()
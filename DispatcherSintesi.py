@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("DispatcherSintesi")
+
+
+@dataclass(frozen=True)
+class Consegna:
+    """
+    Esito di una frase inviata alla sintesi, consegnato nell'ordine di invio.
+
+    Attributes:
+        testo (str): Il testo inviato (più frasi, se unite).
+        lingua (str): Codice lingua della richiesta.
+        esito (str): "ok", "errore" o "scartata" (coda piena o frase troppo vecchia).
+        rtt_ms (Optional[float]): Tempo di andata e ritorno della richiesta HTTP.
+        messaggio (Optional[str]): Dettaglio dell'errore o dello scarto.
+    """
+    testo: str
+    lingua: str
+    esito: str
+    rtt_ms: Optional[float] = None
+    messaggio: Optional[str] = None
+
+
+@dataclass
+class _Frase:
+    sequenza: int
+    testo: str
+    lingua: str
+    arrivo: float
+
+
+def registra_consegna(consegna: Consegna) -> None:
+    """Consegna predefinita: una riga di log per frase, con il tempo di andata e ritorno."""
+    if consegna.esito == "ok":
+        logger.info(f"✅ Sintesi vocale completata ({consegna.rtt_ms:.0f} ms): '{consegna.testo[:50]}'")
+    elif consegna.esito == "scartata":
+        logger.warning(f"⚠️ Frase scartata ({consegna.messaggio}): '{consegna.testo[:50]}'")
+    else:
+        rtt = f" dopo {consegna.rtt_ms:.0f} ms" if consegna.rtt_ms is not None else ""
+        logger.error(f"❌ Fallimento sintesi{rtt}: {consegna.messaggio}")
+
+
+class DispatcherSintesi:
+    """
+    Invia le frasi all'endpoint di sintesi con un numero fisso di lavoratori e una sessione
+    HTTP persistente (connessioni keep-alive riusate), con timeout espliciti.
+
+    Gli esiti sono consegnati nell'ordine in cui le frasi sono state inviate, anche se le
+    risposte arrivano in ordine diverso. L'audio invece è riprodotto dal server nell'ordine
+    in cui le sintesi finiscono: per questo il default è un solo lavoratore (una richiesta
+    in corso alla volta). Più lavoratori vanno usati solo con un endpoint che non riproduce
+    l'audio, altrimenti la frase N+1 può essere pronunciata prima della frase N. Quando il server è lento le frasi in attesa sono
+    limitate: una nuova frase viene unita all'ultima in attesa se ha la stessa lingua,
+    altrimenti si scarta la più vecchia; le frasi più vecchie di 'eta_massima' non vengono
+    più inviate.
+
+    Attributes:
+        endpoint (str): URL di /voce/sintetizza.
+        sessione (requests.Session): Sessione condivisa dai lavoratori.
+        alla_consegna (Callable[[Consegna], None]): Chiamata per ogni frase, in ordine.
+    """
+
+    def __init__(self, endpoint: str, lavoratori: int = 1, timeout_connessione: float = 3.0,
+                 timeout_risposta: float = 30.0, max_in_attesa: int = 4, eta_massima: float = 10.0,
+                 priorita: str = "interattiva", alla_consegna: Optional[Callable[[Consegna], None]] = None,
+                 sessione: Optional[requests.Session] = None, finestra: int = 200):
+        self.endpoint = endpoint
+        self.timeout = (timeout_connessione, timeout_risposta)
+        self.max_in_attesa = max_in_attesa
+        self.eta_massima = eta_massima
+        self.priorita = priorita
+        self.alla_consegna = alla_consegna or registra_consegna
+        self.sessione = sessione if sessione is not None else self._crea_sessione(lavoratori)
+
+        self._attesa: Deque[_Frase] = deque()
+        self._condizione = threading.Condition()
+        self._chiuso = False
+        self._prossima = 0
+        # Gli esiti completati fuori ordine aspettano qui il proprio turno
+        self._completate: Dict[int, Consegna] = {}
+        self._da_consegnare = 0
+        self._lock_consegna = threading.Lock()
+        self._rtt: deque = deque(maxlen=finestra)
+        self._contatori = {"inviate": 0, "riuscite": 0, "fallite": 0, "scartate": 0, "unite": 0}
+
+        self._lavoratori = [threading.Thread(target=self._lavora, name=f"DispatcherSintesi-{i}", daemon=True)
+                            for i in range(max(1, lavoratori))]
+        for lavoratore in self._lavoratori:
+            lavoratore.start()
+
+    @staticmethod
+    def _crea_sessione(lavoratori: int) -> requests.Session:
+        sessione = requests.Session()
+        # Una connessione keep-alive per lavoratore verso lo stesso host
+        adattatore = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, lavoratori))
+        sessione.mount("http://", adattatore)
+        sessione.mount("https://", adattatore)
+        return sessione
+
+    def invia(self, testo: str, lingua: str = "it") -> None:
+        """Accoda una frase senza bloccare; con la coda piena la unisce all'ultima o scarta la più vecchia."""
+        scartata = None
+        with self._condizione:
+            if self._chiuso:
+                logger.warning("⚠️ Dispatcher chiuso: frase ignorata.")
+                return
+            if len(self._attesa) >= self.max_in_attesa:
+                ultima = self._attesa[-1]
+                if ultima.lingua == lingua:
+                    ultima.testo = f"{ultima.testo} {testo}"
+                    self._contatori["unite"] += 1
+                    return
+                scartata = self._scarta(self._attesa.popleft(), "coda piena")
+            self._attesa.append(_Frase(self._prossima, testo, lingua, time.monotonic()))
+            self._prossima += 1
+            self._condizione.notify()
+        if scartata is not None:
+            self._completa(*scartata)
+
+    def chiudi(self, timeout: Optional[float] = None) -> None:
+        """Invia le frasi ancora in attesa, ferma i lavoratori e chiude la sessione."""
+        with self._condizione:
+            self._chiuso = True
+            self._condizione.notify_all()
+        for lavoratore in self._lavoratori:
+            lavoratore.join(timeout)
+        self.sessione.close()
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce frasi in attesa, contatori e tempo di andata e ritorno (ms, medio e 95° percentile)."""
+        with self._condizione:
+            rtt = list(self._rtt)
+            return {
+                "in_attesa": len(self._attesa),
+                **self._contatori,
+                "rtt_ms_medio": round(float(np.mean(rtt)), 1) if rtt else None,
+                "rtt_ms_p95": round(float(np.percentile(rtt, 95)), 1) if rtt else None,
+            }
+
+    def _lavora(self) -> None:
+        while True:
+            with self._condizione:
+                self._condizione.wait_for(lambda: self._attesa or self._chiuso)
+                if not self._attesa:
+                    return
+                frase = self._attesa.popleft()
+                scartata = None
+                if time.monotonic() - frase.arrivo > self.eta_massima:
+                    scartata = self._scarta(frase, f"più vecchia di {self.eta_massima:g}s")
+                else:
+                    self._contatori["inviate"] += 1
+            if scartata is not None:
+                self._completa(*scartata)
+            else:
+                self._completa(frase.sequenza, self._richiesta(frase))
+
+    def _richiesta(self, frase: _Frase) -> Consegna:
+        logger.info(f"📤 Invio frase a sintesi vocale: '{frase.testo[:50]}...' (Lingua: {frase.lingua})")
+        inizio = time.perf_counter()
+        try:
+            # Il server rinuncia alla sintesi se il client ha già smesso di attendere
+            risposta = self.sessione.post(self.endpoint, timeout=self.timeout,
+                                          headers={"X-Request-Timeout": f"{self.timeout[1]:g}"},
+                                          json={"testo": frase.testo, "lingua": frase.lingua,
+                                                "priorita": self.priorita})
+        except requests.exceptions.RequestException as e:
+            return self._esito(frase, "errore", None, f"Errore HTTP: {e}")
+        rtt_ms = (time.perf_counter() - inizio) * 1000
+        try:
+            corpo = risposta.json()
+        except ValueError:  # anche requests.JSONDecodeError, che è pure una RequestException
+            return self._esito(frase, "errore", rtt_ms, f"Risposta JSON non valida (HTTP {risposta.status_code}).")
+        if risposta.ok and corpo.get("success"):
+            return self._esito(frase, "ok", rtt_ms)
+        return self._esito(frase, "errore", rtt_ms,
+                           f"HTTP {risposta.status_code}: {corpo.get('message', 'Nessun messaggio')}")
+
+    def _esito(self, frase: _Frase, esito: str, rtt_ms: Optional[float], messaggio: Optional[str] = None) -> Consegna:
+        with self._condizione:
+            self._contatori["riuscite" if esito == "ok" else "fallite"] += 1
+            if rtt_ms is not None:
+                self._rtt.append(rtt_ms)
+        return Consegna(frase.testo, frase.lingua, esito, rtt_ms, messaggio)
+
+    def _scarta(self, frase: _Frase, motivo: str) -> Tuple[int, Consegna]:
+        # Chiamata con self._condizione acquisita; la consegna avviene dopo averla rilasciata
+        self._contatori["scartate"] += 1
+        return frase.sequenza, Consegna(frase.testo, frase.lingua, "scartata", messaggio=motivo)
+
+    def _completa(self, sequenza: int, consegna: Consegna) -> None:
+        """Registra l'esito e consegna, in ordine, tutti quelli il cui turno è arrivato."""
+        with self._lock_consegna:
+            self._completate[sequenza] = consegna
+            while self._da_consegnare in self._completate:
+                pronta = self._completate.pop(self._da_consegnare)
+                self._da_consegnare += 1
+                try:
+                    self.alla_consegna(pronta)
+                except Exception as e:
+                    logger.exception(f"❌ Errore nella consegna dell'esito: {e}")
@@ -2,13 +2,55 @@ import os
 import logging
 from google.cloud import texttospeech
 import sys
-from typing import Optional
-# Tenta di importare playsound per la riproduzione audio.
-# Se non disponibile, lo gestiamo graziosamente.
-try:
-    from playsound import playsound
-except ImportError:
-    playsound = None
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, List, Iterator, Dict, Any, Union
+from SynthesisCache import SynthesisCache
+from metriche import DURATA_FASE, AUDIO_BYTES, CARATTERI_GOOGLE
+from text_chunker import dividi_testo, MAX_BYTES_API
+from AudioPlayer import AudioPlayer
+from VoiceRegistry import VoiceRegistry
+from CoalescenzaRichieste import CoalescenzaRichieste
+from PianificatoreSintesi import (PianificatoreSintesi, SintesiRifiutata, PRIORITA, PRIORITA_PREDEFINITA,
+                                  e_quota_esaurita)
+from PoliticaChiamate import PoliticaChiamate, ScadenzaSuperata
+import formati_audio
+from formati_audio import FORMATI, FormatoAudio, AdattatoreStream, unisci_audio, adatta_per_stream
+
+@dataclass(frozen=True)
+class SynthesisSpec:
+    """
+    Parametri voce già risolti e immutabili per una singola sintesi.
+    Si ottiene da GoogleSpeaker.crea_spec() e si passa a parla(): più richieste
+    possono così usare lo stesso GoogleSpeaker in parallelo con voci diverse.
+
+    Attributes:
+        codice_lingua (str): Codice BCP-47 inviato a Google (es. 'it-IT').
+        nome_voce (Optional[str]): Nome della voce Google (es. 'it-IT-Wavenet-C').
+        voce (str): Genere della voce effettivo ('femminile' o 'maschile').
+        lingua (str): Codice della lingua effettivo (es. 'it').
+        velocita (float): speaking_rate effettivo (0.25 a 4.0).
+        formato (str): Formato di uscita (chiave di formati_audio.FORMATI, es. 'mp3', 'ogg_opus').
+        sample_rate (Optional[int]): sample_rate_hertz richiesto (None = quello nativo della voce).
+        effetti (Tuple[str, ...]): effects_profile_id di Google (es. 'telephony-class-application').
+        priorita (str): Classe di priorità per il pianificatore ('interattiva', 'normale', 'bulk').
+        scadenza (Optional[float]): Istante time.monotonic() entro cui serve l'audio (None = nessuna).
+            Non partecipa al confronto tra spec: due sintesi identiche restano identiche.
+    """
+    codice_lingua: str
+    nome_voce: Optional[str]
+    voce: str
+    lingua: str
+    velocita: float
+    formato: str = formati_audio.FORMATO_PREDEFINITO
+    sample_rate: Optional[int] = None
+    effetti: Tuple[str, ...] = ()
+    priorita: str = PRIORITA_PREDEFINITA
+    scadenza: Optional[float] = field(default=None, compare=False)
+
+    @property
+    def formato_audio(self) -> FormatoAudio:
+        return FORMATI[self.formato]
 
 class GoogleSpeaker:
     """
@@ -22,43 +64,47 @@ class GoogleSpeaker:
     Attributes:
         logger (logging.Logger): Logger per la classe.
         client (texttospeech.TextToSpeechClient): Client API di Google TTS.
+        player (AudioPlayer): Coda di riproduzione (per default quella condivisa dal processo).
         _voce (str): Genere della voce ('femminile' o 'maschile').
         _lingua (str): Codice della lingua (es. 'it', 'en').
         _velocita (float): Velocità di riproduzione (0.25 a 4.0).
         _custom_voice_name (Optional[str]): Nome specifico della voce di Google da usare.
+            I quattro attributi sopra sono i default dell'istanza; per parametri per-richiesta
+            usare crea_spec() e passare la SynthesisSpec a parla().
+        cache (Optional[SynthesisCache]): Cache dell'audio sintetizzato, se abilitata.
+        registro (VoiceRegistry): Catalogo delle voci Google usato per risolvere voce e lingua
+            (per default quello condiviso dal processo).
+        coalescenza (CoalescenzaRichieste): Unisce le sintesi identiche in corso in una sola chiamata a Google.
+        pianificatore (Optional[PianificatoreSintesi]): Controllo di ammissione delle chiamate a Google
+            (priorità e quota di caratteri); None = nessun limite.
+        politica (PoliticaChiamate): Timeout, ritentativi e hedging delle chiamate a Google.
     """
 
-    # Voci e lingue supportate con mapping diretto ai codici Google BCP-47
-    # e nomi specifici per le voci Neural2, che offrono qualità superiore.
-    _SUPPORTED_VOICES = {
-        'it': {
-            'default': {'code': 'it-IT', 'name': 'it-IT-Wavenet-C'}
-        },
-        'en': {
-            'femminile': {'code': 'en-US', 'name': 'en-US-Neural2-J'},
-            'maschile': {'code': 'en-US', 'name': 'en-US-Neural2-I'}
-        },
-        'fr': {
-            'femminile': {'code': 'fr-FR', 'name': 'fr-FR-Neural2-B'},
-            'maschile': {'code': 'fr-FR', 'name': 'fr-FR-Neural2-D'}
-        },
-        'es': {
-            'femminile': {'code': 'es-ES', 'name': 'es-ES-Neural2-A'},
-            'maschile': {'code': 'es-ES', 'name': 'es-ES-Neural2-C'}
-        },
-        # Lingue con fallback a en-US se non esistono voci neurali specifiche o richieste
-        'ig': {'femminile': {'code': 'en-US', 'name': 'en-US-Neural2-J'},
-               'maschile': {'code': 'en-US', 'name': 'en-US-Neural2-I'}}
-    }
-
     _MIN_SPEED = 0.25 # Velocità minima API di Google
     _MAX_SPEED = 4.0  # Velocità massima API di Google
 
-    def __init__(self, voce: str = 'femminile', lingua: str = 'it'):
+    # Oltre questa soglia (byte UTF-8) parla() passa automaticamente alla modalità testo lungo
+    _SOGLIA_TESTO_LUNGO = 300
+    _MAX_SINTESI_PARALLELE = 4
+    # Modelli di richiesta (voce e audio_config) tenuti pronti; oltre il limite si riparte da zero
+    _MAX_MODELLI = 1024
+
+    def __init__(self, voce: str = 'femminile', lingua: str = 'it',
+                 cache: Optional[SynthesisCache] = None, player: Optional[AudioPlayer] = None,
+                 registro: Optional[VoiceRegistry] = None, pianificatore: Optional[PianificatoreSintesi] = None,
+                 politica: Optional[PoliticaChiamate] = None):
         self.logger = logging.getLogger(__name__)
-        
+        self.cache = cache
+        self.player = player or AudioPlayer.predefinito()
+        self.registro = registro or VoiceRegistry.predefinito()
+        self.coalescenza = CoalescenzaRichieste()
+        self.pianificatore = pianificatore
+        self.politica = politica or PoliticaChiamate()
+        self._modelli_voce: Dict[tuple, Any] = {}
+        self._modelli_audio: Dict[tuple, Any] = {}
+
         try:
-            self.client = texttospeech.TextToSpeechClient()
+            self.client = self._crea_client()
             self.logger.info("Client Google Cloud Text-to-Speech inizializzato.")
         except Exception as e:
             self.logger.critical(f"Errore nell'inizializzazione del client Google TTS. "
@@ -70,16 +116,14 @@ class GoogleSpeaker:
         self._lingua = 'it'
         self._velocita = 0.85
         self._custom_voice_name: Optional[str] = None # Inizializza l'attributo
+        self._codice_lingua = 'it-IT'
 
         self.set_voce(voce, lingua) # Chiama set_voce per impostare voce, lingua e custom_voice_name
         self.set_velocita(100) # Inizializza a velocità normale (100% = 1.0)
 
-        if playsound is None:
-            self.logger.warning(
-                "La libreria 'playsound' non è installata. "
-                "La riproduzione audio diretta tramite Python potrebbe non funzionare. "
-                "Verrà tentato 'mpg123' come fallback."
-            )
+    def _crea_client(self):
+        """Crea il client Google TTS usato da questa istanza (sovrascritto dalle varianti asincrone)."""
+        return texttospeech.TextToSpeechClient()
 
     @property
     def voce(self) -> str:
@@ -97,7 +141,8 @@ class GoogleSpeaker:
         """
         Imposta la voce (femminile/maschile) e la lingua per la sintesi.
         Vengono applicati valori di fallback e avvisi per input non validi.
-        Tenta di selezionare una voce Neural2 specifica se disponibile.
+        La voce Google concreta viene scelta dal registro (VoiceRegistry) in base
+        al catalogo delle voci disponibili.
 
         Args:
             voce (str): Il genere della voce desiderato ('femminile' o 'maschile').
@@ -106,44 +151,12 @@ class GoogleSpeaker:
         Returns:
             bool: True se i parametri sono stati impostati (anche con fallback), False altrimenti.
         """
-        voce_set = False
-        lingua_set = False
-        self._custom_voice_name = None # Resetta ogni volta che si imposta la voce
-
-        # Cerca la lingua nel dizionario supportato
-        lang_data = self._SUPPORTED_VOICES.get(lingua)
-        if lang_data:
-            self._lingua = lingua
-            lingua_set = True
-            
-            # Cerca il genere della voce per la lingua selezionata
-            voice_data = lang_data.get(voce)
-            if voice_data:
-                self._voce = voce
-                self._custom_voice_name = voice_data.get('name')
-                voce_set = True
-            else:
-                self.logger.warning(f"Voce '{voce}' non supportata per la lingua '{lingua}'. Impostata a 'femminile'.")
-                self._voce = 'femminile' # Fallback genere
-                # Tenta di usare la voce femminile predefinita per la lingua data
-                if 'femminile' in lang_data:
-                    self._custom_voice_name = lang_data['femminile'].get('name')
-        else:
-            self.logger.warning(f"Lingua '{lingua}' non supportata. Impostata a 'it' come fallback.")
-            self._lingua = 'it' # Fallback lingua
-            # Applica il fallback anche per la voce in questo caso, usando i default italiani
-            if voce in self._SUPPORTED_VOICES['it']:
-                self._voce = voce
-                self._custom_voice_name = self._SUPPORTED_VOICES['it'][voce].get('name')
-            else:
-                self.logger.warning(f"Voce '{voce}' non supportata per la lingua di fallback 'it'. Impostata a 'femminile'.")
-                self._voce = 'femminile'
-                self._custom_voice_name = self._SUPPORTED_VOICES['it']['femminile'].get('name')
+        risolta = self.registro.risolvi(voce, lingua)
+        self._voce, self._lingua, self._custom_voice_name = risolta.voce, risolta.lingua, risolta.nome_voce
+        self._codice_lingua = risolta.codice_lingua
 
-        if not lingua_set or not voce_set:
-            self.logger.info(f"Parametri voce aggiornati con fallback: lingua='{self.lingua}', voce='{self.voce}', nome_voce='{self._custom_voice_name}'.")
-        else:
-            self.logger.info(f"Parametri voce aggiornati: lingua='{self.lingua}', voce='{self.voce}', nome_voce='{self._custom_voice_name}'.")
+        # Gli avvisi sui fallback sono già stati registrati dal registro
+        self.logger.debug(f"Parametri voce aggiornati: lingua='{self.lingua}', voce='{self.voce}', nome_voce='{self._custom_voice_name}'.")
         return True
 
     def set_velocita(self, velocita_percentuale: int) -> bool:
@@ -157,9 +170,22 @@ class GoogleSpeaker:
         Returns:
             bool: True se la velocità è stata impostata, False altrimenti.
         """
+        velocita = self._converti_velocita(velocita_percentuale)
+        if velocita is None:
+            return False
+        self._velocita = velocita
+
+        self.logger.info(f"Velocità impostata a {self._velocita:.2f} (da input percentuale {velocita_percentuale}%).")
+        return True
+
+    def _converti_velocita(self, velocita_percentuale: int) -> Optional[float]:
+        """
+        Converte una velocità percentuale (100 = normale) nello speaking_rate dell'API,
+        limitato a 0.25 - 4.0. Restituisce None per input non numerici.
+        """
         if not isinstance(velocita_percentuale, (int, float)):
             self.logger.error(f"Input non valido per la velocità: {velocita_percentuale}. Deve essere un numero.")
-            return False
+            return None
 
         # Clampa l'input percentuale in un range ragionevole per evitare comportamenti estremi
         clamped_percent = max(0, min(velocita_percentuale, 400)) # Clampa tra 0% e 400%
@@ -168,121 +194,411 @@ class GoogleSpeaker:
         new_speed = clamped_percent / 100.0
 
         # Assicura che la velocità rientri nei limiti dell'API (0.25 - 4.0)
-        self._velocita = max(self._MIN_SPEED, min(new_speed, self._MAX_SPEED))
-        
-        self.logger.info(f"Velocità impostata a {self._velocita:.2f} (da input percentuale {velocita_percentuale}%).")
-        return True
+        return max(self._MIN_SPEED, min(new_speed, self._MAX_SPEED))
 
-    def parla(self, testo: str, output_file: str = "output_google.mp3", play_audio: bool = True) -> bool:
+    def crea_spec(self, voce: Optional[str] = None, lingua: Optional[str] = None,
+                  velocita: Optional[int] = None, formato: Optional[str] = None,
+                  sample_rate: Optional[int] = None, effetti: Optional[List[str]] = None,
+                  priorita: Optional[str] = None, scadenza: Optional[float] = None) -> SynthesisSpec:
+        """
+        Risolve i parametri di una singola sintesi in una SynthesisSpec immutabile,
+        senza modificare i default dell'istanza. I parametri None usano i default correnti.
+        Si applicano gli stessi fallback di set_voce/set_velocita.
+
+        Args:
+            voce (Optional[str]): Genere della voce ('femminile' o 'maschile').
+            lingua (Optional[str]): Codice della lingua (es. 'it', 'en').
+            velocita (Optional[int]): Velocità in percentuale (es. 100 per normale).
+            formato (Optional[str]): Formato di uscita ('mp3', 'ogg_opus', 'linear16', 'mulaw'); None = MP3.
+            sample_rate (Optional[int]): Frequenza di campionamento in Hz; None = predefinita del formato.
+            effetti (Optional[List[str]]): Profili effetti audio di Google.
+            priorita (Optional[str]): Classe di priorità ('interattiva', 'normale', 'bulk'); None = 'normale'.
+            scadenza (Optional[float]): Istante time.monotonic() entro cui serve l'audio; None = nessuna.
+
+        Returns:
+            SynthesisSpec: I parametri risolti, da passare a parla().
+
+        Raises:
+            ValueError: Se formato, sample_rate o priorita non sono validi.
+        """
+        formato_eff = formati_audio.formato(formato)
+        if sample_rate is not None and not (
+                formati_audio.MIN_SAMPLE_RATE <= int(sample_rate) <= formati_audio.MAX_SAMPLE_RATE):
+            raise ValueError(f"sample_rate fuori intervallo ({formati_audio.MIN_SAMPLE_RATE}-"
+                             f"{formati_audio.MAX_SAMPLE_RATE} Hz): {sample_rate}")
+        priorita = priorita or PRIORITA_PREDEFINITA
+        if priorita not in PRIORITA:
+            raise ValueError(f"Priorità non valida: '{priorita}'. Valori ammessi: {', '.join(PRIORITA)}.")
+
+        if voce is None and lingua is None:
+            voce_eff, lingua_eff = self._voce, self._lingua
+            codice_lingua, nome_voce = self._codice_lingua, self._custom_voice_name
+        else:
+            risolta = self.registro.risolvi(voce if voce is not None else self._voce,
+                                            lingua if lingua is not None else self._lingua)
+            voce_eff, lingua_eff = risolta.voce, risolta.lingua
+            codice_lingua, nome_voce = risolta.codice_lingua, risolta.nome_voce
+
+        velocita_eff = self._velocita
+        if velocita is not None:
+            velocita_eff = self._converti_velocita(velocita) or self._velocita
+
+        return SynthesisSpec(codice_lingua=codice_lingua, nome_voce=nome_voce,
+                             voce=voce_eff, lingua=lingua_eff, velocita=velocita_eff,
+                             formato=formato_eff.nome,
+                             sample_rate=int(sample_rate) if sample_rate else formato_eff.sample_rate,
+                             effetti=tuple(effetti or ()), priorita=priorita, scadenza=scadenza)
+
+    def parla(self, testo: str, output_file: Optional[str] = "output_google.mp3", play_audio: bool = True,
+              spec: Optional[SynthesisSpec] = None) -> Union[bool, Optional[bytes]]:
         """
         Sintetizza il testo in voce utilizzando Google Cloud Text-to-Speech.
-        Salva l'audio in un file MP3 e, opzionalmente, lo riproduce.
+        Salva l'audio in un file (MP3, o il formato della spec) e, opzionalmente, lo riproduce.
+        Con output_file=None non viene scritto nessun file: l'audio resta in memoria,
+        viene riprodotto dal buffer e restituito al chiamante.
+        La riproduzione è accodata e legge il file più tardi: con play_audio usare un file
+        diverso per ogni sintesi (o output_file=None), altrimenti la sintesi successiva
+        sovrascrive l'audio ancora in coda.
+        I testi più lunghi di _SOGLIA_TESTO_LUNGO vengono delegati a parla_lungo().
 
         Args:
             testo (str): Il testo da sintetizzare.
-            output_file (str): Il percorso del file dove salvare l'audio MP3.
-            play_audio (bool): Se True, tenterà di riprodurre l'audio dopo la sintesi.
+            output_file (Optional[str]): Il percorso del file dove salvare l'audio (None = solo in memoria).
+            play_audio (bool): Se True, accoda l'audio al riproduttore (senza attenderne la fine).
+            spec (Optional[SynthesisSpec]): Parametri voce per questa sintesi (da crea_spec());
+                                            se None, usa i default dell'istanza.
 
         Returns:
-            bool: True se la sintesi e il salvataggio sono riusciti, False altrimenti.
+            Union[bool, Optional[bytes]]: True se la sintesi e il salvataggio sono riusciti, False altrimenti;
+            con output_file=None i byte audio, oppure None in caso di errore.
+
+        Raises:
+            SintesiRifiutata: Se la chiamata a Google è rifiutata per quota (dal pianificatore o da Google).
+            ScadenzaSuperata: Se la scadenza della spec trascorre prima della risposta di Google.
         """
+        esito_fallito = None if output_file is None else False
         if not testo or not testo.strip():
             self.logger.warning("Tentativo di sintetizzare un testo vuoto. Nessuna operazione.")
-            return False
+            return esito_fallito
+
+        if len(testo.encode("utf-8")) > self._SOGLIA_TESTO_LUNGO:
+            return self.parla_lungo(testo, output_file=output_file, play_audio=play_audio, spec=spec)
 
         try:
-            # Recupera il codice lingua e il nome della voce personalizzata
-            current_lang_data = self._SUPPORTED_VOICES.get(self._lingua)
-            if not current_lang_data:
-                self.logger.error(f"Configurazione lingua non valida per '{self._lingua}'.")
-                return False
-            
-            # Seleziona la voce in base al nome personalizzato o al genere
-            if self._custom_voice_name:
-                voice_params = texttospeech.VoiceSelectionParams(
-                    language_code=current_lang_data[self._voce]['code'],
-                    name=self._custom_voice_name
-                )
-                self.logger.info(f"Voce selezionata (custom): {self._custom_voice_name}")
-            else:
-                # Fallback al genere se non c'è un nome specifico (anche se _custom_voice_name dovrebbe esserci sempre qui)
-                gender_enum = texttospeech.SsmlVoiceGender.FEMALE if self._voce == 'femminile' else texttospeech.SsmlVoiceGender.MALE
-                voice_params = texttospeech.VoiceSelectionParams(
-                    language_code=current_lang_data[self._voce]['code'],
-                    ssml_gender=gender_enum
-                )
-                self.logger.info(f"Voce selezionata (genere): {self._voce}")
-
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3,
-                speaking_rate=self._velocita
-            )
-
-            synthesis_input = texttospeech.SynthesisInput(text=testo)
-            
-            self.logger.info(f"Inizio sintesi vocale: Lingua='{self._lingua}', Voce='{self._voce}', Velocità='{self._velocita:.2f}'")
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice_params,
-                audio_config=audio_config
-            )
+            spec = spec or self.crea_spec()
+            audio_content = self._sintetizza_audio(testo, spec)
+
+            if output_file is None:
+                if play_audio:
+                    self.player.accoda_audio(audio_content, suffisso=spec.formato_audio.estensione)
+                return audio_content
 
             # Salva il contenuto audio
-            with open(output_file, "wb") as out:
-                out.write(response.audio_content)
+            with DURATA_FASE.labels(fase="scrittura_mp3").cronometra():
+                with open(output_file, "wb") as out:
+                    out.write(audio_content)
             self.logger.info(f"✅ Audio salvato con successo in '{output_file}'")
 
-            # Riproduci l'audio se richiesto
+            # Accoda l'audio al riproduttore se richiesto
             if play_audio:
                 self._play_audio(output_file)
             return True
 
+        except (SintesiRifiutata, ScadenzaSuperata):
+            raise
         except Exception as e:
             self.logger.error(f"❌ Errore critico durante la sintesi vocale con Google TTS: {e}", exc_info=True)
-            return False
+            return esito_fallito
 
-    def _play_audio(self, file_path: str):
+    def sintetizza(self, testo: str, spec: Optional[SynthesisSpec] = None) -> bytes:
         """
-        Metodo interno per la riproduzione audio, gestisce playsound e fallback mpg123.
+        Sintetizza il testo e restituisce l'audio (nel formato della spec), senza file e senza riproduzione.
+        A differenza di parla(), gli errori vengono propagati al chiamante.
+
+        Args:
+            testo (str): Il testo da sintetizzare (i testi lunghi vengono divisi in blocchi).
+            spec (Optional[SynthesisSpec]): Parametri voce; se None, usa i default dell'istanza.
+
+        Returns:
+            bytes: L'audio sintetizzato.
         """
-        if not os.path.exists(file_path):
-            self.logger.error(f"File audio non trovato per la riproduzione: {file_path}")
-            return
+        spec = spec or self.crea_spec()
+        if len(testo.encode("utf-8")) > self._SOGLIA_TESTO_LUNGO:
+            parti = list(self._sintetizza_blocchi(dividi_testo(testo), self._MAX_SINTESI_PARALLELE, spec))
+            return unisci_audio(parti, spec.formato_audio)
+        return self._sintetizza_audio(testo, spec)
+
+    def parla_lungo(self, testo: str, output_file: Optional[str] = "output_google.mp3", play_audio: bool = True,
+                    max_paralleli: int = _MAX_SINTESI_PARALLELE, max_bytes_blocco: int = MAX_BYTES_API,
+                    spec: Optional[SynthesisSpec] = None) -> Union[bool, Optional[bytes]]:
+        """
+        Sintetizza un testo lungo dividendolo in blocchi su confini di frase/proposizione.
+        I blocchi vengono sintetizzati in parallelo (al massimo max_paralleli alla volta),
+        concatenati in ordine in un unico file e, se richiesto, riprodotti man mano
+        che arrivano: la riproduzione del primo blocco parte appena è disponibile.
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            output_file (Optional[str]): Il percorso del file dove salvare l'audio completo
+                                         (None = solo in memoria, come in parla()).
+            play_audio (bool): Se True, accoda i blocchi al riproduttore man mano che sono pronti.
+            max_paralleli (int): Numero massimo di richieste contemporanee a Google TTS.
+            max_bytes_blocco (int): Dimensione massima (byte UTF-8) di ciascun blocco.
+            spec (Optional[SynthesisSpec]): Parametri voce; se None, usa i default dell'istanza.
+
+        Returns:
+            Union[bool, Optional[bytes]]: True se tutti i blocchi sono stati sintetizzati e salvati,
+            False altrimenti; con output_file=None i byte audio concatenati, oppure None.
+
+        Raises:
+            SintesiRifiutata, ScadenzaSuperata: Come in parla().
+        """
+        esito_fallito = None if output_file is None else False
+        blocchi = dividi_testo(testo, max_bytes=max_bytes_blocco)
+        if not blocchi:
+            self.logger.warning("Tentativo di sintetizzare un testo vuoto. Nessuna operazione.")
+            return esito_fallito
+        self.logger.info(f"Sintesi testo lungo: {len(blocchi)} blocchi, parallelismo {max_paralleli}.")
 
-        if playsound:
+        out = None
+        try:
+            spec = spec or self.crea_spec()
+            formato_audio = spec.formato_audio
+            parti: List[bytes] = []
+            # I WAV hanno un header con la lunghezza totale: vengono scritti solo alla fine
+            if output_file is not None and not formato_audio.wav:
+                out = open(output_file, "wb")
+                adattatore = AdattatoreStream(formato_audio)
+            for audio in self._sintetizza_blocchi(blocchi, max_paralleli, spec):
+                if out is not None:
+                    with DURATA_FASE.labels(fase="scrittura_mp3").cronometra():
+                        out.write(adattatore.adatta(audio))
+                else:
+                    parti.append(audio)
+                if play_audio:
+                    self.player.accoda_audio(audio, suffisso=formato_audio.estensione)
+            if output_file is None:
+                return unisci_audio(parti, formato_audio)
+            if out is not None:
+                out.write(adattatore.fine())
+            else:
+                with DURATA_FASE.labels(fase="scrittura_mp3").cronometra():
+                    with open(output_file, "wb") as f:
+                        f.write(unisci_audio(parti, formato_audio))
+            self.logger.info(f"✅ Audio ({len(blocchi)} blocchi) salvato con successo in '{output_file}'")
+            return True
+        except (SintesiRifiutata, ScadenzaSuperata):
+            raise
+        except Exception as e:
+            self.logger.error(f"❌ Errore critico durante la sintesi a blocchi con Google TTS: {e}", exc_info=True)
+            return esito_fallito
+        finally:
+            if out is not None:
+                out.close()
+
+    def sintetizza_stream(self, testo: str, max_paralleli: int = _MAX_SINTESI_PARALLELE,
+                          max_bytes_blocco: int = MAX_BYTES_API,
+                          spec: Optional[SynthesisSpec] = None) -> Iterator[bytes]:
+        """
+        Sintetizza il testo a blocchi e restituisce l'audio di ciascun blocco in ordine,
+        appena disponibile, senza scrivere file né riprodurre nulla.
+        La concatenazione dei blocchi è un file valido nel formato della spec
+        (per i WAV solo il primo blocco porta l'header, i blocchi Ogg formano un solo
+        flusso logico e sono seguiti da una pagina di fine).
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            max_paralleli (int): Numero massimo di richieste contemporanee a Google TTS.
+            max_bytes_blocco (int): Dimensione massima (byte UTF-8) di ciascun blocco.
+            spec (Optional[SynthesisSpec]): Parametri voce; se None, usa i default dell'istanza.
+
+        Yields:
+            bytes: L'audio di un blocco.
+
+        Raises:
+            Exception: Qualsiasi errore di Google TTS durante la sintesi di un blocco.
+        """
+        blocchi = dividi_testo(testo, max_bytes=max_bytes_blocco)
+        self.logger.info(f"Sintesi in streaming: {len(blocchi)} blocchi, parallelismo {max_paralleli}.")
+        spec = spec or self.crea_spec()
+        yield from adatta_per_stream(self._sintetizza_blocchi(blocchi, max_paralleli, spec), spec.formato_audio)
+
+    def _sintetizza_blocchi(self, blocchi: List[str], max_paralleli: int,
+                            spec: SynthesisSpec) -> Iterator[bytes]:
+        """
+        Sintetizza i blocchi in parallelo e restituisce l'audio nell'ordine originale,
+        ciascuno appena esso (e tutti i precedenti) è pronto.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, max_paralleli), thread_name_prefix="GoogleTTS") as executor:
+            futures = [executor.submit(self._sintetizza_audio, blocco, spec) for blocco in blocchi]
             try:
-                self.logger.info(f"Riproduzione audio con 'playsound': {file_path}")
-                playsound(file_path)
-            except Exception as e:
-                self.logger.error(f"Errore durante la riproduzione con 'playsound': {e}")
-                self.logger.info(f"Tentativo di riproduzione con 'mpg123' come fallback...")
-                self._play_audio_with_mpg123(file_path)
-        else:
-            self.logger.info(f"Riproduzione audio con 'mpg123' (playsound non disponibile): {file_path}")
-            self._play_audio_with_mpg123(file_path)
+                for future in futures:
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
 
-    def _play_audio_with_mpg123(self, file_path: str):
+    def _sintetizza_audio(self, testo: str, spec: Optional[SynthesisSpec] = None) -> bytes:
         """
-        Metodo interno per riprodurre audio usando il comando di sistema mpg123.
+        Restituisce l'audio per il testo, consultando prima la cache (se presente)
+        e chiamando Google TTS solo in caso di miss.
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            spec (Optional[SynthesisSpec]): Parametri voce da usare; se None, i default correnti.
+
+        Raises:
+            Exception: Qualsiasi errore della configurazione voce o dell'API di Google.
         """
+        spec = spec or self.crea_spec()
+        chiave, audio_content = self._cerca_in_cache(testo, spec)
+        if audio_content is None:
+            # Richieste identiche contemporanee (es. una notifica a molti client) condividono una sola chiamata
+            # (la priorità fa parte della chiave: una richiesta interattiva non attende il turno di una bulk;
+            # la scadenza no: ognuno attende fino alla propria, e ripete la sintesi se scade solo quella altrui)
+            audio_content = self.coalescenza.esegui(
+                (chiave or self.chiave_sintesi(testo, spec), spec.priorita),
+                lambda: self._sintetizza_google(testo, spec, chiave), spec.scadenza)
+        AUDIO_BYTES.inc(len(audio_content))
+        return audio_content
+
+    def _sintetizza_google(self, testo: str, spec: SynthesisSpec, chiave: Optional[str]) -> bytes:
+        if self.pianificatore is not None:
+            self.pianificatore.acquisisci(len(testo), spec.priorita, spec.scadenza)
+        self.logger.info(f"Inizio sintesi vocale: Lingua='{spec.lingua}', Voce='{spec.voce}', Velocità='{spec.velocita:.2f}'")
+        richiesta = self._richiesta_sintesi(testo, spec)
+        CARATTERI_GOOGLE.inc(len(testo))
         try:
-            if sys.platform.startswith('linux') or sys.platform == 'darwin': # Linux o macOS
-                command = f"mpg123 {file_path}"
-                result = os.system(command)
-                if result != 0:
-                    self.logger.warning(
-                        f"Il comando '{command}' è terminato con codice {result}. "
-                        "Assicurati che 'mpg123' sia installato e nel PATH."
-                    )
-            elif sys.platform == 'win32': # Windows
-                self.logger.warning(
-                    f"Riproduzione audio diretta tramite comando di sistema non supportata "
-                    f"nativamente per Windows con mpg123. Considera l'uso di 'playsound'."
+            # Timeout e ritentativi sono della politica (retry=None disattiva quelli della libreria)
+            with DURATA_FASE.labels(fase="sintesi_google").cronometra():
+                response = self.politica.esegui(
+                    lambda timeout: self.client.synthesize_speech(**richiesta, timeout=timeout, retry=None),
+                    spec.scadenza, lambda: self._consenti_hedge(testo, spec))
+        except Exception as e:
+            self._rilancia_se_quota_esaurita(e, testo, spec)
+            raise
+        self._salva_in_cache(chiave, response.audio_content)
+        return response.audio_content
+
+    def _consenti_hedge(self, testo: str, spec: SynthesisSpec) -> bool:
+        """Un duplicato parte solo se la quota ha gettoni liberi: Google addebita anche quello."""
+        if self.pianificatore is not None and not self.pianificatore.prova_acquisire(len(testo), spec.priorita):
+            return False
+        CARATTERI_GOOGLE.inc(len(testo))
+        return True
+
+    def _rilancia_se_quota_esaurita(self, errore: Exception, testo: str, spec: SynthesisSpec) -> None:
+        """Trasforma il 429 di Google in SintesiRifiutata (il server risponde 429, non 500)."""
+        if not e_quota_esaurita(errore):
+            return
+        if self.pianificatore is not None:
+            raise self.pianificatore.quota_esaurita(len(testo), spec.priorita) from errore
+        raise SintesiRifiutata("Quota di Google Text-to-Speech esaurita.", 60) from errore
+
+    @staticmethod
+    def chiave_sintesi(testo: str, spec: SynthesisSpec) -> str:
+        """Chiave dei parametri effettivi di una sintesi: la stessa di cache, coalescenza e pre-render."""
+        return SynthesisCache.crea_chiave(testo, spec.nome_voce, spec.codice_lingua, spec.velocita,
+                                          spec.formato_audio.encoding, spec.sample_rate, spec.effetti)
+
+    def _cerca_in_cache(self, testo: str, spec: SynthesisSpec) -> Tuple[Optional[str], Optional[bytes]]:
+        """Restituisce (chiave, audio) dalla cache; audio è None in caso di miss o cache disabilitata."""
+        if self.cache is None:
+            return None, None
+        chiave = self.chiave_sintesi(testo, spec)
+        audio_content = self.cache.get(chiave)
+        if audio_content is not None:
+            self.logger.info(f"Audio recuperato dalla cache (voce='{spec.nome_voce}', chiave={chiave[:12]}).")
+        return chiave, audio_content
+
+    def _salva_in_cache(self, chiave: Optional[str], audio_content: bytes) -> None:
+        if chiave is not None:
+            self.cache.put(chiave, audio_content)
+
+    def _richiesta_sintesi(self, testo: str, spec: SynthesisSpec) -> dict:
+        """Costruisce gli argomenti di synthesize_speech (input, voice, audio_config)."""
+        voice_params, audio_config = self._modelli_richiesta(spec)
+        return {
+            "input": texttospeech.SynthesisInput(text=testo),
+            "voice": voice_params,
+            "audio_config": audio_config,
+        }
+
+    def _modelli_richiesta(self, spec: SynthesisSpec) -> Tuple[Any, Any]:
+        """
+        Restituisce VoiceSelectionParams e AudioConfig per la spec, costruiti una sola volta
+        per combinazione di voce e parametri audio: per ogni sintesi resta da creare solo l'input.
+        """
+        chiave_voce = (spec.codice_lingua, spec.nome_voce, spec.voce)
+        voice_params = self._modelli_voce.get(chiave_voce)
+        if voice_params is None:
+            # Seleziona la voce in base al nome personalizzato o al genere
+            if spec.nome_voce:
+                voice_params = texttospeech.VoiceSelectionParams(
+                    language_code=spec.codice_lingua,
+                    name=spec.nome_voce
                 )
             else:
-                self.logger.warning(f"Piattaforma '{sys.platform}' non supportata per la riproduzione audio diretta.")
-        except Exception as e:
-            self.logger.error(f"Errore durante l'esecuzione del comando mpg123: {e}")
+                gender_enum = texttospeech.SsmlVoiceGender.FEMALE if spec.voce == 'femminile' else texttospeech.SsmlVoiceGender.MALE
+                voice_params = texttospeech.VoiceSelectionParams(
+                    language_code=spec.codice_lingua,
+                    ssml_gender=gender_enum
+                )
+            self.logger.info(f"Voce selezionata: {spec.nome_voce or spec.voce} ({spec.codice_lingua})")
+            self._memorizza_modello(self._modelli_voce, chiave_voce, voice_params)
+
+        chiave_audio = (spec.formato_audio.encoding, spec.velocita, spec.sample_rate, spec.effetti)
+        audio_config = self._modelli_audio.get(chiave_audio)
+        if audio_config is None:
+            opzioni_audio = {
+                "audio_encoding": getattr(texttospeech.AudioEncoding, spec.formato_audio.encoding),
+                "speaking_rate": spec.velocita,
+            }
+            if spec.sample_rate:
+                opzioni_audio["sample_rate_hertz"] = spec.sample_rate
+            if spec.effetti:
+                opzioni_audio["effects_profile_id"] = list(spec.effetti)
+            audio_config = texttospeech.AudioConfig(**opzioni_audio)
+            self._memorizza_modello(self._modelli_audio, chiave_audio, audio_config)
+        return voice_params, audio_config
+
+    def _memorizza_modello(self, modelli: Dict[tuple, Any], chiave: tuple, modello: Any) -> None:
+        if len(modelli) >= self._MAX_MODELLI:
+            modelli.clear()
+        modelli[chiave] = modello
+
+    def riscalda(self, testo: str = "Pronto.", timeout: float = 5.0) -> None:
+        """
+        Sintetizza un testo minimo con la voce predefinita, senza cache né riproduzione,
+        per aprire il canale con Google (TLS, credenziali) prima della prima richiesta reale.
+
+        Un solo tentativo, entro timeout secondi e senza i ritentativi della libreria: se
+        Google non risponde la readiness non resta bloccata, e la connessione verrà aperta
+        dalla prima richiesta. Non passa dalla politica, per non contare il tempo
+        dell'handshake tra le latenze che decidono l'hedging.
+
+        Raises:
+            Exception: Qualsiasi errore dell'API di Google (anche il timeout).
+        """
+        richiesta = self._richiesta_sintesi(testo, self.crea_spec())
+        CARATTERI_GOOGLE.inc(len(testo))
+        with DURATA_FASE.labels(fase="riscaldamento").cronometra():
+            self.client.synthesize_speech(**richiesta, timeout=timeout, retry=None)
+
+    def _play_audio(self, file_path: str):
+        """
+        Metodo interno per la riproduzione audio: accoda il file al riproduttore e ritorna subito.
+        """
+        self.player.accoda(file_path)
+
+    def interrompi_riproduzione(self) -> Dict[str, Any]:
+        """
+        Interrompe l'audio in riproduzione e scarta quello in coda.
+
+        Returns:
+            Dict[str, Any]: Numero di elementi scartati e se un audio è stato interrotto.
+        """
+        return self.player.interrompi()
 
 # --- Esempio di utilizzo (quando lo script viene eseguito direttamente) ---
 if __name__ == '__main__':
@@ -299,9 +615,10 @@ if __name__ == '__main__':
     try:
         # Test con una lingua supportata e voce specifica
         speaker_it_fem = GoogleSpeaker(voce='femminile', lingua='it')
+        # output_file=None: ogni frase accodata ha il proprio buffer (un file unico verrebbe sovrascritto)
         print("\n--- Test 1: Saluto in italiano femminile (Neural2-C) ---")
         speaker_it_fem.set_velocita(100)
-        if speaker_it_fem.parla("Ciao, sono la voce femminile italiana di Neural2-C. Sono le 21:00 del 24 maggio 2025. Oggi a Concordia Sagittaria, il tempo è mite."):
+        if speaker_it_fem.parla("Ciao, sono la voce femminile italiana di Neural2-C. Sono le 21:00 del 24 maggio 2025. Oggi a Concordia Sagittaria, il tempo è mite.", output_file=None):
             print("Test 1 completato con successo.")
         else:
             print("Test 1 fallito.")
@@ -310,7 +627,7 @@ if __name__ == '__main__':
         speaker_en_masc = GoogleSpeaker(voce='maschile', lingua='en')
         print("\n--- Test 2: Saluto in inglese maschile (Neural2-I) ---")
         speaker_en_masc.set_velocita(90) # Un po' più lento
-        if speaker_en_masc.parla("Hello, I am the English male voice Neural2-I. It's 9 PM on May 24th, 2025. In Concordia Sagittaria, the weather is mild."):
+        if speaker_en_masc.parla("Hello, I am the English male voice Neural2-I. It's 9 PM on May 24th, 2025. In Concordia Sagittaria, the weather is mild.", output_file=None):
             print("Test 2 completato con successo.")
         else:
             print("Test 2 fallito.")
@@ -319,7 +636,7 @@ if __name__ == '__main__':
         speaker_ig_fem = GoogleSpeaker(voce='femminile', lingua='ig') # Lingua 'ig' non supportata direttamente
         print("\n--- Test 3: Saluto con lingua 'ig' (dovrebbe fallback a italiano femminile) ---")
         speaker_ig_fem.set_velocita(100)
-        if speaker_ig_fem.parla("Questo testo dovrebbe essere pronunciato in italiano perché la lingua 'ig' non è pienamente supportata."):
+        if speaker_ig_fem.parla("Questo testo dovrebbe essere pronunciato in italiano perché la lingua 'ig' non è pienamente supportata.", output_file=None):
             print("Test 3 completato con successo (fallback lingua).")
         else:
             print("Test 3 fallito.")
@@ -329,24 +646,27 @@ if __name__ == '__main__':
         speaker_es_neutra = GoogleSpeaker(voce='neutra', lingua='es')
         print("\n--- Test 4: Saluto con genere 'neutra' per spagnolo (dovrebbe fallback a spagnolo femminile) ---")
         speaker_es_neutra.set_velocita(100)
-        if speaker_es_neutra.parla("Este texto debería ser pronunciado en español femenino por defecto."):
+        if speaker_es_neutra.parla("Este texto debería ser pronunciado en español femenino por defecto.", output_file=None):
             print("Test 4 completato con successo (fallback genere).")
         else:
             print("Test 4 fallito.")
 
         print("\n--- Test 5: Testo vuoto (dovrebbe produrre un avviso e non fare nulla) ---")
-        if not speaker_it_fem.parla(""):
+        if not speaker_it_fem.parla("", output_file=None):
             print("Test 5 gestito correttamente (testo vuoto).")
         else:
             print("Test 5 fallito (testo vuoto non gestito correttamente).")
 
         print("\n--- Test 6: Velocità fuori range (dovrebbe essere clampata) ---")
         speaker_it_fem.set_velocita(500) # Oltre il 400%
-        if speaker_it_fem.parla("Questa voce è incredibilmente veloce, ma entro i limiti dell'API!"):
+        if speaker_it_fem.parla("Questa voce è incredibilmente veloce, ma entro i limiti dell'API!", output_file=None):
             print("Test 6 completato con successo (velocità clampata).")
         else:
             print("Test 6 fallito.")
 
+        # La riproduzione è in background: attendi che la coda si svuoti prima di uscire
+        speaker_it_fem.player.attendi()
+
     except Exception as e:
         print(f"Errore critico durante l'inizializzazione o l'esecuzione dei test: {e}")
         sys.exit(1) # Esce se non può inizializzare il client o se i test falliscono in modo critico
\ No newline at end of file
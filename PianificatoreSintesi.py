@@ -0,0 +1,237 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from metriche import PIANIFICATORE, DURATA_FASE
+
+# Classi di priorità, dalla più alta: l'assistente vocale interattivo precede le richieste
+# ordinarie, che precedono i lavori massivi (batch, pre-render)
+PRIORITA = ("interattiva", "normale", "bulk")
+PRIORITA_PREDEFINITA = "normale"
+
+
+class SintesiRifiutata(RuntimeError):
+    """
+    La sintesi non è stata eseguita per non superare la quota di Google (risposta HTTP 429).
+
+    Attributes:
+        retry_after (int): Secondi dopo i quali ha senso riprovare.
+    """
+
+    def __init__(self, messaggio: str, retry_after: float):
+        super().__init__(messaggio)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+def e_quota_esaurita(errore: BaseException) -> bool:
+    """True se l'errore è la risposta 429 / RESOURCE_EXHAUSTED di Google."""
+    return getattr(errore, "code", None) == 429 or type(errore).__name__ == "ResourceExhausted"
+
+
+class PianificatoreSintesi:
+    """
+    Controllo di ammissione delle chiamate a Google TTS: classi di priorità,
+    token bucket sulla quota di caratteri al minuto e coda limitata.
+
+    Ogni chiamata costa tanti gettoni quanti sono i caratteri del testo. Il secchio
+    contiene al massimo la quota di un minuto e si ricarica in modo continuo. Le
+    richieste in attesa vengono servite in ordine di priorità (FIFO a parità di classe).
+    Le classi non interattive non possono intaccare una riserva di gettoni, così
+    l'assistente vocale trova sempre quota disponibile anche sotto carico.
+
+    Se la coda della classe è piena, o l'attesa stimata supera attesa_massima, la
+    richiesta viene rifiutata subito con SintesiRifiutata: il chiamante risponde 429
+    con Retry-After invece di accumulare richieste destinate a fallire.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        caratteri_al_minuto (int): Quota di caratteri al minuto (dimensione del secchio).
+        max_in_coda (Dict[str, int]): Richieste in attesa ammesse per classe.
+        attesa_massima (float): Attesa massima in coda, in secondi.
+        riserva_interattiva (float): Frazione del secchio riservata alla classe 'interattiva'.
+    """
+
+    # Ogni quanto una richiesta asincrona in coda ricontrolla il proprio turno (secondi)
+    _INTERVALLO_ASYNC = 0.05
+
+    def __init__(self, caratteri_al_minuto: int, max_in_coda: Optional[Dict[str, int]] = None,
+                 attesa_massima: float = 30.0, riserva_interattiva: float = 0.2):
+        if caratteri_al_minuto <= 0:
+            raise ValueError("caratteri_al_minuto deve essere positivo.")
+        self.logger = logging.getLogger("PianificatoreSintesi")
+        self.caratteri_al_minuto = caratteri_al_minuto
+        self.max_in_coda = {"interattiva": 32, "normale": 64, "bulk": 16, **(max_in_coda or {})}
+        self.attesa_massima = attesa_massima
+        self.riserva_interattiva = riserva_interattiva
+
+        self._ricarica = caratteri_al_minuto / 60.0  # gettoni al secondo
+        self._gettoni = float(caratteri_al_minuto)
+        self._aggiornato = time.monotonic()
+        self._condizione = threading.Condition()
+        self._sequenza = itertools.count()
+        # (indice priorità, sequenza, costo) in attesa; la testa è la prossima a essere servita
+        self._coda: List[Tuple[int, int, int]] = []
+        self._in_coda = {p: 0 for p in PRIORITA}
+        self._contatori = {"ammesse": 0, "rifiutate": 0, "quota_google": 0}
+
+    def acquisisci(self, caratteri: int, priorita: str = PRIORITA_PREDEFINITA,
+                   scadenza: Optional[float] = None) -> None:
+        """
+        Attende il turno e i gettoni per una chiamata da 'caratteri' caratteri.
+        Con una scadenza (istante time.monotonic()) l'attesa non la oltrepassa.
+
+        Raises:
+            ValueError: Se la priorità non è valida.
+            SintesiRifiutata: Se la coda è piena o l'attesa supererebbe attesa_massima o la scadenza.
+        """
+        with self._condizione:
+            voce, inizio, limite = self._accoda(caratteri, priorita, scadenza)
+            try:
+                while True:
+                    attesa = self._turno(voce, priorita, inizio, limite)
+                    if attesa is None:
+                        break
+                    # Attende la ricarica dei gettoni mancanti o il cambio della testa della coda
+                    self._condizione.wait(attesa)
+            finally:
+                self._esci(voce, priorita)
+        self._ammessa(priorita, inizio)
+
+    async def acquisisci_async(self, caratteri: int, priorita: str = PRIORITA_PREDEFINITA,
+                               scadenza: Optional[float] = None) -> None:
+        """
+        Come acquisisci, per l'event loop: l'attesa è un asyncio.sleep e non occupa un thread
+        dell'executor. Non potendo essere svegliate dalla condizione, le richieste asincrone
+        ricontrollano il proprio turno almeno ogni _INTERVALLO_ASYNC secondi.
+        """
+        with self._condizione:
+            voce, inizio, limite = self._accoda(caratteri, priorita, scadenza)
+        try:
+            while True:
+                with self._condizione:
+                    attesa = self._turno(voce, priorita, inizio, limite)
+                if attesa is None:
+                    break
+                await asyncio.sleep(min(attesa, self._INTERVALLO_ASYNC))
+        finally:
+            with self._condizione:
+                self._esci(voce, priorita)
+        self._ammessa(priorita, inizio)
+
+    def prova_acquisire(self, caratteri: int, priorita: str = PRIORITA_PREDEFINITA) -> bool:
+        """
+        Preleva i gettoni solo se disponibili subito e senza scavalcare richieste in coda
+        (per chiamate facoltative, come i duplicati dell'hedging). Restituisce True se prelevati.
+        """
+        indice = PRIORITA.index(priorita) if priorita in PRIORITA else PRIORITA.index(PRIORITA_PREDEFINITA)
+        with self._condizione:
+            self._ricarica_gettoni()
+            if self._coda or self._gettoni - self._riserva(indice) < caratteri:
+                return False
+            self._gettoni -= caratteri
+            return True
+
+    def quota_esaurita(self, caratteri: int, priorita: str = PRIORITA_PREDEFINITA) -> SintesiRifiutata:
+        """
+        Da chiamare quando Google risponde 429 nonostante il secchio: lo svuota (la quota reale
+        è più bassa del previsto o condivisa con altri) e restituisce l'errore da sollevare.
+        """
+        with self._condizione:
+            self._ricarica_gettoni()
+            self._gettoni = min(self._gettoni, 0.0)
+            self._contatori["quota_google"] += 1
+            attesa = self._attesa_stimata(PRIORITA.index(priorita) if priorita in PRIORITA else 1, caratteri)
+        PIANIFICATORE.labels(esito="quota_google", priorita=priorita).inc()
+        self.logger.warning(f"⚠️ Google ha rifiutato la sintesi per quota esaurita; nuove chiamate tra {attesa:.0f} s.")
+        return SintesiRifiutata("Quota di Google Text-to-Speech esaurita.", attesa)
+
+    def statistiche(self) -> Dict[str, object]:
+        """Restituisce gettoni disponibili, richieste in coda per classe e contatori."""
+        with self._condizione:
+            self._ricarica_gettoni()
+            return {
+                "gettoni": int(self._gettoni),
+                "caratteri_al_minuto": self.caratteri_al_minuto,
+                "in_coda": dict(self._in_coda),
+                **self._contatori,
+            }
+
+    def _accoda(self, caratteri: int, priorita: str,
+                scadenza: Optional[float]) -> Tuple[Tuple[int, int, int], float, float]:
+        """Controllo di ammissione e ingresso in coda (con il lock): (voce in coda, inizio, attesa massima)."""
+        if priorita not in PRIORITA:
+            raise ValueError(f"Priorità non valida: '{priorita}'. Valori ammessi: {', '.join(PRIORITA)}.")
+        indice = PRIORITA.index(priorita)
+        # Un testo più grande del secchio non verrebbe mai ammesso
+        costo = min(max(1, caratteri), int(self._capienza(indice)))
+        inizio = time.monotonic()
+        limite = self.attesa_massima if scadenza is None else min(self.attesa_massima, scadenza - inizio)
+
+        self._ricarica_gettoni()
+        if self._in_coda[priorita] >= self.max_in_coda[priorita]:
+            self._rifiuta(priorita, f"Coda di sintesi '{priorita}' piena.", self._attesa_stimata(indice, costo))
+        attesa = self._attesa_stimata(indice, costo)
+        if attesa > limite:
+            self._rifiuta(priorita, f"Quota di sintesi esaurita per la priorità '{priorita}'.", attesa)
+
+        voce = (indice, next(self._sequenza), costo)
+        heapq.heappush(self._coda, voce)
+        self._in_coda[priorita] += 1
+        return voce, inizio, limite
+
+    def _turno(self, voce: Tuple[int, int, int], priorita: str, inizio: float, limite: float) -> Optional[float]:
+        """
+        Preleva i gettoni se è il turno della richiesta (con il lock) e restituisce None;
+        altrimenti i secondi da attendere prima di riprovare.
+        """
+        indice, _, costo = voce
+        self._ricarica_gettoni()
+        mancanti = costo - (self._gettoni - self._riserva(indice))
+        if self._coda[0] is voce and mancanti <= 0:
+            self._gettoni -= costo
+            self._contatori["ammesse"] += 1
+            return None
+        residua = limite - (time.monotonic() - inizio)
+        if residua <= 0:
+            self._rifiuta(priorita, f"Attesa massima in coda superata ('{priorita}').",
+                          self._attesa_stimata(indice, costo))
+        return min(residua, mancanti / self._ricarica) if self._coda[0] is voce else residua
+
+    def _esci(self, voce: Tuple[int, int, int], priorita: str) -> None:
+        """Toglie la richiesta dalla coda, ammessa o no (con il lock), e sveglia le altre."""
+        self._coda.remove(voce)
+        heapq.heapify(self._coda)
+        self._in_coda[priorita] -= 1
+        self._condizione.notify_all()
+
+    @staticmethod
+    def _ammessa(priorita: str, inizio: float) -> None:
+        PIANIFICATORE.labels(esito="ammesse", priorita=priorita).inc()
+        DURATA_FASE.labels(fase=f"attesa_quota_{priorita}").observe(time.monotonic() - inizio)
+
+    def _capienza(self, indice: int) -> float:
+        return self.caratteri_al_minuto - self._riserva(indice)
+
+    def _riserva(self, indice: int) -> float:
+        return 0.0 if indice == 0 else self.riserva_interattiva * self.caratteri_al_minuto
+
+    def _ricarica_gettoni(self) -> None:
+        adesso = time.monotonic()
+        self._gettoni = min(float(self.caratteri_al_minuto),
+                            self._gettoni + (adesso - self._aggiornato) * self._ricarica)
+        self._aggiornato = adesso
+
+    def _attesa_stimata(self, indice: int, costo: int) -> float:
+        """Secondi prima che i gettoni bastino per questa richiesta e per quelle che la precedono."""
+        davanti = sum(c for i, _, c in self._coda if i <= indice)
+        mancanti = davanti + costo - (self._gettoni - self._riserva(indice))
+        return max(0.0, mancanti / self._ricarica)
+
+    def _rifiuta(self, priorita: str, messaggio: str, attesa: float) -> None:
+        self._contatori["rifiutate"] += 1
+        PIANIFICATORE.labels(esito="rifiutate", priorita=priorita).inc()
+        raise SintesiRifiutata(messaggio, attesa)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from metriche import CHIAMATE_GOOGLE
+
+T = TypeVar("T")
+
+# Errori transitori di Google (google.api_core.exceptions) per cui ha senso riprovare
+_ERRORI_RITENTABILI = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "Aborted", "GatewayTimeout"}
+_CODICI_RITENTABILI = {500, 502, 503, 504}
+
+
+class ScadenzaSuperata(TimeoutError):
+    """La scadenza della richiesta è trascorsa prima che Google restituisse l'audio (risposta HTTP 504)."""
+
+
+def e_ritentabile(errore: BaseException) -> bool:
+    """True per gli errori transitori: servizio non disponibile, errore interno, timeout del tentativo."""
+    if isinstance(errore, ScadenzaSuperata):
+        return False
+    return (type(errore).__name__ in _ERRORI_RITENTABILI
+            or getattr(errore, "code", None) in _CODICI_RITENTABILI
+            or isinstance(errore, (ConnectionError, TimeoutError)))
+
+
+class PoliticaChiamate:
+    """
+    Scadenze, ritentativi e hedging delle chiamate a Google TTS.
+
+    Ogni tentativo riceve un timeout, il minore tra timeout_tentativo e il tempo che resta
+    alla scadenza della richiesta, da passare alla chiamata gRPC. Gli errori transitori
+    vengono ritentati al più max_tentativi volte in tutto, con backoff esponenziale e
+    jitter pieno, finché la scadenza lo consente.
+
+    Con hedging attivo, se un tentativo supera il percentile percentile_hedging delle
+    latenze recenti ne parte un duplicato e vince la prima risposta. Il duplicato parte
+    solo se consenti_hedge() lo permette (es. se la quota ha gettoni liberi), perché Google
+    addebita entrambe le chiamate.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        timeout_tentativo (float): Timeout massimo di un singolo tentativo, in secondi.
+        max_tentativi (int): Tentativi complessivi per chiamata (1 = nessun ritentativo).
+        attesa_base (float): Attesa prima del primo ritentativo, raddoppiata a ogni tentativo.
+        attesa_massima (float): Limite dell'attesa tra due tentativi.
+        hedging (bool): Se True, i tentativi lenti vengono duplicati.
+        percentile_hedging (float): Percentile delle latenze oltre il quale parte il duplicato.
+        min_campioni_hedging (int): Latenze necessarie prima di attivare l'hedging.
+    """
+
+    def __init__(self, timeout_tentativo: float = 15.0, max_tentativi: int = 3, attesa_base: float = 0.2,
+                 attesa_massima: float = 2.0, hedging: bool = False, percentile_hedging: float = 0.95,
+                 min_campioni_hedging: int = 20, finestra: int = 200):
+        if max_tentativi < 1:
+            raise ValueError("max_tentativi deve essere almeno 1.")
+        self.logger = logging.getLogger("PoliticaChiamate")
+        self.timeout_tentativo = timeout_tentativo
+        self.max_tentativi = max_tentativi
+        self.attesa_base = attesa_base
+        self.attesa_massima = attesa_massima
+        self.hedging = hedging
+        self.percentile_hedging = percentile_hedging
+        self.min_campioni_hedging = min_campioni_hedging
+
+        self._lock = threading.Lock()
+        self._latenze: deque = deque(maxlen=finestra)
+        self._contatori = {"ritentativi": 0, "hedge": 0, "hedge_vinti": 0, "scadenze_superate": 0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def esegui(self, chiamata: Callable[[float], T], scadenza: Optional[float] = None,
+               consenti_hedge: Optional[Callable[[], bool]] = None) -> T:
+        """
+        Esegue chiamata(timeout) applicando scadenza, ritentativi e hedging.
+
+        Args:
+            chiamata (Callable[[float], T]): Esegue un tentativo con il timeout indicato (secondi).
+            scadenza (Optional[float]): Istante time.monotonic() entro cui serve il risultato (None = nessuna).
+            consenti_hedge (Optional[Callable[[], bool]]): Decide se un duplicato può partire.
+
+        Raises:
+            ScadenzaSuperata: Se la scadenza trascorre prima di una risposta.
+            Exception: L'ultimo errore di Google, se non ritentabile o a tentativi esauriti.
+        """
+        for tentativo in range(1, self.max_tentativi + 1):
+            timeout = self._timeout(scadenza)
+            try:
+                return self._tentativo(chiamata, timeout, consenti_hedge)
+            except Exception as e:
+                time.sleep(self._prima_di_ritentare(e, tentativo, scadenza))
+
+    async def esegui_async(self, chiamata: Callable[[float], Awaitable[T]], scadenza: Optional[float] = None,
+                           consenti_hedge: Optional[Callable[[], bool]] = None) -> T:
+        """Come esegui(), per chiamate asincrone; il duplicato perdente viene cancellato."""
+        for tentativo in range(1, self.max_tentativi + 1):
+            timeout = self._timeout(scadenza)
+            try:
+                return await self._tentativo_async(chiamata, timeout, consenti_hedge)
+            except Exception as e:
+                await asyncio.sleep(self._prima_di_ritentare(e, tentativo, scadenza))
+
+    def ritardo_hedging(self) -> Optional[float]:
+        """Latenza oltre la quale un tentativo viene duplicato (None = hedging non attivo)."""
+        if not self.hedging:
+            return None
+        with self._lock:
+            if len(self._latenze) < self.min_campioni_hedging:
+                return None
+            latenze = sorted(self._latenze)
+        return latenze[min(len(latenze) - 1, int(self.percentile_hedging * len(latenze)))]
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce ritentativi, duplicati avviati e vinti, scadenze superate e soglia di hedging."""
+        ritardo = self.ritardo_hedging()
+        with self._lock:
+            return {**self._contatori,
+                    "ritardo_hedging_ms": round(ritardo * 1000, 1) if ritardo is not None else None}
+
+    def _timeout(self, scadenza: Optional[float]) -> float:
+        if scadenza is None:
+            return self.timeout_tentativo
+        residuo = scadenza - time.monotonic()
+        if residuo <= 0:
+            self._conta("scadenze_superate", "scadenza_superata")
+            raise ScadenzaSuperata("Scadenza della richiesta superata prima della sintesi.")
+        return min(self.timeout_tentativo, residuo)
+
+    def _prima_di_ritentare(self, errore: Exception, tentativo: int, scadenza: Optional[float]) -> float:
+        """Restituisce l'attesa prima del prossimo tentativo, o rilancia l'errore se non si ritenta."""
+        if not e_ritentabile(errore) or tentativo >= self.max_tentativi:
+            if scadenza is not None and time.monotonic() >= scadenza and e_ritentabile(errore):
+                self._conta("scadenze_superate", "scadenza_superata")
+                raise ScadenzaSuperata("Scadenza della richiesta superata durante la sintesi.") from errore
+            raise errore
+        # Jitter pieno: i client che hanno fallito insieme non riprovano insieme
+        attesa = random.uniform(0, min(self.attesa_massima, self.attesa_base * 2 ** (tentativo - 1)))
+        if scadenza is not None and time.monotonic() + attesa >= scadenza:
+            self._conta("scadenze_superate", "scadenza_superata")
+            raise ScadenzaSuperata("Scadenza della richiesta superata durante la sintesi.") from errore
+        self._conta("ritentativi", "ritentativo")
+        self.logger.warning(f"⚠️ Tentativo {tentativo}/{self.max_tentativi} fallito ({type(errore).__name__}: "
+                            f"{errore}); nuovo tentativo tra {attesa * 1000:.0f} ms.")
+        return attesa
+
+    def _tentativo(self, chiamata: Callable[[float], T], timeout: float,
+                   consenti_hedge: Optional[Callable[[], bool]]) -> T:
+        ritardo = self.ritardo_hedging()
+        if ritardo is None or ritardo >= timeout:
+            return self._cronometra(chiamata, timeout)
+
+        primaria = self._pool().submit(self._cronometra, chiamata, timeout)
+        if wait([primaria], timeout=ritardo).done or not (consenti_hedge is None or consenti_hedge()):
+            return primaria.result()
+
+        self._conta("hedge", "hedge")
+        secondaria = self._pool().submit(self._cronometra, chiamata, timeout - ritardo)
+        in_corso = {primaria, secondaria}
+        errore: Optional[BaseException] = None
+        while in_corso:
+            finiti, in_corso = wait(in_corso, return_when=FIRST_COMPLETED)
+            for future in finiti:
+                if future.exception() is None:
+                    # La chiamata sincrona perdente non si può interrompere: il risultato viene scartato
+                    if future is secondaria:
+                        self._conta("hedge_vinti", "hedge_vinto")
+                    return future.result()
+                errore = future.exception()
+        raise errore
+
+    async def _tentativo_async(self, chiamata: Callable[[float], Awaitable[T]], timeout: float,
+                               consenti_hedge: Optional[Callable[[], bool]]) -> T:
+        ritardo = self.ritardo_hedging()
+        if ritardo is None or ritardo >= timeout:
+            return await self._cronometra_async(chiamata, timeout)
+
+        primaria = asyncio.ensure_future(self._cronometra_async(chiamata, timeout))
+        in_corso = {primaria}
+        try:
+            finiti, _ = await asyncio.wait(in_corso, timeout=ritardo)
+            if finiti or not (consenti_hedge is None or consenti_hedge()):
+                return await primaria
+
+            self._conta("hedge", "hedge")
+            secondaria = asyncio.ensure_future(self._cronometra_async(chiamata, timeout - ritardo))
+            in_corso.add(secondaria)
+            errore: Optional[BaseException] = None
+            while in_corso:
+                finiti, in_corso = await asyncio.wait(in_corso, return_when=asyncio.FIRST_COMPLETED)
+                for task in finiti:
+                    if task.exception() is None:
+                        if task is secondaria:
+                            self._conta("hedge_vinti", "hedge_vinto")
+                        return task.result()
+                    errore = task.exception()
+            raise errore
+        finally:
+            for task in in_corso:
+                task.cancel()
+
+    def _cronometra(self, chiamata: Callable[[float], T], timeout: float) -> T:
+        inizio = time.monotonic()
+        risultato = chiamata(timeout)
+        self._registra_latenza(time.monotonic() - inizio)
+        return risultato
+
+    async def _cronometra_async(self, chiamata: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        inizio = time.monotonic()
+        risultato = await chiamata(timeout)
+        self._registra_latenza(time.monotonic() - inizio)
+        return risultato
+
+    def _registra_latenza(self, secondi: float) -> None:
+        with self._lock:
+            self._latenze.append(secondi)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Creato solo se l'hedging entra in funzione: senza, i tentativi girano nel thread del chiamante
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="Hedging")
+            return self._executor
+
+    def _conta(self, contatore: str, esito: str) -> None:
+        with self._lock:
+            self._contatori[contatore] += 1
+        CHIAMATE_GOOGLE.labels(esito=esito).inc()
@@ -0,0 +1,152 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+from langdetect.lang_detect_exception import LangDetectException
+from VoiceRegistry import LINGUA_FALLBACK, VoiceRegistry
+
+logger = logging.getLogger("RilevatoreLingua")
+
+# Parole molto frequenti per lingua: bastano a riconoscere i testi brevi
+# ("grazie", "thank you"), su cui il modello a n-grammi è inaffidabile
+_PAROLE_FREQUENTI: Dict[str, Tuple[str, ...]] = {
+    "it": ("ciao", "grazie", "buongiorno", "buonasera", "il", "lo", "gli", "della", "che", "non",
+           "sono", "per", "come", "cosa", "è", "si", "no", "perché", "anche", "questo"),
+    "en": ("hello", "hi", "thanks", "thank", "you", "the", "is", "are", "what", "how", "yes",
+           "please", "and", "of", "to", "this", "it's", "good", "morning", "with"),
+    "fr": ("bonjour", "bonsoir", "merci", "oui", "le", "les", "des", "est", "je", "vous",
+           "c'est", "pour", "avec", "pas", "très", "comment", "salut", "qui", "une", "du"),
+    "es": ("hola", "gracias", "buenos", "buenas", "el", "los", "las", "es", "que", "por",
+           "sí", "para", "con", "muy", "cómo", "qué", "está", "yo", "una", "del"),
+}
+_PAROLA = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+# Codici di langdetect diversi da quelli delle voci di Google
+_ALIAS_LANGDETECT = {"zh-cn": "cmn", "zh-tw": "cmn", "no": "nb", "tl": "fil"}
+
+
+@dataclass(frozen=True)
+class LinguaRilevata:
+    """
+    Esito dell'identificazione della lingua di un testo.
+
+    Attributes:
+        lingua (str): Codice della lingua (es. 'it').
+        confidenza (float): Probabilità stimata, tra 0 e 1 (0 se è la lingua predefinita).
+        metodo (str): "modello" (n-grammi), "parole" (testo breve), "predefinita" o "cache".
+    """
+    lingua: str
+    confidenza: float
+    metodo: str
+
+
+class RilevatoreLingua:
+    """
+    Identificazione della lingua di un testo, condivisa da assistente locale e server.
+
+    I profili di langdetect vengono caricati una volta, alla creazione, in una factory
+    propria con seme fisso: lo stesso testo dà sempre lo stesso esito e la factory globale
+    del modulo langdetect non viene toccata. I testi brevi passano per un elenco di parole
+    frequenti invece che per il modello; gli esiti recenti restano in una cache LRU.
+    È sicuro da usare da più thread.
+
+    Il modello considera tutte le lingue di langdetect. Se la più probabile non ha voci
+    nel catalogo di VoiceRegistry viene restituita la lingua predefinita con confidenza 0,
+    invece della lingua con voci più vicina (un testo tedesco non va letto in inglese).
+
+    Attributes:
+        lingue (Tuple[str, ...]): Lingue con almeno una voce (per default dal catalogo di VoiceRegistry).
+        predefinita (str): Lingua restituita quando il testo non basta a decidere.
+    """
+
+    def __init__(self, lingue: Optional[Iterable[str]] = None, predefinita: str = LINGUA_FALLBACK,
+                 min_parole_modello: int = 4, min_confidenza: float = 0.5, seme: int = 0,
+                 dimensione_cache: int = 1024):
+        inizio = time.perf_counter()
+        self._factory = DetectorFactory()
+        self._factory.load_profile(PROFILES_DIRECTORY)
+        self._factory.set_seed(seme)
+        disponibili = {_ALIAS_LANGDETECT.get(l, l) for l in self._factory.get_lang_list()}
+        richieste = tuple(lingue) if lingue is not None else tuple(VoiceRegistry.predefinito().lingue())
+        self.lingue = tuple(l for l in richieste if l in disponibili)
+        if not self.lingue:
+            raise ValueError(f"Nessuna delle lingue {richieste} è riconoscibile.")
+        self.predefinita = predefinita
+        self.min_parole_modello = min_parole_modello
+        self.min_confidenza = min_confidenza
+        self._parole = {parola: lingua for lingua, parole in _PAROLE_FREQUENTI.items()
+                        if lingua in self.lingue for parola in parole}
+        self._cache: "OrderedDict[str, LinguaRilevata]" = OrderedDict()
+        self._dimensione_cache = dimensione_cache
+        self._lock = threading.Lock()
+        logger.info(f"Profili lingua caricati in {(time.perf_counter() - inizio) * 1000:.0f} ms "
+                    f"(lingue: {', '.join(self.lingue)}).")
+
+    def rileva(self, testo: str) -> LinguaRilevata:
+        """Restituisce lingua, confidenza e metodo per il testo indicato."""
+        chiave = " ".join(testo.lower().split())
+        with self._lock:
+            esito = self._cache.get(chiave)
+            if esito is not None:
+                self._cache.move_to_end(chiave)
+                return LinguaRilevata(esito.lingua, esito.confidenza, "cache")
+
+        esito = self._identifica(chiave)
+        with self._lock:
+            self._cache[chiave] = esito
+            if len(self._cache) > self._dimensione_cache:
+                self._cache.popitem(last=False)
+        return esito
+
+    def lingua(self, testo: str) -> str:
+        """Solo il codice della lingua rilevata."""
+        return self.rileva(testo).lingua
+
+    def _identifica(self, testo: str) -> LinguaRilevata:
+        parole = _PAROLA.findall(testo)
+        if len(parole) < self.min_parole_modello:
+            return self._da_parole(parole)
+        try:
+            rilevatore = self._factory.create()
+            rilevatore.append(testo)
+            migliore = rilevatore.get_probabilities()[0]
+        except LangDetectException as e:
+            logger.debug(f"Lingua non rilevabile: {e}")
+            return self._da_parole(parole)
+        lingua = _ALIAS_LANGDETECT.get(migliore.lang, migliore.lang)
+        if lingua not in self.lingue:
+            logger.debug(f"Lingua rilevata '{lingua}' senza voci: uso '{self.predefinita}'.")
+            return LinguaRilevata(self.predefinita, 0.0, "predefinita")
+        if migliore.prob < self.min_confidenza:
+            return LinguaRilevata(self.predefinita, 0.0, "predefinita")
+        return LinguaRilevata(lingua, round(migliore.prob, 3), "modello")
+
+    def _da_parole(self, parole) -> LinguaRilevata:
+        voti: Dict[str, int] = {}
+        for parola in parole:
+            lingua = self._parole.get(parola)
+            if lingua is not None:
+                voti[lingua] = voti.get(lingua, 0) + 1
+        if not voti:
+            return LinguaRilevata(self.predefinita, 0.0, "predefinita")
+        ordinati = sorted(voti.values(), reverse=True)
+        if len(ordinati) > 1 and ordinati[0] == ordinati[1]:
+            return LinguaRilevata(self.predefinita, 0.0, "predefinita")
+        lingua = max(voti, key=voti.get)
+        return LinguaRilevata(lingua, round(voti[lingua] / len(parole), 3), "parole")
+
+
+_condiviso: Optional[RilevatoreLingua] = None
+_lock_condiviso = threading.Lock()
+
+
+def rilevatore_condiviso() -> RilevatoreLingua:
+    """Istanza unica per processo, creata (e quindi precaricata) alla prima chiamata."""
+    global _condiviso
+    with _lock_condiviso:
+        if _condiviso is None:
+            _condiviso = RilevatoreLingua()
+        return _condiviso
@@ -0,0 +1,233 @@
+import argparse
+import logging
+import pickle
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import librosa
+from RilevatoreVoce import DURATA_FRAME, segmenta
+
+logger = logging.getLogger("RilevatoreParolaChiave")
+
+FREQUENZA_CAMPIONAMENTO = 16000  # Hz: l'audio del microfono viene convertito a questa frequenza
+_N_FFT = 400                      # finestra MFCC di 25 ms
+_HOP = 160                        # passo MFCC di 10 ms
+_MARGINE_SOGLIA = 1.3             # tolleranza sulla distanza massima tra le registrazioni di iscrizione
+
+
+@dataclass(frozen=True)
+class Rilevamento:
+    """
+    Esito della ricerca della parola chiave in un frammento audio.
+
+    Attributes:
+        trovata (bool): True se la parola chiave è stata riconosciuta.
+        distanza (Optional[float]): Distanza DTW migliore dai modelli (None se non c'è parlato).
+        fine (Optional[float]): Secondi dall'inizio dell'audio alla fine della parola chiave.
+        elaborazione_ms (float): Tempo di calcolo del rilevamento.
+    """
+    trovata: bool
+    distanza: Optional[float]
+    fine: Optional[float]
+    elaborazione_ms: float
+
+
+def pcm_in_float(pcm: Union[bytes, np.ndarray]) -> np.ndarray:
+    """Converte PCM 16 bit little-endian (es. AudioData.get_raw_data()) in float32 tra -1 e 1."""
+    if isinstance(pcm, np.ndarray) and pcm.dtype.kind == "f":
+        return pcm.astype(np.float32, copy=False)
+    campioni = np.frombuffer(pcm, dtype="<i2") if isinstance(pcm, (bytes, bytearray, memoryview)) else pcm
+    return campioni.astype(np.float32) / 32768.0
+
+
+def segmenti_voce(y: np.ndarray, frequenza: int = FREQUENZA_CAMPIONAMENTO,
+                  max_pausa: float = 0.15) -> List[Tuple[int, int]]:
+    """
+    Tratti di parlato (inizio, fine), in campioni, secondo il VAD di RilevatoreVoce.
+
+    Pause più brevi di max_pausa non separano i segmenti. La stima del rumore parte dal
+    10° percentile dell'energia dei frame, non dal primo frame: le registrazioni possono
+    iniziare direttamente con la parola chiave.
+    """
+    campioni_frame = int(frequenza * DURATA_FRAME)
+    n_frame = len(y) // campioni_frame
+    if n_frame == 0:
+        return []
+    campioni = (np.clip(y[:n_frame * campioni_frame], -1, 1) * 32767).astype("<i2")
+    rms = np.sqrt(np.mean(campioni.reshape(n_frame, campioni_frame).astype(np.float64) ** 2, axis=1))
+    enunciati = segmenta(campioni.tobytes(), frequenza, rumore_iniziale=float(np.percentile(rms, 10)),
+                         silenzio_finale=max_pausa, durata_massima=n_frame * DURATA_FRAME + 1)
+    return [(e.inizio * campioni_frame, e.fine * campioni_frame) for e in enunciati]
+
+
+class RilevatoreParolaChiave:
+    """
+    Riconoscimento locale della parola chiave ("keyword spotting"), senza chiamate di rete.
+
+    Il VAD a energia (RilevatoreVoce) isola i tratti di parlato; all'inizio di ciascuno la parola chiave
+    viene cercata con DTW a sottosequenza sulle MFCC (normalizzate per media) di alcune
+    registrazioni di iscrizione. Se la distanza migliore è sotto la soglia la parola chiave
+    è riconosciuta e 'fine' indica dove termina, così il resto della frase può andare
+    al riconoscimento nel cloud.
+
+    Attributes:
+        modelli (List[np.ndarray]): MFCC delle registrazioni di iscrizione (coefficienti x frame).
+        soglia (float): Distanza DTW massima per accettare la parola chiave.
+        frequenza (int): Frequenza di campionamento attesa per l'audio.
+    """
+
+    def __init__(self, modelli: Sequence[np.ndarray], soglia: float, frequenza: int = FREQUENZA_CAMPIONAMENTO):
+        if not modelli:
+            raise ValueError("Serve almeno un modello della parola chiave.")
+        self.modelli = list(modelli)
+        self.soglia = soglia
+        self.frequenza = frequenza
+        durate = [m.shape[1] * _HOP / frequenza for m in self.modelli]
+        # Segmenti molto più brevi della parola chiave non vengono confrontati
+        self._durata_minima = 0.5 * min(durate)
+        # La parola chiave viene cercata solo all'inizio di ciascun segmento
+        self._durata_ricerca = 1.5 * max(durate)
+        # La media delle MFCC si calcola sulla durata della parola chiave, non sulla frase che la segue
+        self._frame_media = int(np.mean([m.shape[1] for m in self.modelli]))
+
+    @classmethod
+    def iscrivi(cls, registrazioni: Sequence[Union[bytes, np.ndarray]], soglia: Optional[float] = None,
+                frequenza: int = FREQUENZA_CAMPIONAMENTO) -> "RilevatoreParolaChiave":
+        """
+        Crea il rilevatore da alcune registrazioni della sola parola chiave (3-5 sono sufficienti).
+
+        Senza soglia esplicita, questa viene calibrata sulle registrazioni stesse: la massima
+        distanza tra ciascuna e le altre, con un margine di tolleranza.
+
+        Raises:
+            ValueError: Se una registrazione non contiene parlato, o se la soglia non è
+                        indicata e le registrazioni sono meno di due.
+        """
+        modelli = []
+        for indice, registrazione in enumerate(registrazioni):
+            y = pcm_in_float(registrazione)
+            segmenti = segmenti_voce(y, frequenza)
+            if not segmenti:
+                raise ValueError(f"La registrazione {indice} non contiene parlato.")
+            modelli.append(cls._mfcc(y[segmenti[0][0]:segmenti[-1][1]], frequenza))
+
+        if soglia is None:
+            if len(modelli) < 2:
+                raise ValueError("Per calibrare la soglia servono almeno due registrazioni.")
+            distanze = [cls._distanza(m, altro)[0] for i, m in enumerate(modelli)
+                        for j, altro in enumerate(modelli) if i != j]
+            soglia = max(distanze) * _MARGINE_SOGLIA
+        logger.info(f"Parola chiave iscritta da {len(modelli)} registrazioni, soglia {soglia:.3f}.")
+        return cls(modelli, soglia, frequenza)
+
+    def rileva(self, audio: Union[bytes, np.ndarray]) -> Rilevamento:
+        """
+        Cerca la parola chiave nell'audio (PCM 16 bit o float, mono, alla frequenza del rilevatore).
+
+        Returns:
+            Rilevamento: Esito, distanza migliore e fine della parola chiave in secondi.
+        """
+        inizio = time.perf_counter()
+        y = pcm_in_float(audio)
+        migliore, fine = None, None
+        for a, b in segmenti_voce(y, self.frequenza):
+            if (b - a) / self.frequenza < self._durata_minima:
+                continue
+            finestra = self._mfcc(y[a:min(b, a + int(self._durata_ricerca * self.frequenza))], self.frequenza,
+                                  frame_media=self._frame_media)
+            for modello in self.modelli:
+                if finestra.shape[1] < modello.shape[1] // 2:
+                    continue
+                distanza, frame_fine = self._distanza(modello, finestra)
+                if migliore is None or distanza < migliore:
+                    migliore, fine = distanza, float(a + frame_fine * _HOP) / self.frequenza
+        trovata = migliore is not None and migliore <= self.soglia
+        return Rilevamento(trovata=trovata, distanza=migliore, fine=fine if trovata else None,
+                           elaborazione_ms=(time.perf_counter() - inizio) * 1000)
+
+    def salva(self, percorso: str) -> None:
+        """Salva modelli e soglia (pickle, come le impronte di VoiceRecognizer)."""
+        with open(percorso, "wb") as f:
+            pickle.dump({"modelli": self.modelli, "soglia": self.soglia, "frequenza": self.frequenza}, f)
+
+    @classmethod
+    def carica(cls, percorso: str) -> "RilevatoreParolaChiave":
+        """Carica un rilevatore salvato con salva()."""
+        with open(percorso, "rb") as f:
+            dati = pickle.load(f)
+        return cls(dati["modelli"], dati["soglia"], dati.get("frequenza", FREQUENZA_CAMPIONAMENTO))
+
+    def valuta(self, positivi: Sequence[str], negativi: Sequence[str]) -> Dict[str, float]:
+        """
+        Misura il rilevatore su file WAV: registrazioni che contengono la parola chiave
+        (eventualmente seguita dalla frase) e registrazioni che non la contengono.
+
+        La latenza di un rilevamento è il tempo tra la fine della parola chiave e la decisione,
+        elaborando il frammento catturato per intero: l'audio dopo la parola chiave più il calcolo.
+
+        Returns:
+            Dict[str, float]: Tassi di falsi rifiuti e falsi allarmi, latenza media e al 95°
+                              percentile, tempo di elaborazione medio (millisecondi).
+        """
+        latenze, elaborazioni, rifiuti, allarmi = [], [], 0, 0
+        for percorso in positivi:
+            y = librosa.load(percorso, sr=self.frequenza, mono=True)[0]
+            esito = self.rileva(y)
+            elaborazioni.append(esito.elaborazione_ms)
+            if esito.trovata:
+                latenze.append((len(y) / self.frequenza - esito.fine) * 1000 + esito.elaborazione_ms)
+            else:
+                rifiuti += 1
+        for percorso in negativi:
+            esito = self.rileva(librosa.load(percorso, sr=self.frequenza, mono=True)[0])
+            elaborazioni.append(esito.elaborazione_ms)
+            allarmi += esito.trovata
+        return {
+            "positivi": len(positivi),
+            "negativi": len(negativi),
+            "tasso_falsi_rifiuti": rifiuti / len(positivi) if positivi else 0.0,
+            "tasso_falsi_allarmi": allarmi / len(negativi) if negativi else 0.0,
+            "latenza_ms_media": float(np.mean(latenze)) if latenze else 0.0,
+            "latenza_ms_p95": float(np.percentile(latenze, 95)) if latenze else 0.0,
+            "elaborazione_ms_media": float(np.mean(elaborazioni)) if elaborazioni else 0.0,
+        }
+
+    @staticmethod
+    def _mfcc(y: np.ndarray, frequenza: int, frame_media: Optional[int] = None) -> np.ndarray:
+        # Senza c0 (volume) e con la media dei primi frame_media frame sottratta:
+        # il confronto non dipende da volume e microfono
+        mfcc = librosa.feature.mfcc(y=y, sr=frequenza, n_mfcc=13, n_fft=_N_FFT, hop_length=_HOP)[1:]
+        return mfcc - mfcc[:, :frame_media].mean(axis=1, keepdims=True)
+
+    @staticmethod
+    def _distanza(modello: np.ndarray, finestra: np.ndarray) -> Tuple[float, int]:
+        """Distanza DTW del modello dal tratto più simile della finestra e frame in cui termina."""
+        costi, _ = librosa.sequence.dtw(X=modello, Y=finestra, subseq=True, metric="euclidean")
+        finale = costi[-1, :] / modello.shape[1]
+        frame = int(np.argmin(finale))
+        return float(finale[frame]), frame + 1
+
+
+# Uso diretto: iscrizione da file WAV e valutazione su fixture
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Keyword spotting locale per la parola chiave dell'assistente.")
+    comandi = parser.add_subparsers(dest="comando", required=True)
+    parser_iscrivi = comandi.add_parser("iscrivi", help="Crea il modello da registrazioni WAV della parola chiave.")
+    parser_iscrivi.add_argument("wav", nargs="+")
+    parser_iscrivi.add_argument("--soglia", type=float, default=None)
+    parser_valuta = comandi.add_parser("valuta", help="Misura falsi allarmi, falsi rifiuti e latenza su WAV.")
+    parser_valuta.add_argument("--positivi", nargs="*", default=[])
+    parser_valuta.add_argument("--negativi", nargs="*", default=[])
+    for sottoparser in (parser_iscrivi, parser_valuta):
+        sottoparser.add_argument("--modello", default="parola_chiave.pkl")
+    args = parser.parse_args()
+
+    if args.comando == "iscrivi":
+        registrazioni = [librosa.load(p, sr=FREQUENZA_CAMPIONAMENTO, mono=True)[0] for p in args.wav]
+        RilevatoreParolaChiave.iscrivi(registrazioni, soglia=args.soglia).salva(args.modello)
+        print(f"Modello salvato in '{args.modello}'.")
+    else:
+        for nome, valore in RilevatoreParolaChiave.carica(args.modello).valuta(args.positivi, args.negativi).items():
+            print(f"{nome}: {valore:.3f}" if isinstance(valore, float) else f"{nome}: {valore}")
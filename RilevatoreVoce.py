@@ -0,0 +1,201 @@
+import argparse
+import math
+import wave
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+
+DURATA_FRAME = 0.02  # secondi per frame nell'elaborazione di buffer interi (segmenta)
+# Costanti di tempo (secondi) della stima del rumore di fondo: scende in fretta nel silenzio,
+# sale piano con il rumore stazionario e quasi per nulla durante il parlato
+_COSTANTE_DISCESA = 0.1
+_COSTANTE_SALITA = 2.0
+_COSTANTE_PARLATO = 60.0
+# Un frame oltre questo multiplo del rumore non contribuisce (quasi) alla stima
+_RAPPORTO_PARLATO = 2.0
+# Soglia minima di parlato (RMS su campioni a 16 bit): circa -44 dBFS
+_SOGLIA_MINIMA = 200.0
+
+
+def energia(pcm: bytes) -> float:
+    """RMS di un frame PCM 16 bit little-endian."""
+    campioni = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+    return float(np.sqrt(np.mean(campioni ** 2))) if len(campioni) else 0.0
+
+
+class StimaRumore:
+    """
+    Stima incrementale del rumore di fondo (RMS), aggiornata frame per frame: scende in
+    fretta quando c'è silenzio, sale piano con il rumore stazionario e il parlato quasi
+    non la sposta.
+
+    Attributes:
+        rumore (Optional[float]): RMS stimato (None prima del primo frame).
+    """
+
+    def __init__(self):
+        self.rumore: Optional[float] = None
+
+    def aggiorna(self, rms: float, secondi: float) -> None:
+        """Aggiorna la stima con l'energia di un frame lungo 'secondi'."""
+        if self.rumore is None:
+            self.rumore = rms
+            return
+        if rms < self.rumore:
+            costante = _COSTANTE_DISCESA
+        elif rms < self.rumore * _RAPPORTO_PARLATO:
+            costante = _COSTANTE_SALITA
+        else:
+            costante = _COSTANTE_PARLATO
+        self.rumore += (rms - self.rumore) * min(1.0, secondi / costante)
+
+    def soglia(self, rapporto: float = 3.0) -> float:
+        """Energia oltre la quale un frame è parlato: il rumore per il rapporto, mai sotto il minimo."""
+        return max((self.rumore or 0.0) * rapporto, _SOGLIA_MINIMA)
+
+
+@dataclass(frozen=True)
+class Enunciato:
+    """
+    Un tratto di parlato delimitato dal VAD. Gli indici sono frame dall'inizio dello stream.
+
+    Attributes:
+        inizio (int): Primo frame di parlato.
+        fine (int): Frame successivo all'ultimo frame di parlato.
+        decisione (int): Frame dopo il quale l'enunciato è stato chiuso (fine + silenzio finale).
+        troncato (bool): True se chiuso per la durata massima invece che per il silenzio.
+    """
+    inizio: int
+    fine: int
+    decisione: int
+    troncato: bool
+
+
+class RilevatoreVoce:
+    """
+    VAD a energia per l'endpointing, frame per frame su PCM 16 bit.
+
+    L'enunciato inizia dopo 'durata_attacco' secondi di parlato consecutivo (i clic
+    isolati non lo aprono) e termina dopo 'silenzio_finale' secondi senza parlato, o
+    comunque dopo 'durata_massima' secondi. La latenza per un comando breve è quindi
+    la sua durata più il silenzio finale.
+
+    Attributes:
+        secondi_per_frame (float): Durata dei frame passati ad aggiungi().
+        stima (StimaRumore): Stima del rumore di fondo; se condivisa (es. con la cattura
+                             del microfono) la aggiorna chi l'ha creata.
+    """
+
+    def __init__(self, secondi_per_frame: float, silenzio_finale: float = 0.6, durata_massima: float = 15.0,
+                 durata_attacco: float = 0.1, rapporto_soglia: float = 3.0, stima: Optional[StimaRumore] = None):
+        self.secondi_per_frame = secondi_per_frame
+        self.rapporto_soglia = rapporto_soglia
+        self.stima = stima if stima is not None else StimaRumore()
+        self._stima_propria = stima is None
+        self._frame_attacco = max(1, math.ceil(durata_attacco / secondi_per_frame))
+        self._frame_silenzio = max(1, math.ceil(silenzio_finale / secondi_per_frame))
+        self._frame_massimi = max(1, math.ceil(durata_massima / secondi_per_frame))
+        self.azzera()
+
+    def azzera(self) -> None:
+        """Ricomincia da capo: gli indici ripartono da zero."""
+        self._frame = 0
+        self._attacco = 0
+        self._inizio: Optional[int] = None
+        self._ultimo = 0
+
+    @property
+    def in_parlato(self) -> bool:
+        """True se un enunciato è iniziato e non ancora chiuso."""
+        return self._inizio is not None
+
+    def aggiungi(self, frame: bytes) -> Optional[Enunciato]:
+        """Elabora il frame successivo; restituisce l'enunciato quando si chiude, altrimenti None."""
+        indice = self._frame
+        self._frame += 1
+        rms = energia(frame)
+        if self._stima_propria:
+            self.stima.aggiorna(rms, self.secondi_per_frame)
+        voce = rms > self.stima.soglia(self.rapporto_soglia)
+
+        if self._inizio is None:
+            self._attacco = self._attacco + 1 if voce else 0
+            if self._attacco >= self._frame_attacco:
+                self._inizio = indice - self._attacco + 1
+                self._ultimo = indice
+            return None
+
+        if voce:
+            self._ultimo = indice
+        troncato = indice + 1 - self._inizio >= self._frame_massimi
+        if indice - self._ultimo < self._frame_silenzio and not troncato:
+            return None
+        enunciato = Enunciato(inizio=self._inizio, fine=indice + 1 if troncato else self._ultimo + 1,
+                              decisione=indice + 1, troncato=troncato)
+        self._inizio = None
+        self._attacco = 0
+        return enunciato
+
+    def termina(self) -> Optional[Enunciato]:
+        """A fine stream: chiude l'enunciato ancora aperto e lo restituisce (None se non c'è)."""
+        if self._inizio is None:
+            return None
+        enunciato = Enunciato(inizio=self._inizio, fine=self._ultimo + 1, decisione=self._frame, troncato=False)
+        self._inizio = None
+        self._attacco = 0
+        return enunciato
+
+
+def segmenta(pcm: bytes, frequenza: int, secondi_per_frame: float = DURATA_FRAME,
+             rumore_iniziale: Optional[float] = None, **opzioni) -> List[Enunciato]:
+    """
+    Applica il VAD a un intero buffer PCM 16 bit mono (es. una fixture WAV); l'enunciato
+    ancora aperto alla fine del buffer viene chiuso lì.
+
+    Args:
+        rumore_iniziale (Optional[float]): RMS da cui parte la stima del rumore, per i buffer che
+                                           iniziano già con il parlato (None = il primo frame).
+        opzioni: Parametri di RilevatoreVoce.
+    """
+    byte_frame = int(frequenza * secondi_per_frame) * 2
+    rilevatore = RilevatoreVoce(byte_frame / 2 / frequenza, **opzioni)
+    if rumore_iniziale is not None:
+        rilevatore.stima.rumore = rumore_iniziale
+    enunciati = []
+    for inizio in range(0, len(pcm) - byte_frame + 1, byte_frame):
+        enunciato = rilevatore.aggiungi(pcm[inizio:inizio + byte_frame])
+        if enunciato is not None:
+            enunciati.append(enunciato)
+    ultimo = rilevatore.termina()
+    if ultimo is not None:
+        enunciati.append(ultimo)
+    return enunciati
+
+
+def leggi_wav(percorso: str) -> Tuple[bytes, int]:
+    """
+    Legge un WAV PCM 16 bit mono e restituisce (pcm, frequenza).
+
+    Raises:
+        ValueError: Se il file non è PCM 16 bit mono.
+    """
+    with wave.open(percorso, "rb") as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise ValueError(f"'{percorso}': serve un WAV PCM 16 bit mono.")
+        return f.readframes(f.getnframes()), f.getframerate()
+
+
+# Uso diretto: misura dell'endpointing su fixture WAV
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Endpointing VAD su file WAV (PCM 16 bit mono).")
+    parser.add_argument("wav", nargs="+")
+    parser.add_argument("--silenzio-finale", type=float, default=0.6)
+    parser.add_argument("--durata-massima", type=float, default=15.0)
+    args = parser.parse_args()
+
+    for percorso in args.wav:
+        pcm, frequenza = leggi_wav(percorso)
+        for e in segmenta(pcm, frequenza, silenzio_finale=args.silenzio_finale, durata_massima=args.durata_massima):
+            # Tempi in secondi; 'chiuso' è la latenza dall'inizio del parlato alla fine dell'endpointing
+            print(f"{percorso}: parlato {e.inizio * DURATA_FRAME:.2f}-{e.fine * DURATA_FRAME:.2f}s, "
+                  f"chiuso dopo {(e.decisione - e.inizio) * DURATA_FRAME:.2f}s{' (troncato)' if e.troncato else ''}")
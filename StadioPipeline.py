@@ -0,0 +1,112 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger("StadioPipeline")
+
+# Segnale di fine stream: chiude lo stadio e viene propagato al successivo
+_FINE = object()
+
+
+class StadioPipeline:
+    """
+    Stadio di una pipeline produttore/consumatore: un thread prende gli elementi da una
+    coda d'ingresso limitata, li elabora e passa i risultati diversi da None allo stadio
+    successivo. Una coda piena blocca chi inserisce, quindi uno stadio lento rallenta
+    quelli a monte invece di accumulare memoria.
+
+    Le statistiche (coda, tempi di servizio) mostrano quale stadio è il collo di bottiglia.
+
+    Attributes:
+        nome (str): Nome dello stadio (thread e log).
+        elabora (Callable[[Any], Any]): Funzione applicata a ogni elemento.
+        successivo (Optional[StadioPipeline]): Stadio che riceve i risultati.
+    """
+
+    def __init__(self, nome: str, elabora: Callable[[Any], Any], capacita: int = 4,
+                 successivo: Optional["StadioPipeline"] = None, finestra: int = 200):
+        self.nome = nome
+        self.elabora = elabora
+        self.successivo = successivo
+        self.capacita = capacita
+        self._coda: queue.Queue = queue.Queue(maxsize=capacita)
+        self._tempi: deque = deque(maxlen=finestra)
+        self._contatori = {"elaborati": 0, "errori": 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def avvia(self) -> None:
+        """Avvia il thread dello stadio (nessun effetto se già avviato)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._esegui, name=f"Stadio-{self.nome}", daemon=True)
+            self._thread.start()
+
+    def inserisci(self, elemento: Any) -> None:
+        """Accoda un elemento; se la coda è piena attende che lo stadio si liberi."""
+        self._coda.put(elemento)
+
+    def chiudi(self) -> None:
+        """Chiude lo stadio dopo gli elementi già in coda; la chiusura si propaga ai successivi."""
+        self._coda.put(_FINE)
+
+    def attendi(self, timeout: Optional[float] = None) -> bool:
+        """Attende la fine del thread; restituisce False se è ancora in esecuzione."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce elementi in coda, capacità, elaborati, errori e tempi di servizio (ms)."""
+        with self._lock:
+            tempi = list(self._tempi)
+            contatori = dict(self._contatori)
+        return {
+            "in_coda": self._coda.qsize(),
+            "capacita": self.capacita,
+            **contatori,
+            "servizio_ms_medio": round(float(np.mean(tempi)) * 1000, 1) if tempi else None,
+            "servizio_ms_p95": round(float(np.percentile(tempi, 95)) * 1000, 1) if tempi else None,
+        }
+
+    def _esegui(self) -> None:
+        while True:
+            elemento = self._coda.get()
+            if elemento is _FINE:
+                break
+            inizio = time.perf_counter()
+            try:
+                risultato = self.elabora(elemento)
+            except Exception as e:
+                logger.exception(f"❌ Errore nello stadio '{self.nome}': {e}")
+                risultato, esito = None, "errori"
+            else:
+                esito = "elaborati"
+            with self._lock:
+                self._tempi.append(time.perf_counter() - inizio)
+                self._contatori[esito] += 1
+            if risultato is not None and self.successivo is not None:
+                self.successivo.inserisci(risultato)
+        if self.successivo is not None:
+            self.successivo.chiudi()
+
+
+def collega(*stadi: StadioPipeline) -> List[StadioPipeline]:
+    """Collega gli stadi in sequenza e restituisce la lista, dal primo all'ultimo."""
+    for stadio, successivo in zip(stadi, stadi[1:]):
+        stadio.successivo = successivo
+    return list(stadi)
+
+
+def riepilogo(stadi: Sequence[StadioPipeline]) -> str:
+    """Una riga per il log: coda e tempo di servizio di ogni stadio, con il più lento in evidenza."""
+    statistiche = {stadio.nome: stadio.statistiche() for stadio in stadi}
+    lento = max(statistiche, key=lambda nome: statistiche[nome]["servizio_ms_medio"] or 0)
+    parti = [f"{nome}{'*' if nome == lento else ''}: coda {s['in_coda']}/{s['capacita']}, "
+             f"{s['servizio_ms_medio'] if s['servizio_ms_medio'] is not None else '-'} ms"
+             for nome, s in statistiche.items()]
+    return " | ".join(parti)
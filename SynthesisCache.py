@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+
+class SynthesisCache:
+    """
+    Cache a due livelli (memoria + disco) per l'audio sintetizzato da Google TTS.
+
+    La chiave è un hash SHA-256 calcolato su testo normalizzato, nome della voce
+    risolta, codice lingua, velocità e codifica audio: due richieste con gli stessi
+    parametri effettivi producono lo stesso audio e quindi la stessa chiave.
+
+    Il livello in memoria è un LRU limitato in byte; il livello su disco salva un
+    file per chiave (suddiviso in sottocartelle per prefisso dell'hash) ed è
+    limitato sia in byte totali sia in età massima delle voci.
+
+    Più processi possono condividere la stessa directory: le scritture sono atomiche
+    (file temporaneo + rename) e le voci scritte da altri processi vengono trovate
+    anche se assenti dall'indice in memoria di questo processo. I limiti su disco sono
+    però applicati da ciascun processo sulle proprie scritture: con N processi la
+    directory condivisa può arrivare a N volte max_disco_bytes.
+
+    Il lock protegge solo le strutture in memoria: letture, scritture e rimozioni dei
+    file avvengono fuori dal lock, così un hit in memoria non attende mai l'I/O su disco.
+
+    Le frasi pre-renderizzate (prerender_frasi.py) si aggiungono con carica_manifest():
+    i loro file restano dove sono, non scadono e non vengono mai evinti.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        cache_dir (Optional[Path]): Directory della cache su disco (None = solo memoria).
+        max_memoria_bytes (int): Dimensione massima del livello in memoria.
+        max_disco_bytes (int): Dimensione massima del livello su disco, per processo.
+        max_eta_secondi (float): Età massima di una voce prima di essere considerata scaduta.
+    """
+
+    _ESTENSIONE = ".audio"
+
+    def __init__(self, cache_dir: Optional[str] = "storage/cache",
+                 max_memoria_bytes: int = 32 * 1024 * 1024,
+                 max_disco_bytes: int = 512 * 1024 * 1024,
+                 max_eta_secondi: float = 7 * 24 * 3600):
+        self.logger = logging.getLogger("SynthesisCache")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_memoria_bytes = max_memoria_bytes
+        self.max_disco_bytes = max_disco_bytes
+        self.max_eta_secondi = max_eta_secondi
+
+        self._lock = threading.Lock()
+        # chiave -> (audio, istante di inserimento)
+        self._memoria: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memoria_bytes = 0
+        # chiave -> (dimensione, mtime) dei file presenti su disco, dal più vecchio al più recente
+        self._indice_disco: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._disco_bytes = 0
+        # chiave -> file audio delle frasi pre-renderizzate (da carica_manifest)
+        self._prerender: Dict[str, Path] = {}
+
+        self._contatori = {
+            "hit_memoria": 0,
+            "hit_prerender": 0,
+            "hit_disco": 0,
+            "miss": 0,
+            "scritture": 0,
+            "evizioni_memoria": 0,
+            "evizioni_disco": 0,
+            "scadute": 0,
+        }
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._carica_indice_disco()
+        self.logger.info(f"SynthesisCache pronta. Disco: '{self.cache_dir}', "
+                         f"memoria max {self.max_memoria_bytes} B, disco max {self.max_disco_bytes} B.")
+
+    @staticmethod
+    def normalizza_testo(testo: str) -> str:
+        """Normalizza Unicode (NFC) e spazi, così varianti banali condividono la stessa chiave."""
+        return " ".join(unicodedata.normalize("NFC", testo).split())
+
+    @classmethod
+    def crea_chiave(cls, testo: str, nome_voce: Optional[str], codice_lingua: str,
+                    velocita: float, encoding: str, sample_rate: Optional[int] = None,
+                    effetti: Tuple[str, ...] = ()) -> str:
+        """
+        Calcola la chiave di cache per una sintesi.
+
+        Args:
+            testo (str): Il testo da sintetizzare (verrà normalizzato).
+            nome_voce (Optional[str]): Il nome della voce Google risolta (es. 'it-IT-Wavenet-C').
+            codice_lingua (str): Il codice BCP-47 inviato a Google (es. 'it-IT').
+            velocita (float): Lo speaking_rate effettivo.
+            encoding (str): Il nome della codifica audio (es. 'MP3').
+            sample_rate (Optional[int]): Frequenza di campionamento richiesta (None = quella della voce).
+            effetti (Tuple[str, ...]): Profili effetti audio di Google (effects_profile_id).
+
+        Returns:
+            str: Digest esadecimale SHA-256.
+        """
+        parti = [
+            cls.normalizza_testo(testo),
+            nome_voce or "",
+            codice_lingua,
+            f"{velocita:.2f}",
+            encoding,
+        ]
+        # Solo se presenti, così le chiavi già in cache (MP3 con parametri predefiniti) restano valide
+        if sample_rate or effetti:
+            parti.extend([str(sample_rate or ""), ",".join(effetti)])
+        materiale = "\x1f".join(parti)
+        return hashlib.sha256(materiale.encode("utf-8")).hexdigest()
+
+    def get(self, chiave: str) -> Optional[bytes]:
+        """
+        Restituisce l'audio associato alla chiave, cercando in memoria, tra le frasi
+        pre-renderizzate e poi su disco. Un hit fuori dalla memoria promuove la voce in memoria.
+        """
+        adesso = time.time()
+        with self._lock:
+            voce = self._memoria.get(chiave)
+            if voce is not None:
+                audio, inserito = voce
+                if adesso - inserito <= self.max_eta_secondi:
+                    self._memoria.move_to_end(chiave)
+                    self._contatori["hit_memoria"] += 1
+                    return audio
+                self._rimuovi_memoria(chiave)
+                self._contatori["scadute"] += 1
+
+            file_prerender = self._prerender.get(chiave)
+
+        if file_prerender is not None:
+            audio = self._leggi_prerender(chiave, file_prerender)
+            if audio is not None:
+                with self._lock:
+                    self._contatori["hit_prerender"] += 1
+                    self._inserisci_memoria(chiave, audio, adesso)
+                return audio
+
+        audio = self._leggi_disco(chiave, adesso)
+        with self._lock:
+            if audio is None:
+                self._contatori["miss"] += 1
+                return None
+            self._contatori["hit_disco"] += 1
+            self._inserisci_memoria(chiave, audio, adesso)
+        return audio
+
+    def put(self, chiave: str, audio: bytes) -> None:
+        """Memorizza l'audio in entrambi i livelli, applicando l'evizione per dimensione."""
+        if not audio:
+            return
+        adesso = time.time()
+        with self._lock:
+            self._inserisci_memoria(chiave, audio, adesso)
+            self._contatori["scritture"] += 1
+        self._scrivi_disco(chiave, audio, adesso)
+
+    def carica_manifest(self, percorso: str) -> int:
+        """
+        Registra le frasi pre-renderizzate elencate in un manifest di prerender_frasi.py
+        (una riga JSON per frase con 'chiave' e 'file' relativo al manifest).
+        Le righe non valide e i file mancanti vengono ignorati.
+
+        Returns:
+            int: Il numero di frasi registrate.
+        """
+        manifest = Path(percorso)
+        frasi: Dict[str, Path] = {}
+        with open(manifest, encoding="utf-8") as f:
+            for riga in f:
+                try:
+                    voce = json.loads(riga)
+                    file = manifest.parent / voce["file"]
+                    chiave = voce["chiave"]
+                except (ValueError, TypeError, KeyError):
+                    continue
+                if file.is_file():
+                    frasi[chiave] = file
+        with self._lock:
+            self._prerender.update(frasi)
+        self.logger.info(f"Frasi pre-renderizzate caricate da '{manifest}': {len(frasi)}.")
+        return len(frasi)
+
+    def svuota(self) -> None:
+        """
+        Elimina tutte le voci della cache (memoria e disco), tranne le frasi pre-renderizzate.
+        I contatori non vengono azzerati.
+        """
+        with self._lock:
+            self._memoria.clear()
+            self._memoria_bytes = 0
+            chiavi = list(self._indice_disco)
+            self._indice_disco.clear()
+            self._disco_bytes = 0
+        self._elimina_file(chiavi)
+
+    def statistiche(self) -> Dict[str, Any]:
+        """
+        Restituisce contatori e occupazione della cache.
+
+        Returns:
+            Dict[str, Any]: hit/miss/evizioni, hit ratio e byte/voci per livello.
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._contatori)
+            hit = stats["hit_memoria"] + stats["hit_prerender"] + stats["hit_disco"]
+            totale = hit + stats["miss"]
+            stats["hit_ratio"] = (hit / totale) if totale else 0.0
+            stats["voci_prerender"] = len(self._prerender)
+            stats["voci_memoria"] = len(self._memoria)
+            stats["bytes_memoria"] = self._memoria_bytes
+            stats["voci_disco"] = len(self._indice_disco)
+            stats["bytes_disco"] = self._disco_bytes
+        return stats
+
+    # --- Livello in memoria ---
+
+    def _inserisci_memoria(self, chiave: str, audio: bytes, adesso: float) -> None:
+        if len(audio) > self.max_memoria_bytes:
+            return
+        if chiave in self._memoria:
+            self._rimuovi_memoria(chiave)
+        self._memoria[chiave] = (audio, adesso)
+        self._memoria_bytes += len(audio)
+        while self._memoria_bytes > self.max_memoria_bytes and self._memoria:
+            vecchia = next(iter(self._memoria))
+            self._rimuovi_memoria(vecchia)
+            self._contatori["evizioni_memoria"] += 1
+
+    def _rimuovi_memoria(self, chiave: str) -> None:
+        audio, _ = self._memoria.pop(chiave)
+        self._memoria_bytes -= len(audio)
+
+    # --- Frasi pre-renderizzate ---
+
+    def _leggi_prerender(self, chiave: str, file: Path) -> Optional[bytes]:
+        try:
+            with open(file, "rb") as f:
+                return f.read()
+        except OSError as e:
+            self.logger.warning(f"Frase pre-renderizzata illeggibile '{file}': {e}")
+            with self._lock:
+                self._prerender.pop(chiave, None)
+            return None
+
+    # --- Livello su disco ---
+    # I metodi che toccano i file vanno chiamati senza il lock; quelli con il suffisso
+    # _indice aggiornano solo l'indice e vanno chiamati con il lock acquisito.
+
+    def _percorso(self, chiave: str) -> Path:
+        return self.cache_dir / chiave[:2] / f"{chiave}{self._ESTENSIONE}"
+
+    def _carica_indice_disco(self) -> None:
+        voci = []
+        for sottocartella in self.cache_dir.iterdir():
+            if not sottocartella.is_dir():
+                continue
+            try:
+                file = list(os.scandir(sottocartella))
+            except OSError:
+                continue
+            for voce in file:
+                if not voce.name.endswith(self._ESTENSIONE):
+                    continue
+                try:
+                    st = voce.stat()
+                except OSError:
+                    continue  # rimosso nel frattempo da un altro processo che condivide la directory
+                voci.append((voce.name[:-len(self._ESTENSIONE)], st.st_size, st.st_mtime))
+        # L'unico ordinamento: da qui in poi le scritture si accodano in fondo all'indice
+        for chiave, dimensione, mtime in sorted(voci, key=lambda v: v[2]):
+            self._indice_disco[chiave] = (dimensione, mtime)
+            self._disco_bytes += dimensione
+        self.logger.info(f"Indice cache su disco caricato: {len(self._indice_disco)} voci, {self._disco_bytes} B.")
+        self._elimina_file(self._evinci_indice())
+
+    def _leggi_disco(self, chiave: str, adesso: float) -> Optional[bytes]:
+        if self.cache_dir is None:
+            return None
+        percorso = self._percorso(chiave)
+        with self._lock:
+            voce = self._indice_disco.get(chiave)
+        if voce is None:
+            # La directory può essere condivisa da più processi (server multi-worker):
+            # una voce scritta da un altro processo è valida anche se non è nel nostro indice
+            try:
+                st = os.stat(percorso)
+            except OSError:
+                return None
+            voce = (st.st_size, st.st_mtime)
+            with self._lock:
+                if chiave not in self._indice_disco:
+                    self._aggiungi_indice(chiave, voce)
+        if adesso - voce[1] > self.max_eta_secondi:
+            with self._lock:
+                rimossa = self._togli_indice(chiave, voce)
+                self._contatori["scadute"] += 1
+            if rimossa:
+                self._elimina_file([chiave])
+            return None
+        try:
+            with open(percorso, "rb") as f:
+                return f.read()
+        except OSError as e:
+            self.logger.warning(f"Voce di cache illeggibile '{chiave}': {e}")
+            with self._lock:
+                rimossa = self._togli_indice(chiave, voce)
+            if rimossa:
+                self._elimina_file([chiave])
+            return None
+
+    def _scrivi_disco(self, chiave: str, audio: bytes, adesso: float) -> None:
+        if self.cache_dir is None or len(audio) > self.max_disco_bytes:
+            return
+        percorso = self._percorso(chiave)
+        temporaneo = percorso.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            percorso.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporaneo, "wb") as f:
+                f.write(audio)
+            os.replace(temporaneo, percorso)
+        except OSError as e:
+            self.logger.warning(f"Impossibile scrivere la voce di cache '{chiave}': {e}")
+            return
+        with self._lock:
+            self._togli_indice(chiave)
+            self._aggiungi_indice(chiave, (len(audio), adesso))
+            evinte = self._evinci_indice()
+        self._elimina_file(evinte)
+
+    def _aggiungi_indice(self, chiave: str, voce: Tuple[int, float]) -> None:
+        self._indice_disco[chiave] = voce
+        self._disco_bytes += voce[0]
+
+    def _togli_indice(self, chiave: str, voce: Optional[Tuple[int, float]] = None) -> bool:
+        """Toglie la voce dall'indice; con 'voce' solo se non è stata riscritta nel frattempo."""
+        attuale = self._indice_disco.get(chiave)
+        if attuale is None or (voce is not None and attuale != voce):
+            return False
+        del self._indice_disco[chiave]
+        self._disco_bytes -= attuale[0]
+        return True
+
+    def _evinci_indice(self) -> List[str]:
+        # Toglie le voci più vecchie (in testa all'indice) finché non si rientra nel limite
+        evinte = []
+        while self._disco_bytes > self.max_disco_bytes and self._indice_disco:
+            chiave, (dimensione, _) = self._indice_disco.popitem(last=False)
+            self._disco_bytes -= dimensione
+            self._contatori["evizioni_disco"] += 1
+            evinte.append(chiave)
+        return evinte
+
+    def _elimina_file(self, chiavi: List[str]) -> None:
+        for chiave in chiavi:
+            try:
+                os.remove(self._percorso(chiave))
+            except OSError:
+                pass
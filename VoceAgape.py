@@ -191,8 +191,9 @@ class VoceAgape:
 
     def parla(self, testo: str, play_audio: bool = True) -> bool:
         """
-        Sintetizza e riproduce il testo. Se Google TTS è in uso, lo fa in modo sincrono.
-        Se pyttsx3 è in uso, lo fa in un thread separato per evitare di bloccare l'UI.
+        Sintetizza e riproduce il testo. Con Google TTS la sintesi è sincrona e l'audio, tenuto
+        in memoria, viene accodato al riproduttore: il metodo ritorna senza attendere la fine
+        della riproduzione. Con pyttsx3 la pronuncia avviene in un thread separato.
 
         Args:
             testo (str): Il testo da pronunciare.
@@ -207,8 +208,9 @@ class VoceAgape:
 
         if self.use_google and self.google_engine:
             self._LOGGER.info("Utilizzo Google Cloud TTS per la pronuncia.")
-            # GoogleSpeaker gestisce già il salvataggio e la riproduzione in modo sincrono
-            return self.google_engine.parla(testo, play_audio=play_audio)
+            # Niente file condiviso: ogni frase accodata ha il proprio buffer, così la frase
+            # successiva non sovrascrive quella ancora in coda o in riproduzione
+            return self.google_engine.parla(testo, output_file=None, play_audio=play_audio) is not None
         
         elif self.pyttsx3_engine:
             if self._pyttsx3_voice_thread and self._pyttsx3_voice_thread.is_alive():
@@ -235,14 +237,15 @@ class VoceAgape:
     def stop_parla(self) -> bool:
         """
         Tenta di fermare la riproduzione vocale in corso.
-        Funziona solo con pyttsx3. Google TTS è asincrono e non può essere interrotto.
+        Con Google TTS ferma l'audio in riproduzione e scarta quello in coda.
 
         Returns:
             bool: True se la riproduzione è stata interrotta, False se non supportato o fallito.
         """
-        if self.use_google:
-            self._LOGGER.info("Stop non supportato per Google Cloud TTS (sincrono).")
-            return False
+        if self.use_google and self.google_engine:
+            risultato = self.google_engine.interrompi_riproduzione()
+            self._LOGGER.info(f"Riproduzione Google TTS interrotta: {risultato}")
+            return risultato["interrotto"] or risultato["scartati"] > 0
         
         if self.pyttsx3_engine:
             try:
@@ -1,8 +1,16 @@
 from GoogleSpeaker import GoogleSpeaker # Assicurati che GoogleSpeaker sia accessibile
+from SynthesisCache import SynthesisCache
+from ArchivioAudio import ArchivioAudio
+from formati_audio import unisci_audio
+from AudioStorage import AudioStorage
+from PianificatoreSintesi import PianificatoreSintesi, SintesiRifiutata
+from PoliticaChiamate import PoliticaChiamate, ScadenzaSuperata
+from prerender_frasi import CARTELLA_PREDEFINITA, NOME_MANIFEST
+from metriche import DURATA_FASE, RICHIESTE, IN_CORSO
 import logging
-from typing import Optional, Dict, Any
-import uuid
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, Tuple, List
 from pathlib import Path
 import sys # Importato per la configurazione del logger
 
@@ -14,7 +22,14 @@ class VoiceAI:
     """
 
     def __init__(self, voce: str = 'femminile', lingua: str = 'it', velocita: int = 100,
-                 output_dir: str = "storage/audio"):
+                 output_dir: str = "storage/audio", cache_dir: Optional[str] = "storage/cache",
+                 usa_cache: bool = True, in_memoria: bool = False, archivia: bool = True,
+                 max_eta_audio_giorni: Optional[float] = 30,
+                 max_bytes_audio: Optional[int] = 2 * 1024 * 1024 * 1024,
+                 multi_processo: bool = False, pianificatore: Optional[PianificatoreSintesi] = None,
+                 politica: Optional[PoliticaChiamate] = None,
+                 manifest_prerender: Optional[str] = f"{CARTELLA_PREDEFINITA}/{NOME_MANIFEST}",
+                 riproduzione_locale: bool = True):
         """
         Inizializza l'istanza di VoiceAI.
 
@@ -22,26 +37,58 @@ class VoiceAI:
             voce (str): Il genere della voce predefinito ('femminile' o 'maschile').
             lingua (str): Il codice della lingua predefinito ('it' o 'en').
             velocita (int): La velocità di riproduzione predefinita in percentuale (es. 100 per normale).
-            output_dir (str): La directory base dove salvare i file audio e testo.
+            output_dir (str): La directory base dove salvare i file audio e testo (suddivisi per giorno).
+            cache_dir (Optional[str]): Directory della cache audio su disco (None = solo memoria).
+            usa_cache (bool): Se True, le sintesi ripetute vengono servite dalla cache senza chiamare Google.
+            in_memoria (bool): Se True, sintesi e riproduzione non passano dal disco: l'audio resta in memoria
+                               e i file MP3/TXT vengono scritti in background (se archivia è True).
+            archivia (bool): Se False, in modalità in memoria non viene salvato nessun file.
+            max_eta_audio_giorni (Optional[float]): Età oltre la quale i file salvati vengono eliminati (None = mai).
+            max_bytes_audio (Optional[int]): Occupazione massima dei file salvati (None = nessun limite).
+            multi_processo (bool): True se altri processi (worker dello stesso server) condividono
+                                   output_dir e cache_dir.
+            pianificatore (Optional[PianificatoreSintesi]): Controllo di ammissione delle chiamate a Google
+                                   (priorità e quota di caratteri); None = nessun limite.
+            politica (Optional[PoliticaChiamate]): Timeout, ritentativi e hedging delle chiamate a Google;
+                                   None = politica predefinita (ritentativi, nessun hedging).
+            manifest_prerender (Optional[str]): Manifest delle frasi pre-renderizzate (voice_cli.py prerender)
+                                   da servire dalla cache, se il file esiste.
+            riproduzione_locale (bool): Se False l'audio non viene mai riprodotto (play_audio è ignorato):
+                                   va disattivata quando più processi condividono lo stesso altoparlante.
         """
         self.logger = logging.getLogger("VoiceAI")
+        self.riproduzione_locale = riproduzione_locale
         self.output_directory = Path(output_dir)
+        self.cache: Optional[SynthesisCache] = SynthesisCache(cache_dir=cache_dir) if usa_cache else None
+        if self.cache is not None and manifest_prerender and Path(manifest_prerender).is_file():
+            self.cache.carica_manifest(manifest_prerender)
+        self.storage = AudioStorage(output_dir, max_eta_giorni=max_eta_audio_giorni, max_bytes=max_bytes_audio,
+                                    condiviso=multi_processo)
+        self.in_memoria = in_memoria
+        self.archivio: Optional[ArchivioAudio] = ArchivioAudio(dopo_scrittura=self.storage.registra) if archivia else None
+        self.pianificatore = pianificatore
+        self.politica = politica
 
         try:
             # Inizializza GoogleSpeaker con i parametri di default
-            self.vocal_engine = GoogleSpeaker(voce=voce, lingua=lingua)
+            self.vocal_engine = self._crea_motore(voce, lingua)
             self.vocal_engine.set_velocita(velocita)
-            
-            # Crea la directory di output se non esiste
-            self.output_directory.mkdir(parents=True, exist_ok=True)
             self.logger.info(f"✅ VoiceAI (Google) initialized. Output directory: '{self.output_directory}'")
         except Exception as e:
             self.logger.critical(f"❌ Critical error during GoogleSpeaker initialization: {e}", exc_info=True)
             # Rilancia l'eccezione perché l'oggetto non può funzionare senza il motore vocale
             raise
 
-    def sintetizza_voce(self, testo: str, voce: Optional[str] = None, 
-                        velocita: Optional[int] = None, play_audio: bool = True) -> Dict[str, Any]:
+    def _crea_motore(self, voce: str, lingua: str) -> GoogleSpeaker:
+        """Crea il motore vocale (sovrascritto dalle varianti che usano un motore diverso)."""
+        return GoogleSpeaker(voce=voce, lingua=lingua, cache=self.cache, pianificatore=self.pianificatore,
+                             politica=self.politica)
+
+    def sintetizza_voce(self, testo: str, voce: Optional[str] = None,
+                        velocita: Optional[int] = None, play_audio: bool = True,
+                        lingua: Optional[str] = None, formato: Optional[str] = None,
+                        sample_rate: Optional[int] = None, effetti: Optional[List[str]] = None,
+                        priorita: Optional[str] = None, scadenza: Optional[float] = None) -> Dict[str, Any]:
         """
         Sintetizza un dato testo in voce, salva l'audio e il testo, e opzionalmente riproduce l'audio.
 
@@ -52,87 +99,342 @@ class VoiceAI:
             velocita (Optional[int]): Velocità di riproduzione in percentuale per questa sintesi.
                                      Se None, usa il default dell'istanza.
             play_audio (bool): Se True, riproduce l'audio dopo la sintesi.
+            lingua (Optional[str]): Codice della lingua per questa sintesi (es. 'it', 'en').
+                                    Se None, usa il default dell'istanza.
+            formato (Optional[str]): Formato audio ('mp3', 'ogg_opus', 'linear16', 'mulaw'). Se None, MP3.
+            sample_rate (Optional[int]): Frequenza di campionamento in Hz. Se None, quella predefinita del formato.
+            effetti (Optional[List[str]]): Profili effetti audio di Google (es. 'telephony-class-application').
+            priorita (Optional[str]): Classe di priorità verso la quota di Google ('interattiva', 'normale',
+                                      'bulk'). Se None, 'normale'.
+            scadenza (Optional[float]): Istante time.monotonic() entro cui serve l'audio (es. dal timeout
+                                        della richiesta HTTP). Se None, nessuna scadenza.
 
         Returns:
             Dict[str, Any]: Un dizionario contenente lo stato dell'operazione, un messaggio,
-                            e il percorso del file audio in caso di successo.
+                            e il percorso del file audio in caso di successo. Se la sintesi è
+                            rifiutata per quota, 'retry_after' indica i secondi dopo cui riprovare;
+                            se la scadenza è trascorsa, 'scaduta' è True.
+        """
+        with IN_CORSO.in_corso():
+            return self._sintetizza_voce(testo, voce, velocita, play_audio and self.riproduzione_locale, lingua,
+                                         priorita=priorita,
+                                         scadenza=scadenza,
+                                         opzioni_audio={"formato": formato, "sample_rate": sample_rate,
+                                                        "effetti": effetti})
+
+    def sintetizza_audio(self, testo: str, voce: Optional[str] = None, velocita: Optional[int] = None,
+                         lingua: Optional[str] = None, formato: Optional[str] = None,
+                         sample_rate: Optional[int] = None, effetti: Optional[List[str]] = None,
+                         priorita: Optional[str] = None, scadenza: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Come sintetizza_voce, ma senza riproduzione e restituendo l'audio nella chiave 'audio' (bytes),
+        senza rileggerlo dal disco. Il salvataggio su file, se attivo, avviene in background.
+
+        Returns:
+            Dict[str, Any]: Il dizionario di sintetizza_voce, con in più 'audio' in caso di successo.
         """
+        with IN_CORSO.in_corso():
+            return self._sintetizza_voce(testo, voce, velocita, False, lingua, includi_audio=True,
+                                         priorita=priorita, scadenza=scadenza, opzioni_audio={"formato": formato, "sample_rate": sample_rate,
+                                                        "effetti": effetti})
+
+    def _sintetizza_voce(self, testo: str, voce: Optional[str], velocita: Optional[int],
+                         play_audio: bool, lingua: Optional[str], includi_audio: bool = False,
+                         priorita: Optional[str] = None, scadenza: Optional[float] = None,
+                         opzioni_audio: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        inizio = time.perf_counter()
         if not testo or not testo.strip():
             self.logger.warning("⚠️ Attempted to synthesize an empty or whitespace-only text.")
+            RICHIESTE.labels(esito="testo_non_valido").inc()
             return {"success": False, "message": "Empty or invalid text provided."}
 
-        # Salva lo stato corrente del motore vocale per ripristinarlo
-        original_voce = self.vocal_engine.voce
-        original_lingua = self.vocal_engine.lingua # Potrebbe essere utile anche la lingua
-        original_velocita = self.vocal_engine.velocita
-
-        # Imposta i parametri specifici per questa sintesi, se forniti
-        # Nota: La lingua è impostata dalla voce, quindi set_voce gestisce entrambe
-        if voce:
-            # Qui si potrebbe passare anche la lingua se fosse un parametro di sintetizza_voce
-            # Per ora, la lingua resta quella di default dell'istanza
-            self.vocal_engine.set_voce(voce, self.vocal_engine.lingua)
-        if velocita:
-            self.vocal_engine.set_velocita(velocita)
+        # Parametri per questa sintesi, risolti senza modificare il motore condiviso
+        try:
+            spec = self.vocal_engine.crea_spec(voce=voce or None, lingua=lingua or None, velocita=velocita or None,
+                                               priorita=priorita, scadenza=scadenza, **(opzioni_audio or {}))
+        except ValueError as e:
+            self.logger.warning(f"⚠️ Invalid audio options: {e}")
+            RICHIESTE.labels(esito="parametri_non_validi").inc()
+            return {"success": False, "message": str(e)}
+        DURATA_FASE.labels(fase="validazione").observe(time.perf_counter() - inizio)
+        estensione = spec.formato_audio.estensione
 
-        # Genera nomi di file univoci basati su timestamp e UUID
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_id = uuid.uuid4().hex[:6]
-        filename_base = f"agape_{timestamp}_{unique_id}"
+        if self.in_memoria or includi_audio:
+            try:
+                audio = self.vocal_engine.parla(testo, output_file=None, play_audio=play_audio, spec=spec)
+            except SintesiRifiutata as e:
+                return self._sintesi_rifiutata(e)
+            except ScadenzaSuperata as e:
+                return self._scadenza_superata(e)
+            return self._risultato_in_memoria(testo, audio, includi_audio, estensione)
 
-        mp3_path = self.output_directory / f"{filename_base}.mp3"
-        txt_path = self.output_directory / f"{filename_base}.txt"
+        mp3_path, txt_path = self._nuovi_percorsi(estensione)
 
         try:
             # Salva il testo originale nel file TXT
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(testo)
+            with DURATA_FASE.labels(fase="scrittura_txt").cronometra():
+                with open(txt_path, "w", encoding="utf-8") as f:
+                    f.write(testo)
             self.logger.info(f"Testo originale salvato in: {txt_path}")
         except IOError as e: # Cattura errori specifici di I/O
             self.logger.error(f"❌ Error saving text file '{txt_path}': {e}", exc_info=True)
-            # Ripristina lo stato originale in caso di errore prima del TTS
-            self.vocal_engine.set_voce(original_voce, original_lingua) # Assumendo che set_voce gestisca anche la lingua
-            self.vocal_engine.set_velocita(int(original_velocita * 100)) # Converto float in int per set_velocita
+            RICHIESTE.labels(esito="errore_txt").inc()
             return {"success": False, "message": f"Error saving text file: {e}"}
         except Exception as e:
             self.logger.error(f"❌ An unexpected error occurred while saving text file: {e}", exc_info=True)
-            self.vocal_engine.set_voce(original_voce, original_lingua)
-            self.vocal_engine.set_velocita(int(original_velocita * 100))
+            RICHIESTE.labels(esito="errore_txt").inc()
             return {"success": False, "message": f"Unexpected error: {e}"}
 
 
         # Esegue la sintesi vocale tramite GoogleSpeaker
-        success = self.vocal_engine.parla(testo, output_file=str(mp3_path), play_audio=play_audio)
-
-        # Ripristina i parametri originali del motore vocale
-        self.vocal_engine.set_voce(original_voce, original_lingua)
-        self.vocal_engine.set_velocita(int(original_velocita * 100))
+        try:
+            success = self.vocal_engine.parla(testo, output_file=str(mp3_path), play_audio=play_audio, spec=spec)
+        except SintesiRifiutata as e:
+            txt_path.unlink(missing_ok=True)
+            return self._sintesi_rifiutata(e)
+        except ScadenzaSuperata as e:
+            txt_path.unlink(missing_ok=True)
+            return self._scadenza_superata(e)
 
+        self.storage.registra(mp3_path, txt_path)
         if success:
             self.logger.info(f"✅ Synthesis completed. Audio: {mp3_path}, Text: {txt_path}")
+            RICHIESTE.labels(esito="successo").inc()
             return {"success": True, "message": "Speech synthesis completed.", "audio_file": str(mp3_path)}
         else:
             self.logger.error(f"❌ Speech synthesis failed for text: '{testo[:50]}...'")
+            RICHIESTE.labels(esito="errore_sintesi").inc()
+            return {"success": False, "message": "Speech synthesis failed."}
+
+    def _sintesi_rifiutata(self, errore: SintesiRifiutata) -> Dict[str, Any]:
+        """Risposta di una sintesi rifiutata per quota: il server la traduce in 429 con Retry-After."""
+        self.logger.warning(f"⚠️ Synthesis rejected: {errore} Retry after {errore.retry_after} s.")
+        RICHIESTE.labels(esito="rifiutata").inc()
+        return {"success": False, "message": str(errore), "retry_after": errore.retry_after}
+
+    def _scadenza_superata(self, errore: ScadenzaSuperata) -> Dict[str, Any]:
+        """Risposta di una sintesi non conclusa entro la scadenza: il server la traduce in 504."""
+        self.logger.warning(f"⚠️ Synthesis deadline exceeded: {errore}")
+        RICHIESTE.labels(esito="scaduta").inc()
+        return {"success": False, "message": str(errore), "scaduta": True}
+
+    def _risultato_in_memoria(self, testo: str, audio: Optional[bytes], includi_audio: bool,
+                              estensione: str = ".mp3") -> Dict[str, Any]:
+        """Costruisce la risposta di una sintesi in memoria e ne accoda l'archiviazione."""
+        if audio is None:
+            self.logger.error(f"❌ Speech synthesis failed for text: '{testo[:50]}...'")
+            RICHIESTE.labels(esito="errore_sintesi").inc()
             return {"success": False, "message": "Speech synthesis failed."}
 
+        risultato: Dict[str, Any] = {"success": True, "message": "Speech synthesis completed.",
+                                     "audio_bytes": len(audio)}
+        if self.archivio is not None:
+            mp3_path, txt_path = self._nuovi_percorsi(estensione)
+            if self.archivio.salva(testo, audio, mp3_path, txt_path):
+                risultato["audio_file"] = str(mp3_path)
+        if includi_audio:
+            risultato["audio"] = audio
+        self.logger.info(f"✅ Synthesis completed in memory ({len(audio)} bytes).")
+        RICHIESTE.labels(esito="successo").inc()
+        return risultato
+
+    def sintetizza_batch(self, richieste: List[Dict[str, Any]], max_paralleli: int = 4,
+                         play_audio: bool = False) -> List[Dict[str, Any]]:
+        """
+        Sintetizza più testi in parallelo (al massimo max_paralleli alla volta).
+        Gli elementi identici (stesso testo normalizzato e stessi parametri voce risolti)
+        vengono sintetizzati una sola volta e condividono il risultato.
+
+        Args:
+            richieste (List[Dict[str, Any]]): Elementi con chiavi 'testo' e, opzionali, 'voce',
+                                              'velocita', 'lingua', 'formato', 'sample_rate', 'effetti',
+                                              'priorita' (predefinita 'bulk').
+            max_paralleli (int): Numero massimo di sintesi contemporanee.
+            play_audio (bool): Se True, riproduce ogni audio dopo la sintesi.
+
+        Returns:
+            List[Dict[str, Any]]: Un risultato per elemento, nello stesso ordine dell'input,
+                                  nel formato di sintetizza_voce.
+        """
+        gruppi = self._gruppi_batch(richieste)
+        self.logger.info(f"Batch di {len(richieste)} elementi: {len(gruppi)} sintesi distinte, parallelismo {max_paralleli}.")
+
+        def esegui(indice: int) -> Dict[str, Any]:
+            try:
+                return self.sintetizza_voce(**self._argomenti_batch(richieste[indice], play_audio))
+            except Exception as e:
+                self.logger.error(f"❌ Batch item {indice} failed: {e}", exc_info=True)
+                return {"success": False, "message": f"Unexpected error: {e}"}
+
+        risultati: List[Optional[Dict[str, Any]]] = [None] * len(richieste)
+        with ThreadPoolExecutor(max_workers=max(1, max_paralleli), thread_name_prefix="VoiceAIBatch") as executor:
+            futures = {executor.submit(esegui, indici[0]): indici for indici in gruppi}
+            for future, indici in futures.items():
+                risultato = future.result()
+                for indice in indici:
+                    risultati[indice] = dict(risultato)
+        return risultati
+
+    def _gruppi_batch(self, richieste: List[Dict[str, Any]]) -> List[List[int]]:
+        """Indici degli elementi equivalenti (stesso testo normalizzato e stessa spec), gruppo per gruppo."""
+        gruppi: Dict[Tuple[str, Any], List[int]] = {}
+        for indice, richiesta in enumerate(richieste):
+            testo = richiesta.get("testo") or ""
+            try:
+                spec = self.vocal_engine.crea_spec(voce=richiesta.get("voce") or None,
+                                                   lingua=richiesta.get("lingua") or None,
+                                                   velocita=richiesta.get("velocita") or None,
+                                                   formato=richiesta.get("formato"),
+                                                   sample_rate=richiesta.get("sample_rate"),
+                                                   effetti=richiesta.get("effetti"),
+                                                   priorita=richiesta.get("priorita") or "bulk")
+            except (TypeError, ValueError):
+                spec = indice  # non valido: elaborato da solo, sintetizza_voce riporterà l'errore
+            gruppi.setdefault((SynthesisCache.normalizza_testo(testo), spec), []).append(indice)
+        return list(gruppi.values())
+
+    @staticmethod
+    def _argomenti_batch(richiesta: Dict[str, Any], play_audio: bool) -> Dict[str, Any]:
+        """Argomenti di sintetizza_voce per un elemento del batch (priorità predefinita 'bulk')."""
+        return {"testo": richiesta.get("testo") or "", "voce": richiesta.get("voce"),
+                "velocita": richiesta.get("velocita"), "play_audio": play_audio,
+                "lingua": richiesta.get("lingua"), "formato": richiesta.get("formato"),
+                "sample_rate": richiesta.get("sample_rate"), "effetti": richiesta.get("effetti"),
+                "priorita": richiesta.get("priorita") or "bulk"}
+
+    def sintetizza_voce_stream(self, testo: str, voce: Optional[str] = None,
+                               velocita: Optional[int] = None, lingua: Optional[str] = None,
+                               formato: Optional[str] = None,
+                               sample_rate: Optional[int] = None,
+                               effetti: Optional[List[str]] = None,
+                               priorita: Optional[str] = None,
+                               scadenza: Optional[float] = None) -> Iterator[bytes]:
+        """
+        Sintetizza il testo a blocchi e restituisce l'audio man mano che ogni blocco è pronto,
+        senza riprodurlo. Testo e audio completo vengono comunque salvati come in sintetizza_voce,
+        ma solo a stream concluso (in modalità in memoria, in background).
+
+        Args:
+            testo (str): Il testo da sintetizzare.
+            voce (Optional[str]): Genere della voce per questa sintesi. Se None, usa il default dell'istanza.
+            velocita (Optional[int]): Velocità in percentuale per questa sintesi. Se None, usa il default.
+            lingua (Optional[str]): Codice della lingua per questa sintesi. Se None, usa il default.
+            formato, sample_rate, effetti: Opzioni audio, come in sintetizza_voce.
+            priorita (Optional[str]): Classe di priorità verso la quota di Google, come in sintetizza_voce.
+            scadenza (Optional[float]): Istante time.monotonic() entro cui serve l'intero audio.
+
+        Yields:
+            bytes: L'audio di un blocco, nell'ordine del testo.
+
+        Raises:
+            ValueError: Se il testo è vuoto o le opzioni audio non sono valide.
+            SintesiRifiutata: Se la sintesi di un blocco è rifiutata per quota.
+            ScadenzaSuperata: Se la scadenza trascorre prima della sintesi di un blocco.
+            Exception: Errori di I/O o di Google TTS durante la sintesi.
+        """
+        if not testo or not testo.strip():
+            self.logger.warning("⚠️ Attempted to synthesize an empty or whitespace-only text.")
+            raise ValueError("Empty or invalid text provided.")
+
+        spec = self.vocal_engine.crea_spec(voce=voce or None, lingua=lingua or None, velocita=velocita or None,
+                                           formato=formato, sample_rate=sample_rate, effetti=effetti,
+                                           priorita=priorita, scadenza=scadenza)
+        formato_audio = spec.formato_audio
+
+        # I file vengono scritti solo a stream concluso: se la sintesi fallisce o il client
+        # si disconnette non restano file parziali fuori dal conteggio dello storage
+        parti = []
+        for audio in self.vocal_engine.sintetizza_stream(testo, spec=spec):
+            parti.append(audio)
+            yield audio
+
+        audio_path, txt_path = self._nuovi_percorsi(formato_audio.estensione)
+        if self.in_memoria:
+            if self.archivio is not None:
+                self.archivio.salva(testo, unisci_audio(parti, formato_audio), audio_path, txt_path)
+            return
+        self._salva_stream(testo, unisci_audio(parti, formato_audio), audio_path, txt_path)
+        self.logger.info(f"✅ Streaming synthesis completed. Audio: {audio_path}, Text: {txt_path}")
+
+    def _salva_stream(self, testo: str, audio: bytes, audio_path: Path, txt_path: Path) -> None:
+        """Scrive testo e audio completo di uno stream concluso e li registra nello storage."""
+        txt_path.write_text(testo, encoding="utf-8")
+        audio_path.write_bytes(audio)
+        self.storage.registra(audio_path, txt_path)
+
+    def _nuovi_percorsi(self, estensione: str = ".mp3") -> Tuple[Path, Path]:
+        """Genera percorsi audio/TXT univoci (timestamp e UUID) nella cartella del giorno corrente."""
+        return self.storage.nuovi_percorsi(estensione)
+
     def stop_sintesi(self) -> Dict[str, Any]:
         """
-        Tenta di fermare una sintesi vocale in corso.
-        Nota: L'API di Google TTS è sincrona e non supporta l'interruzione di una sintesi già avviata.
-        Questo metodo serve principalmente per compatibilità con eventuali futuri motori vocali.
+        Ferma l'audio in riproduzione e scarta quello in coda.
+        Nota: la richiesta a Google TTS già inviata non può essere annullata; l'audio
+        prodotto viene comunque salvato, ma non più riprodotto se era in coda.
+
+        Returns:
+            Dict[str, Any]: Un dizionario con l'esito e il numero di elementi scartati/interrotti.
+        """
+        risultato = self.vocal_engine.interrompi_riproduzione()
+        self.logger.info(f"⏹️ Riproduzione interrotta: {risultato}")
+        return {"success": True, "message": "Riproduzione interrotta.", **risultato}
+
+    def salta_audio(self) -> Dict[str, Any]:
+        """Interrompe solo l'audio in riproduzione e passa al successivo in coda."""
+        interrotto = self.vocal_engine.player.salta()
+        return {"success": True, "interrotto": interrotto}
+
+    def svuota_coda_audio(self) -> Dict[str, Any]:
+        """Scarta l'audio in coda senza interrompere quello in riproduzione."""
+        return {"success": True, "scartati": self.vocal_engine.player.svuota()}
+
+    def stato_riproduzione(self) -> Dict[str, Any]:
+        """Restituisce lo stato della coda di riproduzione."""
+        return self.vocal_engine.player.stato()
+
+    def riscalda(self) -> None:
+        """
+        Apre la connessione con Google con una sintesi minima (vedi GoogleSpeaker.riscalda),
+        così la prima richiesta non paga handshake e configurazione del canale.
+        """
+        self.vocal_engine.riscalda()
+
+    def statistiche_cache(self) -> Dict[str, Any]:
+        """
+        Restituisce i contatori della cache di sintesi (hit, miss, evizioni, occupazione),
+        quelli della coalescenza delle sintesi identiche contemporanee e i ritentativi
+        e duplicati (hedge) delle chiamate a Google.
+
+        Returns:
+            Dict[str, Any]: Un dizionario con lo stato dell'operazione e le statistiche.
+        """
+        contatori = {"coalescenza": self.vocal_engine.coalescenza.statistiche(),
+                     "chiamate_google": self.vocal_engine.politica.statistiche()}
+        if self.cache is None:
+            return {"success": False, "message": "Synthesis cache disabled.", **contatori}
+        return {"success": True, "cache": self.cache.statistiche(), **contatori}
+
+    def statistiche_archivio(self) -> Dict[str, Any]:
+        """
+        Restituisce l'occupazione dei file MP3/TXT salvati e i limiti di ritenzione.
 
         Returns:
-            Dict[str, Any]: Un dizionario indicante lo stato dell'operazione.
+            Dict[str, Any]: Un dizionario con lo stato dell'operazione e le statistiche.
         """
-        self.logger.info("ℹ️ Stop operation called. Google TTS is synchronous and does not support stopping in-progress synthesis.")
-        return {"success": False, "message": "Stop not supported for Google TTS (synchronous API)."}
+        return {"success": True, "archivio": self.storage.statistiche()}
 
     def cleanup(self) -> None:
         """
         Esegue operazioni di pulizia per l'istanza di VoiceAI.
-        Attualmente, non ci sono risorse persistenti da liberare per GoogleSpeaker.
+        Ferma l'audio in riproduzione e completa i salvataggi in background ancora in coda;
+        il riproduttore, condiviso dal processo, resta attivo.
         """
-        self.logger.info("🧹 VoiceAI cleanup completed. No persistent engine resources to clear for GoogleSpeaker.")
+        self.vocal_engine.interrompi_riproduzione()
+        if self.archivio is not None:
+            self.archivio.chiudi()
+            self.archivio = None
+        self.storage.chiudi()
+        self.logger.info("🧹 VoiceAI cleanup completed.")
 
 
 # --- Esempio di Utilizzo ---
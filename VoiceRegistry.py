@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+# Preferenze di voce per lingua e genere. Se la voce è presente nel catalogo di Google
+# viene usata questa; se il catalogo non è disponibile (nessuna rete/credenziali)
+# queste voci costituiscono il catalogo stesso.
+VOCI_PREFERITE: Dict[str, Dict[str, Dict[str, str]]] = {
+    'it': {
+        'default': {'code': 'it-IT', 'name': 'it-IT-Wavenet-C'}
+    },
+    'en': {
+        'femminile': {'code': 'en-US', 'name': 'en-US-Neural2-J'},
+        'maschile': {'code': 'en-US', 'name': 'en-US-Neural2-I'}
+    },
+    'fr': {
+        'femminile': {'code': 'fr-FR', 'name': 'fr-FR-Neural2-B'},
+        'maschile': {'code': 'fr-FR', 'name': 'fr-FR-Neural2-D'}
+    },
+    'es': {
+        'femminile': {'code': 'es-ES', 'name': 'es-ES-Neural2-A'},
+        'maschile': {'code': 'es-ES', 'name': 'es-ES-Neural2-C'}
+    },
+    # Finché Google non offre voci igbo si usa l'inglese; quando il catalogo
+    # conterrà voci 'ig-*' verranno scelte automaticamente quelle
+    'ig': {'femminile': {'code': 'en-US', 'name': 'en-US-Neural2-J'},
+           'maschile': {'code': 'en-US', 'name': 'en-US-Neural2-I'}}
+}
+
+LINGUA_FALLBACK = 'it'
+GENERI = {'femminile': 'FEMALE', 'maschile': 'MALE'}
+
+# Ordine di preferenza delle famiglie di voci; quelle non elencate vengono dopo.
+# Le famiglie escluse non supportano speaking_rate o tutte le codifiche.
+_RANGO_FAMIGLIA = {'Neural2': 0, 'Wavenet': 1, 'News': 2, 'Standard': 3}
+_FAMIGLIE_ESCLUSE = ('Chirp', 'Journey', 'Studio', 'Polyglot')
+
+
+@dataclass(frozen=True)
+class VoceRisolta:
+    """
+    Esito della risoluzione di (voce, lingua) in una voce Google concreta.
+
+    Attributes:
+        voce (str): Genere effettivo ('femminile' o 'maschile').
+        lingua (str): Lingua effettiva (es. 'it').
+        codice_lingua (str): Codice BCP-47 da inviare a Google (es. 'it-IT').
+        nome_voce (Optional[str]): Nome della voce Google (es. 'it-IT-Wavenet-C').
+        con_fallback (bool): True se è stata scelta una lingua o un genere diverso da quello richiesto.
+    """
+    voce: str
+    lingua: str
+    codice_lingua: str
+    nome_voce: Optional[str]
+    con_fallback: bool = False
+
+
+class VoiceRegistry:
+    """
+    Catalogo delle voci di Google TTS e risoluzione di (voce, lingua) nella voce da usare.
+
+    Il catalogo viene da list_voices() ed è salvato su disco con un TTL: ai riavvii
+    successivi non serve chiamare Google. Scaduto il TTL il catalogo viene aggiornato
+    in background, continuando a servire quello precedente. Le combinazioni (voce, lingua)
+    risolte restano in una cache LRU di dimensione_cache elementi: le richieste ripetute
+    sono una lettura da dizionario, e lingue arbitrarie dai client non fanno crescere la memoria.
+
+    Attributes:
+        logger (logging.Logger): Logger per la classe.
+        cache_file (Optional[Path]): File JSON del catalogo (None = nessuna persistenza).
+        ttl_secondi (float): Validità del catalogo salvato.
+    """
+
+    _predefinito: Optional["VoiceRegistry"] = None
+    _lock_predefinito = threading.Lock()
+
+    def __init__(self, cache_file: Optional[str] = "storage/cache/voci_google.json",
+                 ttl_secondi: float = 24 * 3600,
+                 elenca_voci: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+                 dimensione_cache: int = 256):
+        self.logger = logging.getLogger("VoiceRegistry")
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.ttl_secondi = ttl_secondi
+        self._elenca_voci = elenca_voci or self._elenca_voci_google
+
+        self._lock = threading.Lock()
+        self._catalogo: Optional[List[Dict[str, Any]]] = None
+        self._aggiornato = 0.0
+        self._aggiornamento_in_corso = False
+        self._risolte: "OrderedDict[Tuple[str, str], VoceRisolta]" = OrderedDict()
+        self._dimensione_cache = dimensione_cache
+        self._lock_risolte = threading.Lock()
+
+    @classmethod
+    def predefinito(cls) -> "VoiceRegistry":
+        """Restituisce il registro condiviso dal processo."""
+        with cls._lock_predefinito:
+            if cls._predefinito is None:
+                cls._predefinito = cls(cache_file=os.getenv("VOICE_CATALOGO_FILE", "storage/cache/voci_google.json"))
+            return cls._predefinito
+
+    def risolvi(self, voce: str, lingua: str) -> VoceRisolta:
+        """
+        Risolve genere e lingua richiesti nella voce Google da usare.
+        Una lingua senza voci (né preferenze) ricade su 'it'; un genere non disponibile
+        ricade su una voce dell'altro genere della stessa lingua.
+
+        Args:
+            voce (str): Genere richiesto ('femminile' o 'maschile').
+            lingua (str): Codice della lingua richiesta (es. 'it', 'en').
+
+        Returns:
+            VoceRisolta: La voce risolta (memorizzata nella cache LRU per le chiamate successive).
+        """
+        chiave = (voce, lingua)
+        with self._lock_risolte:
+            risolta = self._risolte.get(chiave)
+            if risolta is not None:
+                self._risolte.move_to_end(chiave)
+        if risolta is not None:
+            if time.time() - self._aggiornato > self.ttl_secondi:
+                self._aggiorna_in_background()
+            return risolta
+
+        catalogo = self._catalogo_corrente()
+        risolta = self._risolvi(voce, lingua, catalogo)
+        if risolta.con_fallback:
+            self.logger.warning(f"Voce '{voce}'/lingua '{lingua}' non disponibile: uso {risolta.nome_voce} "
+                                f"({risolta.codice_lingua}, {risolta.voce}).")
+        with self._lock_risolte:
+            self._risolte[chiave] = risolta
+            if len(self._risolte) > self._dimensione_cache:
+                self._risolte.popitem(last=False)
+        return risolta
+
+    def lingue(self) -> List[str]:
+        """Restituisce le lingue (codici a due lettere) con almeno una voce disponibile."""
+        catalogo = self._catalogo_corrente()
+        lingue = {codice.split("-")[0].lower() for v in catalogo for codice in v["language_codes"]}
+        return sorted(lingue | set(VOCI_PREFERITE))
+
+    def statistiche(self) -> Dict[str, Any]:
+        """Restituisce numero di voci, età del catalogo e combinazioni già risolte."""
+        return {
+            "voci": len(self._catalogo or []),
+            "eta_catalogo_secondi": round(time.time() - self._aggiornato, 1) if self._aggiornato else None,
+            "combinazioni_risolte": len(self._risolte),
+        }
+
+    # --- Catalogo ---
+
+    def _catalogo_corrente(self) -> List[Dict[str, Any]]:
+        if self._catalogo is None:
+            with self._lock:
+                if self._catalogo is None:
+                    self._carica()
+        return self._catalogo
+
+    def _carica(self) -> None:
+        """Carica il catalogo dal disco se valido, altrimenti da Google; in ultima istanza dalle preferenze."""
+        salvato = self._leggi_file()
+        if salvato is not None and time.time() - salvato[0] <= self.ttl_secondi:
+            self._imposta(salvato[1], salvato[0])
+            self.logger.info(f"Catalogo voci caricato da '{self.cache_file}' ({len(salvato[1])} voci).")
+            return
+        try:
+            voci = self._elenca_voci()
+            self._imposta(voci, time.time())
+            self._scrivi_file(voci)
+            self.logger.info(f"Catalogo voci scaricato da Google TTS ({len(voci)} voci).")
+        except Exception as e:
+            if salvato is not None:
+                self.logger.warning(f"list_voices non disponibile ({e}): uso il catalogo salvato, anche se scaduto.")
+                self._imposta(salvato[1], salvato[0])
+            else:
+                self.logger.warning(f"list_voices non disponibile ({e}): uso solo le voci preferite predefinite.")
+                self._imposta([], time.time())
+
+    def _imposta(self, voci: List[Dict[str, Any]], aggiornato: float) -> None:
+        self._catalogo = voci
+        self._aggiornato = aggiornato
+        with self._lock_risolte:
+            self._risolte = OrderedDict()
+
+    def _aggiorna_in_background(self) -> None:
+        with self._lock:
+            if self._aggiornamento_in_corso:
+                return
+            self._aggiornamento_in_corso = True
+
+        def aggiorna():
+            try:
+                voci = self._elenca_voci()
+                with self._lock:
+                    self._imposta(voci, time.time())
+                self._scrivi_file(voci)
+                self.logger.info(f"Catalogo voci aggiornato ({len(voci)} voci).")
+            except Exception as e:
+                # Si riprova alla prossima scadenza del TTL
+                self._aggiornato = time.time()
+                self.logger.warning(f"Aggiornamento del catalogo voci fallito: {e}")
+            finally:
+                self._aggiornamento_in_corso = False
+
+        threading.Thread(target=aggiorna, name="VoiceRegistry", daemon=True).start()
+
+    @staticmethod
+    def _elenca_voci_google() -> List[Dict[str, Any]]:
+        from google.cloud import texttospeech
+        risposta = texttospeech.TextToSpeechClient().list_voices()
+        return [{
+            "name": v.name,
+            "language_codes": list(v.language_codes),
+            "ssml_gender": getattr(v.ssml_gender, "name", str(v.ssml_gender)),
+        } for v in risposta.voices]
+
+    def _leggi_file(self) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        if self.cache_file is None or not self.cache_file.exists():
+            return None
+        try:
+            dati = json.loads(self.cache_file.read_text(encoding="utf-8"))
+            return float(dati["aggiornato"]), list(dati["voci"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Catalogo voci '{self.cache_file}' non leggibile: {e}")
+            return None
+
+    def _scrivi_file(self, voci: List[Dict[str, Any]]) -> None:
+        if self.cache_file is None:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # Il file può essere condiviso da più processi: temporaneo distinto e rename atomico
+            temporaneo = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+            temporaneo.write_text(json.dumps({"aggiornato": time.time(), "voci": voci}), encoding="utf-8")
+            os.replace(temporaneo, self.cache_file)
+        except OSError as e:
+            self.logger.warning(f"Impossibile salvare il catalogo voci in '{self.cache_file}': {e}")
+
+    # --- Risoluzione ---
+
+    @staticmethod
+    def _rango(voce: Dict[str, Any], codice_preferito: Optional[str]) -> Tuple[int, int, str]:
+        famiglia = voce["name"].split("-")[2] if voce["name"].count("-") >= 3 else ""
+        regione = 0 if codice_preferito and codice_preferito in voce["language_codes"] else 1
+        return regione, _RANGO_FAMIGLIA.get(famiglia, len(_RANGO_FAMIGLIA)), voce["name"]
+
+    def _risolvi(self, voce: str, lingua: str, catalogo: List[Dict[str, Any]]) -> VoceRisolta:
+        con_fallback = False
+        if voce not in GENERI:
+            voce, con_fallback = 'femminile', True
+
+        preferite = VOCI_PREFERITE.get(lingua, {})
+        nomi_catalogo = {v["name"] for v in catalogo}
+        candidate = [v for v in catalogo
+                     if any(c.lower().split("-")[0] == lingua for c in v["language_codes"])
+                     and not any(f in v["name"] for f in _FAMIGLIE_ESCLUSE)]
+
+        # 1. Voce preferita, se appartiene alla lingua ed esiste (o se il catalogo non è disponibile)
+        preferita = preferite.get(voce) or preferite.get('default')
+        if preferita and (not catalogo or preferita['name'] in nomi_catalogo) \
+                and (not candidate or preferita['code'].split("-")[0] == lingua):
+            return VoceRisolta(voce, lingua, preferita['code'], preferita['name'], con_fallback)
+
+        # 2. Migliore voce del catalogo per lingua e genere (poi di qualsiasi genere)
+        if candidate:
+            codice_preferito = next((p['code'] for p in preferite.values()), None)
+            stesso_genere = [v for v in candidate if v.get("ssml_gender") == GENERI[voce]]
+            scelta = min(stesso_genere or candidate, key=lambda v: self._rango(v, codice_preferito))
+            codice = next((c for c in scelta["language_codes"] if c == codice_preferito),
+                          scelta["language_codes"][0])
+            # Come per le lingue con un'unica voce preferita, il genere mancante non è un errore
+            return VoceRisolta(voce, lingua, codice, scelta["name"], con_fallback)
+
+        # 3. Preferenza verso un'altra lingua (es. 'ig' -> inglese)
+        if preferita:
+            return VoceRisolta(voce, lingua, preferita['code'], preferita['name'], con_fallback)
+
+        if lingua == LINGUA_FALLBACK:
+            raise ValueError(f"Nessuna voce disponibile per la lingua di fallback '{LINGUA_FALLBACK}'.")
+        self.logger.warning(f"Lingua '{lingua}' non supportata. Impostata a '{LINGUA_FALLBACK}' come fallback.")
+        risolta = self._risolvi(voce, LINGUA_FALLBACK, catalogo)
+        return VoceRisolta(risolta.voce, risolta.lingua, risolta.codice_lingua, risolta.nome_voce, True)
@@ -1,12 +1,17 @@
 
 import speech_recognition as sr
-import requests
-import time
 import logging
-import threading
+import time
 import os
 import sys
-from langdetect import detect
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from CatturaMicrofono import CatturaMicrofono, SorgenteBuffer
+from DispatcherSintesi import DispatcherSintesi
+from RilevatoreParolaChiave import FREQUENZA_CAMPIONAMENTO, RilevatoreParolaChiave
+from RilevatoreLingua import RilevatoreLingua
+from RilevatoreVoce import RilevatoreVoce
+from StadioPipeline import StadioPipeline, collega, riepilogo
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
@@ -14,74 +19,145 @@ logger = logging.getLogger(__name__)
 
 KEYWORD = os.getenv("VOICE_ASSISTANT_KEYWORD", "agape").lower()
 TRIGGER_LISTEN_TIMEOUT = float(os.getenv("VOICE_ASSISTANT_TRIGGER_TIMEOUT", 5))
-PHRASE_RECORD_DURATION = float(os.getenv("VOICE_ASSISTANT_PHRASE_DURATION", 4))
+# Endpointing: la frase si chiude dopo questo silenzio, e comunque dopo la durata massima
+END_SILENCE_SECONDS = float(os.getenv("VOICE_ASSISTANT_END_SILENCE", 0.6))
+PHRASE_MAX_SECONDS = float(os.getenv("VOICE_ASSISTANT_PHRASE_MAX", 15))
 SYNTHESIS_ENDPOINT = os.getenv("VOICE_ASSISTANT_SYNTHESIS_ENDPOINT", "http://localhost:3003/voce/sintetizza")
+# Modello della parola chiave creato con --iscrivi (o con RilevatoreParolaChiave.py iscrivi)
+KEYWORD_MODEL = os.getenv("VOICE_ASSISTANT_KEYWORD_MODEL", "parola_chiave.pkl")
+KEYWORD_ENROLL_REPETITIONS = int(os.getenv("VOICE_ASSISTANT_KEYWORD_REPETITIONS", 4))
+# Audio tenuto in memoria dalla cattura continua e audio incluso prima e dopo ogni enunciato
+CAPTURE_BUFFER_SECONDS = float(os.getenv("VOICE_ASSISTANT_BUFFER_SECONDS", 30))
+PRE_ROLL_SECONDS = float(os.getenv("VOICE_ASSISTANT_PRE_ROLL", 0.3))
+# Elementi in attesa tra uno stadio e l'altro e intervallo (secondi) del log delle statistiche
+PIPELINE_QUEUE_SIZE = int(os.getenv("VOICE_ASSISTANT_QUEUE_SIZE", 4))
+PIPELINE_STATS_INTERVAL = float(os.getenv("VOICE_ASSISTANT_STATS_INTERVAL", 60))
+# Invio alla sintesi: richieste contemporanee, timeout (secondi), frasi in attesa e loro età massima.
+# Il server riproduce l'audio quando la sintesi finisce: con più richieste contemporanee le frasi
+# possono essere pronunciate fuori ordine
+DISPATCH_WORKERS = int(os.getenv("VOICE_ASSISTANT_DISPATCH_WORKERS", 1))
+CONNECT_TIMEOUT = float(os.getenv("VOICE_ASSISTANT_CONNECT_TIMEOUT", 3))
+READ_TIMEOUT = float(os.getenv("VOICE_ASSISTANT_READ_TIMEOUT", 30))
+MAX_PENDING_PHRASES = int(os.getenv("VOICE_ASSISTANT_MAX_PENDING", 4))
+MAX_PHRASE_AGE = float(os.getenv("VOICE_ASSISTANT_MAX_PHRASE_AGE", 10))
 
 recognizer = sr.Recognizer()
 microfono = sr.Microphone()
+cattura = CatturaMicrofono(microfono, durata_buffer=CAPTURE_BUFFER_SECONDS)
+# Blocco del buffer entro cui deve iniziare la frase dopo una parola chiave pronunciata da sola
+frase_attesa_entro: Optional[int] = None
+# Creato da main_loop: i lavoratori partono solo quando l'assistente è in ascolto
+dispatcher: Optional[DispatcherSintesi] = None
 
-def detect_language(text):
+@dataclass(frozen=True)
+class Frammento:
+    """Un enunciato letto dal buffer: audio, fine del parlato (secondi nell'audio) e blocchi del parlato."""
+    audio: sr.AudioData
+    fine_parlato: float
+    inizio: int
+    fine: int
+
+def carica_rilevatore():
+    """Rilevatore locale della parola chiave; None se non è stato iscritto (si usa il riconoscimento nel cloud)."""
+    if not os.path.exists(KEYWORD_MODEL):
+        logger.warning(f"⚠️ Modello '{KEYWORD_MODEL}' assente: la parola chiave viene riconosciuta nel cloud. "
+                       f"Eseguire '{sys.argv[0]} --iscrivi' per il rilevamento locale.")
+        return None
     try:
-        lang = detect(text)
-        logger.info(f"🌍 Lingua rilevata: {lang}")
-        return lang
+        return RilevatoreParolaChiave.carica(KEYWORD_MODEL)
     except Exception as e:
-        logger.warning(f"❌ Errore rilevamento lingua: {e}")
-        return "it"  # fallback
+        logger.error(f"❌ Modello della parola chiave non leggibile: {e}")
+        return None
+
+rilevatore = carica_rilevatore()
+# Profili caricati all'avvio: la prima frase non paga il caricamento
+rilevatore_lingua = RilevatoreLingua()
+
+def detect_language(text):
+    esito = rilevatore_lingua.rileva(text)
+    logger.info(f"🌍 Lingua rilevata: {esito.lingua} (confidenza {esito.confidenza:.2f}, {esito.metodo})")
+    return esito.lingua
 
 def synthesize_text_async(text_to_synthesize: str, lingua_rilevata: str = "it"):
-    def _send_request():
-        try:
-            logger.info(f"📤 Invio frase a sintesi vocale: '{text_to_synthesize[:50]}...' (Lingua: {lingua_rilevata})")
-            response = requests.post(SYNTHESIS_ENDPOINT, json={"testo": text_to_synthesize, "lingua": lingua_rilevata})
-            response.raise_for_status()
-            json_response = response.json()
-            if json_response.get("success"):
-                logger.info("✅ Sintesi vocale completata.")
-            else:
-                logger.error(f"❌ Fallimento sintesi: {json_response.get('message', 'Nessun messaggio')}")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Errore HTTP: {e}")
-        except ValueError:
-            logger.error("❌ Risposta JSON non valida.")
-        except Exception as e:
-            logger.exception(f"❌ Errore inaspettato durante la sintesi: {e}")
-    threading.Thread(target=_send_request, daemon=True).start()
-
-def listen_for_trigger(timeout_seconds: float = TRIGGER_LISTEN_TIMEOUT) -> bool:
-    with microfono as source:
-        try:
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            logger.info(f"🎧 In ascolto per la parola chiave '{KEYWORD}' ({timeout_seconds}s)...")
-            audio = recognizer.listen(source, timeout=timeout_seconds)
-        except sr.WaitTimeoutError:
-            logger.debug("⏳ Nessun parlato rilevato.")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Errore ascolto trigger: {e}")
-            return False
+    """Accoda la frase al dispatcher: non blocca, gli esiti arrivano nel log in ordine."""
+    dispatcher.invia(text_to_synthesize, lingua_rilevata)
+
+def attendi_enunciato(source: SorgenteBuffer, attesa_massima: Optional[float] = None,
+                      durata_massima: float = PHRASE_MAX_SECONDS) -> Optional[Frammento]:
+    """
+    Legge dal buffer il prossimo enunciato delimitato dal VAD, con PRE_ROLL_SECONDS di audio
+    prima e dopo il parlato. Restituisce None se il parlato non inizia entro attesa_massima
+    o la cattura termina.
+    """
+    vad = RilevatoreVoce(cattura.secondi_per_blocco, silenzio_finale=END_SILENCE_SECONDS,
+                         durata_massima=durata_massima, stima=cattura.stima)
+    primo = source.cursore
+    while True:
+        blocco = source.read(source.CHUNK)
+        if not blocco:
+            return None
+        enunciato = vad.aggiungi(blocco)
+        if enunciato is not None:
+            break
+        if attesa_massima is not None and not vad.in_parlato and \
+                (source.cursore - primo) * cattura.secondi_per_blocco >= attesa_massima:
+            return None
+    # Gli indici del VAD partono dal primo blocco letto
+    margine = cattura.blocchi(PRE_ROLL_SECONDS)
+    da = max(0, primo + enunciato.inizio - margine)
+    fine_parlato = primo + enunciato.fine
+    audio = cattura.estrai(da, min(primo + enunciato.decisione, fine_parlato + margine))
+    return Frammento(audio=sr.AudioData(audio, source.SAMPLE_RATE, source.SAMPLE_WIDTH),
+                     fine_parlato=(fine_parlato - da) * cattura.secondi_per_blocco,
+                     inizio=primo + enunciato.inizio, fine=fine_parlato)
+
+def listen_for_trigger(frammento: Frammento) -> Tuple[bool, Optional[sr.AudioData]]:
+    """
+    Verifica se l'enunciato contiene la parola chiave. Se dopo la parola chiave l'enunciato
+    prosegue (es. "agape, che ore sono?"), restituisce anche quel resto come frase.
+    """
+    audio = frammento.audio
+    if rilevatore is not None:
+        # Nessuna chiamata di rete: il cloud riceve solo la frase dopo la parola chiave
+        esito = rilevatore.rileva(audio.get_raw_data(convert_rate=FREQUENZA_CAMPIONAMENTO, convert_width=2))
+        logger.debug(f"🔑 Parola chiave: distanza {esito.distanza} (soglia {rilevatore.soglia:.2f}), "
+                     f"{esito.elaborazione_ms:.0f} ms.")
+        if not esito.trovata:
+            return False, None
+        logger.info(f"🗣️ Parola chiave '{KEYWORD}' rilevata.")
+        if frammento.fine_parlato - esito.fine < PRE_ROLL_SECONDS:
+            return True, None
+        inizio_frase = int(esito.fine * audio.sample_rate) * audio.sample_width
+        return True, sr.AudioData(audio.frame_data[inizio_frase:], audio.sample_rate, audio.sample_width)
     try:
         text = recognizer.recognize_google(audio, language="it-IT").lower()
         logger.info(f"🗣️ Riconosciuto: '{text}'")
-        return KEYWORD in text
+        return KEYWORD in text, None
     except sr.UnknownValueError:
         logger.debug("❌ Audio non compreso.")
-        return False
     except sr.RequestError as e:
         logger.error(f"❌ Errore Google Speech Recognition: {e}")
-        return False
-    except Exception as e:
-        logger.exception(f"❌ Errore trigger: {e}")
-        return False
+    return False, None
 
-def record_and_recognize_phrase(duration_seconds: float = PHRASE_RECORD_DURATION):
-    with microfono as source:
-        try:
-            logger.info(f"🎙️ Parla ora ({duration_seconds}s)...")
-            audio = recognizer.record(source, duration=duration_seconds)
-        except Exception as e:
-            logger.error(f"❌ Errore durante la registrazione: {e}")
-            return None
+def trigger_stage(frammento: Frammento) -> Optional[sr.AudioData]:
+    """
+    Stadio della parola chiave: restituisce l'audio della frase da riconoscere, o None.
+    Dopo una parola chiave pronunciata da sola, la frase è l'enunciato successivo, se
+    inizia entro TRIGGER_LISTEN_TIMEOUT secondi.
+    """
+    global frase_attesa_entro
+    if frase_attesa_entro is not None:
+        entro, frase_attesa_entro = frase_attesa_entro, None
+        if frammento.inizio <= entro:
+            return frammento.audio
+        logger.info("⏳ Nessuna frase dopo la parola chiave.")
+    trovata, resto = listen_for_trigger(frammento)
+    if trovata and resto is None:
+        logger.info("🎙️ Parla ora...")
+        frase_attesa_entro = frammento.fine + cattura.blocchi(TRIGGER_LISTEN_TIMEOUT)
+    return resto
+
+def recognize_phrase(audio: sr.AudioData) -> Optional[str]:
     try:
         phrase = recognizer.recognize_google(audio, language="it-IT")
         logger.info(f"✅ Frase riconosciuta: '{phrase}'")
@@ -90,26 +166,94 @@ def record_and_recognize_phrase(duration_seconds: float = PHRASE_RECORD_DURATION
         logger.warning("❌ Frase non compresa.")
     except sr.RequestError as e:
         logger.error(f"❌ Errore Google Speech Recognition: {e}")
-    except Exception as e:
-        logger.exception(f"❌ Errore riconoscimento frase: {e}")
     return None
 
+def crea_pipeline() -> List[StadioPipeline]:
+    """Stadi dopo la cattura: parola chiave, riconoscimento, lingua e invio alla sintesi."""
+    return collega(
+        StadioPipeline("trigger", trigger_stage, capacita=PIPELINE_QUEUE_SIZE),
+        StadioPipeline("riconoscimento", recognize_phrase, capacita=PIPELINE_QUEUE_SIZE),
+        StadioPipeline("lingua", lambda phrase: (phrase, detect_language(phrase)), capacita=PIPELINE_QUEUE_SIZE),
+        StadioPipeline("sintesi", lambda frase_lingua: synthesize_text_async(*frase_lingua),
+                       capacita=PIPELINE_QUEUE_SIZE),
+    )
+
+def log_pipeline(source: SorgenteBuffer, stadi: List[StadioPipeline]) -> None:
+    # Per la cattura conta quanto audio catturato attende ancora di essere letto
+    ritardo = (cattura.posizione() - source.cursore) * cattura.secondi_per_blocco
+    invio = dispatcher.statistiche() if dispatcher is not None else {}
+    logger.info(f"📊 cattura: ritardo {ritardo:.1f}s | {riepilogo(stadi)} | invio: attesa {invio.get('in_attesa', 0)}, "
+                f"rtt {invio.get('rtt_ms_medio') or '-'} ms (p95 {invio.get('rtt_ms_p95') or '-'}), "
+                f"scartate {invio.get('scartate', 0)}, unite {invio.get('unite', 0)}")
+
+def iscrivi_parola_chiave(ripetizioni: int = KEYWORD_ENROLL_REPETITIONS) -> bool:
+    """Registra più volte la sola parola chiave e salva il modello per il rilevamento locale."""
+    global rilevatore
+    registrazioni = []
+    cattura.avvia()
+    source = cattura.sorgente()
+    try:
+        while len(registrazioni) < ripetizioni and not source.esaurita:
+            logger.info(f"🎙️ Pronuncia '{KEYWORD}' ({len(registrazioni) + 1}/{ripetizioni})...")
+            frammento = attendi_enunciato(source, attesa_massima=TRIGGER_LISTEN_TIMEOUT, durata_massima=3)
+            if frammento is not None:
+                registrazioni.append(frammento.audio.get_raw_data(convert_rate=FREQUENZA_CAMPIONAMENTO,
+                                                                  convert_width=2))
+    finally:
+        cattura.ferma()
+    try:
+        rilevatore = RilevatoreParolaChiave.iscrivi(registrazioni)
+    except ValueError as e:
+        logger.error(f"❌ Iscrizione non riuscita: {e}")
+        return False
+    rilevatore.salva(KEYWORD_MODEL)
+    logger.info(f"✅ Modello della parola chiave salvato in '{KEYWORD_MODEL}'.")
+    return True
+
 def main_loop():
+    """
+    La cattura (questo thread) legge gli enunciati dal buffer e li passa agli stadi successivi,
+    ciascuno con il proprio thread e una coda limitata: mentre una frase viene riconosciuta,
+    l'enunciato successivo è già in cattura.
+    """
+    global dispatcher
     logger.info("🚀 Voice Assistant avviato. Ctrl+C per uscire.")
+    # Le risposte dell'assistente hanno la precedenza sulle sintesi massive nella quota di Google
+    dispatcher = DispatcherSintesi(SYNTHESIS_ENDPOINT, lavoratori=DISPATCH_WORKERS, timeout_connessione=CONNECT_TIMEOUT,
+                                   timeout_risposta=READ_TIMEOUT, max_in_attesa=MAX_PENDING_PHRASES,
+                                   eta_massima=MAX_PHRASE_AGE, priorita="interattiva")
+    stadi = crea_pipeline()
+    source = None
     try:
-        while True:
-            if listen_for_trigger():
-                phrase = record_and_recognize_phrase()
-                if phrase:
-                    lang = detect_language(phrase)
-                    synthesize_text_async(phrase, lang)
-            time.sleep(0.5)
+        cattura.avvia()
+        for stadio in stadi:
+            stadio.avvia()
+        source = cattura.sorgente()
+        logger.info(f"🎧 In ascolto per la parola chiave '{KEYWORD}'...")
+        ultimo_log = time.monotonic()
+        while not source.esaurita:
+            frammento = attendi_enunciato(source)
+            if frammento is not None:
+                stadi[0].inserisci(frammento)
+            if PIPELINE_STATS_INTERVAL > 0 and time.monotonic() - ultimo_log >= PIPELINE_STATS_INTERVAL:
+                log_pipeline(source, stadi)
+                ultimo_log = time.monotonic()
+        logger.error("❌ La cattura dal microfono si è interrotta.")
     except KeyboardInterrupt:
         logger.info("👋 Assistente vocale interrotto manualmente.")
     except Exception as e:
         logger.critical(f"Errore fatale nel ciclo principale: {e}", exc_info=True)
     finally:
+        cattura.ferma()
+        # Le frasi già catturate completano la pipeline
+        stadi[0].chiudi()
+        stadi[-1].attendi(timeout=10)
+        dispatcher.chiudi(timeout=READ_TIMEOUT)
+        if source is not None:
+            log_pipeline(source, stadi)
         logger.info("Voice Assistant terminato.")
 
 if __name__ == "__main__":
+    if "--iscrivi" in sys.argv[1:]:
+        sys.exit(0 if iscrivi_parola_chiave() else 1)
     main_loop()
@@ -0,0 +1,65 @@
+# Confronto dei formati di uscita di Google TTS sullo stesso testo: dimensione dell'audio,
+# tempo di sintesi e tempo di decodifica in PCM 16 bit. La decodifica avviene nel processo
+# (wave per LINEAR16, soundfile/libsndfile per gli altri formati): viene misurato solo il
+# decoder, senza l'avvio di un processo esterno che coprirebbe le differenze tra i formati.
+# Uso: python benchmark_formati.py ["testo da sintetizzare"] [ripetizioni]
+import io
+import sys
+import time
+import wave
+from typing import Optional
+from GoogleSpeaker import GoogleSpeaker
+from formati_audio import FORMATI, FormatoAudio
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+TESTO_PREDEFINITO = ("Buongiorno e benvenuti. Questo è un testo di prova per confrontare "
+                     "dimensione e tempo di decodifica dei diversi formati audio.")
+
+
+def decodifica(audio: bytes, formato_audio: FormatoAudio):
+    """Decodifica l'audio in campioni PCM 16 bit."""
+    if formato_audio.nome == "linear16":
+        # Già PCM: basta leggere i campioni dal contenitore WAV
+        with wave.open(io.BytesIO(audio)) as wav:
+            return wav.readframes(wav.getnframes())
+    return soundfile.read(io.BytesIO(audio), dtype="int16")[0]
+
+
+def tempo_decodifica(audio: bytes, formato_audio: FormatoAudio, ripetizioni: int) -> Optional[float]:
+    """Secondi medi per decodificare l'audio in PCM 16 bit (None se manca un decoder per il formato)."""
+    if formato_audio.nome != "linear16" and soundfile is None:
+        return None
+    try:
+        decodifica(audio, formato_audio)  # la prima volta carica il codec: non conta
+    except RuntimeError:  # libsndfile compilato senza il codec
+        return None
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        decodifica(audio, formato_audio)
+    return (time.perf_counter() - inizio) / ripetizioni
+
+
+def main() -> None:
+    testo = sys.argv[1] if len(sys.argv) > 1 else TESTO_PREDEFINITO
+    ripetizioni = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    speaker = GoogleSpeaker(voce='femminile', lingua='it')  # senza cache: misura la sintesi reale
+
+    print(f"{'formato':<10} {'byte':>9} {'sintesi ms':>11} {'decodifica ms':>14}")
+    for nome in FORMATI:
+        spec = speaker.crea_spec(formato=nome)
+        inizio = time.perf_counter()
+        audio = speaker.sintetizza(testo, spec=spec)
+        sintesi = time.perf_counter() - inizio
+        decodifica = tempo_decodifica(audio, spec.formato_audio, ripetizioni)
+        decodifica_ms = f"{decodifica * 1000:.1f}" if decodifica is not None else "n/d"
+        print(f"{nome:<10} {len(audio):>9} {sintesi * 1000:>11.0f} {decodifica_ms:>14}")
+    if soundfile is None:
+        print("soundfile non installato: tempi di decodifica disponibili solo per LINEAR16.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class FormatoAudio:
+    """
+    Formato di uscita supportato da Google TTS.
+
+    Attributes:
+        nome (str): Nome usato nell'API HTTP e nei parametri (es. 'ogg_opus').
+        encoding (str): Nome del valore di texttospeech.AudioEncoding.
+        mime (str): Content-Type della risposta HTTP.
+        estensione (str): Estensione dei file salvati.
+        wav (bool): True se Google restituisce un contenitore WAV (header RIFF + campioni).
+        ogg (bool): True se Google restituisce un flusso Ogg (i blocchi vanno rimultiplexati
+                    in un unico flusso logico per essere uniti).
+        sample_rate (Optional[int]): Frequenza di campionamento predefinita (None = quella della voce).
+    """
+    nome: str
+    encoding: str
+    mime: str
+    estensione: str
+    wav: bool = False
+    ogg: bool = False
+    sample_rate: Optional[int] = None
+
+
+FORMATI: Dict[str, FormatoAudio] = {
+    "mp3": FormatoAudio("mp3", "MP3", "audio/mpeg", ".mp3"),
+    # Payload più piccoli per i client web
+    "ogg_opus": FormatoAudio("ogg_opus", "OGG_OPUS", "audio/ogg", ".ogg", ogg=True),
+    # Campioni PCM: la riproduzione locale non deve decodificare nulla
+    "linear16": FormatoAudio("linear16", "LINEAR16", "audio/wav", ".wav", wav=True),
+    # Telefonia: G.711 μ-law a 8 kHz
+    "mulaw": FormatoAudio("mulaw", "MULAW", "audio/wav", ".wav", wav=True, sample_rate=8000),
+}
+FORMATO_PREDEFINITO = "mp3"
+
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+# Tipi MIME accettati nell'header Accept -> formato. Solo tipi di cui la risposta è
+# davvero un'istanza: il µ-law di Google è in un contenitore WAV, quindi audio/basic e
+# audio/pcmu (campioni grezzi) non sono negoziabili, così come audio/l16 (big-endian);
+# 'mulaw' si chiede con il parametro 'formato'.
+_MIME_FORMATO = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/ogg": "ogg_opus",
+    "audio/opus": "ogg_opus",
+    "audio/wav": "linear16",
+    "audio/x-wav": "linear16",
+    "audio/wave": "linear16",
+}
+MIME_NEGOZIABILI: Tuple[str, ...] = tuple(_MIME_FORMATO)
+
+def formato(nome: Optional[str]) -> FormatoAudio:
+    """
+    Restituisce il formato per nome (None = formato predefinito).
+
+    Raises:
+        ValueError: Se il formato non è supportato.
+    """
+    nome = (nome or FORMATO_PREDEFINITO).strip().lower()
+    if nome not in FORMATI:
+        raise ValueError(f"Formato audio non supportato: '{nome}'. Valori ammessi: {', '.join(FORMATI)}.")
+    return FORMATI[nome]
+
+
+def negozia_formato(accept: Optional[str]) -> Optional[str]:
+    """
+    Sceglie il formato dall'header HTTP Accept, rispettando i valori q.
+
+    Args:
+        accept (Optional[str]): Il valore dell'header Accept.
+
+    Returns:
+        Optional[str]: Il nome del formato; il predefinito se l'header manca o accetta qualsiasi
+        audio; None se nessun formato supportato è accettabile (risposta 406).
+    """
+    if not accept or not accept.strip():
+        return FORMATO_PREDEFINITO
+    candidati: List[Tuple[float, int, str]] = []
+    for posizione, voce in enumerate(accept.split(",")):
+        parti = [p.strip() for p in voce.split(";")]
+        mime = parti[0].lower()
+        q = 1.0
+        for parametro in parti[1:]:
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            continue
+        if mime in ("*/*", "audio/*"):
+            nome = FORMATO_PREDEFINITO
+        else:
+            nome = _MIME_FORMATO.get(mime)
+        if nome:
+            # A parità di q vince l'ordine nell'header
+            candidati.append((-q, posizione, nome))
+    return min(candidati)[2] if candidati else None
+
+
+def _dividi_wav(audio: bytes) -> Tuple[bytes, bytes]:
+    """Separa un file WAV nel chunk 'fmt ' e nei campioni del chunk 'data'."""
+    if audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return b"", audio  # già PCM senza header
+    posizione, fmt = 12, b""
+    while posizione + 8 <= len(audio):
+        identificativo, dimensione = audio[posizione:posizione + 4], struct.unpack("<I", audio[posizione + 4:posizione + 8])[0]
+        inizio = posizione + 8
+        if identificativo == b"fmt ":
+            fmt = audio[inizio:inizio + dimensione]
+        elif identificativo == b"data":
+            return fmt, audio[inizio:inizio + dimensione]
+        posizione = inizio + dimensione + (dimensione & 1)
+    return fmt, b""
+
+
+def _header_wav(fmt: bytes, dimensione_dati: int) -> bytes:
+    dimensione_riff = min(4 + 8 + len(fmt) + 8 + dimensione_dati, 0xFFFFFFFF)
+    return (b"RIFF" + struct.pack("<I", dimensione_riff) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", min(dimensione_dati, 0xFFFFFFFF)))
+
+
+# --- Ogg Opus ---
+# Ogni risposta di Google è un flusso Ogg completo (header OpusHead/OpusTags, pagine audio
+# con granule position da zero, pagina di fine). Concatenati così come sono danno un flusso
+# "concatenato" che Chrome e la maggior parte dei player web interrompono al primo link:
+# i blocchi successivi vengono quindi rimultiplexati nel flusso logico del primo.
+
+_OGG_INIZIO, _OGG_FINE = 0x02, 0x04
+
+
+def _tabella_crc_ogg() -> List[int]:
+    tabella = []
+    for byte in range(256):
+        crc = byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        tabella.append(crc & 0xFFFFFFFF)
+    return tabella
+
+
+_CRC_OGG = _tabella_crc_ogg()
+
+
+def _crc_ogg(dati: bytes) -> int:
+    crc = 0
+    for byte in dati:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_OGG[(crc >> 24) ^ byte]
+    return crc
+
+
+@dataclass
+class _PaginaOgg:
+    flag: int
+    granulo: int
+    segmenti: bytes
+    corpo: bytes
+
+    def serializza(self, seriale: int, sequenza: int) -> bytes:
+        header = (b"OggS" + bytes([0, self.flag]) + struct.pack("<qII", self.granulo, seriale, sequenza)
+                  + b"\x00\x00\x00\x00" + bytes([len(self.segmenti)]) + self.segmenti)
+        crc = _crc_ogg(header + self.corpo)
+        return header[:22] + struct.pack("<I", crc) + header[26:] + self.corpo
+
+
+def _pagine_ogg(dati: bytes) -> List[_PaginaOgg]:
+    """Divide un flusso Ogg nelle sue pagine (ValueError se non è un flusso Ogg)."""
+    pagine, posizione = [], 0
+    while posizione < len(dati):
+        if dati[posizione:posizione + 4] != b"OggS" or posizione + 27 > len(dati):
+            raise ValueError("Flusso Ogg non valido.")
+        flag = dati[posizione + 5]
+        granulo = struct.unpack("<q", dati[posizione + 6:posizione + 14])[0]
+        numero = dati[posizione + 26]
+        segmenti = dati[posizione + 27:posizione + 27 + numero]
+        inizio = posizione + 27 + numero
+        posizione = inizio + sum(segmenti)
+        if len(segmenti) != numero or posizione > len(dati):
+            raise ValueError("Flusso Ogg troncato.")
+        pagine.append(_PaginaOgg(flag, granulo, segmenti, dati[inizio:posizione]))
+    return pagine
+
+
+def _campioni_opus(pacchetto: bytes) -> int:
+    """Campioni (a 48 kHz) di un pacchetto Opus, dal byte TOC (RFC 6716, 3.1)."""
+    if not pacchetto:
+        return 0
+    configurazione, codice = pacchetto[0] >> 3, pacchetto[0] & 0x03
+    if configurazione < 12:
+        durata = (480, 960, 1920, 2880)[configurazione & 0x03]
+    elif configurazione < 16:
+        durata = (480, 960)[configurazione & 0x01]
+    else:
+        durata = (120, 240, 480, 960)[configurazione & 0x03]
+    if codice == 0:
+        trame = 1
+    elif codice < 3:
+        trame = 2
+    else:
+        trame = pacchetto[1] & 0x3F if len(pacchetto) > 1 else 0
+    return durata * trame
+
+
+class _UnioneOgg:
+    """Rimultiplexa più flussi Ogg Opus (con gli stessi parametri) in un unico flusso logico."""
+
+    def __init__(self):
+        self._seriale: Optional[int] = None
+        self._sequenza = 0
+        self._campioni = 0  # campioni decodificati nei blocchi precedenti
+        self._granulo = 0
+
+    def aggiungi(self, blocco: bytes, ultimo: bool = False) -> bytes:
+        """
+        Restituisce le pagine del blocco nel flusso unico. Solo l'ultimo blocco mantiene
+        la pagina di fine e il taglio dei campioni finali; negli altri la granule position
+        dell'ultima pagina conta tutti i campioni decodificati, come in una pagina intermedia.
+        """
+        pagine = _pagine_ogg(blocco)
+        if not pagine:
+            return b""
+        primo = self._seriale is None
+        if primo:
+            self._seriale = struct.unpack("<I", blocco[14:18])[0]
+        uscita, pacchetti, parziale, campioni = [], 0, b"", 0
+        for pagina in pagine:
+            # Le pagine di header (OpusHead e OpusTags) restano solo nel primo blocco;
+            # l'audio inizia sempre su una pagina nuova
+            header = pacchetti < 2
+            posizione = 0
+            for lunghezza in pagina.segmenti:
+                parziale += pagina.corpo[posizione:posizione + lunghezza]
+                posizione += lunghezza
+                if lunghezza < 255:
+                    if pacchetti >= 2:
+                        campioni += _campioni_opus(parziale)
+                    pacchetti, parziale = pacchetti + 1, b""
+            if header:
+                if primo:
+                    uscita.append(pagina.serializza(self._seriale, self._sequenza))
+                    self._sequenza += 1
+                continue
+            flag, granulo = pagina.flag, pagina.granulo
+            if not ultimo and flag & _OGG_FINE:
+                flag, granulo = flag & ~_OGG_FINE, campioni
+            if granulo >= 0:
+                granulo = self._granulo = self._campioni + granulo
+            uscita.append(_PaginaOgg(flag, granulo, pagina.segmenti, pagina.corpo).serializza(self._seriale, self._sequenza))
+            self._sequenza += 1
+        # Il blocco successivo prosegue dopo tutti i campioni decodificati di questo
+        self._campioni += campioni
+        return b"".join(uscita)
+
+    def fine(self) -> bytes:
+        """Pagina vuota di fine flusso (nessuna se non è stato aggiunto nessun blocco)."""
+        if self._seriale is None:
+            return b""
+        pagina = _PaginaOgg(_OGG_FINE, self._granulo, b"", b"").serializza(self._seriale, self._sequenza)
+        self._sequenza += 1
+        return pagina
+
+
+class AdattatoreStream:
+    """
+    Adatta i blocchi di un testo lungo, ricevuti uno alla volta, perché scritti o inviati
+    in sequenza formino un unico file. Per i WAV il primo blocco porta un header con
+    lunghezza 'sconosciuta' (massima, come d'uso per i WAV in streaming) e i successivi
+    solo i campioni; i blocchi Ogg vengono rimultiplexati in un solo flusso logico.
+    Dopo l'ultimo blocco va scritto anche fine().
+    """
+
+    def __init__(self, formato_audio: FormatoAudio):
+        self.formato_audio = formato_audio
+        self._primo = True
+        self._ogg = _UnioneOgg() if formato_audio.ogg else None
+
+    def adatta(self, blocco: bytes) -> bytes:
+        primo, self._primo = self._primo, False
+        if self._ogg is not None:
+            return self._ogg.aggiungi(blocco)
+        if not self.formato_audio.wav:
+            return blocco
+        fmt, campioni = _dividi_wav(blocco)
+        return _header_wav(fmt, 0xFFFFFFFF) + campioni if primo and fmt else campioni
+
+    def fine(self) -> bytes:
+        return self._ogg.fine() if self._ogg is not None else b""
+
+
+def unisci_audio(parti: List[bytes], formato_audio: FormatoAudio) -> bytes:
+    """
+    Concatena l'audio dei blocchi di un testo lungo.
+    Gli MP3 si possono concatenare così come sono; i blocchi Ogg vengono rimultiplexati
+    in un unico flusso logico; per i WAV i campioni vengono uniti sotto un solo header.
+    Accetta anche le parti già prodotte da adatta_per_stream.
+    """
+    if formato_audio.ogg:
+        if not all(parte[:4] == b"OggS" and parte[5] & _OGG_INIZIO for parte in parti[1:]):
+            return b"".join(parti)  # parti di adatta_per_stream: già un solo flusso logico
+        unione = _UnioneOgg()
+        return b"".join(unione.aggiungi(parte, ultimo=indice == len(parti) - 1) for indice, parte in enumerate(parti))
+    if not formato_audio.wav:
+        return b"".join(parti)
+    fmt, dati = b"", []
+    for parte in parti:
+        fmt_parte, campioni = _dividi_wav(parte)
+        fmt = fmt or fmt_parte
+        dati.append(campioni)
+    dati_uniti = b"".join(dati)
+    return _header_wav(fmt, len(dati_uniti)) + dati_uniti if fmt else dati_uniti
+
+
+def adatta_per_stream(blocchi: Iterable[bytes], formato_audio: FormatoAudio) -> Iterator[bytes]:
+    """Adatta i blocchi per l'invio in streaming come un unico file (vedi AdattatoreStream)."""
+    adattatore = AdattatoreStream(formato_audio)
+    for blocco in blocchi:
+        yield adattatore.adatta(blocco)
+    coda = adattatore.fine()
+    if coda:
+        yield coda
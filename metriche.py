@@ -0,0 +1,265 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Bucket (secondi) adatti a latenze da sub-millisecondo fino a decine di secondi
+BUCKET_LATENZA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                  0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(valore: str) -> str:
+    return str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatta_etichette(nomi: Sequence[str], valori: Tuple[str, ...], extra: str = "") -> str:
+    coppie = [f'{n}="{_escape(v)}"' for n, v in zip(nomi, valori)]
+    if extra:
+        coppie.append(extra)
+    return "{" + ",".join(coppie) + "}" if coppie else ""
+
+
+def _formatta_numero(valore: float) -> str:
+    if valore == float("inf"):
+        return "+Inf"
+    return repr(float(valore)) if isinstance(valore, float) else str(valore)
+
+
+class _Metrica:
+    """Base comune: gestisce nome, descrizione, etichette e figli per combinazione di etichette."""
+
+    tipo = ""
+
+    def __init__(self, nome: str, descrizione: str, etichette: Sequence[str] = ()):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self._lock = threading.Lock()
+        self._figli: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **valori: str):
+        chiave = tuple(str(valori[n]) for n in self.etichette)
+        figlio = self._figli.get(chiave)
+        if figlio is None:
+            with self._lock:
+                figlio = self._figli.setdefault(chiave, self._nuovo_figlio())
+        return figlio
+
+    def _nuovo_figlio(self):
+        raise NotImplementedError
+
+    def _predefinito(self):
+        # Metriche senza etichette: un unico figlio con chiave vuota
+        return self.labels()
+
+    def esporta(self) -> List[str]:
+        righe = [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            figli = sorted(self._figli.items())
+        for chiave, figlio in figli:
+            righe.extend(self._esporta_figlio(chiave, figlio))
+        return righe
+
+    def _esporta_figlio(self, chiave: Tuple[str, ...], figlio) -> List[str]:
+        raise NotImplementedError
+
+
+class _Valore:
+    __slots__ = ("valore", "_lock")
+
+    def __init__(self):
+        self.valore = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, quantita: float = 1.0) -> None:
+        with self._lock:
+            self.valore += quantita
+
+    def dec(self, quantita: float = 1.0) -> None:
+        with self._lock:
+            self.valore -= quantita
+
+    def set(self, valore: float) -> None:
+        self.valore = valore
+
+
+class Counter(_Metrica):
+    """Contatore monotono (es. richieste totali, byte prodotti)."""
+
+    tipo = "counter"
+
+    def _nuovo_figlio(self):
+        return _Valore()
+
+    def inc(self, quantita: float = 1.0) -> None:
+        self._predefinito().inc(quantita)
+
+    def _esporta_figlio(self, chiave, figlio) -> List[str]:
+        return [f"{self.nome}{_formatta_etichette(self.etichette, chiave)} {_formatta_numero(figlio.valore)}"]
+
+
+class Gauge(Counter):
+    """Valore istantaneo che può salire e scendere (es. richieste in corso)."""
+
+    tipo = "gauge"
+
+    def dec(self, quantita: float = 1.0) -> None:
+        self._predefinito().dec(quantita)
+
+    def set(self, valore: float) -> None:
+        self._predefinito().set(valore)
+
+    @contextmanager
+    def in_corso(self) -> Iterator[None]:
+        """Incrementa il gauge per la durata del blocco."""
+        figlio = self._predefinito()
+        figlio.inc()
+        try:
+            yield
+        finally:
+            figlio.dec()
+
+
+class _Distribuzione:
+    __slots__ = ("limiti", "conteggi", "somma", "_lock")
+
+    def __init__(self, limiti: Tuple[float, ...]):
+        self.limiti = limiti
+        self.conteggi = [0] * (len(limiti) + 1)
+        self.somma = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, valore: float) -> None:
+        indice = bisect.bisect_left(self.limiti, valore)
+        with self._lock:
+            self.conteggi[indice] += 1
+            self.somma += valore
+
+    @contextmanager
+    def cronometra(self) -> Iterator[None]:
+        """Osserva la durata (secondi) del blocco, anche se solleva un'eccezione."""
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inizio)
+
+
+class Histogram(_Metrica):
+    """Istogramma a bucket cumulativi, come richiesto dal formato di Prometheus."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, descrizione: str, etichette: Sequence[str] = (),
+                 bucket: Sequence[float] = BUCKET_LATENZA):
+        super().__init__(nome, descrizione, etichette)
+        self.bucket = tuple(sorted(bucket))
+
+    def _nuovo_figlio(self):
+        return _Distribuzione(self.bucket)
+
+    def observe(self, valore: float) -> None:
+        self._predefinito().observe(valore)
+
+    def cronometra(self):
+        return self._predefinito().cronometra()
+
+    def _esporta_figlio(self, chiave, figlio) -> List[str]:
+        with figlio._lock:
+            conteggi = list(figlio.conteggi)
+            somma = figlio.somma
+        righe, cumulato = [], 0
+        for limite, conteggio in zip(self.bucket + (float("inf"),), conteggi):
+            cumulato += conteggio
+            etichette = _formatta_etichette(self.etichette, chiave, f'le="{_formatta_numero(limite)}"')
+            righe.append(f"{self.nome}_bucket{etichette} {cumulato}")
+        etichette = _formatta_etichette(self.etichette, chiave)
+        righe.append(f"{self.nome}_sum{etichette} {_formatta_numero(somma)}")
+        righe.append(f"{self.nome}_count{etichette} {cumulato}")
+        return righe
+
+
+class RegistroMetriche:
+    """
+    Raccolta di metriche esportabile nel formato testuale di Prometheus (version 0.0.4).
+    Le operazioni sul percorso critico (inc/observe) costano un lock e poche operazioni aritmetiche.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metriche: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registra(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            esistente = self._metriche.get(metrica.nome)
+            if esistente is not None:
+                return esistente
+            self._metriche[metrica.nome] = metrica
+            return metrica
+
+    def counter(self, nome: str, descrizione: str, etichette: Sequence[str] = ()) -> Counter:
+        return self._registra(Counter(nome, descrizione, etichette))
+
+    def gauge(self, nome: str, descrizione: str, etichette: Sequence[str] = ()) -> Gauge:
+        return self._registra(Gauge(nome, descrizione, etichette))
+
+    def histogram(self, nome: str, descrizione: str, etichette: Sequence[str] = (),
+                  bucket: Optional[Sequence[float]] = None) -> Histogram:
+        return self._registra(Histogram(nome, descrizione, etichette, bucket or BUCKET_LATENZA))
+
+    def esporta(self) -> str:
+        with self._lock:
+            metriche = list(self._metriche.values())
+        righe: List[str] = []
+        for metrica in metriche:
+            righe.extend(metrica.esporta())
+        return "\n".join(righe) + "\n"
+
+
+# Registro condiviso dal processo (come il modulo logging, ogni componente vi registra le sue metriche)
+REGISTRO = RegistroMetriche()
+
+DURATA_FASE = REGISTRO.histogram(
+    "voce_ai_fase_durata_secondi",
+    "Durata di ciascuna fase della sintesi vocale.", ("fase",))
+RICHIESTE = REGISTRO.counter(
+    "voce_ai_richieste_total",
+    "Richieste di sintesi per esito.", ("esito",))
+AUDIO_BYTES = REGISTRO.counter(
+    "voce_ai_audio_bytes_total",
+    "Byte di audio prodotti (da Google o dalla cache).")
+CARATTERI_GOOGLE = REGISTRO.counter(
+    "voce_ai_caratteri_google_total",
+    "Caratteri inviati a Google Text-to-Speech (base della quota).")
+IN_CORSO = REGISTRO.gauge(
+    "voce_ai_richieste_in_corso",
+    "Richieste di sintesi attualmente in elaborazione.")
+TTFB_STREAM = REGISTRO.histogram(
+    "voce_ai_stream_ttfb_secondi",
+    "Tempo dalla ricezione della richiesta al primo byte audio inviato in streaming.")
+CACHE = REGISTRO.gauge(
+    "voce_ai_cache",
+    "Contatori e occupazione della cache di sintesi, aggiornati a ogni lettura di /metrics.", ("statistica",))
+COALESCENZA = REGISTRO.counter(
+    "voce_ai_coalescenza_total",
+    "Sintesi Google eseguite ('chiamate') o risparmiate perché identiche a una già in corso ('risparmiate').",
+    ("esito",))
+PIANIFICATORE = REGISTRO.counter(
+    "voce_ai_pianificatore_total",
+    "Chiamate a Google ammesse o rifiutate dal pianificatore, e rifiuti per quota da parte di Google.",
+    ("esito", "priorita"))
+CHIAMATE_GOOGLE = REGISTRO.counter(
+    "voce_ai_chiamate_google_total",
+    "Ritentativi, duplicati (hedge) avviati e vinti e scadenze superate nelle chiamate a Google.", ("esito",))
+AVVIO = REGISTRO.gauge(
+    "voce_ai_avvio_secondi",
+    "Durata delle fasi di avvio del processo (import, motore, riscaldamento, pronto, prima richiesta).", ("fase",))
+
+
+def aggiorna_metriche_cache(statistiche: Dict[str, float]) -> None:
+    """Copia le statistiche di SynthesisCache.statistiche() nel gauge voce_ai_cache."""
+    for nome, valore in statistiche.items():
+        CACHE.labels(statistica=nome).set(valore)
@@ -0,0 +1,168 @@
+import csv
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from validazione_richieste import valida_richiesta_sintesi
+
+logger = logging.getLogger("prerender_frasi")
+
+CARTELLA_PREDEFINITA = "storage/prerender"
+NOME_MANIFEST = "manifest.jsonl"
+# Ogni quante frasi completate viene registrato l'avanzamento
+_PASSO_AVANZAMENTO = 50
+
+
+def leggi_corpus(percorso: str) -> List[Dict[str, Any]]:
+    """
+    Legge un corpus di frasi da pre-renderizzare. Ogni voce ha 'testo' e, opzionali,
+    'voce', 'lingua', 'velocita', 'formato', 'sample_rate', 'effetti' e 'id'.
+
+    Formati accettati, in base all'estensione:
+    - .jsonl: un oggetto (o una stringa) per riga; righe vuote e commenti '#' ignorati;
+    - .csv: intestazione con i nomi dei campi; le celle vuote usano i valori predefiniti;
+    - .json: una lista di oggetti o stringhe, oppure un profilo come admin.json
+      (vengono lette le frasi in riconoscimento.frasi_chiave).
+
+    Raises:
+        ValueError: Se l'estensione non è supportata o il contenuto non è valido.
+        OSError: Se il file non è leggibile.
+    """
+    estensione = Path(percorso).suffix.lower()
+    with open(percorso, encoding="utf-8", newline="") as f:
+        if estensione == ".jsonl":
+            voci = [json.loads(riga) for riga in f if riga.strip() and not riga.lstrip().startswith("#")]
+        elif estensione == ".csv":
+            voci = [{campo: valore for campo, valore in riga.items() if campo and valore not in (None, "")}
+                    for riga in csv.DictReader(f)]
+        elif estensione == ".json":
+            dati = json.load(f)
+            voci = dati.get("riconoscimento", {}).get("frasi_chiave", []) if isinstance(dati, dict) else dati
+        else:
+            raise ValueError(f"Formato del corpus non supportato: '{estensione}' (usare .jsonl, .csv o .json).")
+    if not isinstance(voci, list):
+        raise ValueError(f"Il corpus '{percorso}' non contiene una lista di frasi.")
+    return [{"testo": voce} if isinstance(voce, str) else voce for voce in voci]
+
+
+def leggi_manifest(percorso: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Restituisce le voci del manifest per chiave di sintesi, solo se il file audio esiste ancora.
+    Le righe incomplete (es. processo interrotto durante la scrittura) vengono ignorate.
+    """
+    voci: Dict[str, Dict[str, Any]] = {}
+    if not percorso.exists():
+        return voci
+    with open(percorso, encoding="utf-8") as f:
+        for riga in f:
+            try:
+                voce = json.loads(riga)
+            except ValueError:
+                continue
+            if isinstance(voce, dict) and voce.get("chiave") and (percorso.parent / voce.get("file", "")).is_file():
+                voci[voce["chiave"]] = voce
+    return voci
+
+
+def prerenderizza(corpus: List[Dict[str, Any]], motore, cartella: str = CARTELLA_PREDEFINITA,
+                  max_paralleli: int = 8, priorita: str = "bulk") -> Dict[str, int]:
+    """
+    Sintetizza in parallelo le frasi del corpus e le registra nel manifest della cartella.
+
+    Il manifest (manifest.jsonl) ha una riga per frase con parametri, chiave di sintesi e
+    file audio, ed è scritto man mano: un'esecuzione interrotta riprende da dove si era
+    fermata. Le frasi già nel manifest e i duplicati nel corpus vengono saltati. Le chiavi
+    sono quelle della cache di sintesi, quindi al riavvio il server serve queste frasi
+    senza chiamare Google (SynthesisCache.carica_manifest).
+
+    Args:
+        corpus (List[Dict[str, Any]]): Le frasi, come restituite da leggi_corpus().
+        motore (GoogleSpeaker): Il motore che risolve i parametri (crea_spec) e sintetizza.
+        cartella (str): Cartella dei file audio e del manifest.
+        max_paralleli (int): Sintesi contemporanee.
+        priorita (str): Classe di priorità verso la quota di Google.
+
+    Returns:
+        Dict[str, int]: Frasi totali, saltate (già presenti o duplicate), sintetizzate,
+                        fallite e non valide.
+    """
+    cartella_audio = Path(cartella)
+    cartella_audio.mkdir(parents=True, exist_ok=True)
+    manifest = cartella_audio / NOME_MANIFEST
+    presenti = leggi_manifest(manifest)
+    esito = {"totale": len(corpus), "saltate": 0, "sintetizzate": 0, "fallite": 0, "non_valide": 0}
+
+    da_sintetizzare: Dict[str, Tuple[Dict[str, Any], Dict[str, Any], Any]] = {}
+    for indice, voce in enumerate(corpus):
+        parametri, errore = valida_richiesta_sintesi(voce)
+        if errore is None:
+            try:
+                spec = motore.crea_spec(voce=parametri["voce"], lingua=parametri["lingua"],
+                                        velocita=parametri["velocita"], formato=parametri["formato"],
+                                        sample_rate=parametri["sample_rate"], effetti=parametri["effetti"],
+                                        priorita=priorita)
+            except ValueError as e:
+                errore = str(e)
+        if errore is not None:
+            logger.warning(f"⚠️ Frase {indice} non valida: {errore}")
+            esito["non_valide"] += 1
+            continue
+        chiave = motore.chiave_sintesi(parametri["testo"], spec)
+        if chiave in presenti or chiave in da_sintetizzare:
+            esito["saltate"] += 1
+            continue
+        da_sintetizzare[chiave] = (voce, parametri, spec)
+
+    logger.info(f"Pre-render: {len(da_sintetizzare)} frasi da sintetizzare, {esito['saltate']} già presenti "
+                f"o duplicate, {esito['non_valide']} non valide.")
+    if not da_sintetizzare:
+        return esito
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_paralleli), thread_name_prefix="Prerender")
+    try:
+        futures = {executor.submit(_renderizza, motore, cartella_audio, chiave, parametri["testo"], spec): chiave
+                   for chiave, (_, parametri, spec) in da_sintetizzare.items()}
+        # Il manifest è scritto solo da questo thread, una riga per frase appena completata
+        with open(manifest, "a", encoding="utf-8") as out:
+            for completate, future in enumerate(as_completed(futures), 1):
+                chiave = futures[future]
+                voce, parametri, spec = da_sintetizzare[chiave]
+                try:
+                    file, dimensione = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Sintesi fallita per '{parametri['testo'][:50]}': {e}")
+                    esito["fallite"] += 1
+                else:
+                    out.write(json.dumps({
+                        "id": voce.get("id"), "testo": parametri["testo"], "voce": spec.voce,
+                        "lingua": spec.lingua, "velocita": parametri["velocita"], "formato": spec.formato,
+                        "nome_voce": spec.nome_voce, "chiave": chiave, "file": file, "bytes": dimensione,
+                    }, ensure_ascii=False) + "\n")
+                    out.flush()
+                    esito["sintetizzate"] += 1
+                if completate % _PASSO_AVANZAMENTO == 0 or completate == len(futures):
+                    logger.info(f"Pre-render: {completate}/{len(futures)} ({esito['fallite']} fallite).")
+    except KeyboardInterrupt:
+        # Le frasi già completate restano nel manifest: la prossima esecuzione riprende da lì
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
+    return esito
+
+
+def _renderizza(motore, cartella: Path, chiave: str, testo: str, spec) -> Tuple[str, int]:
+    """Sintetizza una frase (se il file non esiste già) e restituisce percorso relativo e dimensione."""
+    relativo = Path(chiave[:2]) / f"{chiave}{spec.formato_audio.estensione}"
+    percorso = cartella / relativo
+    if not percorso.is_file() or percorso.stat().st_size == 0:
+        audio = motore.sintetizza(testo, spec)
+        percorso.parent.mkdir(parents=True, exist_ok=True)
+        temporaneo = percorso.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temporaneo, "wb") as f:
+            f.write(audio)
+        os.replace(temporaneo, percorso)
+    return relativo.as_posix(), percorso.stat().st_size
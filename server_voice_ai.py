@@ -1,9 +1,20 @@
-from flask import Flask, request, jsonify
+import time
+_INIZIO_PROCESSO = time.perf_counter()  # riferimento per i tempi di avvio (/pronto, /metrics)
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from VoiceAI import VoiceAI  # Deve contenere la logica di sintesi vocale
+from AvvioMotore import AvvioMotore, MotoreNonPronto
+from PianificatoreSintesi import PianificatoreSintesi, SintesiRifiutata
+from PoliticaChiamate import PoliticaChiamate, ScadenzaSuperata
+from validazione_richieste import valida_richiesta_sintesi, valida_richiesta_batch
+from RilevatoreLingua import rilevatore_condiviso
+from formati_audio import FORMATI, MIME_NEGOZIABILI, negozia_formato
+from metriche import REGISTRO, TTFB_STREAM, aggiorna_metriche_cache
 import logging
 import os
 import subprocess
+import threading
+from collections import deque
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -11,20 +22,147 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
 logger = logging.getLogger("VoiceAPI")
 
-# --- Inizializzazione App Flask ---
-app = Flask(__name__)
-CORS(app)
+# --- Endpoint (registrati sull'app da crea_app) ---
+api = Blueprint("voce_ai", __name__)
 
 # --- Inizializzazione del modulo vocale ---
-try:
-    voce_ai = VoiceAI()
-    logger.info("✅ VoiceAI inizializzato correttamente.")
-except Exception as e:
-    logger.critical(f"❌ Errore critico inizializzando VoiceAI: {e}")
-    raise SystemExit("Impossibile avviare il server vocale. Controllare VoiceAI.py.")
+# VOICE_IN_MEMORIA=true: nessun file in linea con la richiesta (MP3/TXT salvati in background,
+# o mai se VOICE_ARCHIVIA=false). Utile su dispositivi con scheda SD.
+IN_MEMORIA = os.getenv("VOICE_IN_MEMORIA", "False").lower() == "true"
+ARCHIVIA = os.getenv("VOICE_ARCHIVIA", "True").lower() == "true"
+# Ritenzione dei file salvati in storage/audio (0 = nessun limite)
+MAX_GIORNI_AUDIO = float(os.getenv("VOICE_AUDIO_MAX_GIORNI", 30))
+MAX_MB_AUDIO = int(os.getenv("VOICE_AUDIO_MAX_MB", 2048))
+
+# Secondi che una richiesta attende la creazione del motore prima di ricevere 503
+ATTESA_AVVIO = float(os.getenv("VOICE_ATTESA_AVVIO", 30))
+
+# Processi worker (0 = uno per core) e richieste contemporanee per worker. Con più di un worker
+# il server usa gunicorn in modalità pre-fork; ogni worker crea il proprio motore dopo il fork.
+WORKERS = int(os.getenv("VOICE_WORKERS", 1)) or os.cpu_count() or 1
+THREAD_PER_WORKER = int(os.getenv("VOICE_THREADS", 4))
+
+# Quota di Google TTS in caratteri al minuto (0 = nessun controllo), divisa tra i worker,
+# e attesa massima in coda prima di rispondere 429
+QUOTA_CARATTERI_MINUTO = int(os.getenv("VOICE_QUOTA_CARATTERI_MINUTO", 150000))
+ATTESA_QUOTA_MAX = float(os.getenv("VOICE_ATTESA_QUOTA_MAX", 10))
+
+# Scadenza massima di una richiesta di sintesi (secondi, 0 = nessuna); il client può ridurla
+# con l'header X-Request-Timeout. La scadenza arriva fino al timeout della chiamata gRPC.
+SCADENZA_RICHIESTA = float(os.getenv("VOICE_SCADENZA_RICHIESTA", 30))
+# Timeout di ogni tentativo verso Google, tentativi complessivi e hedging (duplicato delle
+# chiamate più lente del percentile indicato)
+TIMEOUT_GOOGLE = float(os.getenv("VOICE_TIMEOUT_GOOGLE", 15))
+TENTATIVI_GOOGLE = int(os.getenv("VOICE_TENTATIVI_GOOGLE", 3))
+HEDGING = os.getenv("VOICE_HEDGING", "False").lower() == "true"
+HEDGING_PERCENTILE = float(os.getenv("VOICE_HEDGING_PERCENTILE", 95))
+
+def _crea_pianificatore(workers: int):
+    if QUOTA_CARATTERI_MINUTO <= 0:
+        return None
+    quota = QUOTA_CARATTERI_MINUTO // max(1, workers)
+    return PianificatoreSintesi(max(1, quota), attesa_massima=ATTESA_QUOTA_MAX)
+
+def _crea_voce_ai(avvio: AvvioMotore, multi_processo: bool, workers: int):
+    # Importato qui: le librerie di Google (e la risoluzione delle credenziali) non rallentano l'avvio
+    with avvio.fase("import_motore"):
+        from VoiceAI import VoiceAI
+    # Profili di lingua caricati ora, non alla prima richiesta con 'lingua': 'auto'
+    with avvio.fase("lingua"):
+        rilevatore_condiviso()
+    return VoiceAI(in_memoria=IN_MEMORIA, archivia=ARCHIVIA,
+                   max_eta_audio_giorni=MAX_GIORNI_AUDIO or None,
+                   max_bytes_audio=MAX_MB_AUDIO * 1024 * 1024 or None,
+                   multi_processo=multi_processo,
+                   # Con più worker ognuno avrebbe la propria coda e il proprio mpg123 sullo stesso
+                   # altoparlante, e stop/salta raggiungerebbero solo il worker che risponde
+                   riproduzione_locale=not multi_processo,
+                   pianificatore=_crea_pianificatore(workers if multi_processo else 1),
+                   politica=PoliticaChiamate(timeout_tentativo=TIMEOUT_GOOGLE, max_tentativi=TENTATIVI_GOOGLE,
+                                             hedging=HEDGING, percentile_hedging=HEDGING_PERCENTILE / 100))
+
+def crea_app(multi_processo: bool = False, workers: Optional[int] = None) -> Flask:
+    """
+    Crea l'app Flask e avvia in background l'inizializzazione del motore vocale.
+
+    Va chiamata nel processo che servirà le richieste: con più worker, in ciascun worker
+    dopo il fork (mai nel processo master), così client gRPC di Google e thread di
+    riproduzione/archiviazione nascono nel processo che li usa.
+
+    Args:
+        multi_processo (bool): True se altri worker condividono directory di output e cache.
+        workers (Optional[int]): Numero di worker, tra cui è divisa la quota di Google
+                                 (se None, VOICE_WORKERS). Va indicato quando è gunicorn
+                                 a creare i worker con -w, che il processo non conosce.
+    """
+    workers = workers or WORKERS
+    if multi_processo and workers <= 1:
+        logger.warning("⚠️ multi_processo senza numero di worker (workers=N o VOICE_WORKERS=N): "
+                       "ogni worker userà l'intera quota di Google.")
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(api)
+
+    # Il server accetta connessioni subito; il motore è pronto quando /pronto risponde 200
+    avvio = AvvioMotore(lambda: _crea_voce_ai(avvio, multi_processo, workers), inizio=_INIZIO_PROCESSO)
+    app.extensions["avvio_motore"] = avvio
+    avvio.avvia()
+    avvio.registra("import_server", time.perf_counter() - _INIZIO_PROCESSO)
+    return app
+
+def _avvio() -> AvvioMotore:
+    return current_app.extensions["avvio_motore"]
+
+def _voce_ai():
+    """Il modulo vocale, attendendone l'inizializzazione al più ATTESA_AVVIO secondi."""
+    return _avvio().ottieni(timeout=ATTESA_AVVIO)
+
+@api.app_errorhandler(MotoreNonPronto)
+def motore_non_pronto(errore):
+    return jsonify({"success": False, "message": str(errore)}), 503, {"Retry-After": "5"}
+
+def _sintesi_rifiutata(messaggio: str, retry_after: int):
+    logger.warning(f"⚠️ Sintesi rifiutata per quota: {messaggio} (Retry-After {retry_after} s)")
+    return (jsonify({"success": False, "message": messaggio, "retry_after": retry_after}), 429,
+            {"Retry-After": str(retry_after)})
+
+def _scadenza_superata(messaggio: str):
+    logger.warning(f"⚠️ Sintesi non conclusa entro la scadenza: {messaggio}")
+    return jsonify({"success": False, "message": messaggio, "scaduta": True}), 504
+
+def _risposta_fallita(risultato: dict):
+    """429 con Retry-After se la sintesi è stata rifiutata per quota, 504 se è scaduta, altrimenti 500."""
+    if risultato.get("scaduta"):
+        return _scadenza_superata(risultato["message"])
+    if "retry_after" in risultato:
+        return _sintesi_rifiutata(risultato["message"], risultato["retry_after"])
+    logger.error(f"❌ Sintesi fallita: {risultato.get('message')}")
+    return jsonify(risultato), 500
+
+@api.before_request
+def _inizio_richiesta():
+    g.inizio_richiesta = time.perf_counter()
+    g.arrivo = time.monotonic()
+
+def _scadenza():
+    """Istante (time.monotonic()) entro cui la sintesi deve concludersi, o None."""
+    timeout = SCADENZA_RICHIESTA or None
+    try:
+        richiesto = float(request.headers["X-Request-Timeout"])
+        timeout = richiesto if timeout is None else min(timeout, richiesto)
+    except (KeyError, ValueError):
+        pass
+    return None if timeout is None else g.arrivo + timeout
+
+@api.after_request
+def _fine_richiesta(risposta):
+    # Solo una sintesi riuscita: un 400 di validazione o un 429 non misurano il primo servizio
+    if request.method == "POST" and request.path.startswith("/voce/sintetizza") and 200 <= risposta.status_code < 300:
+        _avvio().registra_prima_richiesta(time.perf_counter() - g.inizio_richiesta)
+    return risposta
 
 # --- Endpoints API ---
-@app.route("/", methods=["GET"])
+@api.route("/", methods=["GET"])
 def home():
     return jsonify({
         "status": "✅ Voce AI attiva",
@@ -32,61 +170,283 @@ def home():
         "versione_api": "1.0"
     }), 200
 
-@app.route("/voce/sintetizza", methods=["POST"])
+@api.route("/pronto", methods=["GET"])
+def pronto():
+    """
+    Readiness: 200 solo quando il motore vocale è creato e il riscaldamento è concluso,
+    503 durante l'avvio o se l'inizializzazione è fallita. Riporta la durata delle fasi di avvio.
+    """
+    stato = _avvio().stato()
+    if stato["pronto"]:
+        return jsonify(stato), 200
+    return jsonify(stato), 503, {"Retry-After": "2"}
+
+@api.route("/voce/sintetizza", methods=["POST"])
 def sintetizza_voce():
     """
     Richiede la sintesi vocale. Parametri accettati:
     - testo (str): Il testo da pronunciare (obbligatorio)
     - voce (str): 'maschile' o 'femminile' (opzionale)
     - velocita (int): Velocità parlato (opzionale, default 170)
+    - lingua (str): Codice lingua ('it', 'en', ...) o 'auto' per rilevarla dal testo (opzionale)
+    - formato (str): 'mp3', 'ogg_opus', 'linear16' o 'mulaw' (opzionale, default 'mp3')
+    - sample_rate (int): Frequenza di campionamento in Hz (opzionale)
+    - effetti (list): Profili effetti audio di Google (opzionale)
+    - priorita (str): 'interattiva', 'normale' o 'bulk' (opzionale, default 'normale')
+    Se la quota di Google non basta risponde 429 con l'header Retry-After; se la sintesi non si
+    conclude entro X-Request-Timeout secondi (al più VOICE_SCADENZA_RICHIESTA) risponde 504.
+    L'audio viene anche riprodotto sul server, tranne con più worker (VOICE_WORKERS > 1).
     """
     logger.info("➡️ Richiesta POST /voce/sintetizza ricevuta.")
-    data = request.get_json(silent=True)
+    parametri, errore = valida_richiesta_sintesi(request.get_json(silent=True))
+    if errore:
+        logger.warning(f"⚠️ Richiesta non valida: {errore}")
+        return jsonify({"success": False, "message": errore}), 400
 
-    if not data or "testo" not in data:
-        logger.warning("⚠️ Richiesta JSON non valida o parametro 'testo' mancante.")
-        return jsonify({
-            "success": False,
-            "message": "Parametro obbligatorio 'testo' mancante o JSON non valido."
-        }), 400
-
-    testo = data["testo"]
-    voce = data.get("voce", "femminile")
-    velocita = data.get("velocita", 170)
-
-    # Validazioni aggiuntive
-    if not isinstance(testo, str) or not testo.strip():
-        return jsonify({
-            "success": False,
-            "message": "Il testo deve essere una stringa non vuota."
-        }), 400
-
-    try:
-        velocita = int(velocita)
-        if velocita <= 0:
-            raise ValueError
-    except ValueError:
-        return jsonify({
-            "success": False,
-            "message": "Il parametro 'velocita' deve essere un numero intero positivo."
-        }), 400
+    testo = parametri["testo"]
+    voce = parametri["voce"]
+    velocita = parametri["velocita"]
+    lingua = parametri["lingua"]
 
     # Sintesi
+    voce_ai = _voce_ai()
     try:
-        risultato = voce_ai.sintetizza_voce(testo=testo, voce=voce, velocita=velocita)
+        risultato = voce_ai.sintetizza_voce(testo=testo, voce=voce, velocita=velocita, lingua=lingua,
+                                            priorita=parametri["priorita"], scadenza=_scadenza(),
+                                            **_opzioni_audio(parametri))
         if risultato.get("success"):
             logger.info("✅ Sintesi vocale completata.")
             return jsonify(risultato), 200
         else:
-            logger.error(f"❌ Sintesi fallita: {risultato.get('message')}")
-            return jsonify(risultato), 500
+            return _risposta_fallita(risultato)
     except Exception as e:
         logger.exception("❌ Errore imprevisto durante la sintesi vocale.")
         return jsonify({
             "success": False,
             "message": f"Errore interno del server: {str(e)}"
         }), 500
-@app.route("/update", methods=["POST"])
+
+def _opzioni_audio(parametri: dict) -> dict:
+    return {"formato": parametri["formato"], "sample_rate": parametri["sample_rate"],
+            "effetti": parametri["effetti"]}
+
+def _formato_risposta(parametri: dict):
+    """Formato dell'audio in risposta: quello del corpo JSON, altrimenti negoziato con l'header Accept."""
+    return parametri["formato"] or negozia_formato(request.headers.get("Accept"))
+
+def _formato_non_accettabile():
+    return jsonify({"success": False,
+                    "message": f"Nessun formato audio accettabile. Supportati: {', '.join(MIME_NEGOZIABILI)}."}), 406
+
+@api.route("/voce/sintetizza/audio", methods=["POST"])
+def sintetizza_voce_audio():
+    """
+    Come /voce/sintetizza, ma restituisce direttamente l'audio dalla memoria,
+    senza riprodurlo né rileggerlo dal disco. Il formato è 'formato' nel corpo
+    oppure viene negoziato con l'header Accept (audio/mpeg, audio/ogg, audio/wav).
+    """
+    logger.info("➡️ Richiesta POST /voce/sintetizza/audio ricevuta.")
+    parametri, errore = valida_richiesta_sintesi(request.get_json(silent=True))
+    if errore:
+        logger.warning(f"⚠️ Richiesta non valida: {errore}")
+        return jsonify({"success": False, "message": errore}), 400
+    formato = _formato_risposta(parametri)
+    if formato is None:
+        return _formato_non_accettabile()
+
+    voce_ai = _voce_ai()
+    try:
+        risultato = voce_ai.sintetizza_audio(testo=parametri["testo"], voce=parametri["voce"],
+                                             velocita=parametri["velocita"], lingua=parametri["lingua"],
+                                             priorita=parametri["priorita"],
+                                             scadenza=_scadenza(), **{**_opzioni_audio(parametri), "formato": formato})
+    except Exception as e:
+        logger.exception("❌ Errore imprevisto durante la sintesi vocale.")
+        return jsonify({"success": False, "message": f"Errore interno del server: {str(e)}"}), 500
+    if not risultato.get("success"):
+        return _risposta_fallita(risultato)
+    return Response(risultato["audio"], mimetype=FORMATI[formato].mime,
+                    headers={"Cache-Control": "no-store", "Vary": "Accept"})
+
+# Numero massimo di sintesi contemporanee per una richiesta batch
+BATCH_CONCURRENCY = int(os.getenv("VOICE_BATCH_CONCURRENCY", 4))
+
+@api.route("/voce/sintetizza/batch", methods=["POST"])
+def sintetizza_voce_batch():
+    """
+    Sintetizza più testi in una sola richiesta. Corpo: {"richieste": [{testo, voce, velocita, lingua}, ...]}.
+    Restituisce un risultato per elemento, nello stesso ordine, anche in caso di fallimenti parziali.
+    Gli elementi identici vengono sintetizzati una sola volta. Senza 'priorita' gli elementi
+    sono 'bulk': gli elementi rifiutati per quota riportano 'retry_after'.
+    """
+    logger.info("➡️ Richiesta POST /voce/sintetizza/batch ricevuta.")
+    elementi, errore = valida_richiesta_batch(request.get_json(silent=True))
+    if errore:
+        logger.warning(f"⚠️ Richiesta batch non valida: {errore}")
+        return jsonify({"success": False, "message": errore}), 400
+
+    validi = [parametri for parametri, _ in elementi if parametri is not None]
+    voce_ai = _voce_ai()
+    try:
+        risultati_validi = iter(voce_ai.sintetizza_batch(validi, max_paralleli=BATCH_CONCURRENCY))
+    except Exception as e:
+        logger.exception("❌ Errore imprevisto durante la sintesi batch.")
+        return jsonify({"success": False, "message": f"Errore interno del server: {str(e)}"}), 500
+
+    risultati = [next(risultati_validi) if parametri is not None else {"success": False, "message": errore_elemento}
+                 for parametri, errore_elemento in elementi]
+    riusciti = sum(1 for r in risultati if r.get("success"))
+    logger.info(f"✅ Batch completato: {riusciti}/{len(risultati)} elementi riusciti.")
+    return jsonify({
+        "success": riusciti == len(risultati),
+        "totale": len(risultati),
+        "riusciti": riusciti,
+        "risultati": risultati
+    }), 200
+
+# Tempi al primo byte (secondi) delle ultime risposte in streaming
+_ttfb_stream = deque(maxlen=1000)
+_ttfb_lock = threading.Lock()
+
+@api.route("/voce/sintetizza/stream", methods=["POST"])
+def sintetizza_voce_stream():
+    """
+    Come /voce/sintetizza, ma restituisce direttamente l'audio in chunked transfer encoding,
+    inviando ogni blocco appena sintetizzato. Il formato si sceglie come in /voce/sintetizza/audio.
+    Gli errori sul primo blocco producono una risposta JSON 500 (429 se rifiutato per quota,
+    504 se scaduto); quelli successivi interrompono lo stream.
+    """
+    inizio = time.perf_counter()
+    logger.info("➡️ Richiesta POST /voce/sintetizza/stream ricevuta.")
+    parametri, errore = valida_richiesta_sintesi(request.get_json(silent=True))
+    if errore:
+        logger.warning(f"⚠️ Richiesta non valida: {errore}")
+        return jsonify({"success": False, "message": errore}), 400
+    formato = _formato_risposta(parametri)
+    if formato is None:
+        return _formato_non_accettabile()
+
+    blocchi = _voce_ai().sintetizza_voce_stream(testo=parametri["testo"], voce=parametri["voce"],
+                                             velocita=parametri["velocita"], lingua=parametri["lingua"],
+                                             priorita=parametri["priorita"],
+                                             scadenza=_scadenza(), **{**_opzioni_audio(parametri), "formato": formato})
+    try:
+        # Il primo blocco viene atteso qui, così un errore immediato diventa un 500 esplicito
+        primo = next(blocchi)
+    except SintesiRifiutata as e:
+        return _sintesi_rifiutata(str(e), e.retry_after)
+    except ScadenzaSuperata as e:
+        return _scadenza_superata(str(e))
+    except Exception as e:
+        logger.exception("❌ Errore durante la sintesi vocale in streaming.")
+        return jsonify({"success": False, "message": f"Errore interno del server: {str(e)}"}), 500
+
+    def genera():
+        ttfb = time.perf_counter() - inizio
+        TTFB_STREAM.observe(ttfb)
+        with _ttfb_lock:
+            _ttfb_stream.append(ttfb)
+        logger.info(f"⏱️ Primo blocco audio pronto dopo {ttfb * 1000:.0f} ms ({len(primo)} byte).")
+        yield primo
+        try:
+            yield from blocchi
+        except Exception:
+            logger.exception("❌ Stream audio interrotto da un errore di sintesi.")
+        logger.info(f"✅ Streaming completato in {(time.perf_counter() - inizio) * 1000:.0f} ms.")
+
+    return Response(stream_with_context(genera()), mimetype=FORMATI[formato].mime,
+                    headers={"Cache-Control": "no-store", "Vary": "Accept"})
+
+@api.route("/voce/sintetizza/stream/stats", methods=["GET"])
+def statistiche_stream():
+    """
+    Restituisce le statistiche del tempo al primo byte (ms) delle ultime risposte in streaming.
+    """
+    with _ttfb_lock:
+        campioni = sorted(_ttfb_stream)
+    if not campioni:
+        return jsonify({"success": True, "campioni": 0}), 200
+
+    def percentile(p):
+        return round(campioni[min(len(campioni) - 1, int(p * len(campioni)))] * 1000, 1)
+
+    return jsonify({
+        "success": True,
+        "campioni": len(campioni),
+        "ttfb_ms_p50": percentile(0.50),
+        "ttfb_ms_p95": percentile(0.95),
+        "ttfb_ms_max": round(campioni[-1] * 1000, 1)
+    }), 200
+
+@api.route("/voce/cache", methods=["GET"])
+def statistiche_cache():
+    """
+    Restituisce i contatori della cache di sintesi (hit/miss/evizioni e occupazione),
+    le chiamate a Google risparmiate dalla coalescenza delle richieste identiche
+    e i ritentativi e duplicati (hedge) delle chiamate a Google.
+    """
+    risultato = _voce_ai().statistiche_cache()
+    return jsonify(risultato), 200 if risultato.get("success") else 404
+
+@api.route("/voce/archivio", methods=["GET"])
+def statistiche_archivio():
+    """
+    Restituisce l'occupazione dei file audio/testo salvati e i limiti di ritenzione.
+    """
+    return jsonify(_voce_ai().statistiche_archivio()), 200
+
+def _riproduzione_disattivata():
+    return jsonify({"success": False,
+                    "message": "Riproduzione locale disattivata: il server è in esecuzione con più worker."}), 409
+
+def _controllo_riproduzione(operazione):
+    voce_ai = _voce_ai()
+    if not voce_ai.riproduzione_locale:
+        return _riproduzione_disattivata()
+    return jsonify(operazione(voce_ai)), 200
+
+@api.route("/voce/stop", methods=["POST"])
+def stop_voce():
+    """
+    Ferma l'audio in riproduzione e scarta quello in coda.
+    Con più worker la riproduzione locale è disattivata e gli endpoint di riproduzione rispondono 409.
+    """
+    return _controllo_riproduzione(lambda voce_ai: voce_ai.stop_sintesi())
+
+@api.route("/voce/riproduzione", methods=["GET"])
+def stato_riproduzione():
+    """
+    Restituisce l'audio in riproduzione e la lunghezza della coda.
+    """
+    return _controllo_riproduzione(lambda voce_ai: voce_ai.stato_riproduzione())
+
+@api.route("/voce/riproduzione/salta", methods=["POST"])
+def salta_riproduzione():
+    """
+    Interrompe l'audio in riproduzione e passa al successivo in coda.
+    """
+    return _controllo_riproduzione(lambda voce_ai: voce_ai.salta_audio())
+
+@api.route("/voce/riproduzione/svuota", methods=["POST"])
+def svuota_riproduzione():
+    """
+    Scarta l'audio in coda senza interrompere quello in riproduzione.
+    """
+    return _controllo_riproduzione(lambda voce_ai: voce_ai.svuota_coda_audio())
+
+@api.route("/metrics", methods=["GET"])
+def metriche():
+    """
+    Espone le metriche del servizio nel formato testuale di Prometheus:
+    latenze per fase, richieste per esito, byte audio, caratteri inviati a Google,
+    richieste in corso e statistiche della cache.
+    """
+    # Durante l'avvio le metriche restano disponibili, senza quelle della cache
+    if _avvio().pronto and _voce_ai().cache is not None:
+        aggiorna_metriche_cache(_voce_ai().cache.statistiche())
+    return Response(REGISTRO.esporta(), content_type=REGISTRO.CONTENT_TYPE)
+
+@api.route("/update", methods=["POST"])
 def aggiorna_da_github():
     logger.info("🔄 Richiesta di aggiornamento da GitHub ricevuta.")
     try:
@@ -99,10 +459,32 @@ def aggiorna_da_github():
         return jsonify({"success": False, "message": str(e)}), 500
 
 # --- Avvio Server ---
+def _avvia_workers(host: str, port: int, workers: int, thread: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class ServerMultiProcesso(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", thread)
+            self.cfg.set("worker_class", "gthread")
+            # Le sintesi di testi lunghi superano il timeout predefinito di 30 s
+            self.cfg.set("timeout", 120)
+
+        def load(self):
+            # Chiamato in ciascun worker dopo il fork (senza preload_app)
+            return crea_app(multi_processo=True, workers=workers)
+
+    ServerMultiProcesso().run()
+
 if __name__ == "__main__":
     host = os.getenv("FLASK_HOST", "0.0.0.0")
     port = int(os.getenv("FLASK_PORT", 3003))
     debug = os.getenv("FLASK_DEBUG", "False").lower() == "true"
 
-    logger.info(f"Server in esecuzione su http://{host}:{port} (debug={debug})")
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    if WORKERS > 1 and not debug:
+        logger.info(f"Server in esecuzione su http://{host}:{port} ({WORKERS} worker x {THREAD_PER_WORKER} thread)")
+        _avvia_workers(host, port, WORKERS, THREAD_PER_WORKER)
+    else:
+        logger.info(f"Server in esecuzione su http://{host}:{port} (debug={debug})")
+        crea_app().run(host=host, port=port, debug=debug, threaded=True)
@@ -0,0 +1,199 @@
+# Entry point ASGI del server vocale: stesso contratto di /voce/sintetizza del server Flask,
+# ma con sintesi asincrona (AsyncVoiceAI), così un solo processo gestisce molte richieste
+# contemporanee senza occupare un thread per ciascuna attesa di rete.
+# Avvio: [WEB_CONCURRENCY=N] uvicorn server_voice_ai_asgi:app --host 0.0.0.0 --port 3003
+import time
+_INIZIO_PROCESSO = time.perf_counter()  # riferimento per i tempi di avvio (/pronto, /metrics)
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from AvvioMotore import AvvioMotore, MotoreNonPronto
+from PianificatoreSintesi import PianificatoreSintesi
+from PoliticaChiamate import PoliticaChiamate
+from validazione_richieste import LINGUA_AUTOMATICA, valida_richiesta_sintesi
+from RilevatoreLingua import rilevatore_condiviso
+from metriche import REGISTRO, aggiorna_metriche_cache
+from dotenv import load_dotenv
+load_dotenv()
+
+# --- Configurazione Logging ---
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
+logger = logging.getLogger("VoiceAPI")
+
+# --- Inizializzazione del modulo vocale ---
+# Secondi che una richiesta attende la creazione del motore prima di ricevere 503
+ATTESA_AVVIO = float(os.getenv("VOICE_ATTESA_AVVIO", 30))
+# Più worker: WEB_CONCURRENCY=N (uvicorn lo usa come numero di worker), output e cache condivisi
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+# Quota di Google TTS in caratteri al minuto (0 = nessun controllo), divisa tra i worker
+QUOTA_CARATTERI_MINUTO = int(os.getenv("VOICE_QUOTA_CARATTERI_MINUTO", 150000))
+ATTESA_QUOTA_MAX = float(os.getenv("VOICE_ATTESA_QUOTA_MAX", 10))
+# Scadenza delle richieste (riducibile con X-Request-Timeout), timeout, ritentativi e hedging verso Google
+SCADENZA_RICHIESTA = float(os.getenv("VOICE_SCADENZA_RICHIESTA", 30))
+TIMEOUT_GOOGLE = float(os.getenv("VOICE_TIMEOUT_GOOGLE", 15))
+TENTATIVI_GOOGLE = int(os.getenv("VOICE_TENTATIVI_GOOGLE", 3))
+HEDGING = os.getenv("VOICE_HEDGING", "False").lower() == "true"
+HEDGING_PERCENTILE = float(os.getenv("VOICE_HEDGING_PERCENTILE", 95))
+
+def _crea_voce_ai():
+    # Importato qui: le librerie di Google (e la risoluzione delle credenziali) non rallentano l'avvio
+    with avvio.fase("import_motore"):
+        from AsyncVoiceAI import AsyncVoiceAI
+    # Profili di lingua caricati ora, non alla prima richiesta con 'lingua': 'auto'
+    with avvio.fase("lingua"):
+        rilevatore_condiviso()
+    pianificatore = None
+    if QUOTA_CARATTERI_MINUTO > 0:
+        pianificatore = PianificatoreSintesi(max(1, QUOTA_CARATTERI_MINUTO // max(1, WORKERS)),
+                                             attesa_massima=ATTESA_QUOTA_MAX)
+    politica = PoliticaChiamate(timeout_tentativo=TIMEOUT_GOOGLE, max_tentativi=TENTATIVI_GOOGLE,
+                                hedging=HEDGING, percentile_hedging=HEDGING_PERCENTILE / 100)
+    return AsyncVoiceAI(multi_processo=WORKERS > 1, riproduzione_locale=WORKERS <= 1,
+                        pianificatore=pianificatore, politica=politica)
+
+avvio = AvvioMotore(_crea_voce_ai, inizio=_INIZIO_PROCESSO)
+
+@contextlib.asynccontextmanager
+async def _ciclo_di_vita(app: Starlette):
+    # Il riscaldamento deve avvenire nell'event loop del server, dove vive il client asincrono
+    task_avvio = asyncio.create_task(avvio.avvia_async())
+    try:
+        yield
+    finally:
+        task_avvio.cancel()
+
+async def _voce_ai():
+    """Il modulo vocale, attendendone l'inizializzazione al più ATTESA_AVVIO secondi."""
+    try:
+        return avvio.ottieni(timeout=0)
+    except MotoreNonPronto:
+        # Attesa fuori dall'event loop, che intanto continua a servire /pronto e /metrics
+        return await asyncio.to_thread(avvio.ottieni, ATTESA_AVVIO)
+
+def _scadenza(request: Request, arrivo: float):
+    """Istante (time.monotonic()) entro cui la sintesi deve concludersi, o None."""
+    timeout = SCADENZA_RICHIESTA or None
+    try:
+        richiesto = float(request.headers["X-Request-Timeout"])
+        timeout = richiesto if timeout is None else min(timeout, richiesto)
+    except (KeyError, ValueError):
+        pass
+    return None if timeout is None else arrivo + timeout
+
+async def motore_non_pronto(request: Request, errore: MotoreNonPronto) -> JSONResponse:
+    return JSONResponse({"success": False, "message": str(errore)}, status_code=503,
+                        headers={"Retry-After": "5"})
+
+# --- Endpoints API ---
+async def home(request: Request) -> JSONResponse:
+    return JSONResponse({
+        "status": "✅ Voce AI attiva",
+        "descrizione": "Modulo per la sintesi vocale Agape",
+        "versione_api": "1.0"
+    }, status_code=200)
+
+async def pronto(request: Request) -> JSONResponse:
+    """
+    Readiness: 200 solo quando il motore vocale è creato e il riscaldamento è concluso,
+    503 durante l'avvio o se l'inizializzazione è fallita.
+    """
+    stato = avvio.stato()
+    if stato["pronto"]:
+        return JSONResponse(stato, status_code=200)
+    return JSONResponse(stato, status_code=503, headers={"Retry-After": "2"})
+
+async def sintetizza_voce(request: Request) -> JSONResponse:
+    """
+    Richiede la sintesi vocale. Parametri accettati:
+    - testo (str): Il testo da pronunciare (obbligatorio)
+    - voce (str): 'maschile' o 'femminile' (opzionale)
+    - velocita (int): Velocità parlato (opzionale, default 170)
+    - lingua (str): Codice lingua ('it', 'en', ...) o 'auto' per rilevarla dal testo (opzionale)
+    - formato, sample_rate, effetti: Opzioni audio (opzionali, come nel server Flask)
+    - priorita (str): 'interattiva', 'normale' o 'bulk' (opzionale); 429 con Retry-After se la quota non basta
+    Risponde 504 se la sintesi non si conclude entro X-Request-Timeout secondi (al più VOICE_SCADENZA_RICHIESTA).
+    """
+    inizio = time.perf_counter()
+    arrivo = time.monotonic()
+    logger.info("➡️ Richiesta POST /voce/sintetizza ricevuta.")
+    try:
+        data = await request.json()
+    except (ValueError, json.JSONDecodeError):
+        data = None
+    if isinstance(data, dict) and str(data.get("lingua") or "").strip().lower() == LINGUA_AUTOMATICA:
+        # Il rilevamento della lingua è CPU-bound: fuori dall'event loop
+        parametri, errore = await asyncio.to_thread(valida_richiesta_sintesi, data)
+    else:
+        parametri, errore = valida_richiesta_sintesi(data)
+    if errore:
+        logger.warning(f"⚠️ Richiesta non valida: {errore}")
+        return JSONResponse({"success": False, "message": errore}, status_code=400)
+
+    voce_ai = await _voce_ai()
+    try:
+        risultato = await voce_ai.sintetizza_voce(testo=parametri["testo"], voce=parametri["voce"],
+                                                  velocita=parametri["velocita"], lingua=parametri["lingua"],
+                                                  formato=parametri["formato"],
+                                                  sample_rate=parametri["sample_rate"],
+                                                  effetti=parametri["effetti"], priorita=parametri["priorita"],
+                                                  scadenza=_scadenza(request, arrivo))
+        if risultato.get("success"):
+            logger.info("✅ Sintesi vocale completata.")
+            avvio.registra_prima_richiesta(time.perf_counter() - inizio)
+            return JSONResponse(risultato, status_code=200)
+        if risultato.get("scaduta"):
+            logger.warning(f"⚠️ Sintesi non conclusa entro la scadenza: {risultato['message']}")
+            return JSONResponse(risultato, status_code=504)
+        if "retry_after" in risultato:
+            logger.warning(f"⚠️ Sintesi rifiutata per quota: {risultato['message']}")
+            return JSONResponse(risultato, status_code=429,
+                                headers={"Retry-After": str(risultato["retry_after"])})
+        logger.error(f"❌ Sintesi fallita: {risultato.get('message')}")
+        return JSONResponse(risultato, status_code=500)
+    except Exception as e:
+        logger.exception("❌ Errore imprevisto durante la sintesi vocale.")
+        return JSONResponse({
+            "success": False,
+            "message": f"Errore interno del server: {str(e)}"
+        }, status_code=500)
+
+async def metriche(request: Request) -> Response:
+    """
+    Espone le metriche del servizio nel formato testuale di Prometheus.
+    """
+    # Durante l'avvio le metriche restano disponibili, senza quelle della cache
+    if avvio.pronto:
+        voce_ai = await _voce_ai()
+        if voce_ai.cache is not None:
+            aggiorna_metriche_cache(voce_ai.cache.statistiche())
+    return Response(REGISTRO.esporta(), headers={"Content-Type": REGISTRO.CONTENT_TYPE})
+
+app = Starlette(
+    routes=[
+        Route("/", home, methods=["GET"]),
+        Route("/pronto", pronto, methods=["GET"]),
+        Route("/voce/sintetizza", sintetizza_voce, methods=["POST"]),
+        Route("/metrics", metriche, methods=["GET"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    exception_handlers={MotoreNonPronto: motore_non_pronto},
+    lifespan=_ciclo_di_vita,
+)
+avvio.registra("import_server", time.perf_counter() - _INIZIO_PROCESSO)
+
+# --- Avvio Server ---
+if __name__ == "__main__":
+    import uvicorn
+
+    host = os.getenv("FLASK_HOST", "0.0.0.0")
+    port = int(os.getenv("FLASK_PORT", 3003))
+    logger.info(f"Server ASGI in esecuzione su http://{host}:{port}")
+    uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,38 @@
+import tempfile
+import unittest
+from pathlib import Path
+from ArchivioAudio import ArchivioAudio
+
+
+class TestArchivioAudio(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cartella = Path(self.tmp.name)
+
+    def test_salva_in_background(self):
+        archivio = ArchivioAudio()
+        self.addCleanup(archivio.chiudi)
+        self.assertTrue(archivio.salva("Ciao", b"audio", self.cartella / "a.mp3", self.cartella / "a.txt"))
+        archivio.attendi()
+        self.assertEqual((self.cartella / "a.mp3").read_bytes(), b"audio")
+        self.assertEqual((self.cartella / "a.txt").read_text(encoding="utf-8"), "Ciao")
+
+    def test_chiudi_completa_la_coda(self):
+        archivio = ArchivioAudio()
+        for i in range(5):
+            archivio.salva(f"testo {i}", b"audio", self.cartella / f"{i}.mp3", self.cartella / f"{i}.txt")
+        archivio.chiudi()
+        self.assertEqual(len(list(self.cartella.glob("*.mp3"))), 5)
+
+    def test_errore_di_scrittura_non_ferma_il_worker(self):
+        archivio = ArchivioAudio()
+        self.addCleanup(archivio.chiudi)
+        archivio.salva("x", b"audio", self.cartella / "manca" / "x.mp3", self.cartella / "manca" / "x.txt")
+        archivio.salva("y", b"audio", self.cartella / "y.mp3", self.cartella / "y.txt")
+        archivio.attendi()
+        self.assertTrue((self.cartella / "y.mp3").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
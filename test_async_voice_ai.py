@@ -0,0 +1,123 @@
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+from AsyncGoogleSpeaker import AsyncGoogleSpeaker
+from AsyncVoiceAI import AsyncVoiceAI
+from VoiceRegistry import VoiceRegistry
+
+
+class ClientAsincronoFinto:
+    """Al posto di TextToSpeechAsyncClient: l'audio è 'nome_voce|testo'; registra le chiamate."""
+    def __init__(self, fallisci=()):
+        self.fallisci = set(fallisci)
+        self.chiamate = []
+
+    async def synthesize_speech(self, input, voice, audio_config, timeout=None, retry=None):
+        self.chiamate.append((input.text, voice.name))
+        await asyncio.sleep(0)
+        if input.text in self.fallisci:
+            raise RuntimeError(f"errore Google su '{input.text}'")
+        return SimpleNamespace(audio_content=f"{voice.name}|{input.text}".encode())
+
+
+class PlayerFinto:
+    def __init__(self):
+        self.accodati = []
+
+    def accoda_audio(self, audio, suffisso=".mp3"):
+        self.accodati.append(audio)
+        return len(self.accodati)
+
+
+class MotoreAsincronoFinto(AsyncGoogleSpeaker):
+    def __init__(self, client, **opzioni):
+        super().__init__(**opzioni)
+        self._client_async = client
+
+
+class AsyncVoiceAIFinta(AsyncVoiceAI):
+    def __init__(self, client, **opzioni):
+        self._client = client
+        self._tmp = tempfile.TemporaryDirectory()
+        super().__init__(output_dir=self._tmp.name, usa_cache=False, archivia=False,
+                         manifest_prerender=None, **opzioni)
+
+    def _crea_motore(self, voce, lingua):
+        return MotoreAsincronoFinto(self._client, voce=voce, lingua=lingua, player=PlayerFinto(),
+                                    registro=VoiceRegistry(cache_file=None, elenca_voci=lambda: []),
+                                    pianificatore=self.pianificatore, politica=self.politica)
+
+
+class TestAsyncVoiceAI(unittest.TestCase):
+    def setUp(self):
+        self.client = ClientAsincronoFinto(fallisci={"Rotto."})
+        self.ai = AsyncVoiceAIFinta(self.client, in_memoria=True)
+
+    def tearDown(self):
+        self.ai.storage.chiudi()
+        self.ai._tmp.cleanup()
+
+    def test_sintetizza_voce(self):
+        risultato = asyncio.run(self.ai.sintetizza_voce("Ciao.", voce="maschile", lingua="en", play_audio=True))
+        self.assertTrue(risultato["success"])
+        self.assertEqual(self.ai.vocal_engine.player.accodati, [b"en-US-Neural2-I|Ciao."])
+        self.assertFalse(asyncio.run(self.ai.sintetizza_voce("  "))["success"])
+
+    def test_sintetizza_voce_su_file(self):
+        ai = AsyncVoiceAIFinta(self.client)
+        try:
+            risultato = asyncio.run(ai.sintetizza_voce("Ciao.", play_audio=False))
+            with open(risultato["audio_file"], "rb") as f:
+                self.assertEqual(f.read(), b"it-IT-Wavenet-C|Ciao.")
+        finally:
+            ai.storage.chiudi()
+            ai._tmp.cleanup()
+
+    def test_sintetizza_audio(self):
+        risultato = asyncio.run(self.ai.sintetizza_audio("Ciao.", lingua="fr"))
+        self.assertEqual(risultato["audio"], b"fr-FR-Neural2-B|Ciao.")
+        self.assertEqual(self.ai.vocal_engine.player.accodati, [])
+
+    def test_sintetizza_batch(self):
+        richieste = [{"testo": "Uno."}, {"testo": "Rotto."}, {"testo": " Uno. "}, {"testo": "Due.", "voce": "maschile"}]
+        risultati = asyncio.run(self.ai.sintetizza_batch(richieste))
+        self.assertEqual([r["success"] for r in risultati], [True, False, True, True])
+        self.assertEqual(sorted(testo for testo, _ in self.client.chiamate), ["Due.", "Rotto.", "Uno."])
+
+    def test_sintetizza_voce_stream(self):
+        testo = "Una frase abbastanza lunga da dividere. " * 250
+
+        async def raccogli():
+            return [blocco async for blocco in self.ai.sintetizza_voce_stream(testo, lingua="es")]
+
+        blocchi = asyncio.run(raccogli())
+        self.assertGreater(len(blocchi), 1)
+        self.assertTrue(all(b.startswith(b"es-ES-Neural2-A|") for b in blocchi))
+        self.assertEqual(b"".join(b.split(b"|", 1)[1] for b in blocchi).replace(b" ", b""),
+                         testo.encode().replace(b" ", b""))
+
+    def test_riscalda_un_tentativo_con_timeout_breve(self):
+        opzioni = []
+
+        class ClientOpzioni(ClientAsincronoFinto):
+            async def synthesize_speech(self, input, voice, audio_config, timeout=None, retry="predefinito"):
+                opzioni.append((timeout, retry))
+                return await super().synthesize_speech(input, voice, audio_config)
+
+        self.ai.vocal_engine._client_async = ClientOpzioni()
+        asyncio.run(self.ai.riscalda())
+        self.assertEqual(opzioni, [(5.0, None)])
+
+    def test_motore_sintetizza_e_parla_lungo(self):
+        motore = self.ai.vocal_engine
+        self.assertEqual(asyncio.run(motore.sintetizza("Breve.")), b"it-IT-Wavenet-C|Breve.")
+        testo = "Testo lungo per parla_lungo. " * 30
+        audio = asyncio.run(motore.parla_lungo(testo, output_file=None, play_audio=False))
+        self.assertTrue(audio.startswith(b"it-IT-Wavenet-C|"))
+        with self.assertRaises(RuntimeError):
+            asyncio.run(motore.sintetizza("Rotto."))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import io
+import os
+import sys
+import time
+import wave
+import tempfile
+import unittest
+from AudioPlayer import AudioPlayer
+from metriche import DURATA_FASE
+
+# "Riproduttore" che dura finché non viene terminato: il percorso del file viene aggiunto come argomento
+COMANDO_LENTO = [sys.executable, "-c", "import time; time.sleep(5)"]
+COMANDO_RAPIDO = [sys.executable, "-c", "pass"]
+
+# Emula il protocollo di 'mpg123 -R': ogni LOAD "suona" per un secondo, o fino a STOP
+FINTO_MPG123_R = r"""
+import sys, threading
+stop = threading.Event()
+def suona():
+    print("@P 2", flush=True)
+    print("@F 0 38 0.00 1.00", flush=True)
+    stop.wait(1)
+    print("@P 0", flush=True)
+print("@R MPG123 (finto)", flush=True)
+for riga in sys.stdin:
+    comando = riga.strip()
+    if comando.startswith("LOAD "):
+        stop.clear()
+        threading.Thread(target=suona).start()
+    elif comando == "STOP":
+        stop.set()
+    elif comando == "QUIT":
+        break
+"""
+COMANDO_RESIDENTE = [sys.executable, "-c", FINTO_MPG123_R]
+
+# Come sopra, ma il LOAD viene preso in carico dopo 0.3 s e uno STOP arrivato prima viene
+# ignorato (come fa mpg123 quando non sta suonando nulla); poi "suona" per 5 secondi
+FINTO_MPG123_LENTO = r"""
+import sys, threading, time
+stop = threading.Event()
+suonando = threading.Event()
+def suona():
+    time.sleep(0.3)
+    suonando.set()
+    print("@P 2", flush=True)
+    stop.wait(5)
+    suonando.clear()
+    print("@P 0", flush=True)
+for riga in sys.stdin:
+    comando = riga.strip()
+    if comando.startswith("LOAD "):
+        stop.clear()
+        threading.Thread(target=suona).start()
+    elif comando == "STOP" and suonando.is_set():
+        stop.set()
+    elif comando == "QUIT":
+        break
+"""
+# Emula 'aplay -': accoda i byte ricevuti su stdin al file indicato come primo argomento
+FINTO_APLAY = r"""
+import sys
+with open(sys.argv[1], "ab") as uscita:
+    while True:
+        dati = sys.stdin.buffer.read1(65536)
+        if not dati:
+            break
+        uscita.write(dati)
+        uscita.flush()
+"""
+
+
+def wav_pcm(secondi: float, frequenza: int = 24000, valore: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(frequenza)
+        wav.writeframes(valore.to_bytes(2, "little") * int(secondi * frequenza))
+    return buffer.getvalue()
+
+
+# mpg123 bloccato: legge i comandi e non risponde mai
+FINTO_MPG123_BLOCCATO = "import sys\nfor riga in sys.stdin: pass"
+
+
+class TestAudioPlayer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _file(self, nome: str) -> str:
+        percorso = os.path.join(self.tmp.name, nome)
+        with open(percorso, "wb") as f:
+            f.write(b"audio")
+        return percorso
+
+    def _attendi_riproduzione(self, player: AudioPlayer) -> None:
+        limite = time.monotonic() + 5
+        while player._processo is None and time.monotonic() < limite:
+            time.sleep(0.01)
+
+    def test_accoda_non_blocca_e_attendi(self):
+        player = AudioPlayer(comando=COMANDO_RAPIDO)
+        self.addCleanup(player.chiudi)
+        inizio = time.monotonic()
+        player.accoda(self._file("a.mp3"))
+        player.accoda(self._file("b.mp3"))
+        self.assertLess(time.monotonic() - inizio, 0.5)
+        self.assertTrue(player.attendi(timeout=10))
+        self.assertEqual(player.stato()["in_coda"], 0)
+
+    def test_salta_interrompe_elemento_corrente(self):
+        player = AudioPlayer(comando=COMANDO_LENTO)
+        self.addCleanup(player.chiudi)
+        player.accoda(self._file("a.mp3"))
+        self._attendi_riproduzione(player)
+        inizio = time.monotonic()
+        self.assertTrue(player.salta())
+        self.assertTrue(player.attendi(timeout=3))
+        self.assertLess(time.monotonic() - inizio, 3)
+
+    def test_interrompi_scarta_coda_ed_elimina_file(self):
+        player = AudioPlayer(comando=COMANDO_LENTO)
+        self.addCleanup(player.chiudi)
+        player.accoda(self._file("a.mp3"))
+        self._attendi_riproduzione(player)
+        temporanei = [self._file("b.mp3"), self._file("c.mp3")]
+        for percorso in temporanei:
+            player.accoda(percorso, elimina_dopo=True)
+
+        risultato = player.interrompi()
+        self.assertEqual(risultato, {"scartati": 2, "interrotto": True})
+        self.assertTrue(player.attendi(timeout=3))
+        self.assertFalse(any(os.path.exists(p) for p in temporanei))
+
+    def test_accoda_dopo_chiudi_solleva(self):
+        player = AudioPlayer(comando=COMANDO_RAPIDO)
+        player.chiudi()
+        with self.assertRaises(RuntimeError):
+            player.accoda(self._file("a.mp3"))
+
+    def test_residente_riusa_processo_e_misura_primo_campione(self):
+        player = AudioPlayer(residente=COMANDO_RESIDENTE)
+        self.addCleanup(player.chiudi)
+        misure = DURATA_FASE.labels(fase="avvio_riproduzione")
+        prima = sum(misure.conteggi)
+
+        player.accoda_audio(b"audio")
+        limite = time.monotonic() + 5
+        while player.stato()["in_riproduzione"] is None and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertTrue(player.salta())
+        self.assertTrue(player.attendi(timeout=3))
+        processo = player._backend_residente._processo
+        player.accoda(self._file("b.mp3"))
+        player.salta()
+        self.assertTrue(player.attendi(timeout=3))
+
+        self.assertIs(player._backend_residente._processo, processo)
+        self.assertGreaterEqual(sum(misure.conteggi) - prima, 1)
+        self.assertEqual(player.stato()["backend"].split()[1], "(residente)")
+
+    def test_salta_prima_che_il_load_sia_preso_in_carico(self):
+        player = AudioPlayer(residente=[sys.executable, "-c", FINTO_MPG123_LENTO])
+        self.addCleanup(player.chiudi)
+        player.accoda(self._file("a.mp3"))
+        limite = time.monotonic() + 5
+        while player.stato()["in_riproduzione"] is None and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertTrue(player.salta())
+        self.assertTrue(player.attendi(timeout=3))
+
+    def test_residente_bloccato_viene_riavviato(self):
+        player = AudioPlayer(residente=[sys.executable, "-c", FINTO_MPG123_BLOCCATO])
+        self.addCleanup(player.chiudi)
+        backend = player._backend_residente
+        backend.timeout_eventi = 0.3
+        processi = []
+        for nome in ("a.mp3", "b.mp3"):
+            player.accoda(self._file(nome))
+            limite = time.monotonic() + 5
+            while backend._processo is None and time.monotonic() < limite:
+                time.sleep(0.01)
+            processi.append(backend._processo)
+            self.assertTrue(player.attendi(timeout=3))
+
+        self.assertIsNot(processi[0], processi[1])
+        self.assertTrue(all(p.wait(timeout=1) is not None for p in processi))
+
+    def _player_pcm(self):
+        uscita = os.path.join(self.tmp.name, "pcm.raw")
+        player = AudioPlayer(residente=COMANDO_RESIDENTE, pcm=[sys.executable, "-c", FINTO_APLAY, uscita])
+        self.addCleanup(player.chiudi)
+        return player, uscita
+
+    def test_pcm_residente_riceve_i_buffer_wav(self):
+        player, uscita = self._player_pcm()
+        misure = DURATA_FASE.labels(fase="avvio_riproduzione")
+        prima = sum(misure.conteggi)
+        inizio = time.monotonic()
+        player.accoda_audio(wav_pcm(0.3, valore=1), suffisso=".wav")
+        player.accoda_audio(wav_pcm(0.3, valore=2), suffisso=".wav")
+        limite = time.monotonic() + 5
+        while player._backend_pcm._processo is None and time.monotonic() < limite:
+            time.sleep(0.01)
+        processo = player._backend_pcm._processo
+        self.assertTrue(player.attendi(timeout=5))
+        # Riproduzione al ritmo dell'audio, sullo stesso processo, senza file temporanei
+        self.assertGreaterEqual(time.monotonic() - inizio, 0.5)
+        self.assertIs(player._backend_pcm._processo, processo)
+        # Anche il percorso PCM misura l'avvio della riproduzione, per ogni elemento
+        self.assertEqual(sum(misure.conteggi) - prima, 2)
+        player.chiudi()
+        with open(uscita, "rb") as f:
+            self.assertEqual(f.read(), b"\x01\x00" * 7200 + b"\x02\x00" * 7200)
+
+    def test_pcm_residente_salta(self):
+        player, _ = self._player_pcm()
+        player.accoda_audio(wav_pcm(5), suffisso=".wav")
+        limite = time.monotonic() + 5
+        while player.stato()["in_riproduzione"] is None and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertTrue(player.stato()["in_riproduzione"].startswith("<wav in memoria"))
+        inizio = time.monotonic()
+        self.assertTrue(player.salta())
+        self.assertTrue(player.attendi(timeout=2))
+        self.assertLess(time.monotonic() - inizio, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from AudioStorage import AudioStorage
+
+
+class TestAudioStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.base = Path(self.tmp.name)
+
+    def _storage(self, **kwargs) -> AudioStorage:
+        storage = AudioStorage(self.base, intervallo_pulizia=3600, **kwargs)
+        self.addCleanup(storage.chiudi)
+        return storage
+
+    def _scrivi_giorno(self, giorno: str, nome: str, dimensione: int) -> Path:
+        cartella = self.base / giorno
+        cartella.mkdir(parents=True, exist_ok=True)
+        percorso = cartella / nome
+        percorso.write_bytes(b"x" * dimensione)
+        return percorso
+
+    def test_percorsi_suddivisi_per_giorno(self):
+        storage = self._storage()
+        mp3, txt = storage.nuovi_percorsi()
+        self.assertEqual(mp3.parent, self.base / datetime.now().strftime("%Y/%m/%d"))
+        self.assertEqual(mp3.stem, txt.stem)
+        mp3.write_bytes(b"audio")
+        txt.write_text("testo")
+        storage.registra(mp3, txt)
+        stats = storage.statistiche()
+        self.assertEqual((stats["file"], stats["bytes"], stats["giorni"]), (2, 10, 1))
+
+    def test_scansione_iniziale_e_ritenzione_per_eta(self):
+        self._scrivi_giorno("2020/01/01", "agape_20200101_000000_aaaaaa.mp3", 100)
+        vecchio_piatto = self.base / "agape_20200101_000000_bbbbbb.mp3"
+        vecchio_piatto.write_bytes(b"x" * 10)
+        os.utime(vecchio_piatto, (0, 0))
+        storage = self._storage(max_eta_giorni=30, max_bytes=None)
+        self.assertEqual(storage.statistiche()["bytes"], 110)
+
+        mp3, _ = storage.nuovi_percorsi()
+        mp3.write_bytes(b"audio")
+        storage.registra(mp3)
+        self.assertEqual(storage.pulisci(), {"rimossi_eta": 2, "rimossi_spazio": 0})
+        self.assertFalse((self.base / "2020").exists())
+        self.assertFalse(vecchio_piatto.exists())
+        self.assertTrue(mp3.exists())
+        self.assertEqual(storage.statistiche()["bytes"], 5)
+
+    def test_limite_dimensione_rimuove_prima_i_giorni_vecchi(self):
+        self._scrivi_giorno("2030/01/01", "agape_20300101_000000_aaaaaa.mp3", 100)
+        self._scrivi_giorno("2030/01/02", "agape_20300102_000000_aaaaaa.mp3", 100)
+        secondo = self._scrivi_giorno("2030/01/02", "agape_20300102_000001_bbbbbb.mp3", 100)
+        storage = self._storage(max_eta_giorni=None, max_bytes=150)
+
+        risultato = storage.pulisci()
+        self.assertEqual(risultato["rimossi_spazio"], 2)
+        self.assertFalse((self.base / "2030/01/01").exists())
+        self.assertTrue(secondo.exists())
+        self.assertLessEqual(storage.statistiche()["bytes"], 150)
+
+    def test_condiviso_riconta_i_file_degli_altri_processi(self):
+        storage = self._storage(max_eta_giorni=None, max_bytes=150, condiviso=True)
+        # File scritti da un altro worker dopo la scansione iniziale
+        self._scrivi_giorno("2030/01/01", "agape_20300101_000000_aaaaaa.mp3", 100)
+        self._scrivi_giorno("2030/01/02", "agape_20300102_000000_aaaaaa.mp3", 100)
+        self.assertEqual(storage.statistiche()["bytes"], 0)
+
+        storage._pulisci_condiviso()
+        self.assertFalse((self.base / "2030/01/01/agape_20300101_000000_aaaaaa.mp3").exists())
+        self.assertEqual(storage.statistiche()["bytes"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import unittest
+from AvvioMotore import AvvioMotore, MotoreNonPronto
+
+
+class _Motore:
+    def __init__(self):
+        self.riscaldato = False
+
+    def riscalda(self):
+        self.riscaldato = True
+
+
+class _MotoreAsincrono:
+    def __init__(self):
+        self.loop = None
+
+    async def riscalda(self):
+        self.loop = asyncio.get_running_loop()
+
+
+class TestAvvioMotore(unittest.TestCase):
+    def test_pronto_solo_dopo_il_riscaldamento(self):
+        sblocca = threading.Event()
+
+        class MotoreLento(_Motore):
+            def riscalda(self):
+                sblocca.wait(5)
+                super().riscalda()
+
+        avvio = AvvioMotore(MotoreLento)
+        avvio.avvia()
+        # Il motore è utilizzabile prima della fine del riscaldamento, ma non è 'pronto'
+        motore = avvio.ottieni(timeout=5)
+        self.assertFalse(avvio.pronto)
+        sblocca.set()
+        self.assertTrue(avvio._pronto.wait(5))
+        self.assertTrue(motore.riscaldato)
+        self.assertTrue({"motore", "riscaldamento", "pronto"} <= set(avvio.stato()["tempi_ms"]))
+
+    def test_creazione_fallita(self):
+        def crea():
+            raise RuntimeError("credenziali mancanti")
+        avvio = AvvioMotore(crea)
+        avvio.avvia()
+        with self.assertRaises(MotoreNonPronto):
+            avvio.ottieni(timeout=5)
+        self.assertFalse(avvio.pronto)
+        self.assertIn("credenziali", avvio.stato()["errore"])
+
+    def test_ottieni_scade_durante_l_avvio(self):
+        avvio = AvvioMotore(_Motore)
+        with self.assertRaises(MotoreNonPronto):
+            avvio.ottieni(timeout=0)
+
+    def test_riscaldamento_asincrono_nell_event_loop(self):
+        avvio = AvvioMotore(_MotoreAsincrono)
+
+        async def esegui():
+            await avvio.avvia_async()
+            return asyncio.get_running_loop()
+
+        loop = asyncio.run(esegui())
+        self.assertTrue(avvio.pronto)
+        self.assertIs(avvio.ottieni(timeout=0).loop, loop)
+
+    def test_prima_richiesta_registrata_una_volta(self):
+        avvio = AvvioMotore(_Motore)
+        avvio.registra_prima_richiesta(0.2)
+        avvio.registra_prima_richiesta(0.01)
+        self.assertEqual(avvio.stato()["tempi_ms"]["prima_richiesta"], 200.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
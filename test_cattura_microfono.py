@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+import speech_recognition as sr
+from CatturaMicrofono import CatturaMicrofono
+from test_rilevatore_voce import FS, pcm16, rumore, tono
+
+# Rumore di fondo più forte che nei test del solo VAD
+RUMORE = 0.01
+
+
+class MicrofonoFinto(sr.AudioSource):
+    """Sorgente che restituisce un segnale preregistrato, poi la fine dello stream."""
+    SAMPLE_RATE = FS
+    SAMPLE_WIDTH = 2
+    CHUNK = 320
+
+    def __init__(self, y):
+        self.pcm = pcm16(y)
+        self.posizione = 0
+        self.stream = None
+        self.chiuso = False
+
+    def __enter__(self):
+        self.stream = self
+        return self
+
+    def __exit__(self, *_):
+        self.stream = None
+        self.chiuso = True
+
+    def read(self, campioni):
+        blocco = self.pcm[self.posizione:self.posizione + campioni * self.SAMPLE_WIDTH]
+        self.posizione += len(blocco)
+        return blocco
+
+
+class TestCatturaMicrofono(unittest.TestCase):
+    def _cattura(self, y, durata_buffer=30.0):
+        microfono = MicrofonoFinto(y)
+        cattura = CatturaMicrofono(microfono, durata_buffer=durata_buffer)
+        cattura.avvia()
+        # La sorgente finta termina da sola: si attende che il thread abbia catturato tutto
+        cattura._thread.join(5)
+        self.assertTrue(microfono.chiuso)
+        self.assertFalse(cattura.attiva)
+        return cattura
+
+    def test_rumore_di_fondo_non_segue_il_parlato(self):
+        cattura = self._cattura(np.concatenate([rumore(1.0, RUMORE), tono(2.0) + rumore(2.0, RUMORE, seme=1)]))
+        self.assertLess(cattura.stima.rumore, 2 * RUMORE * 32767)
+
+    def test_listen_dal_buffer_con_pre_roll(self):
+        cattura = self._cattura(np.concatenate([rumore(1.0, RUMORE), tono(0.5), rumore(1.5, RUMORE, seme=1)]))
+        recognizer = sr.Recognizer()
+        recognizer.dynamic_energy_threshold = False
+        recognizer.energy_threshold = cattura.stima.soglia()
+        sorgente = cattura.sorgente(da=0)
+        audio = recognizer.listen(sorgente, timeout=2)
+        # Il tono e il non_speaking_duration di contorno, senza il rumore iniziale
+        self.assertAlmostEqual(len(audio.get_raw_data()) / 2 / FS, 0.5 + 2 * recognizer.non_speaking_duration, delta=0.1)
+        fine = sorgente.cursore
+        self.assertEqual(fine - cattura.sorgente(da=fine, pre_roll=0.3).cursore, cattura.blocchi(0.3))
+
+    def test_buffer_circolare_riparte_dal_blocco_piu_vecchio(self):
+        cattura = self._cattura(rumore(2.0, RUMORE), durata_buffer=0.5)
+        self.assertEqual(cattura.posizione(), 100)
+        indice, blocco = cattura.leggi(0)
+        self.assertEqual(indice, 100 - cattura.blocchi(0.5) + 1)
+        self.assertEqual(len(blocco), 640)
+        self.assertEqual(cattura.estrai(0, 100), b"".join(cattura.leggi(i)[1] for i in range(indice - 1, 100)))
+        # A cattura terminata la lettura oltre la fine restituisce la fine dello stream
+        self.assertEqual(cattura.leggi(100), (100, b""))
+        self.assertFalse(cattura.sorgente(da=0).esaurita)
+        self.assertTrue(cattura.sorgente().esaurita)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from CoalescenzaRichieste import CoalescenzaRichieste
+from PoliticaChiamate import ScadenzaSuperata
+
+
+class TestCoalescenzaRichieste(unittest.TestCase):
+    def setUp(self):
+        self.coalescenza = CoalescenzaRichieste()
+        self.chiamate = 0
+        self.sblocca = threading.Event()
+
+    def _operazione(self, risultato=b"audio", errore=None):
+        def esegui():
+            self.chiamate += 1
+            self.sblocca.wait(5)
+            if errore is not None:
+                raise errore
+            return risultato
+        return esegui
+
+    def _in_parallelo(self, n, chiave, operazione):
+        executor = ThreadPoolExecutor(max_workers=n)
+        self.addCleanup(executor.shutdown)
+        futures = [executor.submit(self.coalescenza.esegui, chiave, operazione) for _ in range(n)]
+        # Rilascia l'operazione solo quando tutti i chiamanti sono in attesa
+        while self.coalescenza.statistiche()["risparmiate"] < n - 1:
+            threading.Event().wait(0.005)
+        self.sblocca.set()
+        return futures
+
+    def test_richieste_identiche_una_sola_chiamata(self):
+        futures = self._in_parallelo(5, "k", self._operazione())
+        self.assertEqual([f.result(timeout=5) for f in futures], [b"audio"] * 5)
+        self.assertEqual(self.chiamate, 1)
+        self.assertEqual(self.coalescenza.statistiche(), {"chiamate": 1, "risparmiate": 4, "in_corso": 0})
+
+    def test_errore_propagato_a_tutti_e_chiave_rilasciata(self):
+        futures = self._in_parallelo(3, "k", self._operazione(errore=ConnectionError("quota")))
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=5)
+        # Dopo un errore la chiamata successiva riprova davvero
+        self.assertEqual(self.coalescenza.esegui("k", self._operazione(b"nuovo")), b"nuovo")
+        self.assertEqual(self.chiamate, 2)
+
+    def test_chiavi_diverse_non_coalescono(self):
+        self.sblocca.set()
+        self.coalescenza.esegui("a", self._operazione())
+        self.coalescenza.esegui("b", self._operazione())
+        self.assertEqual(self.chiamate, 2)
+
+    def test_async_sopravvive_alla_cancellazione_del_capofila(self):
+        async def esegui():
+            sblocca = asyncio.Event()
+
+            async def operazione():
+                self.chiamate += 1
+                await sblocca.wait()
+                return b"audio"
+
+            capofila = asyncio.ensure_future(self.coalescenza.esegui_async("k", operazione))
+            await asyncio.sleep(0)
+            seguente = asyncio.ensure_future(self.coalescenza.esegui_async("k", operazione))
+            await asyncio.sleep(0)
+            capofila.cancel()
+            sblocca.set()
+            return await seguente
+
+        self.assertEqual(asyncio.run(esegui()), b"audio")
+        self.assertEqual(self.chiamate, 1)
+        self.assertEqual(self.coalescenza.statistiche()["in_corso"], 0)
+
+    def test_scadenza_del_capofila_non_ricade_su_chi_attende(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        # Il capofila ha una scadenza breve e la sua chiamata scade; chi attende non ne ha
+        capofila = executor.submit(self.coalescenza.esegui, "k", self._operazione(errore=ScadenzaSuperata("breve")),
+                                   time.monotonic() + 0.1)
+        while self.coalescenza.statistiche()["in_corso"] == 0:
+            time.sleep(0.005)
+        threading.Timer(0.1, self.sblocca.set).start()
+        self.assertEqual(self.coalescenza.esegui("k", self._operazione(b"proprio")), b"proprio")
+        with self.assertRaises(ScadenzaSuperata):
+            capofila.result(timeout=5)
+        self.assertEqual(self.chiamate, 2)
+
+    def test_chi_attende_rispetta_la_propria_scadenza(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        capofila = executor.submit(self.coalescenza.esegui, "k", self._operazione(), None)
+        while self.coalescenza.statistiche()["in_corso"] == 0:
+            time.sleep(0.005)
+        inizio = time.monotonic()
+        with self.assertRaises(ScadenzaSuperata):
+            self.coalescenza.esegui("k", self._operazione(), time.monotonic() + 0.1)
+        self.assertLess(time.monotonic() - inizio, 1)
+        # La chiamata del capofila prosegue
+        self.sblocca.set()
+        self.assertEqual(capofila.result(timeout=5), b"audio")
+
+    def test_async_scadenze_diverse(self):
+        async def esegui():
+            sblocca = asyncio.Event()
+
+            async def scade():
+                self.chiamate += 1
+                await sblocca.wait()
+                raise ScadenzaSuperata("breve")
+
+            async def proprio():
+                self.chiamate += 1
+                return b"proprio"
+
+            capofila = asyncio.ensure_future(self.coalescenza.esegui_async("k", scade, time.monotonic() + 0.1))
+            await asyncio.sleep(0)
+            breve = asyncio.ensure_future(self.coalescenza.esegui_async("k", proprio, time.monotonic() + 0.05))
+            senza = asyncio.ensure_future(self.coalescenza.esegui_async("k", proprio))
+            await asyncio.sleep(0.1)
+            sblocca.set()
+            return await asyncio.gather(capofila, breve, senza, return_exceptions=True)
+
+        capofila, breve, senza = asyncio.run(esegui())
+        self.assertIsInstance(capofila, ScadenzaSuperata)
+        self.assertIsInstance(breve, ScadenzaSuperata)
+        self.assertEqual(senza, b"proprio")
+        self.assertEqual(self.chiamate, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+import requests
+from DispatcherSintesi import DispatcherSintesi
+
+
+class RispostaFinta:
+    def __init__(self, stato=200, corpo=None):
+        self.status_code = stato
+        self.ok = stato < 400
+        self.corpo = corpo if corpo is not None else {"success": True}
+
+    def json(self):
+        if isinstance(self.corpo, Exception):
+            raise self.corpo
+        return self.corpo
+
+
+class SessioneFinta:
+    """Registra le richieste; 'ritardi' per testo, 'sblocca' per trattenere le risposte."""
+
+    def __init__(self, ritardi=None, risposte=None):
+        self.richieste = []
+        self.ritardi = ritardi or {}
+        self.risposte = risposte or {}
+        self.sblocca = threading.Event()
+        self.sblocca.set()
+        self.chiusa = False
+
+    def post(self, url, json, headers, timeout):
+        self.richieste.append((json, headers, timeout))
+        self.sblocca.wait(5)
+        time.sleep(self.ritardi.get(json["testo"], 0))
+        risposta = self.risposte.get(json["testo"], RispostaFinta())
+        if isinstance(risposta, Exception):
+            raise risposta
+        return risposta
+
+    def close(self):
+        self.chiusa = True
+
+
+class TestDispatcherSintesi(unittest.TestCase):
+    def _dispatcher(self, sessione, **opzioni):
+        consegne = []
+        dispatcher = DispatcherSintesi("http://voce/sintetizza", sessione=sessione,
+                                       alla_consegna=consegne.append, **opzioni)
+        return dispatcher, consegne
+
+    def test_consegna_in_ordine_con_risposte_fuori_ordine(self):
+        sessione = SessioneFinta(ritardi={"prima": 0.2})
+        dispatcher, consegne = self._dispatcher(sessione, lavoratori=2, timeout_risposta=20)
+        for testo in ("prima", "seconda", "terza"):
+            dispatcher.invia(testo, "it")
+        dispatcher.chiudi(5)
+        self.assertEqual([c.testo for c in consegne], ["prima", "seconda", "terza"])
+        self.assertTrue(all(c.esito == "ok" for c in consegne))
+        self.assertGreaterEqual(consegne[0].rtt_ms, 200)
+        json, headers, timeout = sessione.richieste[0]
+        self.assertEqual(json["priorita"], "interattiva")
+        self.assertEqual((headers["X-Request-Timeout"], timeout), ("20", (3.0, 20)))
+        self.assertTrue(sessione.chiusa)
+        self.assertEqual(dispatcher.statistiche()["riuscite"], 3)
+
+    def test_coda_piena_unisce_o_scarta(self):
+        sessione = SessioneFinta()
+        sessione.sblocca.clear()
+        dispatcher, consegne = self._dispatcher(sessione, lavoratori=1, max_in_attesa=2)
+        dispatcher.invia("uno", "it")
+        while not sessione.richieste:
+            time.sleep(0.001)
+        # "uno" è in volo; "due" e "three" riempiono la coda
+        dispatcher.invia("due", "it")
+        dispatcher.invia("three", "en")
+        dispatcher.invia("four", "en")
+        dispatcher.invia("cinque", "it")
+        sessione.sblocca.set()
+        dispatcher.chiudi(5)
+        self.assertEqual([(c.testo, c.esito) for c in consegne],
+                         [("uno", "ok"), ("due", "scartata"), ("three four", "ok"), ("cinque", "ok")])
+        statistiche = dispatcher.statistiche()
+        self.assertEqual((statistiche["unite"], statistiche["scartate"]), (1, 1))
+
+    def test_frasi_vecchie_non_inviate(self):
+        sessione = SessioneFinta(ritardi={"lenta": 0.15})
+        dispatcher, consegne = self._dispatcher(sessione, lavoratori=1, eta_massima=0.1)
+        dispatcher.invia("lenta")
+        dispatcher.invia("vecchia")
+        dispatcher.chiudi(5)
+        self.assertEqual([c.esito for c in consegne], ["ok", "scartata"])
+        self.assertEqual(len(sessione.richieste), 1)
+
+    def test_errori_http_e_del_server(self):
+        sessione = SessioneFinta(risposte={
+            "rete": requests.ConnectionError("rifiutata"),
+            "quota": RispostaFinta(429, {"success": False, "message": "Quota esaurita"}),
+        })
+        dispatcher, consegne = self._dispatcher(sessione, lavoratori=1)
+        dispatcher.invia("rete")
+        dispatcher.invia("quota")
+        dispatcher.chiudi(5)
+        self.assertEqual([c.esito for c in consegne], ["errore", "errore"])
+        self.assertIsNone(consegne[0].rtt_ms)
+        self.assertEqual(consegne[1].messaggio, "HTTP 429: Quota esaurita")
+        self.assertEqual(dispatcher.statistiche()["fallite"], 2)
+
+    def test_risposta_non_json_mantiene_rtt_e_stato(self):
+        html = requests.exceptions.JSONDecodeError("Expecting value", "<html>Bad Gateway</html>", 0)
+        sessione = SessioneFinta(risposte={"proxy": RispostaFinta(502, html)})
+        dispatcher, consegne = self._dispatcher(sessione)
+        dispatcher.invia("proxy")
+        dispatcher.chiudi(5)
+        self.assertEqual(consegne[0].esito, "errore")
+        self.assertIsNotNone(consegne[0].rtt_ms)
+        self.assertEqual(consegne[0].messaggio, "Risposta JSON non valida (HTTP 502).")
+
+
+if __name__ == "__main__":
+    unittest.main()
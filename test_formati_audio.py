@@ -0,0 +1,86 @@
+import io
+import wave
+import unittest
+import numpy as np
+import soundfile as sf
+from formati_audio import FORMATI, formato, negozia_formato, unisci_audio, adatta_per_stream
+
+
+def _wav(campioni: bytes, frequenza: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(frequenza)
+        w.writeframes(campioni)
+    return buffer.getvalue()
+
+
+def _ogg_opus(secondi: float, frequenza: float = 440.0) -> bytes:
+    """Un flusso Ogg Opus completo, come quello restituito da Google per ogni blocco."""
+    t = np.arange(int(48000 * secondi)) / 48000
+    buffer = io.BytesIO()
+    sf.write(buffer, (0.3 * np.sin(2 * np.pi * frequenza * t)).astype("float32"), 48000,
+             format="OGG", subtype="OPUS")
+    return buffer.getvalue()
+
+
+def _secondi_decodificati(audio: bytes) -> float:
+    campioni, frequenza = sf.read(io.BytesIO(audio))
+    return len(campioni) / frequenza
+
+
+class TestFormatiAudio(unittest.TestCase):
+    def test_formato_per_nome(self):
+        self.assertEqual(formato(None).nome, "mp3")
+        self.assertEqual(formato(" OGG_OPUS ").encoding, "OGG_OPUS")
+        with self.assertRaises(ValueError):
+            formato("flac")
+
+    def test_negoziazione_accept(self):
+        self.assertEqual(negozia_formato(None), "mp3")
+        self.assertEqual(negozia_formato("*/*"), "mp3")
+        self.assertEqual(negozia_formato("audio/ogg"), "ogg_opus")
+        self.assertEqual(negozia_formato("audio/mpeg;q=0.5, audio/wav"), "linear16")
+        # µ-law arriva in un WAV: un client che accetta solo audio/basic non lo riceve
+        self.assertEqual(negozia_formato("audio/basic, audio/mpeg"), "mp3")
+        self.assertIsNone(negozia_formato("audio/basic"))
+        self.assertIsNone(negozia_formato("application/json"))
+        self.assertIsNone(negozia_formato("audio/ogg;q=0"))
+
+    def test_unisci_wav_sotto_un_solo_header(self):
+        unito = unisci_audio([_wav(b"\x01\x00" * 10), _wav(b"\x02\x00" * 5)], FORMATI["linear16"])
+        with wave.open(io.BytesIO(unito)) as w:
+            self.assertEqual(w.getnframes(), 15)
+            self.assertEqual(w.getframerate(), 8000)
+        self.assertEqual(unisci_audio([b"a", b"b"], FORMATI["mp3"]), b"ab")
+
+    def test_stream_wav_un_header_poi_campioni(self):
+        blocchi = list(adatta_per_stream([_wav(b"\x01\x00" * 10), _wav(b"\x02\x00" * 5)], FORMATI["linear16"]))
+        self.assertTrue(blocchi[0].startswith(b"RIFF"))
+        self.assertEqual(blocchi[1], b"\x02\x00" * 5)
+        # Il file salvato a fine stream viene ricostruito con la lunghezza corretta
+        with wave.open(io.BytesIO(unisci_audio(blocchi, FORMATI["linear16"]))) as w:
+            self.assertEqual(w.getnframes(), 15)
+
+
+    def test_unisci_ogg_in_un_solo_flusso_logico(self):
+        parti = [_ogg_opus(1.0, 440), _ogg_opus(0.5, 660), _ogg_opus(2.0, 330)]
+        # Concatenati così come sono, il decoder si ferma al primo blocco
+        self.assertAlmostEqual(_secondi_decodificati(b"".join(parti)), 1.0, places=2)
+        unito = unisci_audio(parti, FORMATI["ogg_opus"])
+        self.assertEqual(unito.count(b"OpusHead"), 1)
+        self.assertAlmostEqual(_secondi_decodificati(unito), 3.5, places=1)
+        self.assertEqual(unisci_audio(parti[:1], FORMATI["ogg_opus"]), parti[0])
+
+    def test_stream_ogg_in_un_solo_flusso_logico(self):
+        blocchi = list(adatta_per_stream([_ogg_opus(1.0, 440), _ogg_opus(2.0, 330)], FORMATI["ogg_opus"]))
+        # Blocchi più la pagina di fine flusso
+        self.assertEqual(len(blocchi), 3)
+        self.assertAlmostEqual(_secondi_decodificati(b"".join(blocchi)), 3.0, places=1)
+        # Il file salvato a fine stream è la semplice concatenazione
+        self.assertEqual(unisci_audio(blocchi, FORMATI["ogg_opus"]), b"".join(blocchi))
+
+
+if __name__ == "__main__":
+    unittest.main()
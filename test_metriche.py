@@ -0,0 +1,49 @@
+import unittest
+from metriche import RegistroMetriche
+
+
+class TestMetriche(unittest.TestCase):
+    def setUp(self):
+        self.registro = RegistroMetriche()
+
+    def test_counter_con_etichette(self):
+        richieste = self.registro.counter("richieste_total", "Richieste.", ("esito",))
+        richieste.labels(esito="successo").inc()
+        richieste.labels(esito="successo").inc(2)
+        testo = self.registro.esporta()
+        self.assertIn("# TYPE richieste_total counter", testo)
+        self.assertIn('richieste_total{esito="successo"} 3.0', testo)
+
+    def test_gauge_in_corso(self):
+        in_corso = self.registro.gauge("in_corso", "In corso.")
+        with in_corso.in_corso():
+            self.assertIn("in_corso 1.0", self.registro.esporta())
+        self.assertIn("in_corso 0.0", self.registro.esporta())
+
+    def test_histogram_bucket_cumulativi(self):
+        durata = self.registro.histogram("durata_secondi", "Durata.", ("fase",), bucket=(0.1, 1.0))
+        durata.labels(fase="sintesi").observe(0.05)
+        durata.labels(fase="sintesi").observe(0.5)
+        durata.labels(fase="sintesi").observe(5)
+        testo = self.registro.esporta()
+        self.assertIn('durata_secondi_bucket{fase="sintesi",le="0.1"} 1', testo)
+        self.assertIn('durata_secondi_bucket{fase="sintesi",le="1.0"} 2', testo)
+        self.assertIn('durata_secondi_bucket{fase="sintesi",le="+Inf"} 3', testo)
+        self.assertIn('durata_secondi_count{fase="sintesi"} 3', testo)
+        self.assertIn('durata_secondi_sum{fase="sintesi"} 5.55', testo)
+
+    def test_cronometra_registra_anche_su_eccezione(self):
+        durata = self.registro.histogram("durata_secondi", "Durata.")
+        with self.assertRaises(RuntimeError):
+            with durata.cronometra():
+                raise RuntimeError("errore")
+        self.assertIn("durata_secondi_count 1", self.registro.esporta())
+
+    def test_registrazione_idempotente(self):
+        a = self.registro.counter("x_total", "X.")
+        b = self.registro.counter("x_total", "X.")
+        self.assertIs(a, b)
+
+
+if __name__ == "__main__":
+    unittest.main()
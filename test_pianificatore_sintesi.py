@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import unittest
+from PianificatoreSintesi import PianificatoreSintesi, SintesiRifiutata, e_quota_esaurita
+
+
+class TestPianificatoreSintesi(unittest.TestCase):
+    def test_attesa_oltre_il_limite_rifiutata(self):
+        # 600 caratteri al minuto = 10 al secondo; 120 riservati alla classe interattiva
+        pianificatore = PianificatoreSintesi(600, attesa_massima=1)
+        pianificatore.acquisisci(480, "normale")
+        with self.assertRaises(SintesiRifiutata) as contesto:
+            pianificatore.acquisisci(100, "normale")
+        self.assertEqual(contesto.exception.retry_after, 10)
+        self.assertEqual(pianificatore.statistiche()["rifiutate"], 1)
+
+    def test_riserva_interattiva(self):
+        pianificatore = PianificatoreSintesi(600, attesa_massima=1)
+        pianificatore.acquisisci(480, "bulk")
+        # La riserva resta disponibile all'assistente vocale
+        pianificatore.acquisisci(100, "interattiva")
+        self.assertEqual(pianificatore.statistiche()["ammesse"], 2)
+
+    def test_coda_piena_rifiutata(self):
+        pianificatore = PianificatoreSintesi(600, max_in_coda={"bulk": 0})
+        with self.assertRaises(SintesiRifiutata):
+            pianificatore.acquisisci(10, "bulk")
+
+    def test_interattiva_servita_prima_della_bulk_in_coda(self):
+        pianificatore = PianificatoreSintesi(60000, riserva_interattiva=0)
+        pianificatore.acquisisci(60000, "interattiva")
+        ordine = []
+
+        def acquisisci(priorita):
+            pianificatore.acquisisci(200, priorita)
+            ordine.append(priorita)
+
+        bulk = threading.Thread(target=acquisisci, args=("bulk",))
+        bulk.start()
+        while pianificatore.statistiche()["in_coda"]["bulk"] == 0:
+            threading.Event().wait(0.001)
+        interattiva = threading.Thread(target=acquisisci, args=("interattiva",))
+        interattiva.start()
+        bulk.join(5)
+        interattiva.join(5)
+        self.assertEqual(ordine, ["interattiva", "bulk"])
+
+    def test_attesa_asincrona_in_ordine_di_priorita(self):
+        pianificatore = PianificatoreSintesi(60000, riserva_interattiva=0)
+        pianificatore.acquisisci(60000, "interattiva")
+        ordine = []
+
+        async def acquisisci(priorita):
+            await pianificatore.acquisisci_async(200, priorita)
+            ordine.append(priorita)
+
+        async def principale():
+            thread = threading.active_count()
+            bulk = asyncio.ensure_future(acquisisci("bulk"))
+            await asyncio.sleep(0.01)
+            interattiva = asyncio.ensure_future(acquisisci("interattiva"))
+            await asyncio.sleep(0.01)
+            # Le richieste in attesa non occupano thread
+            self.assertEqual(pianificatore.statistiche()["in_coda"], {"interattiva": 1, "normale": 0, "bulk": 1})
+            self.assertEqual(threading.active_count(), thread)
+            await asyncio.wait_for(asyncio.gather(bulk, interattiva), 5)
+
+        asyncio.run(principale())
+        self.assertEqual(ordine, ["interattiva", "bulk"])
+
+    def test_attesa_asincrona_annullata_lascia_la_coda(self):
+        pianificatore = PianificatoreSintesi(600, attesa_massima=60)
+        pianificatore.acquisisci(480, "normale")
+
+        async def principale():
+            attesa = asyncio.ensure_future(pianificatore.acquisisci_async(100, "normale"))
+            await asyncio.sleep(0.01)
+            attesa.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await attesa
+
+        asyncio.run(principale())
+        self.assertEqual(pianificatore.statistiche()["in_coda"]["normale"], 0)
+
+    def test_quota_esaurita_svuota_il_secchio(self):
+        pianificatore = PianificatoreSintesi(600, attesa_massima=1)
+        errore = pianificatore.quota_esaurita(100, "normale")
+        self.assertIsInstance(errore, SintesiRifiutata)
+        self.assertGreaterEqual(errore.retry_after, 1)
+        self.assertEqual(pianificatore.statistiche()["quota_google"], 1)
+        with self.assertRaises(SintesiRifiutata):
+            pianificatore.acquisisci(100, "interattiva")
+
+    def test_prova_acquisire_senza_attesa(self):
+        pianificatore = PianificatoreSintesi(600)
+        self.assertTrue(pianificatore.prova_acquisire(400, "normale"))
+        # Restano 200 gettoni, 120 dei quali riservati all'assistente vocale
+        self.assertFalse(pianificatore.prova_acquisire(100, "normale"))
+        self.assertTrue(pianificatore.prova_acquisire(100, "interattiva"))
+
+    def test_priorita_non_valida(self):
+        with self.assertRaises(ValueError):
+            PianificatoreSintesi(600).acquisisci(10, "urgente")
+
+    def test_riconosce_errore_quota_google(self):
+        class ResourceExhausted(Exception):
+            pass
+
+        self.assertTrue(e_quota_esaurita(ResourceExhausted("429 Quota exceeded")))
+        self.assertFalse(e_quota_esaurita(ConnectionError("timeout")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+import unittest
+from PoliticaChiamate import PoliticaChiamate, ScadenzaSuperata, e_ritentabile
+
+
+class ServiceUnavailable(Exception):
+    """Come google.api_core.exceptions.ServiceUnavailable."""
+    code = 503
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+class TestPoliticaChiamate(unittest.TestCase):
+    def _politica(self, **opzioni):
+        return PoliticaChiamate(attesa_base=0.001, attesa_massima=0.002, **opzioni)
+
+    def test_errore_transitorio_ritentato(self):
+        esiti = [ServiceUnavailable("503"), ServiceUnavailable("503"), b"audio"]
+        timeout = []
+
+        def chiamata(t):
+            timeout.append(t)
+            esito = esiti.pop(0)
+            if isinstance(esito, Exception):
+                raise esito
+            return esito
+
+        politica = self._politica(timeout_tentativo=5)
+        self.assertEqual(politica.esegui(chiamata), b"audio")
+        self.assertEqual(timeout, [5, 5, 5])
+        self.assertEqual(politica.statistiche()["ritentativi"], 2)
+
+    def test_errore_non_ritentabile_e_tentativi_esauriti(self):
+        chiamate = []
+
+        def non_valida(t):
+            chiamate.append(t)
+            raise InvalidArgument("voce sconosciuta")
+
+        with self.assertRaises(InvalidArgument):
+            self._politica().esegui(non_valida)
+        self.assertEqual(len(chiamate), 1)
+
+        def sempre_503(t):
+            chiamate.append(t)
+            raise ServiceUnavailable("503")
+
+        with self.assertRaises(ServiceUnavailable):
+            self._politica(max_tentativi=2).esegui(sempre_503)
+        self.assertEqual(len(chiamate), 3)
+
+    def test_scadenza_limita_il_timeout_e_interrompe(self):
+        timeout = []
+        politica = self._politica(timeout_tentativo=15)
+        politica.esegui(lambda t: timeout.append(t), scadenza=time.monotonic() + 2)
+        self.assertLessEqual(timeout[0], 2)
+
+        with self.assertRaises(ScadenzaSuperata):
+            politica.esegui(lambda t: b"audio", scadenza=time.monotonic() - 1)
+        self.assertEqual(politica.statistiche()["scadenze_superate"], 1)
+
+    def test_hedging_vince_la_risposta_piu_rapida(self):
+        politica = self._politica(hedging=True, min_campioni_hedging=5)
+        for _ in range(5):
+            politica.esegui(lambda t: b"veloce")
+        lenta = threading.Event()
+        self.addCleanup(lenta.set)
+        chiamate = []
+
+        def chiamata(t):
+            chiamate.append(t)
+            if len(chiamate) == 1:
+                lenta.wait(5)
+                return b"lenta"
+            return b"duplicato"
+
+        self.assertEqual(politica.esegui(chiamata), b"duplicato")
+        statistiche = politica.statistiche()
+        self.assertEqual((statistiche["hedge"], statistiche["hedge_vinti"]), (1, 1))
+
+    def test_hedging_non_parte_senza_consenso(self):
+        politica = self._politica(hedging=True, min_campioni_hedging=5)
+        for _ in range(5):
+            politica.esegui(lambda t: b"veloce")
+
+        def lenta(t):
+            time.sleep(0.05)
+            return b"lenta"
+
+        self.assertEqual(politica.esegui(lenta, consenti_hedge=lambda: False), b"lenta")
+        self.assertEqual(politica.statistiche()["hedge"], 0)
+
+    def test_hedging_async_cancella_il_perdente(self):
+        politica = self._politica(hedging=True, min_campioni_hedging=5)
+        cancellate = []
+
+        async def esegui():
+            async def veloce(t):
+                return b"veloce"
+
+            for _ in range(5):
+                await politica.esegui_async(veloce)
+            chiamate = []
+
+            async def chiamata(t):
+                chiamate.append(t)
+                if len(chiamate) == 1:
+                    try:
+                        await asyncio.sleep(5)
+                    except asyncio.CancelledError:
+                        cancellate.append(True)
+                        raise
+                return b"duplicato"
+
+            return await politica.esegui_async(chiamata)
+
+        self.assertEqual(asyncio.run(esegui()), b"duplicato")
+        self.assertEqual(cancellate, [True])
+
+    def test_errori_ritentabili(self):
+        self.assertTrue(e_ritentabile(ServiceUnavailable()))
+        self.assertTrue(e_ritentabile(ConnectionError()))
+        self.assertFalse(e_ritentabile(InvalidArgument()))
+        self.assertFalse(e_ritentabile(ScadenzaSuperata()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from formati_audio import FORMATI
+from prerender_frasi import NOME_MANIFEST, leggi_corpus, leggi_manifest, prerenderizza
+from SynthesisCache import SynthesisCache
+
+
+class MotoreFinto:
+    """Espone l'interfaccia di GoogleSpeaker usata dal pre-render, senza Google."""
+
+    def __init__(self, fallisce=()):
+        self.sintetizzati = []
+        self.fallisce = set(fallisce)
+
+    def crea_spec(self, voce=None, lingua=None, velocita=None, formato=None, sample_rate=None,
+                  effetti=None, priorita=None):
+        if formato is not None and formato not in FORMATI:
+            raise ValueError(f"Formato non valido: {formato}")
+        formato = formato or "mp3"
+        return SimpleNamespace(voce=voce, lingua=lingua or "it", velocita=velocita, formato=formato,
+                               nome_voce=f"{lingua or 'it'}-{voce}", formato_audio=FORMATI[formato])
+
+    @staticmethod
+    def chiave_sintesi(testo, spec):
+        return hashlib.sha256(f"{testo}|{spec.nome_voce}|{spec.velocita}|{spec.formato}".encode()).hexdigest()
+
+    def sintetizza(self, testo, spec):
+        if testo in self.fallisce:
+            raise ConnectionError("503")
+        self.sintetizzati.append(testo)
+        return f"audio:{testo}".encode()
+
+
+class TestPrerenderFrasi(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.cartella = self.dir / "prerender"
+
+    def _scrivi(self, nome, contenuto):
+        percorso = self.dir / nome
+        percorso.write_text(contenuto, encoding="utf-8")
+        return str(percorso)
+
+    def test_leggi_corpus_jsonl_csv_e_profilo(self):
+        jsonl = self._scrivi("ivr.jsonl", '# menu principale\n{"testo": "Premi uno", "lingua": "it"}\n\n"Grazie"\n')
+        self.assertEqual(leggi_corpus(jsonl), [{"testo": "Premi uno", "lingua": "it"}, {"testo": "Grazie"}])
+        csv = self._scrivi("ivr.csv", "testo,voce,velocita\nPremi due,maschile,\nArrivederci,,120\n")
+        self.assertEqual(leggi_corpus(csv), [{"testo": "Premi due", "voce": "maschile"},
+                                             {"testo": "Arrivederci", "velocita": "120"}])
+        profilo = self._scrivi("admin.json", json.dumps({"riconoscimento": {"frasi_chiave": ["Riconoscimi"]}}))
+        self.assertEqual(leggi_corpus(profilo), [{"testo": "Riconoscimi"}])
+        with self.assertRaises(ValueError):
+            leggi_corpus(self._scrivi("corpus.txt", "Ciao"))
+
+    def test_manifest_deduplica_e_frasi_non_valide(self):
+        corpus = [{"testo": "Premi uno", "id": "menu-1"}, {"testo": "Premi uno"}, {"testo": ""},
+                  {"testo": "Premi due", "formato": "flac"}, {"testo": "Premi tre", "voce": "maschile"}]
+        motore = MotoreFinto()
+        esito = prerenderizza(corpus, motore, cartella=str(self.cartella), max_paralleli=2)
+        self.assertEqual(esito, {"totale": 5, "saltate": 1, "sintetizzate": 2, "fallite": 0, "non_valide": 2})
+        voci = leggi_manifest(self.cartella / NOME_MANIFEST)
+        self.assertEqual(sorted(v["testo"] for v in voci.values()), ["Premi tre", "Premi uno"])
+        voce = next(v for v in voci.values() if v["id"] == "menu-1")
+        self.assertEqual((self.cartella / voce["file"]).read_bytes(), b"audio:Premi uno")
+
+    def test_ripresa_dopo_fallimenti(self):
+        corpus = [{"testo": "Uno"}, {"testo": "Due"}, {"testo": "Tre"}]
+        esito = prerenderizza(corpus, MotoreFinto(fallisce={"Due"}), cartella=str(self.cartella))
+        self.assertEqual((esito["sintetizzate"], esito["fallite"]), (2, 1))
+
+        # La seconda esecuzione sintetizza solo la frase mancante
+        motore = MotoreFinto()
+        esito = prerenderizza(corpus, motore, cartella=str(self.cartella))
+        self.assertEqual((esito["sintetizzate"], esito["saltate"]), (1, 2))
+        self.assertEqual(motore.sintetizzati, ["Due"])
+
+    def test_manifest_caricato_nella_cache(self):
+        motore = MotoreFinto()
+        prerenderizza([{"testo": "Benvenuto"}], motore, cartella=str(self.cartella))
+        chiave = motore.chiave_sintesi("Benvenuto", motore.crea_spec(voce="femminile", velocita=170))
+
+        cache = SynthesisCache(cache_dir=None)
+        self.assertEqual(cache.carica_manifest(str(self.cartella / NOME_MANIFEST)), 1)
+        cache.svuota()
+        self.assertEqual(cache.get(chiave), b"audio:Benvenuto")
+        self.assertEqual(cache.statistiche()["hit_prerender"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+import langdetect.detector_factory
+from RilevatoreLingua import RilevatoreLingua
+from VoiceRegistry import VoiceRegistry
+
+TEDESCO = "Guten Tag wie geht es Ihnen heute"
+
+
+class TestRilevatoreLingua(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rilevatore = RilevatoreLingua(lingue=("it", "en", "fr", "es"), dimensione_cache=2)
+
+    def test_frasi(self):
+        casi = {"Accendi la luce della cucina per favore": "it",
+                "What is the weather like in London today?": "en",
+                "Quel temps fait-il aujourd'hui à Paris ?": "fr",
+                "¿Qué tiempo hace hoy en Madrid?": "es"}
+        for testo, lingua in casi.items():
+            esito = self.rilevatore.rileva(testo)
+            self.assertEqual(esito.lingua, lingua, testo)
+            self.assertEqual(esito.metodo, "modello")
+            self.assertGreater(esito.confidenza, 0.5)
+
+    def test_testi_brevi(self):
+        self.assertEqual(self.rilevatore.rileva("thank you").lingua, "en")
+        self.assertEqual(self.rilevatore.rileva("grazie").metodo, "parole")
+        # Nessuna parola nota: lingua predefinita senza confidenza
+        esito = self.rilevatore.rileva("Mario Rossi")
+        self.assertEqual((esito.lingua, esito.confidenza, esito.metodo), ("it", 0.0, "predefinita"))
+
+    def test_cache_e_determinismo(self):
+        testo = "Domani mattina ricordami di chiamare il dentista"
+        primo = self.rilevatore.rileva(testo)
+        secondo = self.rilevatore.rileva(f"  {testo.upper()} ")
+        self.assertEqual(secondo.metodo, "cache")
+        self.assertEqual((primo.lingua, primo.confidenza), (secondo.lingua, secondo.confidenza))
+        # Oltre la dimensione della cache il testo va rielaborato, con lo stesso esito
+        self.rilevatore.rileva("ciao")
+        self.rilevatore.rileva("hello")
+        self.assertEqual(self.rilevatore.rileva(testo), primo)
+
+    def test_factory_globale_intatta(self):
+        self.assertIsNone(langdetect.detector_factory.DetectorFactory.seed)
+        self.assertIsNone(langdetect.detector_factory._factory)
+
+    def test_lingua_senza_voci_non_diventa_la_piu_vicina(self):
+        esito = self.rilevatore.rileva(TEDESCO)
+        self.assertEqual((esito.lingua, esito.confidenza, esito.metodo), ("it", 0.0, "predefinita"))
+
+    def test_lingue_dal_catalogo_delle_voci(self):
+        catalogo = [{"name": "de-DE-Neural2-B", "language_codes": ["de-DE"], "ssml_gender": "MALE"}]
+        registro = VoiceRegistry(cache_file=None, elenca_voci=lambda: catalogo)
+        with mock.patch.object(VoiceRegistry, "_predefinito", registro):
+            rilevatore = RilevatoreLingua()
+        self.assertIn("de", rilevatore.lingue)
+        self.assertNotIn("ig", rilevatore.lingue)  # nessun profilo langdetect
+        esito = rilevatore.rileva(TEDESCO)
+        self.assertEqual((esito.lingua, esito.metodo), ("de", "modello"))
+
+    def test_lingue_non_riconoscibili(self):
+        with self.assertRaises(ValueError):
+            RilevatoreLingua(lingue=("ig",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+import numpy as np
+from RilevatoreParolaChiave import FREQUENZA_CAMPIONAMENTO, RilevatoreParolaChiave, segmenti_voce
+from test_rilevatore_voce import pcm16
+
+FS = FREQUENZA_CAMPIONAMENTO
+
+
+def sillabe(frequenze, durata=0.15, seme=0):
+    """Parola sintetica: una sillaba armonica per frequenza fondamentale, con un filo di rumore."""
+    rng = np.random.default_rng(seme)
+    t = np.arange(int(durata * FS)) / FS
+    parti = [sum(np.sin(2 * np.pi * f * k * t) / k for k in range(1, 6)) * np.hanning(len(t)) for f in frequenze]
+    y = np.concatenate(parti) * 0.3
+    return (y + rng.normal(0, 0.003, len(y))).astype(np.float32)
+
+
+def silenzio(durata, seme=0):
+    return np.random.default_rng(seme).normal(0, 0.001, int(durata * FS)).astype(np.float32)
+
+
+def parola_chiave(seme=0, scala=1.0):
+    return sillabe([220 * scala, 330 * scala, 260 * scala], seme=seme)
+
+
+class TestRilevatoreParolaChiave(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rilevatore = RilevatoreParolaChiave.iscrivi(
+            [np.concatenate([silenzio(0.3, s), parola_chiave(s, 1 + s / 100), silenzio(0.3, s)]) for s in range(3)])
+
+    def test_vad_trova_i_tratti_di_parlato(self):
+        y = np.concatenate([silenzio(0.5), parola_chiave(), silenzio(0.5), sillabe([500, 600])])
+        segmenti = segmenti_voce(y)
+        self.assertEqual(len(segmenti), 2)
+        self.assertAlmostEqual(segmenti[0][0] / FS, 0.5, delta=0.05)
+        self.assertEqual(segmenti_voce(silenzio(1.0)), [])
+        # Registrazione che inizia direttamente con la parola chiave
+        [(inizio, _)] = segmenti_voce(np.concatenate([parola_chiave(), silenzio(0.5)]))
+        self.assertEqual(inizio, 0)
+
+    def test_parola_chiave_seguita_dalla_frase(self):
+        frase = sillabe([500, 420, 610, 380, 450, 520], seme=7)
+        esito = self.rilevatore.rileva(pcm16(np.concatenate([silenzio(0.4, 9), parola_chiave(9), frase])))
+        self.assertTrue(esito.trovata)
+        # La frase inizia dopo 0.4 s di silenzio e 0.45 s di parola chiave
+        self.assertAlmostEqual(esito.fine, 0.85, delta=0.1)
+
+    def test_altre_parole_e_rumore_rifiutati(self):
+        for y in (sillabe([600, 450, 700], seme=4), sillabe([260, 330, 220], seme=5), silenzio(1.0)):
+            self.assertFalse(self.rilevatore.rileva(np.concatenate([silenzio(0.3), y, silenzio(0.3)])).trovata)
+
+    def test_iscrizione_richiede_parlato_e_due_registrazioni(self):
+        with self.assertRaises(ValueError):
+            RilevatoreParolaChiave.iscrivi([silenzio(1.0), parola_chiave()])
+        with self.assertRaises(ValueError):
+            RilevatoreParolaChiave.iscrivi([parola_chiave()])
+        self.assertEqual(RilevatoreParolaChiave.iscrivi([parola_chiave()], soglia=5.0).soglia, 5.0)
+
+    def test_salva_carica_e_valuta_su_wav(self):
+        cartella = Path(tempfile.mkdtemp())
+        self.rilevatore.salva(str(cartella / "parola_chiave.pkl"))
+        rilevatore = RilevatoreParolaChiave.carica(str(cartella / "parola_chiave.pkl"))
+
+        def scrivi(nome, y):
+            with wave.open(str(cartella / nome), "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(FS)
+                f.writeframes(pcm16(y))
+            return str(cartella / nome)
+
+        positivi = [scrivi(f"si{s}.wav", np.concatenate([silenzio(0.3, s), parola_chiave(s), silenzio(0.5, s)]))
+                    for s in (11, 12)]
+        negativi = [scrivi("no.wav", np.concatenate([silenzio(0.3), sillabe([600, 450, 700]), silenzio(0.3)]))]
+        esito = rilevatore.valuta(positivi, negativi)
+        self.assertEqual((esito["tasso_falsi_rifiuti"], esito["tasso_falsi_allarmi"]), (0.0, 0.0))
+        # Dopo la parola chiave restano circa 0.5 s di silenzio da attendere
+        self.assertGreaterEqual(esito["latenza_ms_media"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
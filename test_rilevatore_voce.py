@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+import numpy as np
+from RilevatoreVoce import DURATA_FRAME, RilevatoreVoce, StimaRumore, leggi_wav, segmenta
+
+FS = 16000
+
+
+# Segnali sintetici condivisi con i test della cattura e della parola chiave
+
+def tono(durata, ampiezza=0.3, frequenza=220):
+    t = np.arange(int(durata * FS)) / FS
+    return ampiezza * np.sin(2 * np.pi * frequenza * t)
+
+
+def rumore(durata, ampiezza=0.005, seme=0):
+    return np.random.default_rng(seme).normal(0, ampiezza, int(durata * FS))
+
+
+def pcm16(*parti):
+    return (np.clip(np.concatenate(parti), -1, 1) * 32767).astype("<i2").tobytes()
+
+
+class TestRilevatoreVoce(unittest.TestCase):
+    def test_comando_breve_chiuso_dopo_il_silenzio_finale(self):
+        cartella = Path(tempfile.mkdtemp())
+        with wave.open(str(cartella / "comando.wav"), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(FS)
+            f.writeframes(pcm16(rumore(0.5), tono(0.8) + rumore(0.8, seme=1), rumore(3.0, seme=2)))
+        pcm, frequenza = leggi_wav(str(cartella / "comando.wav"))
+
+        [enunciato] = segmenta(pcm, frequenza, silenzio_finale=0.5)
+        self.assertAlmostEqual(enunciato.inizio * DURATA_FRAME, 0.5, delta=0.04)
+        self.assertAlmostEqual(enunciato.fine * DURATA_FRAME, 1.3, delta=0.04)
+        self.assertFalse(enunciato.troncato)
+        # Latenza: durata del comando più il silenzio finale, non una durata fissa di registrazione
+        self.assertAlmostEqual((enunciato.decisione - enunciato.inizio) * DURATA_FRAME, 0.8 + 0.5, delta=0.06)
+
+    def test_pause_brevi_e_durata_massima(self):
+        # Una pausa di 0.3 s non chiude l'enunciato; il parlato continuo viene troncato
+        parlato = pcm16(rumore(0.5), tono(1.0), rumore(0.3), tono(1.0), rumore(1.0), tono(5.0), rumore(1.0))
+        primo, secondo, resto = segmenta(parlato, FS, silenzio_finale=0.5, durata_massima=3.0)
+        self.assertAlmostEqual((primo.fine - primo.inizio) * DURATA_FRAME, 2.3, delta=0.06)
+        self.assertTrue(secondo.troncato)
+        self.assertEqual(secondo.fine - secondo.inizio, 3.0 / DURATA_FRAME)
+        # Il parlato oltre il limite apre un nuovo enunciato
+        self.assertEqual(resto.inizio, secondo.fine)
+        self.assertFalse(resto.troncato)
+
+    def test_enunciato_aperto_a_fine_buffer(self):
+        [enunciato] = segmenta(pcm16(rumore(0.5), tono(1.0)), FS)
+        self.assertAlmostEqual(enunciato.inizio * DURATA_FRAME, 0.5, delta=0.04)
+        self.assertEqual(enunciato.fine, enunciato.decisione)
+        # Un buffer che inizia già con il parlato ha bisogno della stima del rumore iniziale
+        self.assertEqual(segmenta(pcm16(tono(1.0), rumore(0.1)), FS), [])
+        [enunciato] = segmenta(pcm16(tono(1.0), rumore(0.1)), FS, rumore_iniziale=0.005 * 32767)
+        self.assertEqual(enunciato.inizio, 0)
+
+    def test_clic_isolati_ignorati(self):
+        clic = np.concatenate([rumore(0.5), tono(0.04), rumore(1.0, seme=1)])
+        self.assertEqual(segmenta(pcm16(clic), FS), [])
+
+    def test_frame_in_streaming_con_stima_condivisa(self):
+        stima = StimaRumore()
+        stima.aggiorna(0.005 * 32767, 1.0)
+        rilevatore = RilevatoreVoce(DURATA_FRAME, silenzio_finale=0.2, stima=stima)
+        pcm = pcm16(tono(0.4), rumore(0.5))
+        byte_frame = int(FS * DURATA_FRAME) * 2
+        esiti = [rilevatore.aggiungi(pcm[i:i + byte_frame]) for i in range(0, len(pcm), byte_frame)]
+        self.assertEqual(sum(e is not None for e in esiti), 1)
+        self.assertFalse(rilevatore.in_parlato)
+        # La stima condivisa la aggiorna chi l'ha creata, non il rilevatore
+        self.assertEqual(stima.rumore, 0.005 * 32767)
+
+
+if __name__ == "__main__":
+    unittest.main()
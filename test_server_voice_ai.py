@@ -0,0 +1,95 @@
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+from AvvioMotore import AvvioMotore
+import server_voice_ai
+from server_voice_ai import api
+from test_voiceai import ClientFinto, VoiceAIFinta
+
+
+class TestServerVoiceAI(unittest.TestCase):
+    opzioni = {}
+
+    def setUp(self):
+        self.client_google = ClientFinto()
+        self.voce_ai = VoiceAIFinta(self.client_google, **self.opzioni)
+        app = Flask(__name__)
+        app.register_blueprint(api)
+        avvio = AvvioMotore(lambda: self.voce_ai)
+        app.extensions["avvio_motore"] = avvio
+        avvio.avvia()
+        # Le chiamate del riscaldamento non contano
+        inizio = time.monotonic()
+        while not avvio.pronto and time.monotonic() - inizio < 5:
+            time.sleep(0.01)
+        self.client_google.chiamate.clear()
+        self.avvio = avvio
+        self.http = app.test_client()
+
+    def tearDown(self):
+        self.voce_ai._tmp.cleanup()
+
+    def test_stream_con_voce_per_richiesta(self):
+        testo = "Frase da leggere in streaming. " * 300
+        risposta = self.http.post("/voce/sintetizza/stream", json={"testo": testo, "voce": "maschile",
+                                                                   "lingua": "en"})
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(risposta.mimetype, "audio/mpeg")
+        voci = {voce for _, voce in self.client_google.chiamate}
+        self.assertEqual(voci, {"en-US-Neural2-I"})
+        self.assertGreater(len(self.client_google.chiamate), 1)
+        self.assertTrue(risposta.get_data().startswith(b"en-US-Neural2-I|"))
+
+    def test_accept_non_negoziabile(self):
+        risposta = self.http.post("/voce/sintetizza/audio", json={"testo": "Ciao."},
+                                  headers={"Accept": "audio/basic"})
+        self.assertEqual(risposta.status_code, 406)
+        self.assertTrue(risposta.get_json()["message"].endswith(
+            "Supportati: audio/mpeg, audio/mp3, audio/ogg, audio/opus, audio/wav, audio/x-wav, audio/wave."))
+        risposta = self.http.post("/voce/sintetizza/audio", json={"testo": "Ciao."}, headers={"Accept": "audio/wav"})
+        self.assertEqual((risposta.status_code, risposta.mimetype), (200, "audio/wav"))
+
+    def test_stream_richiesta_non_valida(self):
+        self.assertEqual(self.http.post("/voce/sintetizza/stream", json={"voce": "maschile"}).status_code, 400)
+
+    def test_prima_richiesta_registrata_solo_se_riuscita(self):
+        self.assertEqual(self.http.post("/voce/sintetizza", json={"voce": "maschile"}).status_code, 400)
+        self.assertNotIn("prima_richiesta", self.avvio.stato()["tempi_ms"])
+        self.assertEqual(self.http.post("/voce/sintetizza", json={"testo": "Ciao."}).status_code, 200)
+        self.assertIn("prima_richiesta", self.avvio.stato()["tempi_ms"])
+
+
+
+class TestServerVoiceAIMultiProcesso(TestServerVoiceAI):
+    """Come con più worker: nessuna riproduzione locale."""
+    opzioni = {"riproduzione_locale": False}
+
+    def test_sintesi_senza_riproduzione(self):
+        risposta = self.http.post("/voce/sintetizza", json={"testo": "Ciao."})
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(self.voce_ai.vocal_engine.player.accodati, [])
+
+    def test_controlli_di_riproduzione_rifiutati(self):
+        for metodo, percorso in (("post", "/voce/stop"), ("get", "/voce/riproduzione"),
+                                 ("post", "/voce/riproduzione/salta"), ("post", "/voce/riproduzione/svuota")):
+            self.assertEqual(getattr(self.http, metodo)(percorso).status_code, 409, percorso)
+
+
+class TestCreaApp(unittest.TestCase):
+    def test_quota_divisa_tra_i_worker_di_gunicorn(self):
+        pianificatori = []
+
+        def crea_voce_ai(avvio, multi_processo, workers):
+            pianificatori.append(server_voice_ai._crea_pianificatore(workers if multi_processo else 1))
+            return object()
+
+        with mock.patch.object(server_voice_ai, "_crea_voce_ai", crea_voce_ai), \
+                mock.patch.object(server_voice_ai, "QUOTA_CARATTERI_MINUTO", 8000):
+            server_voice_ai.crea_app(multi_processo=True, workers=8).extensions["avvio_motore"].ottieni(timeout=5)
+            server_voice_ai.crea_app().extensions["avvio_motore"].ottieni(timeout=5)
+        self.assertEqual([p.caratteri_al_minuto for p in pianificatori], [1000, 8000])
+
+
+if __name__ == "__main__":
+    unittest.main()
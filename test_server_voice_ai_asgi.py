@@ -0,0 +1,47 @@
+import time
+import unittest
+from unittest import mock
+from starlette.testclient import TestClient
+import server_voice_ai_asgi
+from test_async_voice_ai import AsyncVoiceAIFinta, ClientAsincronoFinto
+
+
+class TestServerVoiceAIAsgi(unittest.TestCase):
+    def setUp(self):
+        self.client_google = ClientAsincronoFinto()
+        self.voce_ai = None
+
+        def crea():
+            self.voce_ai = AsyncVoiceAIFinta(self.client_google, in_memoria=True)
+            return self.voce_ai
+
+        patch = mock.patch.object(server_voice_ai_asgi.avvio, "_crea", crea)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        if self.voce_ai is not None:
+            self.voce_ai.storage.chiudi()
+            self.voce_ai._tmp.cleanup()
+
+    def test_avvio_pronto_e_sintesi(self):
+        with TestClient(server_voice_ai_asgi.app) as http:
+            # Il motore viene creato e riscaldato dal lifespan, in background
+            limite = time.monotonic() + 5
+            risposta = http.get("/pronto")
+            while risposta.status_code != 200 and time.monotonic() < limite:
+                time.sleep(0.01)
+                risposta = http.get("/pronto")
+            self.assertEqual(risposta.status_code, 200)
+            self.assertTrue(risposta.json()["pronto"])
+
+            risposta = http.post("/voce/sintetizza", json={"testo": "Ciao.", "lingua": "en"})
+            self.assertEqual(risposta.status_code, 200)
+            self.assertTrue(risposta.json()["success"])
+            self.assertIn(("Ciao.", "en-US-Neural2-J"), self.client_google.chiamate)
+
+            self.assertEqual(http.post("/voce/sintetizza", json={"voce": "maschile"}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
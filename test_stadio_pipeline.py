@@ -0,0 +1,57 @@
+import threading
+import time
+import unittest
+from StadioPipeline import StadioPipeline, collega, riepilogo
+
+
+class TestStadioPipeline(unittest.TestCase):
+    def test_elementi_attraversano_gli_stadi_in_ordine(self):
+        ricevuti = []
+        stadi = collega(StadioPipeline("doppio", lambda x: x * 2),
+                        StadioPipeline("filtro", lambda x: x if x % 3 else None),
+                        StadioPipeline("raccolta", ricevuti.append))
+        for stadio in stadi:
+            stadio.avvia()
+        for numero in range(10):
+            stadi[0].inserisci(numero)
+        stadi[0].chiudi()
+        self.assertTrue(all(stadio.attendi(5) for stadio in stadi))
+        self.assertEqual(ricevuti, [2, 4, 8, 10, 14, 16])
+        self.assertEqual(stadi[1].statistiche()["elaborati"], 10)
+
+    def test_stadio_lento_applica_contropressione(self):
+        sblocca = threading.Event()
+        lento = StadioPipeline("lento", lambda x: sblocca.wait(5), capacita=2)
+        veloce = StadioPipeline("veloce", lambda x: x, capacita=1, successivo=lento)
+        lento.avvia()
+        veloce.avvia()
+        produttore = threading.Thread(target=lambda: [veloce.inserisci(i) for i in range(6)])
+        produttore.start()
+        time.sleep(0.2)
+        # Lento: uno in elaborazione e due in coda; veloce: uno fermo in uscita e uno in coda
+        self.assertTrue(produttore.is_alive())
+        self.assertEqual(lento.statistiche()["in_coda"], 2)
+        sblocca.set()
+        produttore.join(5)
+        veloce.chiudi()
+        self.assertTrue(lento.attendi(5))
+        statistiche = lento.statistiche()
+        self.assertEqual(statistiche["elaborati"], 6)
+        self.assertGreater(statistiche["servizio_ms_p95"], 100)
+        self.assertIn("lento*", riepilogo([veloce, lento]))
+
+    def test_errori_contati_senza_fermare_lo_stadio(self):
+        ricevuti = []
+        stadi = collega(StadioPipeline("inverso", lambda x: 1 / x), StadioPipeline("raccolta", ricevuti.append))
+        for stadio in stadi:
+            stadio.avvia()
+        for numero in (1, 0, 2):
+            stadi[0].inserisci(numero)
+        stadi[0].chiudi()
+        stadi[-1].attendi(5)
+        self.assertEqual(ricevuti, [1.0, 0.5])
+        self.assertEqual(stadi[0].statistiche()["errori"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
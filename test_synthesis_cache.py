@@ -0,0 +1,122 @@
+import os
+import threading
+import unittest
+import tempfile
+import time
+from unittest import mock
+from SynthesisCache import SynthesisCache
+
+
+class TestSynthesisCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SynthesisCache(cache_dir=self.tmp.name)
+
+    def test_chiave_normalizza_testo(self):
+        k1 = SynthesisCache.crea_chiave("Ciao   mondo ", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3")
+        k2 = SynthesisCache.crea_chiave(" Ciao mondo", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3")
+        self.assertEqual(k1, k2)
+
+    def test_chiave_dipende_dai_parametri(self):
+        base = SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3")
+        self.assertNotEqual(base, SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.2, "MP3"))
+        self.assertNotEqual(base, SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.0, "OGG_OPUS"))
+        self.assertNotEqual(base, SynthesisCache.crea_chiave("Ciao", "en-US-Neural2-J", "en-US", 1.0, "MP3"))
+        self.assertNotEqual(base, SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3", 16000))
+        self.assertNotEqual(base, SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3",
+                                                             effetti=("telephony-class-application",)))
+        self.assertEqual(base, SynthesisCache.crea_chiave("Ciao", "it-IT-Wavenet-C", "it-IT", 1.0, "MP3", None, ()))
+
+    def test_miss_poi_hit_memoria(self):
+        self.assertIsNone(self.cache.get("k"))
+        self.cache.put("k", b"audio")
+        self.assertEqual(self.cache.get("k"), b"audio")
+        stats = self.cache.statistiche()
+        self.assertEqual(stats["miss"], 1)
+        self.assertEqual(stats["hit_memoria"], 1)
+
+    def test_hit_disco_dopo_riavvio(self):
+        self.cache.put("k", b"audio")
+        nuova = SynthesisCache(cache_dir=self.tmp.name)
+        self.assertEqual(nuova.get("k"), b"audio")
+        self.assertEqual(nuova.statistiche()["hit_disco"], 1)
+
+    def test_file_rimosso_durante_il_caricamento_indice(self):
+        self.cache.put("k", b"audio")
+        scandir = os.scandir
+
+        class VoceRimossa:
+            name = "rimossa.audio"
+
+            def stat(self):
+                raise FileNotFoundError(self.name)
+
+        # Un altro worker elimina un file tra l'elenco della directory e stat()
+        with mock.patch("SynthesisCache.os.scandir", lambda cartella: [*scandir(cartella), VoceRimossa()]):
+            nuova = SynthesisCache(cache_dir=self.tmp.name)
+        self.assertEqual(nuova.statistiche()["voci_disco"], 1)
+        self.assertEqual(nuova.get("k"), b"audio")
+
+    def test_voce_scritta_da_altro_processo(self):
+        # Due istanze sulla stessa directory, come i worker di un server multi-processo
+        altro = SynthesisCache(cache_dir=self.tmp.name)
+        self.assertIsNone(self.cache.get("k"))
+        altro.put("k", b"audio")
+        self.assertEqual(self.cache.get("k"), b"audio")
+        self.assertEqual(self.cache.statistiche()["hit_disco"], 1)
+
+    def test_evizione_memoria_per_dimensione(self):
+        cache = SynthesisCache(cache_dir=None, max_memoria_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.put("c", b"12345")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), b"12345")
+        self.assertEqual(cache.statistiche()["evizioni_memoria"], 1)
+
+    def test_evizione_disco_per_dimensione(self):
+        cache = SynthesisCache(cache_dir=self.tmp.name, max_memoria_bytes=0, max_disco_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.put("c", b"12345")
+        stats = cache.statistiche()
+        self.assertLessEqual(stats["bytes_disco"], 10)
+        self.assertEqual(stats["evizioni_disco"], 1)
+        # Evinta la voce scritta per prima, restano le più recenti
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), b"12345")
+
+    def test_hit_memoria_non_attende_il_disco(self):
+        self.cache.put("a", b"audio a")
+        in_scrittura, sblocca = threading.Event(), threading.Event()
+        replace = os.replace
+
+        def replace_lento(*args):
+            in_scrittura.set()
+            sblocca.wait(5)
+            return replace(*args)
+
+        with mock.patch("SynthesisCache.os.replace", replace_lento):
+            scrittura = threading.Thread(target=self.cache.put, args=("b", b"audio b"))
+            scrittura.start()
+            self.assertTrue(in_scrittura.wait(5))
+            inizio = time.monotonic()
+            self.assertEqual(self.cache.get("a"), b"audio a")
+            self.assertLess(time.monotonic() - inizio, 1.0)
+            sblocca.set()
+            scrittura.join(5)
+        self.assertEqual(self.cache.statistiche()["voci_disco"], 2)
+
+    def test_scadenza_per_eta(self):
+        cache = SynthesisCache(cache_dir=self.tmp.name, max_eta_secondi=0.01)
+        cache.put("k", b"audio")
+        time.sleep(0.05)
+        self.assertIsNone(cache.get("k"))
+        self.assertGreaterEqual(cache.statistiche()["scadute"], 1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from text_chunker import dividi_testo, dividi_frasi
+
+
+class TestTextChunker(unittest.TestCase):
+    def test_testo_vuoto(self):
+        self.assertEqual(dividi_testo("   "), [])
+
+    def test_dividi_frasi(self):
+        frasi = dividi_frasi("Ciao! Come stai? Io bene. Grazie…  A presto")
+        self.assertEqual(frasi, ["Ciao!", "Come stai?", "Io bene.", "Grazie…", "A presto"])
+
+    def test_primo_blocco_breve(self):
+        blocchi = dividi_testo("Prima frase. Seconda frase. Terza frase.")
+        self.assertEqual(blocchi, ["Prima frase.", "Seconda frase. Terza frase."])
+
+    def test_impacchettamento_senza_primo_breve(self):
+        blocchi = dividi_testo("Prima frase. Seconda frase.", primo_blocco_breve=False)
+        self.assertEqual(blocchi, ["Prima frase. Seconda frase."])
+
+    def test_rispetta_limite_byte(self):
+        testo = ("Questa è una proposizione abbastanza lunga, " * 40) + "fine. " + "Àèìòù " * 100
+        blocchi = dividi_testo(testo, max_bytes=120)
+        self.assertTrue(all(len(b.encode("utf-8")) <= 120 for b in blocchi))
+        self.assertEqual(" ".join(blocchi).split(), testo.split())
+
+    def test_parola_piu_lunga_del_limite(self):
+        blocchi = dividi_testo("a" * 25, max_bytes=10)
+        self.assertEqual(blocchi, ["a" * 10, "a" * 10, "a" * 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
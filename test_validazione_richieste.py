@@ -0,0 +1,70 @@
+import unittest
+from validazione_richieste import valida_richiesta_sintesi, valida_richiesta_batch
+
+
+class TestValidazioneRichieste(unittest.TestCase):
+    def test_richiesta_valida_con_default(self):
+        parametri, errore = valida_richiesta_sintesi({"testo": "Ciao"})
+        self.assertIsNone(errore)
+        self.assertEqual(parametri, {"testo": "Ciao", "voce": "femminile", "velocita": 170, "lingua": None,
+                                     "formato": None, "sample_rate": None, "effetti": None,
+                                     "priorita": None})
+
+    def test_testo_mancante_o_vuoto(self):
+        self.assertIsNotNone(valida_richiesta_sintesi(None)[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"voce": "maschile"})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "   "})[1])
+
+    def test_velocita_non_valida(self):
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "velocita": 0})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "velocita": "veloce"})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "velocita": None})[1])
+
+    def test_voce(self):
+        parametri, errore = valida_richiesta_sintesi({"testo": "Ciao", "voce": " Maschile "})
+        self.assertIsNone(errore)
+        self.assertEqual(parametri["voce"], "maschile")
+        self.assertEqual(valida_richiesta_sintesi({"testo": "Ciao", "voce": None})[0]["voce"], "femminile")
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "voce": ["a"]})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "voce": "robot"})[1])
+
+    def test_lingua_normalizzata(self):
+        parametri, _ = valida_richiesta_sintesi({"testo": "Hi", "lingua": " EN "})
+        self.assertEqual(parametri["lingua"], "en")
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Hi", "lingua": 3})[1])
+
+    def test_lingua_automatica(self):
+        parametri, _ = valida_richiesta_sintesi({"testo": "What is the weather like in London today?",
+                                                 "lingua": "auto"})
+        self.assertEqual(parametri["lingua"], "en")
+
+    def test_opzioni_audio(self):
+        parametri, errore = valida_richiesta_sintesi({"testo": "Ciao", "formato": " OGG_OPUS ",
+                                                      "sample_rate": "24000", "effetti": "telephony-class-application"})
+        self.assertIsNone(errore)
+        self.assertEqual((parametri["formato"], parametri["sample_rate"], parametri["effetti"]),
+                         ("ogg_opus", 24000, ["telephony-class-application"]))
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "formato": "flac"})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "sample_rate": 1000})[1])
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "effetti": [3]})[1])
+
+    def test_priorita(self):
+        parametri, errore = valida_richiesta_sintesi({"testo": "Ciao", "priorita": " Interattiva "})
+        self.assertIsNone(errore)
+        self.assertEqual(parametri["priorita"], "interattiva")
+        self.assertIsNotNone(valida_richiesta_sintesi({"testo": "Ciao", "priorita": "urgente"})[1])
+
+    def test_batch_errori_parziali(self):
+        elementi, errore = valida_richiesta_batch({"richieste": [{"testo": "Uno"}, {"testo": ""}]})
+        self.assertIsNone(errore)
+        self.assertIsNone(elementi[0][1])
+        self.assertIsNotNone(elementi[1][1])
+
+    def test_batch_non_valido(self):
+        self.assertIsNotNone(valida_richiesta_batch({"richieste": []})[1])
+        self.assertIsNotNone(valida_richiesta_batch({"testo": "Ciao"})[1])
+        self.assertIsNotNone(valida_richiesta_batch([{"testo": "x"}] * 3, max_elementi=2)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
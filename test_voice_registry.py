@@ -0,0 +1,97 @@
+import json
+import os
+import time
+import tempfile
+import unittest
+from VoiceRegistry import VoiceRegistry
+
+
+def _voce(nome: str, genere: str) -> dict:
+    return {"name": nome, "language_codes": [nome[:5]], "ssml_gender": genere}
+
+
+CATALOGO = [
+    _voce("it-IT-Wavenet-C", "MALE"),
+    _voce("it-IT-Standard-A", "FEMALE"),
+    _voce("en-US-Neural2-J", "MALE"),
+    _voce("en-US-Neural2-I", "MALE"),
+    _voce("de-DE-Standard-B", "MALE"),
+    _voce("de-DE-Neural2-B", "MALE"),
+    _voce("de-DE-Wavenet-A", "FEMALE"),
+    _voce("de-DE-Chirp3-HD-Aoede", "FEMALE"),
+]
+
+
+class TestVoiceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_file = os.path.join(self.tmp.name, "voci.json")
+        self.chiamate = 0
+
+    def _elenca(self, catalogo=CATALOGO):
+        def elenca():
+            self.chiamate += 1
+            return catalogo
+        return elenca
+
+    def _registro(self, **kwargs) -> VoiceRegistry:
+        kwargs.setdefault("elenca_voci", self._elenca())
+        return VoiceRegistry(cache_file=self.cache_file, **kwargs)
+
+    def test_preferenze_e_migliore_voce_del_catalogo(self):
+        registro = self._registro()
+        self.assertEqual(registro.risolvi("maschile", "en").nome_voce, "en-US-Neural2-I")
+        # Lingua senza preferenze: Neural2 prima di Standard, poi il genere richiesto (escluse le Chirp)
+        self.assertEqual(registro.risolvi("maschile", "de").nome_voce, "de-DE-Neural2-B")
+        femminile = registro.risolvi("femminile", "de")
+        self.assertEqual((femminile.nome_voce, femminile.codice_lingua), ("de-DE-Wavenet-A", "de-DE"))
+
+    def test_fallback(self):
+        registro = self._registro()
+        sconosciuta = registro.risolvi("maschile", "xx")
+        self.assertEqual((sconosciuta.lingua, sconosciuta.nome_voce, sconosciuta.con_fallback),
+                         ("it", "it-IT-Wavenet-C", True))
+        genere = registro.risolvi("neutra", "en")
+        self.assertEqual((genere.voce, genere.nome_voce, genere.con_fallback), ("femminile", "en-US-Neural2-J", True))
+        # Igbo senza voci nel catalogo: si usa l'inglese delle preferenze
+        self.assertEqual(registro.risolvi("femminile", "ig").codice_lingua, "en-US")
+
+    def test_cache_risolte_limitata(self):
+        registro = self._registro(dimensione_cache=2)
+        registro.risolvi("femminile", "en")
+        for lingua in ("x1", "x2", "x3"):
+            registro.risolvi("femminile", lingua)
+        self.assertEqual(registro.statistiche()["combinazioni_risolte"], 2)
+        self.assertEqual(list(registro._risolte), [("femminile", "x2"), ("femminile", "x3")])
+
+    def test_igbo_usa_voci_reali_quando_disponibili(self):
+        registro = self._registro(elenca_voci=self._elenca(CATALOGO + [_voce("ig-NG-Standard-A", "FEMALE")]))
+        risolta = registro.risolvi("femminile", "ig")
+        self.assertEqual((risolta.codice_lingua, risolta.nome_voce), ("ig-NG", "ig-NG-Standard-A"))
+
+    def test_catalogo_salvato_su_disco_con_ttl(self):
+        self._registro().risolvi("femminile", "it")
+        self.assertEqual(self.chiamate, 1)
+        # Un secondo processo riusa il file senza chiamare list_voices
+        self.assertEqual(self._registro().risolvi("maschile", "de").nome_voce, "de-DE-Neural2-B")
+        self.assertEqual(self.chiamate, 1)
+
+        with open(self.cache_file, encoding="utf-8") as f:
+            dati = json.load(f)
+        dati["aggiornato"] = time.time() - 3600
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump(dati, f)
+        self._registro(ttl_secondi=60).risolvi("femminile", "it")
+        self.assertEqual(self.chiamate, 2)
+
+    def test_list_voices_non_disponibile(self):
+        def errore():
+            raise ConnectionError("offline")
+        registro = self._registro(elenca_voci=errore)
+        self.assertEqual(registro.risolvi("maschile", "fr").nome_voce, "fr-FR-Neural2-D")
+        self.assertEqual(registro.risolvi("maschile", "de").lingua, "it")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
 import unittest
 from VoiceAI import VoiceAI
+from GoogleSpeaker import GoogleSpeaker
+from VoiceRegistry import VoiceRegistry
+import tempfile
+import threading
 import time
+from pathlib import Path
+from types import SimpleNamespace
 
 class TestVoiceAI(unittest.TestCase):
     def setUp(self):
@@ -35,5 +41,158 @@ class TestVoiceAI(unittest.TestCase):
     def tearDown(self):
         self.ai.cleanup()
 
+class ClientFinto:
+    """Al posto di Google: l'audio è 'nome_voce|testo'; registra le chiamate."""
+    def __init__(self, fallisci=()):
+        self.fallisci = set(fallisci)
+        self.chiamate = []
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, input, voice, audio_config, timeout=None, retry=None):
+        with self._lock:
+            self.chiamate.append((input.text, voice.name))
+        if input.text in self.fallisci:
+            raise RuntimeError(f"errore Google su '{input.text}'")
+        return SimpleNamespace(audio_content=f"{voice.name}|{input.text}".encode())
+
+
+class PlayerFinto:
+    def __init__(self):
+        self.accodati = []
+
+    def accoda_audio(self, audio, suffisso=".mp3"):
+        self.accodati.append(audio)
+        return len(self.accodati)
+
+
+class MotoreFinto(GoogleSpeaker):
+    def __init__(self, client, **opzioni):
+        self._client_finto = client
+        super().__init__(**opzioni)
+
+    def _crea_client(self):
+        return self._client_finto
+
+
+class VoiceAIFinta(VoiceAI):
+    """VoiceAI in memoria, senza cache né archivio, con un motore che non chiama Google."""
+    def __init__(self, client, **opzioni):
+        self._client = client
+        self._tmp = tempfile.TemporaryDirectory()
+        opzioni.setdefault("in_memoria", True)
+        super().__init__(output_dir=self._tmp.name, usa_cache=False, archivia=False,
+                         manifest_prerender=None, **opzioni)
+
+    def _crea_motore(self, voce, lingua):
+        return MotoreFinto(self._client, voce=voce, lingua=lingua, player=PlayerFinto(),
+                           registro=VoiceRegistry(cache_file=None, elenca_voci=lambda: []),
+                           pianificatore=self.pianificatore, politica=self.politica)
+
+
+class TestVoiceAIStream(unittest.TestCase):
+    def setUp(self):
+        self.client = ClientFinto()
+        self.ai = VoiceAIFinta(self.client)
+
+    def tearDown(self):
+        self.ai._tmp.cleanup()
+
+    def test_stream_contemporanei_mantengono_la_propria_voce(self):
+        # Testi di più blocchi: i due generatori si alternano tra una chiamata e l'altra
+        testo = "Questa è una frase di prova per lo streaming. " * 250
+        italiano = self.ai.sintetizza_voce_stream(testo, voce="femminile", lingua="it")
+        inglese = self.ai.sintetizza_voce_stream(testo, voce="maschile", lingua="en")
+        blocchi = {"it-IT-Wavenet-C": [], "en-US-Neural2-I": []}
+        for blocco_it, blocco_en in zip(italiano, inglese):
+            blocchi["it-IT-Wavenet-C"].append(blocco_it)
+            blocchi["en-US-Neural2-I"].append(blocco_en)
+        for voce, audio in blocchi.items():
+            self.assertGreater(len(audio), 1)
+            self.assertTrue(all(a.startswith(voce.encode()) for a in audio), voce)
+        # I default del motore condiviso non cambiano
+        self.assertEqual((self.ai.vocal_engine.voce, self.ai.vocal_engine.lingua), ("femminile", "it"))
+
+    def test_stream_su_disco_senza_file_parziali(self):
+        ai = VoiceAIFinta(ClientFinto(fallisci={"Rotto."}), in_memoria=False)
+        self.addCleanup(ai._tmp.cleanup)
+        file_audio = lambda: sorted(Path(ai._tmp.name).rglob("*.mp3"))
+        # Sintesi fallita e client disconnesso dopo il primo blocco: nessun file
+        with self.assertRaises(RuntimeError):
+            list(ai.sintetizza_voce_stream("Rotto."))
+        stream = ai.sintetizza_voce_stream("Questa è una frase di prova per lo streaming. " * 250)
+        next(stream)
+        stream.close()
+        self.assertEqual(file_audio(), [])
+
+        blocchi = list(ai.sintetizza_voce_stream("Ciao."))
+        [audio] = file_audio()
+        self.assertEqual(audio.read_bytes(), b"".join(blocchi))
+        self.assertEqual(audio.with_suffix(".txt").read_text(encoding="utf-8"), "Ciao.")
+
+
+class PianificatoreFinto:
+    """Ammette tutto e registra la priorità di ogni chiamata a Google."""
+    def __init__(self):
+        self.priorita = []
+
+    def acquisisci(self, caratteri, priorita, scadenza=None):
+        self.priorita.append(priorita)
+
+
+class TestVoiceAIBatch(unittest.TestCase):
+    def setUp(self):
+        self.client = ClientFinto(fallisci={"Rotto."})
+        self.pianificatore = PianificatoreFinto()
+        self.ai = VoiceAIFinta(self.client, pianificatore=self.pianificatore)
+
+    def tearDown(self):
+        self.ai._tmp.cleanup()
+
+    def test_duplicati_sintetizzati_una_volta_in_ordine(self):
+        richieste = [{"testo": "Buongiorno."}, {"testo": "Arrivederci."},
+                     {"testo": "  Buongiorno. "}, {"testo": "Buongiorno.", "voce": "maschile", "lingua": "en"}]
+        risultati = self.ai.sintetizza_batch(richieste, max_paralleli=2)
+        self.assertTrue(all(r["success"] for r in risultati))
+        # Stesso testo normalizzato e stessa spec: una sola chiamata; un'altra voce è un'altra sintesi
+        self.assertEqual(sorted(self.client.chiamate), [("Arrivederci.", "it-IT-Wavenet-C"),
+                                                        ("Buongiorno.", "en-US-Neural2-I"),
+                                                        ("Buongiorno.", "it-IT-Wavenet-C")])
+        self.assertEqual([r["audio_bytes"] for r in risultati],
+                         [len(b"it-IT-Wavenet-C|Buongiorno."), len(b"it-IT-Wavenet-C|Arrivederci."),
+                          len(b"it-IT-Wavenet-C|Buongiorno."), len(b"en-US-Neural2-I|Buongiorno.")])
+        # I duplicati ricevono copie indipendenti del risultato
+        self.assertIsNot(risultati[0], risultati[2])
+
+    def test_fallimenti_isolati(self):
+        richieste = [{"testo": "Uno."}, {"testo": "Rotto."}, {"testo": "Due.", "formato": "flac"},
+                     {"testo": ""}, {"testo": "Tre."}]
+        risultati = self.ai.sintetizza_batch(richieste)
+        self.assertEqual([r["success"] for r in risultati], [True, False, False, False, True])
+        self.assertIn("message", risultati[2])
+
+    def test_voce_non_valida_isolata(self):
+        risultati = self.ai.sintetizza_batch([{"testo": "ciao"}, {"testo": "ok", "voce": ["a"]}])
+        self.assertEqual([r["success"] for r in risultati], [True, False])
+
+    def test_priorita_bulk_predefinita(self):
+        self.ai.sintetizza_batch([{"testo": "Notifica."}, {"testo": "Urgente.", "priorita": "interattiva"}])
+        self.assertEqual(sorted(self.pianificatore.priorita), ["bulk", "interattiva"])
+
+
+class TestRiscaldamento(unittest.TestCase):
+    def test_un_tentativo_con_timeout_breve(self):
+        opzioni = []
+
+        class ClientOpzioni(ClientFinto):
+            def synthesize_speech(self, input, voice, audio_config, timeout=None, retry="predefinito"):
+                opzioni.append((timeout, retry))
+                return super().synthesize_speech(input, voice, audio_config)
+
+        ai = VoiceAIFinta(ClientOpzioni())
+        self.addCleanup(ai._tmp.cleanup)
+        ai.riscalda()
+        self.assertEqual(opzioni, [(5.0, None)])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,89 @@
+import re
+from typing import List
+
+# Limite dell'API Google TTS per SynthesisInput.text (5000 byte), con margine.
+MAX_BYTES_API = 4500
+
+# Fine frase: . ! ? … seguiti da spazio (le virgolette/parentesi di chiusura restano nella frase)
+_FINE_FRASE = re.compile(r'(?<=[.!?…])["\'»)\]]*\s+')
+# Confini di proposizione usati quando una frase supera da sola il limite
+_FINE_PROPOSIZIONE = re.compile(r'(?<=[,;:—–])\s+')
+
+
+def _lunghezza(testo: str) -> int:
+    return len(testo.encode("utf-8"))
+
+
+def _taglia(testo: str, max_bytes: int) -> List[str]:
+    """Divide un segmento troppo lungo prima sulle proposizioni, poi sugli spazi, infine a forza."""
+    if _lunghezza(testo) <= max_bytes:
+        return [testo]
+
+    for separatore in (_FINE_PROPOSIZIONE, re.compile(r'\s+')):
+        parti = [p for p in separatore.split(testo) if p]
+        if len(parti) > 1:
+            return _impacchetta([s for p in parti for s in _taglia(p, max_bytes)], max_bytes)
+
+    # Nessun separatore utile: taglio per caratteri rispettando il limite in byte
+    pezzi, corrente = [], ""
+    for carattere in testo:
+        if _lunghezza(corrente + carattere) > max_bytes:
+            pezzi.append(corrente)
+            corrente = ""
+        corrente += carattere
+    if corrente:
+        pezzi.append(corrente)
+    return pezzi
+
+
+def _impacchetta(segmenti: List[str], max_bytes: int) -> List[str]:
+    """Unisce segmenti consecutivi finché il blocco resta entro max_bytes."""
+    blocchi: List[str] = []
+    corrente = ""
+    for segmento in segmenti:
+        candidato = f"{corrente} {segmento}" if corrente else segmento
+        if corrente and _lunghezza(candidato) > max_bytes:
+            blocchi.append(corrente)
+            corrente = segmento
+        else:
+            corrente = candidato
+    if corrente:
+        blocchi.append(corrente)
+    return blocchi
+
+
+def dividi_frasi(testo: str) -> List[str]:
+    """
+    Divide il testo in frasi sui segni di fine frase.
+
+    Args:
+        testo (str): Il testo da dividere.
+
+    Returns:
+        List[str]: Le frasi non vuote, nell'ordine originale.
+    """
+    return [f.strip() for f in _FINE_FRASE.split(testo.strip()) if f.strip()]
+
+
+def dividi_testo(testo: str, max_bytes: int = MAX_BYTES_API, primo_blocco_breve: bool = True) -> List[str]:
+    """
+    Divide un testo lungo in blocchi sintetizzabili separatamente.
+
+    I blocchi rispettano i confini di frase e, per frasi troppo lunghe, di proposizione.
+    Nessun blocco supera max_bytes in UTF-8.
+
+    Args:
+        testo (str): Il testo da dividere.
+        max_bytes (int): Dimensione massima in byte UTF-8 di ciascun blocco.
+        primo_blocco_breve (bool): Se True, il primo blocco contiene solo la prima frase,
+                                   così l'audio iniziale arriva il prima possibile.
+
+    Returns:
+        List[str]: I blocchi nell'ordine originale (lista vuota per testo vuoto).
+    """
+    segmenti = [s for frase in dividi_frasi(testo) for s in _taglia(frase, max_bytes)]
+    if not segmenti:
+        return []
+    if primo_blocco_breve:
+        return [segmenti[0]] + _impacchetta(segmenti[1:], max_bytes)
+    return _impacchetta(segmenti, max_bytes)
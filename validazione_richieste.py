@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional, Tuple
+from formati_audio import FORMATI, MIN_SAMPLE_RATE, MAX_SAMPLE_RATE
+from PianificatoreSintesi import PRIORITA
+from VoiceRegistry import GENERI
+
+# Valori predefiniti dell'API HTTP per i parametri opzionali
+VOCE_PREDEFINITA = "femminile"
+VELOCITA_PREDEFINITA = 170
+MAX_ELEMENTI_BATCH = 100
+# Valore di 'lingua' che chiede di rilevare la lingua dal testo
+LINGUA_AUTOMATICA = "auto"
+
+
+def valida_richiesta_sintesi(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Valida il corpo JSON di una richiesta di sintesi vocale.
+    Condivisa da tutti gli endpoint di sintesi, indipendentemente dal framework web.
+
+    Args:
+        data (Any): Il JSON decodificato della richiesta (None se non valido).
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: I parametri normalizzati
+        (testo, voce, velocita, lingua, formato, sample_rate, effetti, priorita) e None,
+        con 'lingua' = 'auto' già sostituita dalla lingua rilevata nel testo,
+        oppure None e il messaggio d'errore da restituire con 400.
+    """
+    if not isinstance(data, dict) or "testo" not in data:
+        return None, "Parametro obbligatorio 'testo' mancante o JSON non valido."
+
+    testo = data["testo"]
+    voce = data.get("voce", VOCE_PREDEFINITA)
+    velocita = data.get("velocita", VELOCITA_PREDEFINITA)
+    lingua = data.get("lingua")
+    formato = data.get("formato")
+    sample_rate = data.get("sample_rate")
+    effetti = data.get("effetti")
+    priorita = data.get("priorita")
+
+    if not isinstance(testo, str) or not testo.strip():
+        return None, "Il testo deve essere una stringa non vuota."
+
+    if voce is None:
+        voce = VOCE_PREDEFINITA
+    if not isinstance(voce, str) or voce.strip().lower() not in GENERI:
+        return None, f"Il parametro 'voce' deve essere uno tra: {', '.join(GENERI)}."
+    voce = voce.strip().lower()
+
+    try:
+        velocita = int(velocita)
+        if velocita <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return None, "Il parametro 'velocita' deve essere un numero intero positivo."
+
+    if lingua is not None and (not isinstance(lingua, str) or not lingua.strip()):
+        return None, "Il parametro 'lingua' deve essere un codice lingua (es. 'it', 'en') o 'auto'."
+    lingua = lingua.strip().lower() if lingua else None
+    if lingua == LINGUA_AUTOMATICA:
+        # Importato qui: i profili di langdetect si caricano solo se qualcuno chiede 'auto'
+        from RilevatoreLingua import rilevatore_condiviso
+        lingua = rilevatore_condiviso().lingua(testo)
+
+    if formato is not None:
+        if not isinstance(formato, str) or formato.strip().lower() not in FORMATI:
+            return None, f"Il parametro 'formato' deve essere uno tra: {', '.join(FORMATI)}."
+        formato = formato.strip().lower()
+
+    if sample_rate is not None:
+        try:
+            sample_rate = int(sample_rate)
+            if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+                raise ValueError
+        except (TypeError, ValueError):
+            return None, f"Il parametro 'sample_rate' deve essere un intero tra {MIN_SAMPLE_RATE} e {MAX_SAMPLE_RATE}."
+
+    if isinstance(effetti, str):
+        effetti = [effetti]
+    if effetti is not None and (not isinstance(effetti, list) or not all(isinstance(e, str) and e for e in effetti)):
+        return None, "Il parametro 'effetti' deve essere una lista di profili (es. 'headphone-class-device')."
+
+    if priorita is not None:
+        if not isinstance(priorita, str) or priorita.strip().lower() not in PRIORITA:
+            return None, f"Il parametro 'priorita' deve essere uno tra: {', '.join(PRIORITA)}."
+        priorita = priorita.strip().lower()
+
+    return {"testo": testo, "voce": voce, "velocita": velocita,
+            "lingua": lingua,
+            "formato": formato, "sample_rate": sample_rate, "effetti": effetti or None,
+            "priorita": priorita}, None
+
+
+def valida_richiesta_batch(data: Any, max_elementi: int = MAX_ELEMENTI_BATCH
+                           ) -> Tuple[Optional[List[Tuple[Optional[Dict[str, Any]], Optional[str]]]], Optional[str]]:
+    """
+    Valida il corpo JSON di una richiesta di sintesi batch: {"richieste": [ {...}, ... ]}
+    oppure direttamente una lista di elementi. Ogni elemento è validato come una richiesta
+    singola; gli elementi non validi non invalidano l'intero batch.
+
+    Args:
+        data (Any): Il JSON decodificato della richiesta.
+        max_elementi (int): Numero massimo di elementi accettati.
+
+    Returns:
+        Tuple: La lista (in ordine) di coppie (parametri, errore) per elemento e None,
+        oppure None e il messaggio d'errore da restituire con 400.
+    """
+    elementi = data.get("richieste") if isinstance(data, dict) else data
+    if not isinstance(elementi, list) or not elementi:
+        return None, "Il corpo deve contenere una lista non vuota 'richieste'."
+    if len(elementi) > max_elementi:
+        return None, f"Troppi elementi nel batch ({len(elementi)}); massimo {max_elementi}."
+    return [valida_richiesta_sintesi(elemento) for elemento in elementi], None
@@ -1,9 +1,14 @@
-from VoiceAI import VoiceAI
+import argparse
+import logging
+import os
+import sys
 import time
-
-ai = VoiceAI(voce="femminile", lingua="it", velocita=170)
+from prerender_frasi import CARTELLA_PREDEFINITA, leggi_corpus, prerenderizza
 
 def menu():
+    from VoiceAI import VoiceAI
+    ai = VoiceAI(voce="femminile", lingua="it", velocita=170)
+
     while True:
         print("\n--- Menu Voce AI ---")
         print("1. Parla")
@@ -35,5 +40,40 @@ def menu():
         else:
             print("Scelta non valida.")
 
-if __name__ == "__main__":
+def prerender(args) -> int:
+    """Pre-renderizza i corpus indicati; restituisce il codice di uscita (1 se qualche frase è fallita)."""
+    from GoogleSpeaker import GoogleSpeaker
+    from PianificatoreSintesi import PianificatoreSintesi
+
+    corpus = []
+    for percorso in args.corpus:
+        corpus.extend(leggi_corpus(percorso))
+    # Le frasi attendono la quota invece di essere rifiutate: il pre-render non ha un client in attesa
+    pianificatore = PianificatoreSintesi(args.quota, attesa_massima=3600) if args.quota > 0 else None
+    motore = GoogleSpeaker(pianificatore=pianificatore)
+    esito = prerenderizza(corpus, motore, cartella=args.cartella, max_paralleli=args.paralleli)
+    print(f"Frasi: {esito['totale']}, sintetizzate: {esito['sintetizzate']}, già presenti: {esito['saltate']}, "
+          f"fallite: {esito['fallite']}, non valide: {esito['non_valide']}.")
+    return 1 if esito["fallite"] else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Voce AI: menu interattivo o pre-render di corpus di frasi.")
+    comandi = parser.add_subparsers(dest="comando")
+    parser_prerender = comandi.add_parser(
+        "prerender", help="Sintetizza un corpus di frasi (JSONL, CSV o JSON) e scrive il manifest per la cache.")
+    parser_prerender.add_argument("corpus", nargs="+", help="File del corpus (es. ivr.jsonl, admin.json).")
+    parser_prerender.add_argument("--cartella", default=CARTELLA_PREDEFINITA,
+                                  help=f"Cartella di audio e manifest (default {CARTELLA_PREDEFINITA}).")
+    parser_prerender.add_argument("--paralleli", type=int, default=8, help="Sintesi contemporanee (default 8).")
+    parser_prerender.add_argument("--quota", type=int, default=int(os.getenv("VOICE_QUOTA_CARATTERI_MINUTO", 150000)),
+                                  help="Caratteri al minuto verso Google (0 = nessun limite).")
+    args = parser.parse_args(argv)
+
+    if args.comando == "prerender":
+        logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
+        return prerender(args)
     menu()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())